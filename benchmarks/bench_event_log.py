@@ -0,0 +1,96 @@
+"""Benchmark the overhead of the event log and the warm restart time.
+
+Run with: uv run python benchmarks/bench_event_log.py
+"""
+
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from open_cups.application_state import ApplicationState
+from open_cups.persistence import EventLog, restore_application_state
+from open_cups.types import UserStatus
+
+ROOM_COUNT = 2_000
+SESSIONS_PER_ROOM = 30
+QUESTIONS_PER_ROOM = 5
+CALLS = 50_000
+
+
+def populate(application_state: ApplicationState) -> None:
+    for room_index in range(ROOM_COUNT):
+        room_id = f"room-{room_index}"
+        application_state.create_room(room_id, f"host-{room_index}")
+        room = application_state.rooms[room_id]
+        for session_index in range(SESSIONS_PER_ROOM):
+            room.set_session_status(
+                f"{room_id}-user-{session_index}",
+                UserStatus.GREEN,
+            )
+        for question_index in range(QUESTIONS_PER_ROOM):
+            room.add_question(f"{room_id}-user-0", f"Question {question_index}")
+
+
+def measure(call: Callable[[int], None]) -> tuple[float, float]:
+    latencies = []
+    for i in range(CALLS):
+        start = time.perf_counter_ns()
+        call(i)
+        latencies.append(time.perf_counter_ns() - start)
+    latencies.sort()
+    return statistics.median(latencies) / 1000, latencies[int(CALLS * 0.99)] / 1000
+
+
+def run_mutations(application_state: ApplicationState) -> dict[str, tuple[float, ...]]:
+    statuses = list(UserStatus)
+    room = application_state.rooms["room-0"]
+    question_ids = [question.id for question in room.get_open_questions()]
+
+    def set_status(i: int) -> None:
+        room.set_session_status(f"room-0-user-{i % SESSIONS_PER_ROOM}", statuses[i % 4])
+
+    def upvote(i: int) -> None:
+        room.upvote_question(f"voter-{i}", question_ids[i % len(question_ids)])
+
+    return {
+        "set_session_status": measure(set_status),
+        "upvote_question": measure(upvote),
+    }
+
+
+def main() -> None:
+    baseline = ApplicationState()
+    populate(baseline)
+    without_log = run_mutations(baseline)
+
+    with tempfile.TemporaryDirectory() as directory:
+        state_directory = Path(directory)
+        logged = ApplicationState()
+        event_log = EventLog(state_directory, logged.to_snapshot)
+        logged.add_listener(event_log.append)
+        event_log.start()
+        populate(logged)
+        with_log = run_mutations(logged)
+        event_log.compact()
+        logged.rooms["room-1"].set_session_status("late-user", UserStatus.RED)
+        event_log.close()
+
+        start = time.perf_counter()
+        restored = restore_application_state(state_directory)
+        restore_seconds = time.perf_counter() - start
+
+    print(f"{'operation':<20} {'log':<5} {'median us':>10} {'p99 us':>10}")
+    for operation in without_log:
+        for label, results in (("off", without_log), ("on", with_log)):
+            median, p99 = results[operation]
+            print(f"{operation:<20} {label:<5} {median:>10.2f} {p99:>10.2f}")
+    print(
+        f"warm restart of {len(restored.rooms)} rooms "
+        f"({ROOM_COUNT * SESSIONS_PER_ROOM} sessions): {restore_seconds:.3f} s",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare the bytes and time per refresh of Plotly charts and live charts.
+
+Fills rooms of growing audiences with an hour of history and serializes what
+a refresh sends to the browser: the Plotly figures of the live distribution
+and the history, and the arguments of the live chart component, for the
+first render and for the following refreshes, which send the snapshots of the
+last two seconds.
+
+Run with: uv run python benchmarks/bench_live_charts.py
+"""
+
+import json
+import time
+from collections.abc import Callable
+
+import pandas as pd
+
+from open_cups.clock import SimulatedClock
+from open_cups.live_charts import get_distribution_args, get_history_args
+from open_cups.plots import (
+    ORDERED_STATUS_COLOR_MAP,
+    get_room_statistics_figure,
+    get_status_history_figure,
+)
+from open_cups.room import Room
+from open_cups.types import UserStatus
+
+AUDIENCES = (10, 100, 1000)
+HISTORY_SECONDS = 60 * 60
+REFRESH_SECONDS = 2
+ROUNDS = 20
+
+
+def fill_room(participant_count: int) -> Room:
+    clock = SimulatedClock()
+    room = Room("room-id", "host-id", clock=clock)
+    session_ids = [f"session-{index:08d}" for index in range(participant_count)]
+    for session_id in session_ids:
+        room.join(session_id)
+    statuses = [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED]
+    for second in range(HISTORY_SECONDS):
+        clock.advance(1)
+        room.set_session_status(session_ids[second % participant_count], statuses[0])
+        statuses.append(statuses.pop(0))
+    return room
+
+
+def measure(serialize: Callable[[], str]) -> tuple[int, float]:
+    """Return the bytes and the milliseconds per serialization."""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        payload = serialize()
+    return len(payload), (time.perf_counter() - start) * 1000 / ROUNDS
+
+
+def get_payloads(room: Room) -> dict[str, Callable[[], str]]:
+    """Return the serializations of what a refresh sends, by chart."""
+    counts = room.get_status_counts()
+    df = pd.DataFrame([{status.value: counts[status] for status in UserStatus}])
+    history = room.get_status_history()
+    since = history[-1].timestamp - REFRESH_SECONDS
+    return {
+        "plotly distribution": lambda: get_room_statistics_figure(df).to_json(),
+        "live distribution": lambda: json.dumps(
+            get_distribution_args(counts, ORDERED_STATUS_COLOR_MAP),
+        ),
+        "plotly history": lambda: get_status_history_figure(history).to_json(),
+        "live history, first": lambda: json.dumps(
+            get_history_args(
+                history,
+                None,
+                history[0].timestamp,
+                ORDERED_STATUS_COLOR_MAP,
+            ),
+        ),
+        # a refresh only reads the snapshots after the last one sent
+        "live history, refresh": lambda: json.dumps(
+            get_history_args(
+                room.get_status_history(since),
+                since,
+                room.get_status_history_start(),
+                ORDERED_STATUS_COLOR_MAP,
+            ),
+        ),
+    }
+
+
+def main() -> None:
+    print(f"{'participants':>12} {'chart':<22} {'bytes':>9} {'ms':>8}")
+    for participant_count in AUDIENCES:
+        room = fill_room(participant_count)
+        for name, serialize in get_payloads(room).items():
+            size, milliseconds = measure(serialize)
+            print(f"{participant_count:>12} {name:<22} {size:>9} {milliseconds:>8.3f}")
+        room.close()
+
+
+if __name__ == "__main__":
+    main()
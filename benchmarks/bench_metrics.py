@@ -0,0 +1,36 @@
+"""Benchmark the overhead of timing a rerun phase, enabled and disabled.
+
+Run with: uv run python benchmarks/bench_metrics.py
+"""
+
+import time
+
+from open_cups.metrics import Metrics
+
+CALLS = 1_000_000
+
+
+def time_per_call(metrics: Metrics | None) -> float:
+    start = time.perf_counter()
+    if metrics is None:
+        for _ in range(CALLS):
+            pass
+    else:
+        for _ in range(CALLS):
+            with metrics.phase("rerun"):
+                pass
+    return (time.perf_counter() - start) / CALLS
+
+
+def main() -> None:
+    baseline = time_per_call(None)
+    for label, metrics in (
+        ("disabled", Metrics(enabled=False)),
+        ("enabled", Metrics()),
+    ):
+        overhead = time_per_call(metrics) - baseline
+        print(f"{label:<10} {overhead * 1e9:>8.0f} ns per timed phase")
+
+
+if __name__ == "__main__":
+    main()
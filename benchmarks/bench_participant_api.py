@@ -0,0 +1,135 @@
+"""Simulate a large audience on the participant API.
+
+Thousands of participants join a room, open their websocket and send
+heartbeats and status changes, as the Streamlit app would every two seconds.
+For comparison, the same heartbeat as a Streamlit script rerun is timed.
+
+Run with: uv run python benchmarks/bench_participant_api.py
+"""
+
+import asyncio
+import json
+import time
+
+from streamlit.testing.v1 import AppTest
+from tornado.httpclient import AsyncHTTPClient
+from tornado.websocket import WebSocketClientConnection, websocket_connect
+
+from open_cups.application_state import ApplicationState
+from open_cups.participant_api import ParticipantApiServer
+from open_cups.types import UserStatus
+
+PARTICIPANT_COUNT = 2_000
+HEARTBEAT_ROUNDS = 10
+STREAMLIT_RERUNS = 20
+# a masked client frame with a payload below 126 bytes
+WEBSOCKET_FRAME_OVERHEAD_BYTES = 6
+HEARTBEAT = json.dumps({"op": "heartbeat"})
+
+
+async def open_participant(port: int) -> WebSocketClientConnection:
+    response = await AsyncHTTPClient().fetch(
+        f"http://127.0.0.1:{port}/api/rooms/room-id/participants",
+        method="POST",
+        body=b"",
+    )
+    session_id = json.loads(response.body)["session_id"]
+    return await websocket_connect(
+        f"ws://127.0.0.1:{port}/api/rooms/room-id/participants/{session_id}/socket",
+    )
+
+
+async def heartbeat_round(
+    connections: list[WebSocketClientConnection],
+    round_index: int,
+) -> None:
+    statuses = [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED]
+    status = json.dumps({"op": "status", "status": statuses[round_index % 3].name})
+    await asyncio.gather(
+        *(connection.write_message(HEARTBEAT) for connection in connections),
+        *(connection.write_message(status) for connection in connections[::10]),
+    )
+    # the reply to the last message proves that all earlier ones were handled
+    questions = json.dumps({"op": "questions"})
+    await asyncio.gather(
+        *(connection.write_message(questions) for connection in connections),
+    )
+    await asyncio.gather(*(connection.read_message() for connection in connections))
+
+
+async def run_audience(port: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    connections = []
+    # join in batches, like an audience following a link
+    for batch_start in range(0, PARTICIPANT_COUNT, 100):
+        connections += await asyncio.gather(
+            *(
+                open_participant(port)
+                for _ in range(batch_start, min(batch_start + 100, PARTICIPANT_COUNT))
+            ),
+        )
+    join_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for round_index in range(HEARTBEAT_ROUNDS):
+        await heartbeat_round(connections, round_index)
+    round_seconds = (time.perf_counter() - start) / HEARTBEAT_ROUNDS
+
+    for connection in connections:
+        connection.close()
+    return join_seconds, round_seconds
+
+
+def streamlit_rerun_seconds() -> float:
+    def run_app() -> None:
+        from open_cups.app import run  # noqa: PLC0415
+
+        run()
+
+    host = AppTest.from_function(run_app)
+    host.run()
+    host.button(key="start_room").click().run()
+    room_id = host.query_params["room_id"][0]
+    participant = AppTest.from_function(run_app)
+    participant.query_params["room_id"] = room_id
+    participant.run()
+    participant.run()
+
+    start = time.perf_counter()
+    for _ in range(STREAMLIT_RERUNS):
+        participant.run()
+    return (time.perf_counter() - start) / STREAMLIT_RERUNS
+
+
+def main() -> None:
+    application_state = ApplicationState()
+    application_state.create_room("room-id", "host-id")
+    server = ParticipantApiServer(application_state, "127.0.0.1", 0)
+    server.start()
+    try:
+        join_seconds, round_seconds = asyncio.run(run_audience(server.port))
+    finally:
+        server.stop()
+
+    room = application_state.rooms["room-id"]
+    assert len(list(room)) == PARTICIPANT_COUNT  # noqa: S101
+    rerun_seconds = streamlit_rerun_seconds()
+
+    heartbeat_bytes = len(HEARTBEAT) + WEBSOCKET_FRAME_OVERHEAD_BYTES
+    print(f"{PARTICIPANT_COUNT} participants joined in {join_seconds:.2f} s")
+    print(
+        f"heartbeat round (all participants): {round_seconds * 1000:.1f} ms, "
+        f"{round_seconds / PARTICIPANT_COUNT * 1e6:.1f} us per participant, "
+        f"{heartbeat_bytes} bytes per heartbeat",
+    )
+    print(f"streamlit participant rerun: {rerun_seconds * 1e6:.0f} us")
+    print(
+        "participants per core at one heartbeat every 2 s "
+        "(api clients share the core with the server): "
+        f"api {2 * PARTICIPANT_COUNT / round_seconds:.0f}, "
+        f"streamlit {2 / rerun_seconds:.0f}",
+    )
+
+
+if __name__ == "__main__":
+    main()
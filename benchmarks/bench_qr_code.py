@@ -0,0 +1,48 @@
+"""Compare the QR codes of the join URLs with UUID room ids and room codes.
+
+The host view encodes the join URL into a PNG on every rerun. Prints the QR
+version, the encoding time and the PNG size for both kinds of room ids, on a
+short local and a longer public base URL.
+
+Run with: uv run python benchmarks/bench_qr_code.py
+"""
+
+import time
+import uuid
+
+import qrcode
+
+from open_cups.app import encode_qr_code
+from open_cups.room_codes import generate_room_code
+
+BASE_URLS = ("http://localhost:8501/", "https://opencups.streamlit.app/")
+ROUNDS = 200
+
+
+def measure(join_url: str) -> tuple[int, float, int]:
+    """Return the QR version, the milliseconds per encoding and the PNG bytes."""
+    qr_code = qrcode.QRCode(border=0, box_size=3)
+    qr_code.add_data(join_url)
+    qr_code.make(fit=True)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        image = encode_qr_code(join_url)
+    milliseconds = (time.perf_counter() - start) * 1000 / ROUNDS
+    return qr_code.version, milliseconds, len(image)
+
+
+def main() -> None:
+    print(f"{'base URL':<34} {'room id':<9} {'version':>7} {'ms':>6} {'PNG bytes':>9}")
+    for base_url in BASE_URLS:
+        for kind, room_id in (
+            ("uuid", str(uuid.uuid4())),
+            ("code", generate_room_code()),
+        ):
+            version, milliseconds, size = measure(f"{base_url}?room_id={room_id}")
+            print(
+                f"{base_url:<34} {kind:<9} {version:>7} {milliseconds:>6.2f} {size:>9}",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Replay a recorded trace of room traffic against the in-memory state.
+
+Record a trace of a real lecture by running the app with OPEN_CUPS_TRACE_FILE
+set, then replay it with:
+    uv run python benchmarks/bench_replay_trace.py lecture.trace.gz
+
+Without a trace, a synthetic ten minute lecture is recorded in simulated time
+and replayed. Replays run as fast as possible with 1, 4 and 8 threads, then at
+50 times the recorded pace.
+"""
+
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from open_cups.application_state import ApplicationState
+from open_cups.clock import SimulatedClock
+from open_cups.trace import (
+    RecordingStateBackend,
+    TraceRecorder,
+    format_replay_report,
+    replay_trace,
+)
+from open_cups.types import UserStatus
+
+if TYPE_CHECKING:
+    from open_cups.backend import RoomBackend
+
+LECTURE_SECONDS = 10 * 60
+ROOM_COUNT = 4
+PARTICIPANTS_PER_ROOM = 150
+HEARTBEAT_INTERVAL_SECONDS = 2
+STATUSES = [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED]
+
+
+def record_synthetic_lecture(path: Path) -> None:
+    clock = SimulatedClock()
+    recorder = TraceRecorder(path, clock)
+    backend = RecordingStateBackend(ApplicationState(clock=clock), recorder)
+    random_generator = random.Random(0)  # noqa: S311
+    rooms: list[tuple[RoomBackend, list[str], list[str]]] = []
+    for room_index in range(ROOM_COUNT):
+        host_id = f"host-{room_index}"
+        backend.create_room(f"room-{room_index}", host_id)
+        session_ids = [
+            f"user-{room_index}-{index}" for index in range(PARTICIPANTS_PER_ROOM)
+        ]
+        for session_id in session_ids:
+            backend.join_room(f"room-{room_index}", session_id)
+        host_room = backend.get_session_room(host_id)
+        assert host_room is not None  # noqa: S101
+        rooms.append((host_room, session_ids, []))
+
+    for _ in range(LECTURE_SECONDS // HEARTBEAT_INTERVAL_SECONDS):
+        clock.advance(HEARTBEAT_INTERVAL_SECONDS)
+        for room, session_ids, question_ids in rooms:
+            room.update_host_last_seen()
+            for session_id in session_ids:
+                room.update_session(session_id)
+                draw = random_generator.random()
+                if draw < 0.03:  # noqa: PLR2004
+                    room.set_session_status(
+                        session_id,
+                        random_generator.choice(STATUSES),
+                    )
+                elif draw < 0.031 or (draw < 0.035 and not question_ids):  # noqa: PLR2004
+                    question_ids.append(room.add_question(session_id, "Why?"))
+                elif draw < 0.035:  # noqa: PLR2004
+                    room.upvote_question(
+                        session_id,
+                        random_generator.choice(question_ids),
+                    )
+            if question_ids and random_generator.random() < 0.01:  # noqa: PLR2004
+                room.close_question(question_ids.pop(0))
+    recorder.close()
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        if len(sys.argv) > 1:
+            path = Path(sys.argv[1])
+        else:
+            path = Path(directory) / "synthetic.trace.gz"
+            record_synthetic_lecture(path)
+            print(f"synthetic trace: {path.stat().st_size / 1024:.0f} KiB")
+        for speed, thread_count in ((None, 1), (None, 4), (None, 8), (50.0, 8)):
+            report = replay_trace(path, ApplicationState(), speed, thread_count)
+            pace = "as fast as possible" if speed is None else f"{speed:g}x"
+            print(f"{pace}, {thread_count} threads:")
+            print(format_replay_report(report))
+
+
+if __name__ == "__main__":
+    main()
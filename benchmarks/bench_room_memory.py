@@ -0,0 +1,55 @@
+"""Compare the estimated memory of rooms with the memory they allocate.
+
+Fills rooms of growing audiences with sessions, questions and an hour of
+history, and prints Room.get_memory_usage next to what tracemalloc measured,
+to check the estimate that OPEN_CUPS_MAX_* quotas are sized with.
+
+Run with: uv run python benchmarks/bench_room_memory.py
+"""
+
+import tracemalloc
+
+from open_cups.clock import SimulatedClock
+from open_cups.room import Room
+from open_cups.types import UserStatus
+
+AUDIENCES = (10, 100, 1000, 10000)
+QUESTIONS_PER_PARTICIPANT = 0.1
+QUESTION_LENGTH = 200
+HISTORY_SECONDS = 60 * 60
+
+
+def fill_room(participant_count: int) -> Room:
+    clock = SimulatedClock()
+    room = Room("room-id", "host-id", clock=clock)
+    session_ids = [f"session-{index:08d}" for index in range(participant_count)]
+    for session_id in session_ids:
+        room.join(session_id)
+    for index in range(int(participant_count * QUESTIONS_PER_PARTICIPANT)):
+        room.add_question(session_ids[index], "x" * QUESTION_LENGTH)
+    statuses = [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED]
+    for second in range(HISTORY_SECONDS):
+        clock.advance(1)
+        room.set_session_status(session_ids[second % participant_count], statuses[0])
+        statuses.append(statuses.pop(0))
+    return room
+
+
+def main() -> None:
+    header = f"{'participants':>12} {'estimated KiB':>14} {'allocated KiB':>14}"
+    print(f"{header} {'ratio':>6}")
+    for participant_count in AUDIENCES:
+        tracemalloc.start()
+        room = fill_room(participant_count)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        estimated = room.get_memory_usage().total_bytes
+        print(
+            f"{participant_count:>12} {estimated / 1024:>14.0f} "
+            f"{allocated / 1024:>14.0f} {estimated / allocated:>6.2f}",
+        )
+        room.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark rerun throughput of several processes sharing a SQLite backend.
+
+Each worker process simulates the state access of participant reruns: find the
+session's room, heartbeat, read all participants and the open questions, and
+occasionally change the status.
+
+Run with: uv run python benchmarks/bench_shared_backend.py
+"""
+
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from open_cups.sqlite_backend import SqliteStateBackend
+from open_cups.types import UserStatus
+
+ROOM_COUNT = 50
+SESSIONS_PER_ROOM = 40
+DURATION_SECONDS = 3.0
+STATUS_CHANGE_PROBABILITY = 0.05
+
+
+def session_ids() -> list[str]:
+    return [
+        f"room-{room_index}-user-{session_index}"
+        for room_index in range(ROOM_COUNT)
+        for session_index in range(SESSIONS_PER_ROOM)
+    ]
+
+
+def populate(path: Path) -> None:
+    backend = SqliteStateBackend(path)
+    for room_index in range(ROOM_COUNT):
+        room_id = f"room-{room_index}"
+        backend.create_room(room_id, f"host-{room_index}")
+        for session_index in range(SESSIONS_PER_ROOM):
+            backend.join_room(room_id, f"{room_id}-user-{session_index}")
+        room = backend.get_session_room(f"host-{room_index}")
+        assert room is not None  # noqa: S101
+        room.add_question(f"{room_id}-user-0", "How does this work?")
+    backend.close()
+
+
+def worker(path: Path, start_at: float, results: "multiprocessing.Queue[int]") -> None:
+    backend = SqliteStateBackend(path)
+    sessions = session_ids()
+    statuses = list(UserStatus)
+    rng = random.Random(os.getpid())  # noqa: S311
+    reruns = 0
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + DURATION_SECONDS
+    while time.time() < deadline:
+        session_id = rng.choice(sessions)
+        room = backend.get_session_room(session_id)
+        assert room is not None  # noqa: S101
+        room.update_session(session_id)
+        if rng.random() < STATUS_CHANGE_PROBABILITY:
+            room.set_session_status(session_id, rng.choice(statuses))
+        list(room)
+        room.get_open_questions()
+        reruns += 1
+
+    backend.close()
+    results.put(reruns)
+
+
+def run(path: Path, worker_count: int) -> float:
+    results: multiprocessing.Queue[int] = multiprocessing.Queue()
+    start_at = time.time() + 0.5
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, start_at, results))
+        for _ in range(worker_count)
+    ]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / DURATION_SECONDS
+
+
+def main() -> None:
+    cpu_count = os.cpu_count() or 1
+    worker_counts = [count for count in (1, 2, 4, 8, 16) if count <= cpu_count]
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "state.db"
+        populate(path)
+
+        baseline = None
+        print(f"{'workers':>8} {'reruns/s':>10} {'speedup':>8}")
+        for worker_count in worker_counts:
+            throughput = run(path, worker_count)
+            baseline = baseline or throughput
+            print(
+                f"{worker_count:>8} {throughput:>10.0f} {throughput / baseline:>8.2f}",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Run a three hour lecture through a room in simulated time.
+
+Every participant sends a heartbeat every two seconds and changes their status
+about once a minute, and the cleanup sweeps the room after every heartbeat
+round, as the app's reruns would. A simulated clock replaces the wall clock,
+so millions of events take seconds and the history is the same on every run.
+
+Run with: uv run python benchmarks/bench_simulated_lecture.py
+"""
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from open_cups.clock import SimulatedClock
+from open_cups.room import Room
+from open_cups.types import UserStatus
+
+LECTURE_SECONDS = 3 * 60 * 60
+HEARTBEAT_INTERVAL_SECONDS = 2
+STATUS_CHANGES_PER_MINUTE = 1
+PARTICIPANT_COUNT = 500
+TIMEOUT_SECONDS = 30
+STATUSES = [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED]
+
+
+def run_lecture(history_directory: Path | None) -> None:
+    clock = SimulatedClock()
+    room = Room("room-id", "host-id", history_directory, clock=clock)
+    session_ids = [f"user-{index}" for index in range(PARTICIPANT_COUNT)]
+    random_generator = random.Random(0)  # noqa: S311
+    change_probability = STATUS_CHANGES_PER_MINUTE * HEARTBEAT_INTERVAL_SECONDS / 60
+    for session_id in session_ids:
+        room.set_session_status(session_id, UserStatus.UNKNOWN)
+
+    events = 0
+    sweep_seconds = 0.0
+    max_sweep_seconds = 0.0
+    start = time.perf_counter()
+    for _ in range(LECTURE_SECONDS // HEARTBEAT_INTERVAL_SECONDS):
+        clock.advance(HEARTBEAT_INTERVAL_SECONDS)
+        room.update_host_last_seen()
+        for session_id in session_ids:
+            room.update_session(session_id)
+            if random_generator.random() < change_probability:
+                room.set_session_status(session_id, random_generator.choice(STATUSES))
+                events += 1
+        events += PARTICIPANT_COUNT + 1
+        sweep_start = time.perf_counter()
+        room.remove_inactive_sessions(TIMEOUT_SECONDS)
+        room.is_host_inactive(TIMEOUT_SECONDS)
+        sweep = time.perf_counter() - sweep_start
+        sweep_seconds += sweep
+        max_sweep_seconds = max(max_sweep_seconds, sweep)
+    seconds = time.perf_counter() - start
+
+    sweeps = LECTURE_SECONDS // HEARTBEAT_INTERVAL_SECONDS
+    history = room.get_status_history()
+    assert len(list(room)) == PARTICIPANT_COUNT  # noqa: S101
+    label = "in memory" if history_directory is None else "memory-mapped"
+    print(
+        f"{label:<14} {events} events in {seconds:.1f} s "
+        f"({events / seconds:.0f} events/s), "
+        f"sweep mean {sweep_seconds / sweeps * 1e6:.0f} us, "
+        f"max {max_sweep_seconds * 1e6:.0f} us, "
+        f"{len(history)} history points",
+    )
+    if history_directory is not None:
+        history_bytes = (history_directory / "room-id.history").stat().st_size
+        print(f"{'':<14} history file {history_bytes / 1024:.0f} KiB")
+    room.close()
+
+
+def main() -> None:
+    run_lecture(None)
+    with tempfile.TemporaryDirectory() as directory:
+        run_lecture(Path(directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark a burst of concurrent status writes into one room.
+
+Models the moment a presenter asks everyone to show their cup: many script
+threads set their status in the same room at once.
+
+Run with: uv run python benchmarks/bench_status_writes.py
+Set OPEN_CUPS_LOCK_PROFILE to a file path to also print where the room lock
+is contended.
+"""
+
+import threading
+import time
+
+from open_cups.lock_profiler import lock_profiler, start_lock_profiler
+from open_cups.room import Room
+from open_cups.settings import Settings
+from open_cups.types import RoomEvent, UserStatus
+
+THREAD_COUNT = 16
+SESSIONS_PER_THREAD = 250
+WRITES_PER_SESSION = 10
+
+
+def run_burst(room: Room) -> tuple[float, list[int]]:
+    statuses = [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED]
+    barrier = threading.Barrier(THREAD_COUNT + 1)
+    latencies: list[int] = []
+
+    def writer(thread_index: int) -> None:
+        session_ids = [
+            f"user-{thread_index}-{index}" for index in range(SESSIONS_PER_THREAD)
+        ]
+        own_latencies = []
+        barrier.wait()
+        for write_index in range(WRITES_PER_SESSION):
+            for session_index, session_id in enumerate(session_ids):
+                status = statuses[(write_index + session_index) % 3]
+                start = time.perf_counter_ns()
+                room.set_session_status(session_id, status)
+                own_latencies.append(time.perf_counter_ns() - start)
+                assert room.get_session_status(session_id) == status  # noqa: S101
+        latencies.extend(own_latencies)
+
+    threads = [
+        threading.Thread(target=writer, args=(index,)) for index in range(THREAD_COUNT)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main() -> None:
+    start_lock_profiler(lock_profiler, Settings.from_env())
+    events: list[RoomEvent] = []
+
+    def blocking_listener(event: RoomEvent) -> None:
+        # an event sink that releases the GIL, e.g. a write to a socket
+        events.append(event)
+        time.sleep(0)
+
+    for label, on_event in (
+        ("no listener", None),
+        ("event listener", events.append),
+        ("blocking sink", blocking_listener),
+    ):
+        room = Room("room-id", "host-id", on_event=on_event)
+        seconds, latencies = run_burst(room)
+        writes = len(latencies)
+        print(
+            f"{label:<15} {writes / seconds:>10.0f} writes/s, "
+            f"median {latencies[writes // 2] / 1000:.1f} us, "
+            f"p99 {latencies[int(writes * 0.99)] / 1000:.1f} us, "
+            f"{writes / room.version:.2f} writes per batch",
+        )
+    if lock_profiler.enabled:
+        print(lock_profiler.report())
+
+
+if __name__ == "__main__":
+    main()
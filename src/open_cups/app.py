@@ -1,29 +1,87 @@
+import dataclasses
+import hmac
 import io
+from pathlib import Path
+from urllib.parse import urlencode
 
 import qrcode
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 
+from open_cups.export import (
+    HISTORY_SCHEMA,
+    QUESTIONS_SCHEMA,
+    iter_csv,
+    iter_history_rows,
+    iter_question_rows,
+)
+from open_cups.live_charts import forget_live_history
+from open_cups.message_bytes import RerunBytes
+from open_cups.metrics import Metrics
 from open_cups.plots import show_room_statistics, show_status_history_chart
+from open_cups.question_index import SimilarQuestionError
+from open_cups.quotas import QuotaExceededError
+from open_cups.room_codes import NoFreeRoomCodeError, normalize_room_code
+from open_cups.room_index import RANKING_INTERVAL_SECONDS
+from open_cups.routing import RoomOnOtherWorkerError
+from open_cups.spans import (
+    PARTICIPANTS,
+    ROLE,
+    ROOM_ID,
+    Attributes,
+    NonRecordingSpan,
+    Span,
+    tracer,
+)
 from open_cups.state_provider import (
     ClientState,
     HostState,
     LobbyState,
+    RoomState,
     StateProvider,
 )
-from open_cups.types import UserStatus
+from open_cups.types import LoadLevel, Question, RoomsOverview, UserStatus
 
 AUTOREFRESH_INTERVAL_MS = 2000
-USER_REMOVAL_TIMEOUT_SECONDS = (
-    60  # if we go lower, chrome's background tab throttling causes faulty user removal
-)
-
-
-def show_room_selection_screen(lobby: LobbyState) -> None:
+# participants only need a heartbeat well within the user removal timeout
+SHED_AUTOREFRESH_INTERVAL_MS = 6000
+CACHED_QUESTIONS_TTL_SECONDS = 5
+ADMIN_REFRESH_INTERVAL_MS = int(RANKING_INTERVAL_SECONDS * 1000)
+LOGO_PATH = Path("assets/logo.png")
+
+
+@st.cache_resource
+def load_logo() -> bytes:
+    """Read the logo once per process instead of on every lobby rerun."""
+    return LOGO_PATH.read_bytes()
+
+
+def show_start_room(lobby: LobbyState, load_level: LoadLevel) -> None:
+    st.subheader("Start New Room")
+    if st.button("Create Room", width="stretch", key="start_room"):
+        if load_level >= LoadLevel.REJECT_ROOMS:
+            st.error(
+                "The server is too busy to start new rooms right now. "
+                "Please try again in a few minutes.",
+            )
+        else:
+            try:
+                lobby.create_room()
+                st.rerun()
+            except (QuotaExceededError, NoFreeRoomCodeError) as error:
+                st.error(str(error))
+
+
+def show_room_selection_screen(
+    lobby: LobbyState,
+    load_level: LoadLevel = LoadLevel.NORMAL,
+) -> None:
     if "room_id" in st.query_params:
         try:
             lobby.join_room(st.query_params["room_id"])
             st.rerun()
+        except QuotaExceededError as error:
+            st.error(str(error))
         except ValueError:
             st.error("Room ID from URL not found")
 
@@ -36,15 +94,12 @@ def show_room_selection_screen(lobby: LobbyState) -> None:
         st.title("Welcome to OpenCups")
         st.write("Host or join a room to share feedback.")
     with right:
-        st.image("assets/logo.png", width="content")
+        st.image(load_logo(), width="content")
 
     col_left, col_right = st.columns(2, gap="medium")
 
     with col_left:
-        st.subheader("Start New Room")
-        if st.button("Create Room", width="stretch", key="start_room"):
-            lobby.create_room()
-            st.rerun()
+        show_start_room(lobby, load_level)
 
     with col_right:
         st.subheader("Join Existing Room")
@@ -61,6 +116,14 @@ def show_room_selection_screen(lobby: LobbyState) -> None:
                 try:
                     lobby.join_room(room_id)
                     st.rerun()
+                except RoomOnOtherWorkerError:
+                    # a new page load lets the router pick the room's worker
+                    st.link_button(
+                        "Open Room",
+                        "?" + urlencode({"room_id": normalize_room_code(room_id)}),
+                    )
+                except QuotaExceededError as error:
+                    st.error(str(error))
                 except ValueError:
                     st.error("Room ID not found")
 
@@ -149,10 +212,13 @@ def show_user_status_selection(room: ClientState) -> None:
         st.rerun()
 
 
+@tracer.traced("qr_code")
 def generate_qr_code_image(room_id: str) -> bytes:
     base_url = st.context.url
-    join_url = f"{base_url}?room_id={room_id}"
+    return encode_qr_code(f"{base_url}?room_id={room_id}")
+
 
+def encode_qr_code(join_url: str) -> bytes:
     url_qr_code = qrcode.QRCode(
         border=0,
         box_size=3,
@@ -166,7 +232,7 @@ def generate_qr_code_image(room_id: str) -> bytes:
     return img_bytes.getvalue()
 
 
-def show_active_room_header(room_id: str) -> None:
+def show_active_room_header(room_id: str, metrics: Metrics) -> None:
     st.query_params["room_id"] = room_id
     st.title("Active Room")
     left_col, right_col = st.columns([2, 1], gap="large")
@@ -176,14 +242,39 @@ def show_active_room_header(room_id: str) -> None:
         st.markdown(f"**{room_id}**")
         st.caption("Share this ID with participants to let them join")
     with right_col:
-        st.image(generate_qr_code_image(room_id), width="content")
+        with metrics.phase("qr_code"):
+            qr_code_image = generate_qr_code_image(room_id)
+        st.image(qr_code_image, width="content")
 
     st.divider()
 
 
-def show_open_questions(state: HostState | ClientState) -> None:
+# the room id and the host id are the cache key, since room ids are reused by
+# new rooms, arguments starting with _ are not hashed
+@st.cache_resource(ttl=CACHED_QUESTIONS_TTL_SECONDS)
+def get_cached_open_questions(
+    room_id: str,  # noqa: ARG001
+    host_id: str,  # noqa: ARG001
+    _state: ClientState,
+) -> list[Question]:
+    return _state.get_open_questions()
+
+
+def show_open_questions(
+    state: HostState | ClientState,
+    *,
+    cached: bool = False,
+) -> None:
     st.subheader("Open Questions")
-    open_questions = state.get_open_questions()
+    if cached and isinstance(state, ClientState):
+        # shared by all participants of the room, so votes show up late
+        open_questions = get_cached_open_questions(
+            state.room_id,
+            state.host_id,
+            state,
+        )
+    else:
+        open_questions = state.get_open_questions()
     if not open_questions:
         st.info("No questions yet.")
     else:
@@ -210,12 +301,22 @@ def show_open_questions(state: HostState | ClientState) -> None:
                         help="Vote for question",
                         width="stretch",
                     ):
-                        state.upvote_question(question.id)
+                        try:
+                            state.upvote_question(question.id)
+                        except QuotaExceededError as error:
+                            st.session_state.question_error = str(error)
                         st.rerun()
 
 
-def show_active_room_host(host_state: HostState) -> None:
-    show_active_room_header(host_state.room_id)
+def show_active_room_host(
+    host_state: HostState,
+    metrics: Metrics,
+    load_level: LoadLevel = LoadLevel.NORMAL,
+    *,
+    live_charts: bool = False,
+) -> None:
+    with metrics.phase("header"):
+        show_active_room_header(host_state.room_id, metrics)
     view_choice = st.radio(
         "Select View",
         ["Live distribution", "Distribution history"],
@@ -223,58 +324,284 @@ def show_active_room_host(host_state: HostState) -> None:
         key="host_view_choice",
     )
 
-    if view_choice == "Live distribution":
-        show_room_statistics(host_state)
-    else:
-        show_status_history_chart(host_state)
+    with metrics.phase("plots"):
+        if view_choice == "Live distribution":
+            forget_live_history()
+            show_room_statistics(host_state, live_chart=live_charts)
+        elif load_level >= LoadLevel.PAUSE_HISTORY:
+            forget_live_history()
+            st.info(
+                "The distribution history is paused while the server is busy. "
+                "The live distribution is still up to date.",
+            )
+        else:
+            show_status_history_chart(host_state, live_chart=live_charts)
 
     st.divider()
 
-    show_open_questions(host_state)
+    with metrics.phase("questions"):
+        show_open_questions(host_state)
+
+    st.divider()
+    show_export_downloads(host_state)
+
+
+def show_export_downloads(host_state: HostState) -> None:
+    # the exports are only encoded when a button is clicked
+    history_col, questions_col = st.columns(2)
+    with history_col:
+        st.download_button(
+            "Download history (CSV)",
+            data=lambda: "".join(
+                iter_csv(
+                    HISTORY_SCHEMA,
+                    iter_history_rows(host_state.get_status_history()),
+                ),
+            ),
+            file_name=f"{host_state.room_id}-history.csv",
+            mime="text/csv",
+            key="download_history",
+            on_click="ignore",
+        )
+    with questions_col:
+        st.download_button(
+            "Download questions (CSV)",
+            data=lambda: "".join(
+                iter_csv(
+                    QUESTIONS_SCHEMA,
+                    iter_question_rows(host_state.get_open_questions()),
+                ),
+            ),
+            file_name=f"{host_state.room_id}-questions.csv",
+            mime="text/csv",
+            key="download_questions",
+            on_click="ignore",
+        )
 
 
-def show_active_room_client(client_state: ClientState) -> None:
-    show_active_room_header(client_state.room_id)
+def show_active_room_client(
+    client_state: ClientState,
+    metrics: Metrics,
+    load_level: LoadLevel = LoadLevel.NORMAL,
+    *,
+    live_charts: bool = False,
+) -> None:
+    with metrics.phase("header"):
+        show_active_room_header(client_state.room_id, metrics)
 
     col_left, col_right = st.columns(2, gap="medium")
     with col_left:
         show_user_status_selection(client_state)
-    with col_right:
-        show_room_statistics(client_state)
+    with col_right, metrics.phase("plots"):
+        show_room_statistics(client_state, live_chart=live_charts)
 
-    def handle_question_submit() -> None:
+    def submit_question(*, allow_similar: bool) -> None:
         question = st.session_state.question_input
+        st.session_state.pop("similar_question", None)
         if question and question.strip():
-            client_state.submit_question(question.strip())
+            try:
+                client_state.submit_question(
+                    question.strip(),
+                    allow_similar=allow_similar,
+                )
+            except SimilarQuestionError as error:
+                # offered by the rerun, the question stays in the input
+                st.session_state.similar_question = error.question
+                return
+            except QuotaExceededError as error:
+                # shown by the rerun, the question stays in the input
+                st.session_state.question_error = str(error)
+                return
             st.session_state.question_input = ""
 
-    with st.form("question_form"):
-        st.text_area(
-            "Ask a Question",
-            key="question_input",
-            placeholder="Type your question here...",
+    def vote_for_similar_question() -> None:
+        similar_question = st.session_state.pop("similar_question")
+        try:
+            client_state.upvote_question(similar_question.id)
+        except QuotaExceededError as error:
+            st.session_state.question_error = str(error)
+            return
+        if all(
+            question.id != similar_question.id
+            for question in client_state.get_open_questions()
+        ):
+            # closed since it was offered, so the vote did not count
+            submit_question(allow_similar=True)
+            return
+        st.session_state.question_input = ""
+
+    with metrics.phase("question_form"):
+        with st.form("question_form"):
+            st.text_area(
+                "Ask a Question",
+                key="question_input",
+                placeholder="Type your question here...",
+            )
+
+            st.form_submit_button(
+                "Submit Question",
+                key="submit_question",
+                on_click=submit_question,
+                kwargs={"allow_similar": False},
+            )
+
+        similar_question = st.session_state.get("similar_question")
+        if similar_question is not None:
+            st.warning(
+                f'A similar question is already open: "{similar_question.text}"',
+            )
+            vote_col, ask_col = st.columns(2)
+            vote_col.button(
+                "Vote for it instead",
+                key="vote_similar_question",
+                on_click=vote_for_similar_question,
+            )
+            ask_col.button(
+                "Ask anyway",
+                key="ask_anyway",
+                on_click=submit_question,
+                kwargs={"allow_similar": True},
+            )
+
+    question_error = st.session_state.pop("question_error", None)
+    if question_error is not None:
+        st.error(question_error)
+
+    with metrics.phase("questions"):
+        show_open_questions(
+            client_state,
+            cached=load_level >= LoadLevel.CACHE_QUESTIONS,
         )
 
-        st.form_submit_button(
-            "Submit Question",
-            key="submit_question",
-            on_click=handle_question_submit,
+
+def is_admin_request(admin_token: str | None) -> bool:
+    """Return if the admin query parameter matches the configured token."""
+    if admin_token is None:
+        return False
+    return hmac.compare_digest(
+        st.query_params.get("admin", "").encode(),
+        admin_token.encode(),
+    )
+
+
+def show_admin_overview(overview: RoomsOverview) -> None:
+    st.title("Rooms Overview")
+    columns = st.columns(4)
+    columns[0].metric("Rooms", overview.rooms)
+    columns[1].metric("Participants", sum(overview.participants.values()))
+    columns[2].metric("Open questions", overview.questions)
+    columns[3].metric(
+        "Writes per second",
+        "n/a"
+        if overview.writes_per_second is None
+        else f"{overview.writes_per_second:.1f}",
+    )
+    for column, (status, count) in zip(
+        st.columns(len(overview.participants)),
+        overview.participants.items(),
+        strict=True,
+    ):
+        column.metric(status.value, count)
+
+    st.subheader("Largest Rooms")
+    st.dataframe(
+        [dataclasses.asdict(room) for room in overview.largest_rooms],
+        hide_index=True,
+    )
+    st.subheader("Busiest Rooms")
+    if overview.writes_per_second is None:
+        st.info("This backend does not count the writes of the rooms.")
+    else:
+        st.dataframe(
+            [dataclasses.asdict(room) for room in overview.busiest_rooms],
+            hide_index=True,
         )
 
-    show_open_questions(client_state)
 
+def get_autorefresh_interval_ms(
+    current: LobbyState | HostState | ClientState,
+    load_level: LoadLevel,
+) -> int | None:
+    """Return the refresh interval, None for the lobby which only changes on input."""
+    if isinstance(current, LobbyState):
+        return None
+    if isinstance(current, HostState) or load_level < LoadLevel.SLOW_REFRESH:
+        return AUTOREFRESH_INTERVAL_MS
+    return SHED_AUTOREFRESH_INTERVAL_MS
+
+
+def tag_rerun_span(
+    span: Span | NonRecordingSpan,
+    role: str,
+    room: RoomState | None = None,
+) -> None:
+    """Tag a sampled rerun with the role, room and number of participants."""
+    if not span.is_recording():
+        return
+    attributes: Attributes = {ROLE: role}
+    if room is not None:
+        attributes[ROOM_ID] = room.room_id
+        attributes[PARTICIPANTS] = len(room.get_room_participants())
+    span.set_attributes(attributes)
 
-def run() -> None:
-    st_autorefresh(interval=AUTOREFRESH_INTERVAL_MS, key="data_refresh")
 
+def run() -> None:
     state_provider = StateProvider()
-    cleanup = state_provider.get_cleanup(USER_REMOVAL_TIMEOUT_SECONDS)
-    cleanup.cleanup_all()
-
-    match state_provider.get_current():
-        case HostState() as host:
-            show_active_room_host(host)
-        case ClientState() as client:
-            show_active_room_client(client)
-        case LobbyState() as lobby:
-            show_room_selection_screen(lobby)
+    metrics = state_provider.context.metrics
+    with (
+        tracer.span("rerun") as span,
+        metrics.phase("rerun"),
+        state_provider.context.rerun_profiler.sample() as sample,
+        # the profiled reruns are slower, so they would raise the load level
+        state_provider.context.overload_detector.rerun(
+            record=not sample.sampled,
+        ) as load_level,
+        RerunBytes(metrics) as rerun_bytes,
+    ):
+        cleanup = state_provider.get_cleanup()
+        with metrics.phase("cleanup"):
+            cleanup.cleanup_all()
+
+        if is_admin_request(state_provider.context.settings.admin_token):
+            sample.role = rerun_bytes.role = "admin"
+            tag_rerun_span(span, "admin")
+            st_autorefresh(interval=ADMIN_REFRESH_INTERVAL_MS, key="data_refresh")
+            show_admin_overview(
+                state_provider.context.application_state.get_overview(),
+            )
+            return
+
+        with metrics.phase("get_current"):
+            current = state_provider.get_current()
+
+        interval = get_autorefresh_interval_ms(current, load_level)
+        if interval is None:
+            # keeps the positions of the elements, see show_room_selection_screen
+            st.empty()
+        else:
+            st_autorefresh(interval=interval, key="data_refresh")
+
+        live_charts = state_provider.context.settings.live_charts
+        match current:
+            case HostState() as host:
+                sample.role = rerun_bytes.role = "host"
+                tag_rerun_span(span, "host", host)
+                show_active_room_host(
+                    host,
+                    metrics,
+                    load_level,
+                    live_charts=live_charts,
+                )
+            case ClientState() as client:
+                sample.role = rerun_bytes.role = "client"
+                tag_rerun_span(span, "client", client)
+                show_active_room_client(
+                    client,
+                    metrics,
+                    load_level,
+                    live_charts=live_charts,
+                )
+            case LobbyState() as lobby:
+                sample.role = rerun_bytes.role = "lobby"
+                tag_rerun_span(span, "lobby")
+                show_room_selection_screen(lobby, load_level)
@@ -1,29 +1,100 @@
+from pathlib import Path
+from typing import Any
+
+from open_cups.backend import RoomArchiver
+from open_cups.clock import Clock, system_clock
+from open_cups.quotas import Quotas
 from open_cups.room import Room
+from open_cups.room_codes import RoomCodeTakenError
+from open_cups.room_index import RoomIndex
 from open_cups.thread_safe_dict import ThreadSafeDict
-from open_cups.types import UserStatus
+from open_cups.types import (
+    BackendStatistics,
+    EventKind,
+    EventListener,
+    MemoryUsage,
+    RoomEvent,
+    RoomsOverview,
+)
 
 
 class ApplicationState:
     """Application-wide shared state."""
 
-    def __init__(self) -> None:
-        self.rooms: ThreadSafeDict[Room] = ThreadSafeDict()
+    def __init__(
+        self,
+        history_directory: Path | None = None,
+        clock: Clock = system_clock,
+        quotas: Quotas | None = None,
+        heartbeat_epoch_seconds: float = 0.0,
+    ) -> None:
+        self.rooms: ThreadSafeDict[Room] = ThreadSafeDict(name="rooms")
+        self._history_directory = history_directory
+        self._clock = clock
+        self._quotas = quotas or Quotas()
+        self._heartbeat_epoch_seconds = heartbeat_epoch_seconds
+        self._index = RoomIndex(clock)
+        if history_directory is not None:
+            history_directory.mkdir(parents=True, exist_ok=True)
+        self._listeners: list[EventListener] = []
+        self._archivers: list[RoomArchiver] = []
+
+    def add_listener(self, listener: EventListener) -> None:
+        """Register a listener for the mutations of all rooms."""
+        self._listeners.append(listener)
+
+    def add_room_archiver(self, archiver: RoomArchiver) -> None:
+        """Register an archiver for the rooms removed for an inactive host."""
+        self._archivers.append(archiver)
+
+    def _emit(self, event: RoomEvent) -> None:
+        for listener in self._listeners:
+            listener(event)
 
     def get_session_room(self, session_id: str) -> Room | None:
-        for room in self.rooms.values():
-            if room.has_session(session_id):
-                return room
-        return None
+        room_id = self._index.get_session_room_id(session_id)
+        room = None if room_id is None else self.rooms.get(room_id)
+        # the index may not have caught up with a concurrent removal yet
+        if room is None or not room.has_session(session_id):
+            return None
+        return room
 
     def create_room(self, room_id: str, session_id: str) -> None:
-        room = Room(room_id, session_id)
-        self.rooms[room_id] = room
+        with self.rooms:
+            if room_id in self.rooms:
+                message = f"Room {room_id} already exists"
+                raise RoomCodeTakenError(message)
+            self._quotas.check_rooms(len(self.rooms))
+            room = Room(
+                room_id,
+                session_id,
+                self._history_directory,
+                self._emit,
+                self._clock,
+                quotas=self._quotas,
+                index=self._index,
+                heartbeat_epoch_seconds=self._heartbeat_epoch_seconds,
+            )
+            # emit before publishing the room, so its creation precedes its
+            # mutations
+            self._emit(
+                RoomEvent(EventKind.ROOM_CREATED, room_id, session_id=session_id),
+            )
+            self.rooms[room_id] = room
 
     def join_room(self, room_id: str, session_id: str) -> None:
-        if room_id not in self.rooms:
+        # get, as the room may be removed concurrently
+        room = self.rooms.get(room_id)
+        if room is None:
             message = f"Room {room_id} does not exist"
             raise ValueError(message)
-        self.rooms[room_id].set_session_status(session_id, UserStatus.UNKNOWN)
+        room.join(session_id)
+
+    def remove_inactive_sessions(self, timeout_seconds: int) -> None:
+        for room in self.rooms.values():
+            room.remove_inactive_sessions(timeout_seconds)
+        # this visits every room anyway, the overview only reads the rankings
+        self._index.rank()
 
     def remove_rooms_with_inactive_hosts(self, timeout_seconds: int) -> None:
         inactive_room_ids = [
@@ -32,4 +103,88 @@ class ApplicationState:
             if room.is_host_inactive(timeout_seconds)
         ]
         for room_id in inactive_room_ids:
-            del self.rooms[room_id]
+            self._remove_room(room_id)
+
+    def get_statistics(self) -> BackendStatistics:
+        # the counters of the index and the rooms, nothing is copied
+        rooms, sessions, questions = self._index.get_totals()
+        return BackendStatistics(
+            rooms=rooms,
+            sessions=sessions,
+            questions=questions,
+            history_points=sum(
+                room.get_status_history_length() for room in self.rooms.values()
+            ),
+        )
+
+    def get_overview(self) -> RoomsOverview:
+        return self._index.get_overview()
+
+    def get_memory_usage(self) -> dict[str, MemoryUsage]:
+        """Estimate the memory of each room, by room id."""
+        return {
+            room_id: room.get_memory_usage() for room_id, room in self.rooms.items()
+        }
+
+    def _remove_room(self, room_id: str) -> None:
+        room = self.rooms.pop(room_id)
+        if room is not None:
+            for archiver in self._archivers:
+                archiver(room)
+            room.close()
+            self._emit(RoomEvent(EventKind.ROOM_REMOVED, room_id))
+
+    def apply_event(self, event: RoomEvent) -> None:
+        """Replay a previously emitted event, see Room.apply_event."""
+        match event.kind:
+            case EventKind.ROOM_CREATED:
+                if event.room_id not in self.rooms:
+                    self.rooms[event.room_id] = Room(
+                        event.room_id,
+                        event.session_id,
+                        self._history_directory,
+                        self._emit,
+                        self._clock,
+                        quotas=self._quotas,
+                        index=self._index,
+                        heartbeat_epoch_seconds=self._heartbeat_epoch_seconds,
+                    )
+            case EventKind.ROOM_REMOVED:
+                room = self.rooms.pop(event.room_id)
+                if room is not None:
+                    room.close()
+            case _:
+                room = self.rooms.get(event.room_id)
+                if room is not None:
+                    room.apply_event(event)
+
+    def to_snapshot(self) -> dict[str, Any]:
+        return {"rooms": [room.to_snapshot() for room in self.rooms.values()]}
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        data: dict[str, Any],
+        history_directory: Path | None = None,
+        clock: Clock = system_clock,
+        quotas: Quotas | None = None,
+        heartbeat_epoch_seconds: float = 0.0,
+    ) -> "ApplicationState":
+        application_state = cls(
+            history_directory,
+            clock,
+            quotas,
+            heartbeat_epoch_seconds,
+        )
+        for room_data in data["rooms"]:
+            room = Room.from_snapshot(
+                room_data,
+                history_directory,
+                application_state._emit,
+                clock,
+                quotas=quotas,
+                index=application_state._index,
+                heartbeat_epoch_seconds=heartbeat_epoch_seconds,
+            )
+            application_state.rooms[room.room_id] = room
+        return application_state
@@ -0,0 +1,100 @@
+from collections.abc import Callable, Iterator
+from typing import Protocol
+
+from open_cups.types import (
+    BackendStatistics,
+    Question,
+    RoomsOverview,
+    StatusSnapshot,
+    UserStatus,
+)
+
+
+class RoomBackend(Protocol):
+    """Storage of a single room, as used by the per-session states."""
+
+    @property
+    def room_id(self) -> str: ...
+
+    @property
+    def host_id(self) -> str:
+        """The session of the host, unlike the room id never reused by a room."""
+        ...
+
+    def is_host(self, session_id: str) -> bool: ...
+
+    def has_session(self, session_id: str) -> bool:
+        """Whether the session is the host or a participant of the room.
+
+        False once the room is removed.
+        """
+        ...
+
+    def update_host_last_seen(self) -> None: ...
+
+    def set_session_status(self, session_id: str, status: UserStatus) -> None: ...
+
+    def get_session_status(self, session_id: str) -> UserStatus: ...
+
+    def update_session(self, session_id: str) -> None: ...
+
+    def __iter__(self) -> Iterator[tuple[str, UserStatus]]: ...
+
+    def get_open_questions(self) -> list[Question]: ...
+
+    def add_question(
+        self,
+        session_id: str,
+        text: str,
+        *,
+        allow_similar: bool = True,
+    ) -> str:
+        """Add a question voted for by its author and return its id.
+
+        Unless allow_similar, raise SimilarQuestionError with the most similar
+        open question, if any.
+        """
+        ...
+
+    def upvote_question(self, session_id: str, question_id: str) -> None: ...
+
+    def close_question(self, question_id: str) -> None: ...
+
+    def get_status_history(
+        self,
+        start_time: float | None = None,
+    ) -> list[StatusSnapshot]:
+        """Return the snapshots from start_time on, all of them for None."""
+        ...
+
+    def get_status_history_start(self) -> float | None:
+        """Return the timestamp of the oldest snapshot kept, None without any."""
+        ...
+
+
+class StateBackend(Protocol):
+    """Storage of all rooms.
+
+    ApplicationState keeps the rooms in process memory, SqliteStateBackend in a
+    database file that several server processes can share.
+    """
+
+    def get_session_room(self, session_id: str) -> RoomBackend | None: ...
+
+    def create_room(self, room_id: str, session_id: str) -> None: ...
+
+    def join_room(self, room_id: str, session_id: str) -> None: ...
+
+    def remove_inactive_sessions(self, timeout_seconds: int) -> None: ...
+
+    def remove_rooms_with_inactive_hosts(self, timeout_seconds: int) -> None: ...
+
+    def get_statistics(self) -> BackendStatistics: ...
+
+    def get_overview(self) -> RoomsOverview:
+        """Aggregates over all rooms and the largest and busiest ones."""
+        ...
+
+
+# called with each room removed for an inactive host, before its state is dropped
+type RoomArchiver = Callable[[RoomBackend], None]
@@ -0,0 +1,31 @@
+"""Wall clocks for rooms, their history and the cleanup of inactive sessions.
+
+Rooms, stats trackers and backends take a clock, so tests and benchmarks can
+run a three hour lecture in simulated time instead of sleeping through it.
+"""
+
+import time
+from collections.abc import Callable
+
+type Clock = Callable[[], float]
+
+
+def system_clock() -> float:
+    """Return time.time(), looked up on every call so it can be patched."""
+    return time.time()
+
+
+class SimulatedClock:
+    """A clock that only moves when advanced."""
+
+    def __init__(self, start: float = 0.0) -> None:
+        self._now = start
+
+    def __call__(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        if seconds < 0:
+            message = "A simulated clock cannot go back in time"
+            raise ValueError(message)
+        self._now += seconds
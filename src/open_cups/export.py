@@ -0,0 +1,148 @@
+"""Export of the status history and the open questions of a room.
+
+Hosts download the exports during the session. With OPEN_CUPS_EXPORT_DIR set,
+a room is also exported to that directory when it is removed because its host
+left, as its history is lost afterwards. The files are named after the room
+and the time of its removal, as a later room may get the same code.
+
+CSV and NDJSON are encoded by generators one row at a time, so the encoded
+export never has to fit in memory next to the room. Parquet and Arrow files
+are written in batches of COLUMNAR_BATCH_ROWS rows with pyarrow.
+"""
+
+import csv
+import io
+import itertools
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from open_cups.backend import RoomBackend
+from open_cups.clock import Clock, system_clock
+from open_cups.types import ExportFormat, Question, StatusSnapshot, UserStatus
+
+COLUMNAR_BATCH_ROWS = 10_000
+EXPORT_STATUS_ORDER = (
+    UserStatus.GREEN,
+    UserStatus.YELLOW,
+    UserStatus.RED,
+    UserStatus.UNKNOWN,
+)
+HISTORY_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.float64()),
+        *((status.name.lower(), pa.int64()) for status in EXPORT_STATUS_ORDER),
+    ],
+)
+QUESTIONS_SCHEMA = pa.schema(
+    [("id", pa.string()), ("text", pa.string()), ("votes", pa.int64())],
+)
+
+type Row = tuple[str | float | int, ...]
+
+
+def iter_history_rows(history: Iterable[StatusSnapshot]) -> Iterator[Row]:
+    for snapshot in history:
+        yield (
+            snapshot.timestamp,
+            *(snapshot.counts[status] for status in EXPORT_STATUS_ORDER),
+        )
+
+
+def iter_question_rows(questions: Iterable[Question]) -> Iterator[Row]:
+    for question in questions:
+        yield question.id, question.text, question.vote_count
+
+
+def iter_csv(schema: pa.Schema, rows: Iterable[Row]) -> Iterator[str]:
+    """Encode a header and the rows as CSV, one line at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in itertools.chain([schema.names], rows):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def iter_ndjson(schema: pa.Schema, rows: Iterable[Row]) -> Iterator[str]:
+    """Encode the rows as JSON objects, one line at a time."""
+    for row in rows:
+        record = dict(zip(schema.names, row, strict=True))
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _iter_batches(schema: pa.Schema, rows: Iterable[Row]) -> Iterator[pa.RecordBatch]:
+    for batch in itertools.batched(rows, COLUMNAR_BATCH_ROWS, strict=False):
+        yield pa.RecordBatch.from_arrays(
+            [
+                pa.array(column, type=field.type)
+                for column, field in zip(zip(*batch, strict=True), schema, strict=True)
+            ],
+            schema=schema,
+        )
+
+
+def write_export(
+    path: Path,
+    schema: pa.Schema,
+    rows: Iterable[Row],
+    export_format: ExportFormat,
+) -> None:
+    """Write the rows to path, replacing it only once the export is complete."""
+    # unique, as processes sharing a SQLite database may export a room together
+    partial_path = path.with_name(
+        f"{path.name}.{os.getpid()}-{threading.get_ident()}.partial",
+    )
+    match export_format:
+        case ExportFormat.CSV | ExportFormat.NDJSON:
+            encode = iter_csv if export_format is ExportFormat.CSV else iter_ndjson
+            with partial_path.open("w", encoding="utf-8", newline="") as file:
+                file.writelines(encode(schema, rows))
+        case ExportFormat.PARQUET:
+            with pq.ParquetWriter(partial_path, schema) as writer:
+                for batch in _iter_batches(schema, rows):
+                    writer.write_batch(batch)
+        case ExportFormat.ARROW:
+            with pa.ipc.new_file(partial_path, schema) as writer:
+                for batch in _iter_batches(schema, rows):
+                    writer.write_batch(batch)
+    partial_path.replace(path)
+
+
+class RoomExporter:
+    """Writes the history and open questions of rooms to a directory."""
+
+    def __init__(
+        self,
+        directory: Path,
+        export_format: ExportFormat,
+        clock: Clock = system_clock,
+    ) -> None:
+        self._directory = directory
+        self._export_format = export_format
+        self._clock = clock
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def __call__(self, room: RoomBackend) -> None:
+        suffix = self._export_format.value
+        removed_at = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(self._clock()))
+        prefix = f"{room.room_id}-{removed_at}"
+        write_export(
+            self._directory / f"{prefix}-history.{suffix}",
+            HISTORY_SCHEMA,
+            iter_history_rows(room.get_status_history()),
+            self._export_format,
+        )
+        write_export(
+            self._directory / f"{prefix}-questions.{suffix}",
+            QUESTIONS_SCHEMA,
+            iter_question_rows(room.get_open_questions()),
+            self._export_format,
+        )
@@ -0,0 +1,104 @@
+import bisect
+import mmap
+import struct
+from pathlib import Path
+
+from open_cups.types import StatusSnapshot, UserStatus
+
+# timestamp followed by one count per status, in the order of RECORD_STATUS_ORDER
+RECORD = struct.Struct("<d4I")
+RECORD_STATUS_ORDER = (
+    UserStatus.GREEN,
+    UserStatus.YELLOW,
+    UserStatus.RED,
+    UserStatus.UNKNOWN,
+)
+INITIAL_CAPACITY_RECORDS = 1024
+
+
+class _TimestampView:
+    """Sequence of record timestamps, so bisect can run on the mapping directly."""
+
+    def __init__(self, history: "MemoryMappedHistory") -> None:
+        self._history = history
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    def __getitem__(self, index: int) -> float:
+        return self._history.read_timestamp(index)
+
+
+class MemoryMappedHistory:
+    """Append-only status history stored as fixed-width records in a mapped file."""
+
+    def __init__(
+        self,
+        path: Path,
+        initial_capacity: int = INITIAL_CAPACITY_RECORDS,
+    ) -> None:
+        if initial_capacity <= 0:
+            msg = "initial_capacity must be > 0"
+            raise ValueError(msg)
+        self._path = path
+        self._file = path.open("w+b")
+        self._count = 0
+        self._capacity = initial_capacity
+        self._file.truncate(self._capacity * RECORD.size)
+        self._mmap = mmap.mmap(self._file.fileno(), self._capacity * RECORD.size)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, snapshot: StatusSnapshot) -> None:
+        if self._count == self._capacity:
+            self._grow()
+        RECORD.pack_into(
+            self._mmap,
+            self._count * RECORD.size,
+            snapshot.timestamp,
+            *(snapshot.counts[status] for status in RECORD_STATUS_ORDER),
+        )
+        self._count += 1
+
+    def read_timestamp(self, index: int) -> float:
+        timestamp: float = RECORD.unpack_from(self._mmap, index * RECORD.size)[0]
+        return timestamp
+
+    def read_range(
+        self,
+        start_time: float | None = None,
+        end_time: float | None = None,
+    ) -> list[StatusSnapshot]:
+        """Return snapshots with start_time <= timestamp < end_time."""
+        timestamps = _TimestampView(self)
+        start = 0 if start_time is None else bisect.bisect_left(timestamps, start_time)
+        end = (
+            self._count
+            if end_time is None
+            else bisect.bisect_left(timestamps, end_time, lo=start)
+        )
+        return [self._read(index) for index in range(start, end)]
+
+    def close(self) -> None:
+        """Release the mapping and delete the backing file."""
+        self._mmap.close()
+        self._file.close()
+        self._path.unlink(missing_ok=True)
+
+    def _read(self, index: int) -> StatusSnapshot:
+        timestamp, *counts = RECORD.unpack_from(self._mmap, index * RECORD.size)
+        return StatusSnapshot(
+            timestamp=timestamp,
+            counts=dict(zip(RECORD_STATUS_ORDER, counts, strict=True)),
+        )
+
+    def _grow(self) -> None:
+        self._mmap.close()
+        self._capacity *= 2
+        self._file.truncate(self._capacity * RECORD.size)
+        self._mmap = mmap.mmap(self._file.fileno(), self._capacity * RECORD.size)
@@ -0,0 +1,146 @@
+"""Charts that keep their state in the browser and receive only what changed.
+
+With OPEN_CUPS_LIVE_CHARTS set, the live distribution and the distribution
+history are drawn by a small custom component, frontend/live_chart, instead
+of Plotly. The live distribution receives the four current counts. The history
+receives the snapshots recorded since the last rerun and appends them to the
+ones it already has, so a rerun sends a few dozen bytes instead of a full
+figure.
+
+The session state remembers the timestamp of the last snapshot sent, and only
+the snapshots from then on are read from the room. Every render also sends the
+timestamp of the oldest snapshot the room still keeps, and the browser drops
+the older ones, so its copy does not outgrow the history of the room. When the
+chart is hidden, the browser drops it and all snapshots are sent when it is
+shown again. When the browser misses snapshots anyway, for example after
+reconnecting, the component returns a new request and the next rerun sends
+all of them.
+"""
+
+import bisect
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from open_cups.spans import tracer
+from open_cups.types import StatusSnapshot, UserStatus
+
+FRONTEND_DIRECTORY = Path(__file__).parent / "frontend" / "live_chart"
+HISTORY_CHART_KEY = "live_history_chart"
+# the timestamp of the last snapshot sent and the last resync request answered
+_SENT_UNTIL_KEY = "live_history_sent_until"
+_ANSWERED_RESYNC_KEY = "live_history_answered_resync"
+
+_live_chart = components.declare_component(
+    "live_chart",
+    path=str(FRONTEND_DIRECTORY),
+)
+
+
+def encode_snapshots(
+    snapshots: list[StatusSnapshot],
+    statuses: list[UserStatus],
+) -> list[list[float]]:
+    """Encode snapshots as rows of the timestamp and the counts of statuses."""
+    return [
+        [
+            round(snapshot.timestamp, 3),
+            *(snapshot.counts[status] for status in statuses),
+        ]
+        for snapshot in snapshots
+    ]
+
+
+def get_history_delta(
+    history: list[StatusSnapshot],
+    since: float | None,
+) -> list[StatusSnapshot]:
+    """Return the snapshots recorded after since, all of them for None."""
+    if since is None:
+        return history
+    start = bisect.bisect_right(history, since, key=lambda snapshot: snapshot.timestamp)
+    return history[start:]
+
+
+def get_distribution_args(
+    counts: dict[UserStatus, int],
+    colors: list[tuple[UserStatus, str]],
+) -> dict[str, Any]:
+    return {
+        "kind": "distribution",
+        "counts": [counts[status] for status, _ in colors],
+        "colors": [color for _, color in colors],
+    }
+
+
+def get_history_args(
+    history: list[StatusSnapshot],
+    since: float | None,
+    first: float | None,
+    colors: list[tuple[UserStatus, str]],
+) -> dict[str, Any]:
+    """Return the arguments of the history chart, with the snapshots after since.
+
+    Without since, history has to hold all snapshots, otherwise at least the
+    ones after since. first is the timestamp of the oldest snapshot kept.
+    """
+    return {
+        "kind": "history",
+        "colors": [color for _, color in colors],
+        "since": None if since is None else round(since, 3),
+        "points": encode_snapshots(
+            get_history_delta(history, since),
+            [status for status, _ in colors],
+        ),
+        # the oldest snapshot kept by the backend, the browser drops older ones
+        "first": None if first is None else round(first, 3),
+    }
+
+
+@tracer.traced("plots.show_live_distribution")
+def show_live_distribution(
+    counts: dict[UserStatus, int],
+    colors: list[tuple[UserStatus, str]],
+) -> None:
+    _live_chart(
+        **get_distribution_args(counts, colors),
+        key="live_distribution_chart",
+        default=None,
+    )
+
+
+def forget_live_history() -> None:
+    """Send all snapshots next time, as the hidden chart lost its snapshots."""
+    st.session_state.pop(_SENT_UNTIL_KEY, None)
+
+
+@tracer.traced("plots.show_live_history")
+def show_live_history(
+    read_history: Callable[[float | None], list[StatusSnapshot]],
+    read_first: Callable[[], float | None],
+    colors: list[tuple[UserStatus, str]],
+) -> bool:
+    """Show the history, reading only the snapshots the browser lacks.
+
+    read_history returns the snapshots from a timestamp on, all for None, and
+    read_first the timestamp of the oldest snapshot kept.
+    Return False without showing anything when there is no history yet.
+    """
+    since = st.session_state.get(_SENT_UNTIL_KEY)
+    history = read_history(since)
+    if since is None and not history:
+        return False
+    st.session_state[_SENT_UNTIL_KEY] = history[-1].timestamp if history else since
+    first = history[0].timestamp if since is None else read_first()
+    resync_request = _live_chart(
+        **get_history_args(history, since, first, colors),
+        key=HISTORY_CHART_KEY,
+        default=None,
+    )
+    if resync_request != st.session_state.get(_ANSWERED_RESYNC_KEY):
+        st.session_state[_ANSWERED_RESYNC_KEY] = resync_request
+        forget_live_history()
+    return True
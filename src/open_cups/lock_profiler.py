@@ -0,0 +1,239 @@
+"""Opt-in contention profiling of the locks of rooms and thread-safe dicts.
+
+With OPEN_CUPS_LOCK_PROFILE set to a file path, make_lock returns locks that
+record for every acquisition how long the thread waited for the lock and how
+long it held it, aggregated per lock name and call site. The report is
+written to that path when the process exits, and the totals per lock are
+exported with the metrics. Without it, make_lock returns a plain RLock.
+
+The profiler is enabled by the state provider, the first time the settings are
+read and before the state backend creates its locks, so importing this module
+neither reads the environment nor registers the exit hook.
+"""
+
+import atexit
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Protocol
+
+from open_cups.settings import Settings
+from open_cups.types import LockStats
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+type CallSite = tuple[str, int, str]
+
+# frames of these modules are skipped to find the call site of an acquisition
+_WRAPPER_MODULES = frozenset({__name__, "open_cups.thread_safe_dict", "contextlib"})
+
+
+class RLockLike(Protocol):
+    def acquire(self, blocking: bool = ..., timeout: float = ...) -> bool: ...  # noqa: FBT001
+
+    def release(self) -> None: ...
+
+    def __enter__(self) -> bool: ...
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: "TracebackType | None",
+        /,
+    ) -> None: ...
+
+
+def _call_site() -> CallSite:
+    frame = sys._getframe(1)  # noqa: SLF001
+    while frame.f_back is not None and frame.f_globals["__name__"] in _WRAPPER_MODULES:
+        frame = frame.f_back
+    return (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
+
+
+class ProfiledRLock:
+    """A reentrant lock that reports its wait and hold times to a profiler."""
+
+    def __init__(self, name: str, profiler: "LockProfiler") -> None:
+        self._name = name
+        self._profiler = profiler
+        self._lock = threading.RLock()
+        # only changed by the thread holding _lock
+        self._depth = 0
+        self._site: CallSite = ("<unknown>", 0, "<unknown>")
+        self._wait_seconds = 0.0
+        self._contended = False
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:  # noqa: FBT001, FBT002
+        return self._acquire(_call_site(), blocking=blocking, timeout=timeout)
+
+    def _acquire(self, site: CallSite, *, blocking: bool, timeout: float) -> bool:
+        start = time.perf_counter()
+        contended = not self._lock.acquire(blocking=False)
+        if contended and not (blocking and self._lock.acquire(timeout=timeout)):
+            self._profiler.record_timeout(
+                self._name,
+                site,
+                time.perf_counter() - start,
+            )
+            return False
+        acquired_at = time.perf_counter()
+        self._depth += 1
+        if self._depth == 1:
+            self._site = site
+            self._wait_seconds = acquired_at - start if contended else 0.0
+            self._contended = contended
+            self._acquired_at = acquired_at
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth > 0:
+            self._lock.release()
+            return
+        hold_seconds = time.perf_counter() - self._acquired_at
+        site, wait_seconds, contended = self._site, self._wait_seconds, self._contended
+        self._lock.release()
+        self._profiler.record(
+            self._name,
+            site,
+            wait_seconds=wait_seconds,
+            hold_seconds=hold_seconds,
+            contended=contended,
+        )
+
+    def __enter__(self) -> bool:
+        return self._acquire(_call_site(), blocking=True, timeout=-1)
+
+    def __exit__(self, *args: object) -> None:
+        self.release()
+
+
+class LockProfiler:
+    def __init__(self, *, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._stats: dict[tuple[str, CallSite], LockStats] = {}
+        self._lock = threading.Lock()
+
+    def make_lock(self, name: str) -> RLockLike:
+        if not self.enabled:
+            return threading.RLock()
+        return ProfiledRLock(name, self)
+
+    def _stats_for(self, name: str, site: CallSite) -> LockStats:
+        stats = self._stats.get((name, site))
+        if stats is None:
+            stats = self._stats[name, site] = LockStats()
+        return stats
+
+    def record(
+        self,
+        name: str,
+        site: CallSite,
+        *,
+        wait_seconds: float,
+        hold_seconds: float,
+        contended: bool,
+    ) -> None:
+        with self._lock:
+            stats = self._stats_for(name, site)
+            stats.acquisitions += 1
+            stats.contended += contended
+            stats.wait_seconds += wait_seconds
+            stats.max_wait_seconds = max(stats.max_wait_seconds, wait_seconds)
+            stats.hold_seconds += hold_seconds
+            stats.max_hold_seconds = max(stats.max_hold_seconds, hold_seconds)
+
+    def record_timeout(self, name: str, site: CallSite, wait_seconds: float) -> None:
+        with self._lock:
+            stats = self._stats_for(name, site)
+            stats.timeouts += 1
+            stats.wait_seconds += wait_seconds
+            stats.max_wait_seconds = max(stats.max_wait_seconds, wait_seconds)
+
+    def stats_by_site(self) -> dict[tuple[str, CallSite], LockStats]:
+        with self._lock:
+            return {key: LockStats(**vars(stats)) for key, stats in self._stats.items()}
+
+    def stats_by_lock(self) -> dict[str, LockStats]:
+        totals: dict[str, LockStats] = {}
+        for (name, _), stats in self.stats_by_site().items():
+            total = totals.setdefault(name, LockStats())
+            total.acquisitions += stats.acquisitions
+            total.contended += stats.contended
+            total.timeouts += stats.timeouts
+            total.wait_seconds += stats.wait_seconds
+            total.max_wait_seconds = max(total.max_wait_seconds, stats.max_wait_seconds)
+            total.hold_seconds += stats.hold_seconds
+            total.max_hold_seconds = max(total.max_hold_seconds, stats.max_hold_seconds)
+        return totals
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def report(self) -> str:
+        """Return a table of all call sites, the most waited for first."""
+        rows = sorted(
+            self.stats_by_site().items(),
+            key=lambda item: item[1].wait_seconds,
+            reverse=True,
+        )
+        header = (
+            f"{'lock':<16} {'call site':<48} {'acquired':>9} {'contended':>9} "
+            f"{'timeouts':>8} {'wait ms':>9} {'max wait':>9} {'hold ms':>9} "
+            f"{'max hold':>9}"
+        )
+        lines = [header]
+        for (name, (filename, line, function)), stats in rows:
+            site = f"{Path(filename).name}:{line} {function}"
+            lines.append(
+                f"{name:<16} {site:<48} {stats.acquisitions:>9} "
+                f"{stats.contended:>9} {stats.timeouts:>8} "
+                f"{stats.wait_seconds * 1000:>9.2f} "
+                f"{stats.max_wait_seconds * 1000:>9.2f} "
+                f"{stats.hold_seconds * 1000:>9.2f} "
+                f"{stats.max_hold_seconds * 1000:>9.2f}",
+            )
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Path) -> None:
+        path.write_text(self.report())
+
+    def prometheus_lines(self) -> list[str]:
+        """Totals per lock, for the metrics endpoint."""
+        totals = self.stats_by_lock()
+        lines = []
+        for metric, attribute in (
+            ("open_cups_lock_acquisitions_total", "acquisitions"),
+            ("open_cups_lock_contended_total", "contended"),
+            ("open_cups_lock_timeouts_total", "timeouts"),
+            ("open_cups_lock_wait_seconds_total", "wait_seconds"),
+            ("open_cups_lock_hold_seconds_total", "hold_seconds"),
+        ):
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(
+                f'{metric}{{lock="{name}"}} {getattr(stats, attribute)}'
+                for name, stats in sorted(totals.items())
+            )
+        return lines
+
+
+def start_lock_profiler(profiler: LockProfiler, settings: Settings) -> LockProfiler:
+    """Profile the locks made from now on, if a profile path is set."""
+    if settings.lock_profile_path is None or profiler.enabled:
+        return profiler
+    profiler.enabled = True
+    atexit.register(profiler.dump, settings.lock_profile_path)
+    return profiler
+
+
+# started by open_cups.state_provider, see start_lock_profiler
+lock_profiler = LockProfiler()
+
+
+def make_lock(name: str) -> RLockLike:
+    return lock_profiler.make_lock(name)
@@ -0,0 +1,53 @@
+"""The bytes each rerun sends to the browser, per role and phase.
+
+While metrics are enabled, the messages a rerun enqueues for the browser are
+measured and added to the innermost phase of open_cups.metrics that was
+entered when they were created, e.g. qr_code, plots or questions. Messages
+created outside of a named phase count for the rerun phase. At the end of the
+rerun, the totals are observed in the open_cups_rerun_bytes histograms.
+
+The sizes are those of the serialized protobuf messages before they are
+queued, so deltas the browser queue coalesces are counted each time. Media
+such as the QR code image is served over HTTP and only its URL is counted.
+
+The messages are measured by wrapping the private ScriptRunContext._enqueue of
+Streamlit. With a Streamlit version without it, nothing is measured.
+"""
+
+from collections import Counter
+from typing import Self
+
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from open_cups.metrics import Metrics, current_phase
+from open_cups.rerun_profiler import UNKNOWN_ROLE
+
+
+class RerunBytes:
+    """Counts the bytes of a rerun, the role is set once the rerun knows it."""
+
+    def __init__(self, metrics: Metrics) -> None:
+        self.role = UNKNOWN_ROLE
+        self.sizes: Counter[str] = Counter()
+        self._metrics = metrics
+        ctx = get_script_run_ctx() if metrics.enabled else None
+        self._ctx = ctx if callable(getattr(ctx, "_enqueue", None)) else None
+
+    def __enter__(self) -> Self:
+        if self._ctx is not None:
+            enqueue = self._ctx._enqueue  # noqa: SLF001
+
+            def measured_enqueue(msg: ForwardMsg) -> None:
+                self.sizes[current_phase()] += msg.ByteSize()
+                enqueue(msg)
+
+            self._ctx._enqueue = measured_enqueue  # noqa: SLF001
+            self._enqueue = enqueue
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        if self._ctx is not None:
+            self._ctx._enqueue = self._enqueue  # noqa: SLF001
+            for phase, size in self.sizes.items():
+                self._metrics.observe_rerun_bytes(self.role, phase, size)
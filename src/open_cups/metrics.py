@@ -0,0 +1,278 @@
+"""Timing of script reruns and gauges of the state, in Prometheus text format.
+
+Metrics are disabled unless a metrics port or file is configured. Disabled,
+Metrics.phase returns a shared no-op context manager. Enabled, the innermost
+phase of the current thread is tracked, so the bytes sent to the browser can
+be attributed to it, see open_cups.message_bytes.
+"""
+
+import bisect
+import contextlib
+import json
+import threading
+import time
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from dataclasses import fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from open_cups.room_index import encode_overview
+from open_cups.types import BackendStatistics, RoomsOverview
+
+DURATION_BUCKETS_SECONDS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+# from a small delta message up to a large image
+SIZE_BUCKETS_BYTES = (
+    256.0,
+    1024.0,
+    4096.0,
+    16384.0,
+    65536.0,
+    262144.0,
+    1048576.0,
+)
+FILE_EXPORT_INTERVAL_SECONDS = 15.0
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OVERVIEW_PATH = "/overview"
+PHASE_DURATION = "open_cups_phase_duration_seconds"
+RERUN_BYTES = "open_cups_rerun_bytes"
+NO_PHASE = "none"
+
+_NO_OP = contextlib.nullcontext()
+_phases = threading.local()
+
+
+def current_phase() -> str:
+    """Return the innermost phase entered by this thread."""
+    return getattr(_phases, "name", NO_PHASE)
+
+
+class Histogram:
+    def __init__(self, bounds: tuple[float, ...] = DURATION_BUCKETS_SECONDS) -> None:
+        self._bounds = bounds
+        # the last bucket counts the observations above all bounds
+        self._bucket_counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._bucket_counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> tuple[list[tuple[str, int]], float, int]:
+        """Return the cumulative buckets by upper bound, the sum and the count."""
+        with self._lock:
+            bucket_counts = list(self._bucket_counts)
+            total = self._sum
+        buckets = []
+        cumulative = 0
+        for bound, count in zip(
+            [*map(str, self._bounds), "+Inf"],
+            bucket_counts,
+            strict=True,
+        ):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets, total, cumulative
+
+
+class _PhaseTimer:
+    __slots__ = ("_histogram", "_name", "_outer_name", "_start")
+
+    def __init__(self, name: str, histogram: Histogram) -> None:
+        self._name = name
+        self._histogram = histogram
+        self._outer_name = NO_PHASE
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._outer_name = current_phase()
+        _phases.name = self._name
+        self._start = time.perf_counter()
+
+    def __exit__(self, *args: object) -> None:
+        self._histogram.observe(time.perf_counter() - self._start)
+        _phases.name = self._outer_name
+
+
+def _histogram_lines(metric: str, labels: str, histogram: Histogram) -> list[str]:
+    buckets, total, count = histogram.snapshot()
+    return [
+        *(
+            f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            for bound, cumulative in buckets
+        ),
+        f"{metric}_sum{{{labels}}} {total}",
+        f"{metric}_count{{{labels}}} {count}",
+    ]
+
+
+class Metrics:
+    """Durations of the phases of script reruns and gauges of the state."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = True,
+        statistics: Callable[[], BackendStatistics] | None = None,
+    ) -> None:
+        self._enabled = enabled
+        self._statistics = statistics
+        self._histograms: dict[str, Histogram] = {}
+        self._size_histograms: dict[tuple[str, str], Histogram] = {}
+        self._collectors: list[Callable[[], list[str]]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def add_collector(self, collector: Callable[[], list[str]]) -> None:
+        """Add lines in Prometheus text format to every export."""
+        self._collectors.append(collector)
+
+    def phase(self, name: str) -> AbstractContextManager[None]:
+        """Time the enclosed block as one observation of the given phase."""
+        if not self._enabled:
+            return _NO_OP
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return _PhaseTimer(name, histogram)
+
+    def observe_rerun_bytes(self, role: str, phase: str, size: int) -> None:
+        """Add the bytes a rerun of the role sent to the browser during a phase."""
+        histogram = self._size_histograms.get((role, phase))
+        if histogram is None:
+            with self._lock:
+                histogram = self._size_histograms.setdefault(
+                    (role, phase),
+                    Histogram(SIZE_BUCKETS_BYTES),
+                )
+        histogram.observe(size)
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {PHASE_DURATION} Duration of the phases of script reruns.",
+            f"# TYPE {PHASE_DURATION} histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            size_histograms = sorted(self._size_histograms.items())
+        for name, histogram in histograms:
+            lines.extend(
+                _histogram_lines(PHASE_DURATION, f'phase="{name}"', histogram),
+            )
+        if size_histograms:
+            lines.append(
+                f"# HELP {RERUN_BYTES} Bytes sent to the browser per rerun and phase.",
+            )
+            lines.append(f"# TYPE {RERUN_BYTES} histogram")
+        for (role, phase), histogram in size_histograms:
+            lines.extend(
+                _histogram_lines(
+                    RERUN_BYTES,
+                    f'role="{role}",phase="{phase}"',
+                    histogram,
+                ),
+            )
+        if self._statistics is not None:
+            statistics = self._statistics()
+            for field in fields(statistics):
+                value = getattr(statistics, field.name)
+                lines.append(f"# TYPE open_cups_{field.name} gauge")
+                lines.append(f"open_cups_{field.name} {value}")
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        temporary_path = path.with_name(path.name + ".tmp")
+        temporary_path.write_text(self.render())
+        temporary_path.replace(path)
+
+
+def serve_metrics(
+    metrics: Metrics,
+    host: str,
+    port: int,
+    overview: Callable[[], RoomsOverview] | None = None,
+) -> ThreadingHTTPServer:
+    """Serve the metrics for Prometheus to scrape from a background thread.
+
+    With an overview, OVERVIEW_PATH serves the overview of all rooms as JSON.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if overview is not None and self.path == OVERVIEW_PATH:
+                body = json.dumps(encode_overview(overview())).encode()
+                content_type = "application/json"
+            else:
+                body = metrics.render().encode()
+                content_type = CONTENT_TYPE
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(
+        target=server.serve_forever,
+        name="metrics-http",
+        daemon=True,
+    ).start()
+    return server
+
+
+class MetricsFileExporter:
+    """Writes the metrics to a file, e.g. for node_exporter's textfile collector."""
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        path: Path,
+        interval_seconds: float = FILE_EXPORT_INTERVAL_SECONDS,
+    ) -> None:
+        self._metrics = metrics
+        self._path = path
+        self._interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="metrics-file",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval_seconds):
+            self._metrics.write(self._path)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self._metrics.write(self._path)
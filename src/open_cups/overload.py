@@ -0,0 +1,82 @@
+"""Detection of overload from the latency and the number of concurrent reruns.
+
+With OPEN_CUPS_OVERLOAD_RERUN_MS set, the load level rises with the moving
+average of the rerun durations, one level each time it doubles beyond that
+target, and with the number of reruns in progress at the same time. The app
+sheds work in priority order as the level rises: participants refresh less
+often, the history chart is paused, participants get cached question lists
+and, finally, no new rooms are created. Host dashboards and status writes are
+never shed.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from open_cups.types import LoadLevel
+
+LATENCY_SMOOTHING = 0.2
+RERUNS_IN_PROGRESS_PER_LEVEL = 8
+
+
+class OverloadDetector:
+    def __init__(self, target_rerun_seconds: float | None) -> None:
+        self._target_rerun_seconds = target_rerun_seconds
+        self._average_rerun_seconds = 0.0
+        self._reruns_in_progress = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._target_rerun_seconds is not None
+
+    @property
+    def level(self) -> LoadLevel:
+        if self._target_rerun_seconds is None:
+            return LoadLevel.NORMAL
+        latency_level = 0
+        threshold = self._target_rerun_seconds
+        while (
+            latency_level < LoadLevel.REJECT_ROOMS
+            and self._average_rerun_seconds > threshold
+        ):
+            latency_level += 1
+            threshold *= 2
+        depth_level = self._reruns_in_progress // RERUNS_IN_PROGRESS_PER_LEVEL
+        return LoadLevel(min(max(latency_level, depth_level), LoadLevel.REJECT_ROOMS))
+
+    def record(self, rerun_seconds: float) -> None:
+        """Add the duration of a rerun to the moving average."""
+        with self._lock:
+            self._average_rerun_seconds += LATENCY_SMOOTHING * (
+                rerun_seconds - self._average_rerun_seconds
+            )
+
+    @contextmanager
+    def rerun(self, *, record: bool = True) -> Iterator[LoadLevel]:
+        """Time the enclosed rerun and return the level it should shed work at.
+
+        Without record, the rerun counts as in progress, but its duration is not
+        added to the moving average, e.g. as it is slowed down by profiling.
+        """
+        if self._target_rerun_seconds is None:
+            yield LoadLevel.NORMAL
+            return
+        with self._lock:
+            level = self.level
+            self._reruns_in_progress += 1
+        start = time.perf_counter()
+        try:
+            yield level
+        finally:
+            with self._lock:
+                self._reruns_in_progress -= 1
+            if record:
+                self.record(time.perf_counter() - start)
+
+    def prometheus_lines(self) -> list[str]:
+        return [
+            "# TYPE open_cups_load_level gauge",
+            f"open_cups_load_level {self.level.value}",
+        ]
@@ -0,0 +1,212 @@
+"""Minimal participant API for large audiences.
+
+A participant in the Streamlit app is a full Streamlit session that reruns the
+whole script every few seconds to send its heartbeat. Participants of this API
+join with one HTTP request and then keep a websocket open, over which a
+heartbeat is a few bytes. It works directly on the state backend, so the host
+dashboard in Streamlit shows them like any other participant.
+
+    POST /api/rooms/<room_id>/participants -> 201 {"session_id": ...}
+    WS   /api/rooms/<room_id>/participants/<session_id>/socket
+
+Messages on the websocket are JSON objects with an "op":
+
+    {"op": "heartbeat"}
+    {"op": "status", "status": "GREEN"}
+    {"op": "ask", "text": "..."}
+    {"op": "upvote", "question_id": "..."}
+    {"op": "questions"} -> {"questions": [{"id": ..., "text": ..., "votes": ...}]}
+
+Invalid messages and questions beyond the quotas are answered with
+{"error": ...}, joins of full rooms with 429. Once the session was
+removed, e.g. after its timeout, the websocket is closed with code 4404.
+
+The room of a websocket is looked up once, when it opens. The backend is
+called from the default executor of the event loop, so that a slow write,
+e.g. waiting for the lock of a SQLite database, only delays the messages of
+its own websocket.
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import uuid
+from typing import Any
+
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+import tornado.websocket
+from tornado.ioloop import IOLoop
+
+from open_cups.backend import RoomBackend, StateBackend
+from open_cups.quotas import QuotaExceededError
+from open_cups.types import UserStatus
+
+SESSION_NOT_FOUND = 4404
+
+
+class _SessionRemovedError(Exception):
+    pass
+
+
+class JoinHandler(tornado.web.RequestHandler):
+    def initialize(self, backend: StateBackend) -> None:
+        self._backend = backend
+
+    async def post(self, room_id: str) -> None:
+        session_id = str(uuid.uuid4())
+        try:
+            await IOLoop.current().run_in_executor(
+                None,
+                self._backend.join_room,
+                room_id,
+                session_id,
+            )
+        except QuotaExceededError as error:
+            raise tornado.web.HTTPError(429) from error
+        except ValueError as error:
+            raise tornado.web.HTTPError(404) from error
+        self.set_status(201)
+        self.write({"session_id": session_id})
+
+
+class ParticipantSocket(tornado.websocket.WebSocketHandler):
+    def initialize(self, backend: StateBackend) -> None:
+        self._backend = backend
+        # None until opened, and for sessions that were not found
+        self._room: RoomBackend | None = None
+
+    async def open(self, room_id: str, session_id: str) -> None:  # type: ignore[override]
+        self._session_id = session_id
+        room = await IOLoop.current().run_in_executor(
+            None,
+            self._backend.get_session_room,
+            session_id,
+        )
+        if room is None or room.room_id != room_id or room.is_host(session_id):
+            self.close(SESSION_NOT_FOUND, "Session not found")
+            return
+        self._room = room
+
+    async def on_message(self, message: str | bytes) -> None:
+        # the next message is only delivered once this one is handled
+        try:
+            reply = await IOLoop.current().run_in_executor(
+                None,
+                self._reply,
+                message,
+            )
+        except _SessionRemovedError:
+            self.close(SESSION_NOT_FOUND, "Session not found")
+            return
+        if reply is not None:
+            self.write_message(reply)
+
+    def _reply(self, message: str | bytes) -> dict[str, Any] | None:
+        room = self._room
+        if room is None or not room.has_session(self._session_id):
+            raise _SessionRemovedError
+        try:
+            return self._handle(room, json.loads(message))
+        except QuotaExceededError as error:
+            return {"error": str(error)}
+        except (KeyError, TypeError, ValueError):
+            return {"error": "Invalid message"}
+
+    def _handle(self, room: RoomBackend, request: Any) -> dict[str, Any] | None:  # noqa: ANN401
+        room.update_session(self._session_id)
+        match request["op"]:
+            case "heartbeat":
+                pass
+            case "status":
+                room.set_session_status(
+                    self._session_id,
+                    UserStatus[request["status"]],
+                )
+            case "ask":
+                text = str(request["text"]).strip()
+                if not text:
+                    message = "Empty question"
+                    raise ValueError(message)
+                room.add_question(self._session_id, text)
+            case "upvote":
+                room.upvote_question(self._session_id, str(request["question_id"]))
+            case "questions":
+                return {
+                    "questions": [
+                        {
+                            "id": question.id,
+                            "text": question.text,
+                            "votes": question.vote_count,
+                        }
+                        for question in room.get_open_questions()
+                    ],
+                }
+            case _:
+                message = f"Unknown op {request['op']}"
+                raise ValueError(message)
+        return None
+
+
+def make_app(backend: StateBackend) -> tornado.web.Application:
+    return tornado.web.Application(
+        [
+            (
+                r"/api/rooms/([^/]+)/participants",
+                JoinHandler,
+                {"backend": backend},
+            ),
+            (
+                r"/api/rooms/([^/]+)/participants/([^/]+)/socket",
+                ParticipantSocket,
+                {"backend": backend},
+            ),
+        ],
+    )
+
+
+class ParticipantApiServer:
+    """Serves the participant API from a thread with its own event loop.
+
+    This way it runs next to the Streamlit server in the same process and
+    shares its state backend.
+    """
+
+    def __init__(self, backend: StateBackend, host: str, port: int) -> None:
+        self._backend = backend
+        self._sockets = tornado.netutil.bind_sockets(port, host, socket.AF_INET)
+        self._loop = asyncio.new_event_loop()
+        self._stopped = asyncio.Event()
+        self._started = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="participant-api",
+            daemon=True,
+        )
+
+    @property
+    def port(self) -> int:
+        port: int = self._sockets[0].getsockname()[1]
+        return port
+
+    def start(self) -> None:
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self) -> None:
+        self._loop.run_until_complete(self._serve())
+        self._loop.close()
+
+    async def _serve(self) -> None:
+        server = tornado.httpserver.HTTPServer(make_app(self._backend))
+        server.add_sockets(self._sockets)
+        self._started.set()
+        await self._stopped.wait()
+        server.stop()
+        await server.close_all_connections()
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join()
@@ -0,0 +1,215 @@
+import atexit
+import json
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from open_cups.application_state import ApplicationState
+from open_cups.quotas import Quotas
+from open_cups.types import EventKind, RoomEvent, UserStatus
+
+SNAPSHOT_FILE_NAME = "snapshot.json"
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".log"
+FLUSH_INTERVAL_SECONDS = 0.05
+COMPACT_EVERY_EVENTS = 50_000
+
+
+def encode_event(event: RoomEvent) -> str:
+    record: dict[str, str] = {"k": event.kind.value, "r": event.room_id}
+    if event.session_id:
+        record["s"] = event.session_id
+    if event.status is not None:
+        record["st"] = event.status.name
+    if event.question_id:
+        record["q"] = event.question_id
+    if event.text:
+        record["t"] = event.text
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode_event(line: str) -> RoomEvent:
+    record = json.loads(line)
+    return RoomEvent(
+        kind=EventKind(record["k"]),
+        room_id=record["r"],
+        session_id=record.get("s", ""),
+        status=UserStatus[record["st"]] if "st" in record else None,
+        question_id=record.get("q", ""),
+        text=record.get("t", ""),
+    )
+
+
+def _segment_path(directory: Path, segment: int) -> Path:
+    return directory / f"{SEGMENT_PREFIX}{segment:08d}{SEGMENT_SUFFIX}"
+
+
+def _list_segments(directory: Path) -> list[tuple[int, Path]]:
+    segments = [
+        (int(path.name.removeprefix(SEGMENT_PREFIX).removesuffix(SEGMENT_SUFFIX)), path)
+        for path in directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+    ]
+    return sorted(segments)
+
+
+class EventLog:
+    """Append-only log of room events with group commit and periodic snapshots.
+
+    Appending only queues the event in memory. A background thread writes all
+    queued events every flush interval as one batch followed by a single fsync.
+    After compact_every_events events, the log switches to a new segment file,
+    writes a snapshot of the full state and deletes the older segments.
+    Because events are idempotent, a snapshot may already contain some of the
+    events in the segments replayed after it.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        snapshot_provider: Callable[[], dict[str, Any]],
+        flush_interval_seconds: float = FLUSH_INTERVAL_SECONDS,
+        compact_every_events: int = COMPACT_EVERY_EVENTS,
+    ) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self._directory = directory
+        self._snapshot_provider = snapshot_provider
+        self._flush_interval_seconds = flush_interval_seconds
+        self._compact_every_events = compact_every_events
+
+        segments = _list_segments(directory)
+        self._segment = segments[-1][0] + 1 if segments else 0
+        self._file = _segment_path(directory, self._segment).open(
+            "a",
+            encoding="utf-8",
+        )
+        self._events_since_snapshot = 0
+
+        self._pending: list[RoomEvent] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="open-cups-event-log",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def append(self, event: RoomEvent) -> None:
+        with self._pending_lock:
+            self._pending.append(event)
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            self._file.write("".join(f"{encode_event(event)}\n" for event in batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+            self._events_since_snapshot += len(batch)
+            if self._events_since_snapshot >= self._compact_every_events:
+                self._compact()
+
+    def compact(self) -> None:
+        with self._write_lock:
+            self._compact()
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+        self._file.close()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._flush_interval_seconds):
+            self.flush()
+
+    def _compact(self) -> None:
+        self._file.close()
+        self._segment += 1
+        self._file = _segment_path(self._directory, self._segment).open(
+            "a",
+            encoding="utf-8",
+        )
+
+        snapshot = {"segment": self._segment, "state": self._snapshot_provider()}
+        snapshot_path = self._directory / SNAPSHOT_FILE_NAME
+        temporary_path = snapshot_path.with_suffix(".tmp")
+        with temporary_path.open("w", encoding="utf-8") as file:
+            json.dump(snapshot, file, separators=(",", ":"), ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        temporary_path.replace(snapshot_path)
+
+        for segment, path in _list_segments(self._directory):
+            if segment < self._segment:
+                path.unlink()
+        self._events_since_snapshot = 0
+
+
+def restore_application_state(
+    directory: Path,
+    history_directory: Path | None = None,
+    quotas: Quotas | None = None,
+    heartbeat_epoch_seconds: float = 0.0,
+) -> ApplicationState:
+    """Rebuild the state from the latest snapshot and the events logged after it."""
+    first_segment = 0
+    snapshot_path = directory / SNAPSHOT_FILE_NAME
+    if snapshot_path.exists():
+        with snapshot_path.open(encoding="utf-8") as file:
+            snapshot = json.load(file)
+        application_state = ApplicationState.from_snapshot(
+            snapshot["state"],
+            history_directory,
+            quotas=quotas,
+            heartbeat_epoch_seconds=heartbeat_epoch_seconds,
+        )
+        first_segment = snapshot["segment"]
+    else:
+        application_state = ApplicationState(
+            history_directory,
+            quotas=quotas,
+            heartbeat_epoch_seconds=heartbeat_epoch_seconds,
+        )
+
+    for segment, path in _list_segments(directory):
+        if segment < first_segment:
+            continue
+        with path.open(encoding="utf-8") as file:
+            for line in file:
+                try:
+                    event = decode_event(line)
+                except json.JSONDecodeError:
+                    break  # torn write of the last batch before a crash
+                application_state.apply_event(event)
+    return application_state
+
+
+def open_persistent_application_state(
+    directory: Path,
+    history_directory: Path | None = None,
+    quotas: Quotas | None = None,
+    heartbeat_epoch_seconds: float = 0.0,
+) -> ApplicationState:
+    """Restore the state from directory and log all further mutations to it."""
+    application_state = restore_application_state(
+        directory,
+        history_directory,
+        quotas,
+        heartbeat_epoch_seconds,
+    )
+    event_log = EventLog(directory, application_state.to_snapshot)
+    event_log.compact()
+    application_state.add_listener(event_log.append)
+    event_log.start()
+    atexit.register(event_log.close)
+    return application_state
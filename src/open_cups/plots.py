@@ -3,12 +3,17 @@ import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 
+from open_cups.live_charts import (
+    show_live_distribution,
+    show_live_history,
+)
+from open_cups.spans import tracer
 from open_cups.state_provider import (
     ClientState,
     HostState,
     RoomState,
 )
-from open_cups.types import UserStatus
+from open_cups.types import StatusSnapshot, UserStatus
 
 GREY_COLOR = "#9CA3AF"
 RED_COLOR = "#EF4444"
@@ -22,12 +27,15 @@ ORDERED_STATUS_COLOR_MAP = [
     (UserStatus.GREEN, GREEN_COLOR),
 ]
 
+NO_HISTORY_MESSAGE = "No status history yet. Waiting for participants to join..."
+
 STREAMLIT_DISABLE_INTERACTIONS_CONFIG = {
     "displayModeBar": False,
     "staticPlot": True,
 }
 
 
+@tracer.traced("plots.get_statistics_data_frame")
 def get_statistics_data_frame(room: RoomState) -> pd.DataFrame:
     participants = room.get_room_participants()
     counts = {
@@ -39,14 +47,8 @@ def get_statistics_data_frame(room: RoomState) -> pd.DataFrame:
     return df[[col for col in column_order if col in df.columns]]
 
 
-def show_room_statistics(room: HostState | ClientState) -> None:
-    st.subheader("Room Overview")
-    df = get_statistics_data_frame(room)
-
-    if df.sum().sum() == 0:
-        st.info("No participants yet. Share the Room ID to get started!")
-        return
-
+@tracer.traced("plots.get_room_statistics_figure")
+def get_room_statistics_figure(df: pd.DataFrame) -> go.Figure:
     fig = px.bar(
         df,
         x=df.index,
@@ -65,6 +67,32 @@ def show_room_statistics(room: HostState | ClientState) -> None:
     fig.update_traces(
         marker_cornerradius=8,
     )
+    return fig
+
+
+@tracer.traced("plots.show_room_statistics")
+def show_room_statistics(
+    room: HostState | ClientState,
+    *,
+    live_chart: bool = False,
+) -> None:
+    st.subheader("Room Overview")
+    df = get_statistics_data_frame(room)
+
+    if df.sum().sum() == 0:
+        st.info("No participants yet. Share the Room ID to get started!")
+        return
+
+    if live_chart:
+        left_col, _ = st.columns([3, 2])
+        with left_col:
+            show_live_distribution(
+                {status: int(df[status.value].iloc[0]) for status in UserStatus},
+                ORDERED_STATUS_COLOR_MAP,
+            )
+        return
+
+    fig = get_room_statistics_figure(df)
 
     left_col, _ = st.columns([3, 2])
     with left_col:
@@ -82,13 +110,8 @@ def show_room_statistics(room: HostState | ClientState) -> None:
         )
 
 
-def show_status_history_chart(host_state: HostState) -> None:
-    status_history = host_state.get_status_history()
-
-    if not status_history:
-        st.info("No status history yet. Waiting for participants to join...")
-        return
-
+@tracer.traced("plots.get_status_history_figure")
+def get_status_history_figure(status_history: list[StatusSnapshot]) -> go.Figure:
     latest_snapshot_time = status_history[-1].timestamp
 
     data = {
@@ -135,6 +158,31 @@ def show_status_history_chart(host_state: HostState) -> None:
         margin={"l": 0, "r": 0, "t": 40, "b": 0},
         height=400,
     )
+    return fig
+
+
+@tracer.traced("plots.show_status_history_chart")
+def show_status_history_chart(
+    host_state: HostState,
+    *,
+    live_chart: bool = False,
+) -> None:
+    if live_chart:
+        if not show_live_history(
+            host_state.get_status_history,
+            host_state.get_status_history_start,
+            ORDERED_STATUS_COLOR_MAP,
+        ):
+            st.info(NO_HISTORY_MESSAGE)
+        return
+
+    status_history = host_state.get_status_history()
+
+    if not status_history:
+        st.info(NO_HISTORY_MESSAGE)
+        return
+
+    fig = get_status_history_figure(status_history)
 
     # This flickers in many refreshes, even though we do basically the same as for
     # the bar chart. Is this acceptable?
@@ -0,0 +1,149 @@
+"""Near-duplicate detection of the open questions of a room.
+
+In large rooms, many participants ask the same question in different words,
+which splits the votes between the copies. Before a question is added, the
+backends look for an open question whose text is similar and raise
+SimilarQuestionError with it, so the author can vote for it instead.
+
+The similarity is the Jaccard similarity of the character trigrams of the
+normalized texts. Comparing a new question with all open ones would take time
+linear in their number, so each text is reduced to a MinHash signature of
+BANDS * ROWS_PER_BAND hashes, which is split into BANDS band keys. Texts with a
+similarity s share at least one key with probability 1 - (1 - s**4)**16, about
+0.89 at SIMILARITY_THRESHOLD and 0.002 for unrelated texts at s = 0.1. Only the
+questions sharing a key are compared exactly.
+
+The hashes are seeded with a constant, so the processes sharing a SQLite
+database compute the same keys.
+"""
+
+import hashlib
+import random
+import re
+import struct
+import zlib
+from collections.abc import Iterable
+
+from open_cups.thread_safe_dict import is_oversized
+from open_cups.types import Question
+
+SHINGLE_LENGTH = 3
+BANDS = 16
+ROWS_PER_BAND = 4
+SIMILARITY_THRESHOLD = 0.6
+# a Mersenne prime above the 32-bit shingle hashes, for the universal hashes
+_PRIME = (1 << 61) - 1
+_random = random.Random(0)  # noqa: S311
+_PERMUTATIONS = [
+    (_random.randrange(1, _PRIME), _random.randrange(_PRIME))
+    for _ in range(BANDS * ROWS_PER_BAND)
+]
+_BAND_FORMAT = struct.Struct(f"<I{ROWS_PER_BAND}Q")
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class SimilarQuestionError(ValueError):
+    """An open question of the room is similar to the one being asked."""
+
+    def __init__(self, question: Question) -> None:
+        super().__init__(f"A similar question was already asked: {question.text}")
+        self.question = question
+
+
+def get_shingles(text: str) -> frozenset[str]:
+    """Return the character trigrams of text, ignoring case and punctuation."""
+    normalized = " ".join(_WORD_PATTERN.findall(text.casefold()))
+    if len(normalized) <= SHINGLE_LENGTH:
+        return frozenset([normalized])
+    return frozenset(
+        normalized[start : start + SHINGLE_LENGTH]
+        for start in range(len(normalized) - SHINGLE_LENGTH + 1)
+    )
+
+
+def get_band_keys(shingles: frozenset[str]) -> list[int]:
+    """Return the LSH band keys of the MinHash signature, as signed 64-bit ints."""
+    hashes = [zlib.crc32(shingle.encode()) for shingle in shingles]
+    signature = [
+        min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS
+    ]
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                _BAND_FORMAT.pack(
+                    band,
+                    *signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND],
+                ),
+                digest_size=8,
+            ).digest(),
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def get_similarity(first: frozenset[str], second: frozenset[str]) -> float:
+    return len(first & second) / len(first | second)
+
+
+def find_most_similar(
+    shingles: frozenset[str],
+    candidates: Iterable[tuple[str, frozenset[str]]],
+) -> str | None:
+    """Return the id of the candidate most similar to shingles, if similar enough."""
+    best_id = None
+    best_similarity = SIMILARITY_THRESHOLD
+    for question_id, candidate_shingles in candidates:
+        similarity = get_similarity(shingles, candidate_shingles)
+        if similarity >= best_similarity:
+            best_id = question_id
+            best_similarity = similarity
+    return best_id
+
+
+class QuestionIndex:
+    """The open questions of a room by their band keys.
+
+    Not thread-safe, the room holds the lock of its questions.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: dict[int, set[str]] = {}
+        self._questions: dict[str, tuple[frozenset[str], list[int]]] = {}
+        self._peak_size = 0
+
+    def add(self, question_id: str, text: str) -> None:
+        shingles = get_shingles(text)
+        band_keys = get_band_keys(shingles)
+        self._questions[question_id] = (shingles, band_keys)
+        for key in band_keys:
+            self._buckets.setdefault(key, set()).add(question_id)
+        self._peak_size = max(self._peak_size, len(self._questions))
+
+    def remove(self, question_id: str) -> None:
+        entry = self._questions.pop(question_id, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            bucket = self._buckets[key]
+            bucket.discard(question_id)
+            if not bucket:
+                del self._buckets[key]
+        if is_oversized(len(self._questions), self._peak_size):
+            self._questions = dict(self._questions)
+            self._buckets = dict(self._buckets)
+            self._peak_size = len(self._questions)
+
+    def find_similar(self, text: str) -> str | None:
+        """Return the id of the open question most similar to text, if any."""
+        shingles = get_shingles(text)
+        candidate_ids = set[str]().union(
+            *(self._buckets.get(key, ()) for key in get_band_keys(shingles)),
+        )
+        return find_most_similar(
+            shingles,
+            (
+                (question_id, self._questions[question_id][0])
+                for question_id in candidate_ids
+            ),
+        )
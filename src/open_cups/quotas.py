@@ -0,0 +1,112 @@
+"""Limits on what a process accepts, and the memory a room takes up.
+
+Without quotas, a single client can create rooms, join participants and ask
+questions until the process runs out of memory. The state backends check the
+quotas before storing anything and raise QuotaExceededError otherwise. A limit
+of None means unlimited. The rates of questions and upvotes are limited by the
+token buckets of open_cups.rate_limit.
+
+The memory accounting is an estimate from the sizes of the stored objects, to
+size deployments and pick the quotas, not an exact measurement.
+"""
+
+import sys
+from dataclasses import dataclass
+
+from open_cups.types import (
+    MemoryUsage,
+    Question,
+    StatusSnapshot,
+    UserSession,
+    UserStatus,
+)
+
+# a slot of a dict's hash table and its entries array, on 64-bit builds
+DICT_ENTRY_BYTES = 32
+
+
+class QuotaExceededError(ValueError):
+    """The operation would exceed one of the quotas of the process."""
+
+
+@dataclass(frozen=True)
+class Quotas:
+    max_rooms: int | None = None
+    max_participants_per_room: int | None = None
+    max_open_questions_per_room: int | None = None
+    max_question_length: int | None = None
+    # rates of the token buckets of each session and room, see rate_limit.py
+    questions_per_minute: int | None = None
+    room_questions_per_minute: int | None = None
+    upvotes_per_minute: int | None = None
+    room_upvotes_per_minute: int | None = None
+
+    def __post_init__(self) -> None:
+        msgs = [
+            f"{name} must be > 0"
+            for name, limit in vars(self).items()
+            if limit is not None and limit <= 0
+        ]
+        if msgs:
+            raise ValueError(", ".join(msgs))
+
+    def check_rooms(self, room_count: int) -> None:
+        """Raise unless another room fits next to room_count rooms."""
+        if self.max_rooms is not None and room_count >= self.max_rooms:
+            message = f"The server is full, it hosts at most {self.max_rooms} rooms"
+            raise QuotaExceededError(message)
+
+    def check_participants(self, participant_count: int) -> None:
+        limit = self.max_participants_per_room
+        if limit is not None and participant_count >= limit:
+            message = f"The room is full, it allows at most {limit} participants"
+            raise QuotaExceededError(message)
+
+    def check_question(self, open_question_count: int, text: str) -> None:
+        if self.max_question_length is not None and (
+            len(text) > self.max_question_length
+        ):
+            message = (
+                f"Questions can be at most {self.max_question_length} characters long"
+            )
+            raise QuotaExceededError(message)
+        limit = self.max_open_questions_per_room
+        if limit is not None and open_question_count >= limit:
+            message = f"The room allows at most {limit} open questions"
+            raise QuotaExceededError(message)
+
+
+# the statuses are shared enum members, the timestamps are floats
+SESSION_BYTES = (
+    sys.getsizeof(UserSession(UserStatus.UNKNOWN, 0.0))
+    + sys.getsizeof(0.0)
+    + DICT_ENTRY_BYTES
+)
+QUESTION_BYTES = sys.getsizeof(Question("", "", set())) + DICT_ENTRY_BYTES
+SNAPSHOT_BYTES = (
+    sys.getsizeof(StatusSnapshot(0.0, {}))
+    + sys.getsizeof(dict.fromkeys(UserStatus, 0))
+    + sys.getsizeof(0.0)
+)
+
+
+def estimate_memory_usage(
+    session_ids: list[str],
+    questions: list[Question],
+    snapshot_count: int,
+) -> MemoryUsage:
+    """Estimate the memory of a room's sessions, questions and history."""
+    return MemoryUsage(
+        sessions_bytes=sum(
+            SESSION_BYTES + sys.getsizeof(session_id) for session_id in session_ids
+        ),
+        questions_bytes=sum(
+            QUESTION_BYTES
+            + sys.getsizeof(question.id)
+            + sys.getsizeof(question.text)
+            # the voter ids are the session ids, only the set is extra
+            + sys.getsizeof(question.voter_ids)
+            for question in questions
+        ),
+        history_bytes=snapshot_count * SNAPSHOT_BYTES,
+    )
@@ -0,0 +1,160 @@
+"""Token buckets that limit the rate of questions and upvotes.
+
+Each session and each room has a bucket per action that holds a minute's worth
+of tokens and refills continuously, so a session can ask a few questions in a
+burst but not flood the room. A session's buckets are dropped with the session,
+so the memory is constant per active session. The rates are part of the
+quotas, None means unlimited.
+
+With the SQLite backend, each process limits the rates on its own and drops
+the buckets that have refilled, which are as good as new ones.
+"""
+
+import threading
+
+from open_cups.clock import Clock
+from open_cups.quotas import QuotaExceededError, Quotas
+from open_cups.thread_safe_dict import is_oversized
+
+
+class RateLimitedError(QuotaExceededError):
+    """The session or room has used up its rate of an action for now."""
+
+
+class TokenBucket:
+    __slots__ = ("_per_minute", "_per_second", "_tokens", "_updated")
+
+    def __init__(self, per_minute: int, now: float) -> None:
+        self._per_minute = per_minute
+        self._per_second = per_minute / 60
+        self._tokens = float(per_minute)
+        self._updated = now
+
+    def refill(self, now: float) -> bool:
+        """Add the tokens earned since the last refill, return if one is left."""
+        self._tokens = min(
+            self._per_minute,
+            self._tokens + (now - self._updated) * self._per_second,
+        )
+        self._updated = now
+        return self._tokens >= 1
+
+    def take(self) -> None:
+        self._tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self.refill(now)
+        return self._tokens >= self._per_minute
+
+
+class ActionRateLimiter:
+    """The buckets of one action, for a room and each of its sessions."""
+
+    def __init__(
+        self,
+        actions: str,
+        session_per_minute: int | None,
+        room_per_minute: int | None,
+        clock: Clock,
+    ) -> None:
+        self._actions = actions
+        self._room_per_minute = room_per_minute
+        self._session_per_minute = session_per_minute
+        self._clock = clock
+        self._session_buckets: dict[str, TokenBucket] = {}
+        self._peak_session_count = 0
+        self._room_bucket = (
+            None if room_per_minute is None else TokenBucket(room_per_minute, clock())
+        )
+        self._lock = threading.Lock()
+
+    def check(self, session_id: str) -> None:
+        """Take a token of the session and the room, or raise if either has none."""
+        if self._session_per_minute is None and self._room_bucket is None:
+            return
+        now = self._clock()
+        with self._lock:
+            session_bucket = None
+            if self._session_per_minute is not None:
+                session_bucket = self._session_buckets.get(session_id)
+                if session_bucket is None:
+                    session_bucket = self._session_buckets[session_id] = TokenBucket(
+                        self._session_per_minute,
+                        now,
+                    )
+                    self._peak_session_count = max(
+                        self._peak_session_count,
+                        len(self._session_buckets),
+                    )
+                if not session_bucket.refill(now):
+                    message = (
+                        "You have reached the limit of "
+                        f"{self._session_per_minute} {self._actions} per minute"
+                    )
+                    raise RateLimitedError(message)
+            if self._room_bucket is not None:
+                if not self._room_bucket.refill(now):
+                    message = (
+                        "The room has reached the limit of "
+                        f"{self._room_per_minute} {self._actions} per minute, "
+                        "please try again in a moment"
+                    )
+                    raise RateLimitedError(message)
+                self._room_bucket.take()
+            if session_bucket is not None:
+                session_bucket.take()
+
+    def remove_session(self, session_id: str) -> None:
+        with self._lock:
+            self._session_buckets.pop(session_id, None)
+            if is_oversized(len(self._session_buckets), self._peak_session_count):
+                self._session_buckets = dict(self._session_buckets)
+                self._peak_session_count = len(self._session_buckets)
+
+    def prune(self) -> bool:
+        """Drop the full session buckets, return if all buckets are full."""
+        now = self._clock()
+        with self._lock:
+            self._session_buckets = {
+                session_id: bucket
+                for session_id, bucket in self._session_buckets.items()
+                if not bucket.is_full(now)
+            }
+            self._peak_session_count = len(self._session_buckets)
+            return not self._session_buckets and (
+                self._room_bucket is None or self._room_bucket.is_full(now)
+            )
+
+    @property
+    def session_count(self) -> int:
+        """The number of sessions with a bucket."""
+        with self._lock:
+            return len(self._session_buckets)
+
+
+class RoomRateLimits:
+    """The rate limits of the questions and upvotes of a room."""
+
+    def __init__(self, quotas: Quotas, clock: Clock) -> None:
+        self.questions = ActionRateLimiter(
+            "questions",
+            quotas.questions_per_minute,
+            quotas.room_questions_per_minute,
+            clock,
+        )
+        self.upvotes = ActionRateLimiter(
+            "upvotes",
+            quotas.upvotes_per_minute,
+            quotas.room_upvotes_per_minute,
+            clock,
+        )
+
+    def remove_session(self, session_id: str) -> None:
+        self.questions.remove_session(session_id)
+        self.upvotes.remove_session(session_id)
+
+    def prune(self) -> bool:
+        """Drop the full session buckets, return if all buckets are full."""
+        # both are pruned, even if the first has buckets left
+        questions_pruned = self.questions.prune()
+        return self.upvotes.prune() and questions_pruned
@@ -0,0 +1,123 @@
+"""Opt-in profiling of a sample of the script reruns.
+
+With OPEN_CUPS_PROFILE_DIR set, one in OPEN_CUPS_PROFILE_EVERY reruns is
+traced. The time spent in each call stack is added up per role of the
+session, host, client or lobby, and written to <role>.folded in that
+directory, in the collapsed stack format of flamegraph.pl and speedscope.
+Reruns that are not sampled only pay for one branch.
+"""
+
+import itertools
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Self
+
+FOLDED_SUFFIX = ".folded"
+UNKNOWN_ROLE = "other"
+
+
+def _label(frame: FrameType, event: str, arg: object) -> str:
+    if event == "c_call":
+        module = getattr(arg, "__module__", None) or "builtins"
+        return f"{module}.{getattr(arg, '__qualname__', repr(arg))}"
+    return f"{Path(frame.f_code.co_filename).stem}.{frame.f_code.co_qualname}"
+
+
+class _StackRecorder:
+    """Adds up the nanoseconds spent in each call stack of the current thread."""
+
+    def __init__(self) -> None:
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self._stack: list[str] = []
+        self._last = time.perf_counter_ns()
+
+    def __call__(self, frame: FrameType, event: str, arg: object) -> None:
+        now = time.perf_counter_ns()
+        if self._stack:
+            self.stacks[tuple(self._stack)] += now - self._last
+        if event in {"call", "c_call"}:
+            self._stack.append(_label(frame, event, arg))
+        elif self._stack:
+            # returns from the frames entered before the recording started
+            # find an empty stack
+            self._stack.pop()
+        self._last = time.perf_counter_ns()
+
+
+class RerunSample:
+    """A traced rerun, the role is set once the rerun knows it."""
+
+    def __init__(self, profiler: "RerunProfiler | None") -> None:
+        self.role = UNKNOWN_ROLE
+        self._profiler = profiler
+        self._recorder = _StackRecorder()
+
+    @property
+    def sampled(self) -> bool:
+        """Whether the rerun is traced, and so slower than the others."""
+        return self._profiler is not None
+
+    def __enter__(self) -> Self:
+        if self._profiler is not None:
+            sys.setprofile(self._recorder)
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        if self._profiler is not None:
+            sys.setprofile(None)
+            self._profiler.add(self.role, self._recorder.stacks)
+
+
+class _UnsampledRerun(RerunSample):
+    """The shared sample of the reruns that are not traced, it keeps no role."""
+
+    def __init__(self) -> None:
+        super().__init__(None)
+
+    @property
+    def role(self) -> str:
+        return UNKNOWN_ROLE
+
+    @role.setter
+    def role(self, role: str) -> None:
+        pass
+
+
+_UNSAMPLED = _UnsampledRerun()
+
+
+class RerunProfiler:
+    def __init__(self, directory: Path | None, sample_every: int) -> None:
+        self._directory = directory
+        self._sample_every = sample_every
+        self._reruns = itertools.count()
+        self._stacks: dict[str, Counter[tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def sample(self) -> RerunSample:
+        """Return a sample that traces the rerun, or a shared no-op one."""
+        if self._directory is None or next(self._reruns) % self._sample_every:
+            return _UNSAMPLED
+        return RerunSample(self)
+
+    def add(self, role: str, stacks: Counter[tuple[str, ...]]) -> None:
+        """Add the stacks of a sampled rerun and rewrite the file of its role."""
+        with self._lock:
+            role_stacks = self._stacks.setdefault(role, Counter())
+            role_stacks.update(stacks)
+            lines = [
+                f"{role};{';'.join(stack)} {microseconds}"
+                for stack, nanoseconds in sorted(role_stacks.items())
+                if (microseconds := nanoseconds // 1000)
+            ]
+            if self._directory is not None:
+                path = self._directory / f"{role}{FOLDED_SUFFIX}"
+                temporary_path = path.with_name(path.name + ".tmp")
+                temporary_path.write_text("\n".join(lines) + "\n")
+                temporary_path.replace(path)
@@ -1,43 +1,201 @@
-import threading
-import time
 import uuid
+from collections import deque
 from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
 
+from open_cups.clock import Clock, system_clock
+from open_cups.history_store import MemoryMappedHistory
+from open_cups.lock_profiler import make_lock
+from open_cups.question_index import QuestionIndex, SimilarQuestionError
+from open_cups.quotas import Quotas, estimate_memory_usage
+from open_cups.rate_limit import RoomRateLimits
+from open_cups.room_index import RoomIndex
+from open_cups.spans import PARTICIPANTS, ROOM_ID, Attributes, tracer
 from open_cups.stats_tracker import Config as StatsTrackerConfig
 from open_cups.stats_tracker import StatsTracker
 from open_cups.thread_safe_dict import ThreadSafeDict
-from open_cups.types import Question, StatusSnapshot, UserSession, UserStatus
+from open_cups.types import (
+    EventKind,
+    EventListener,
+    MemoryUsage,
+    PendingStatusWrite,
+    Question,
+    RoomEvent,
+    StatusSnapshot,
+    UserSession,
+    UserStatus,
+)
+
+COMBINING_WAIT_SECONDS = 0.0005
+# heartbeats are coalesced into epochs of this fraction of the removal timeout
+HEARTBEAT_EPOCHS_PER_TIMEOUT = 3
 
 
 class Room:
-    def __init__(self, room_id: str, host_id: str) -> None:
+    def __init__(  # noqa: PLR0913
+        self,
+        room_id: str,
+        host_id: str,
+        history_directory: Path | None = None,
+        on_event: EventListener | None = None,
+        clock: Clock = system_clock,
+        *,
+        quotas: Quotas | None = None,
+        index: RoomIndex | None = None,
+        heartbeat_epoch_seconds: float = 0.0,
+    ) -> None:
         self._room_id = room_id
-        self._sessions: ThreadSafeDict[UserSession] = ThreadSafeDict()
+        self._clock = clock
+        self._quotas = quotas or Quotas()
+        self._rate_limits = RoomRateLimits(self._quotas, clock)
+        self._sessions: ThreadSafeDict[UserSession] = ThreadSafeDict(
+            name="room.sessions",
+        )
         self._host_id = host_id
-        self._host_last_seen = time.time()
-        self._questions: ThreadSafeDict[Question] = ThreadSafeDict()
-        self._stats_tracker = StatsTracker(StatsTrackerConfig())
-        self._lock = threading.RLock()
+        self._host_last_seen = clock()
+        # without an epoch, every heartbeat is written, see update_session
+        self._heartbeat_epoch_seconds = heartbeat_epoch_seconds
+        self._questions: ThreadSafeDict[Question] = ThreadSafeDict(
+            name="room.questions",
+        )
+        # guarded by the lock of _questions
+        self._question_index = QuestionIndex()
+        history_store = (
+            None
+            if history_directory is None
+            else MemoryMappedHistory(history_directory / f"{room_id}.history")
+        )
+        self._stats_tracker = StatsTracker(StatsTrackerConfig(), history_store, clock)
+        self._lock = make_lock("Room")
+        self._on_event = on_event
+        # status writes waiting to be applied by whichever writer holds _lock next
+        self._pending_statuses: deque[PendingStatusWrite] = deque()
+        self._status_counts = dict.fromkeys(UserStatus, 0)
+        self._version = 0
+        self._index = index or RoomIndex(clock)
+        self._index_entry = self._index.add_room(room_id, host_id)
+        self._closed = False
+
+    def _span_attributes(self, *_: object, **__: object) -> Attributes:
+        return {ROOM_ID: self._room_id, PARTICIPANTS: len(self._sessions)}
+
+    def _emit(self, event: RoomEvent) -> None:
+        if self._on_event is not None:
+            self._on_event(event)
 
     def is_host(self, session_id: str) -> bool:
         return self._host_id == session_id
 
+    @tracer.traced("room.update_host_last_seen", _span_attributes)
     def update_host_last_seen(self) -> None:
-        self._host_last_seen = time.time()
+        self._host_last_seen = self._clock()
 
-    def set_session_status(self, session_id: str, status: UserStatus) -> None:
-        self._sessions[session_id] = UserSession(status, time.time())
+    @tracer.traced("room.join", _span_attributes)
+    def join(self, session_id: str) -> None:
+        """Add a participant with an unknown status, within the quota."""
+        # joins hold the lock until their write is applied, so concurrent
+        # joins cannot both take the last place
         with self._lock:
-            self._stats_tracker.record_status_snapshot(self._sessions.values())
+            if session_id not in self._sessions:
+                self._quotas.check_participants(len(self._sessions))
+            self.set_session_status(session_id, UserStatus.UNKNOWN)
+
+    @tracer.traced("room.set_session_status", _span_attributes)
+    def set_session_status(self, session_id: str, status: UserStatus) -> None:
+        write = PendingStatusWrite(session_id, status, self._clock())
+        self._pending_statuses.append(write)
+        # Another writer holding the lock may apply this write as part of its
+        # batch, so waiting writers check regularly if theirs has been applied.
+        while not write.applied:
+            if self._lock.acquire(timeout=COMBINING_WAIT_SECONDS):
+                try:
+                    self._apply_pending_statuses()
+                finally:
+                    self._lock.release()
+
+    def _apply_pending_statuses(self) -> None:
+        """Apply all queued status writes as one batch.
+
+        The counts, history and version are updated once per batch instead of
+        once per write, so a burst of writes in a room does not serialize on
+        the per-write bookkeeping.
+        """
+        batch_size = 0
+        while self._pending_statuses:
+            write = self._pending_statuses.popleft()
+            # seen until the end of an epoch, like a heartbeat
+            self._store_session(
+                write.session_id,
+                UserSession(
+                    write.status,
+                    write.timestamp + self._heartbeat_epoch_seconds,
+                ),
+            )
+            self._emit(
+                RoomEvent(
+                    EventKind.SESSION_STATUS,
+                    self._room_id,
+                    session_id=write.session_id,
+                    status=write.status,
+                ),
+            )
+            write.applied = True
+            batch_size += 1
+        if batch_size:
+            self._version += 1
+            self._stats_tracker.record_status_counts(self._status_counts)
+            self._report_participants(batch_size)
+
+    def _report_participants(self, writes: int = 0) -> None:
+        # called with _lock held, so the reports of a room are in order
+        self._index.update_participants(
+            self._index_entry,
+            self._status_counts,
+            writes,
+        )
+
+    def _report_questions(self, writes: int = 0) -> None:
+        # called with the lock of _questions held
+        self._index.update_questions(self._index_entry, len(self._questions), writes)
+
+    def _store_session(self, session_id: str, user_session: UserSession) -> None:
+        previous = self._sessions.get(session_id)
+        if previous is None:
+            self._index.add_session(self._index_entry, session_id)
+        else:
+            self._status_counts[previous.status] -= 1
+        self._status_counts[user_session.status] += 1
+        self._sessions[session_id] = user_session
+
+    def _drop_session(self, session_id: str) -> bool:
+        previous = self._sessions.pop(session_id)
+        if previous is None:
+            return False
+        self._index.remove_session(self._index_entry, session_id)
+        self._status_counts[previous.status] -= 1
+        self._version += 1
+        return True
 
     def get_session_status(self, session_id: str) -> UserStatus:
         return self._sessions[session_id].status
 
+    @tracer.traced("room.update_session", _span_attributes)
     def update_session(self, session_id: str) -> None:
-        if session_id in self._sessions:
-            self._sessions[session_id].last_seen = time.time()
+        # get, as the session may be removed concurrently
+        user_session = self._sessions.get(session_id)
+        now = self._clock()
+        # A heartbeat marks the session as seen until the end of an epoch, so
+        # the following heartbeats within the epoch write nothing. Sessions
+        # are removed at most an epoch later than without coalescing, and
+        # never earlier.
+        if user_session is not None and user_session.last_seen < now:
+            user_session.last_seen = now + self._heartbeat_epoch_seconds
 
     def has_session(self, session_id: str) -> bool:
+        # the sessions of a removed room may still write to it, but left it
+        if self._closed:
+            return False
         if session_id in self._sessions:
             return True
         return bool(self.is_host(session_id))
@@ -45,16 +203,29 @@ class Room:
     def __iter__(self) -> Iterator[tuple[str, UserStatus]]:
         return ((k, v.status) for k, v in self._sessions.items())
 
+    def get_status_counts(self) -> dict[UserStatus, int]:
+        with self._lock:
+            return dict(self._status_counts)
+
+    @property
+    def version(self) -> int:
+        """Increases whenever the statuses of the room's sessions change."""
+        return self._version
+
     @property
     def room_id(self) -> str:
         return self._room_id
 
+    @property
+    def host_id(self) -> str:
+        return self._host_id
+
     def is_host_inactive(self, timeout_seconds: int) -> bool:
-        current_time = time.time()
+        current_time = self._clock()
         return current_time - self._host_last_seen > timeout_seconds
 
     def remove_inactive_sessions(self, timeout_seconds: int) -> None:
-        current_time = time.time()
+        current_time = self._clock()
         users_to_remove = [
             session_id
             for session_id, user_session in self._sessions.items()
@@ -62,17 +233,68 @@ class Room:
         ]
 
         for session_id in users_to_remove:
-            del self._sessions[session_id]
+            self._remove_inactive_session(session_id, current_time, timeout_seconds)
+
+    def _remove_inactive_session(
+        self,
+        session_id: str,
+        current_time: float,
+        timeout_seconds: int,
+    ) -> None:
+        with self._lock:
+            # the session may have set its status since it was found inactive
+            user_session = self._sessions.get(session_id)
+            if (
+                user_session is not None
+                and current_time - user_session.last_seen > timeout_seconds
+                and self._drop_session(session_id)
+            ):
+                self._report_participants()
+                self._rate_limits.remove_session(session_id)
+                self._emit(
+                    RoomEvent(
+                        EventKind.SESSION_REMOVED,
+                        self._room_id,
+                        session_id=session_id,
+                    ),
+                )
 
     def get_open_questions(self) -> list[Question]:
         open_questions = list(self._questions.values())
         return sorted(open_questions, key=lambda q: q.vote_count, reverse=True)
 
-    def add_question(self, session_id: str, text: str) -> None:
+    @tracer.traced("room.add_question", _span_attributes)
+    def add_question(
+        self,
+        session_id: str,
+        text: str,
+        *,
+        allow_similar: bool = True,
+    ) -> str:
         question_id = str(uuid.uuid4())
         question = Question(id=question_id, text=text, voter_ids={session_id})
-        self._questions[question_id] = question
+        with self._questions:
+            self._quotas.check_question(len(self._questions), text)
+            if not allow_similar:
+                similar_id = self._question_index.find_similar(text)
+                if similar_id is not None:
+                    raise SimilarQuestionError(self._questions[similar_id])
+            self._rate_limits.questions.check(session_id)
+            self._questions[question_id] = question
+            self._question_index.add(question_id, text)
+            self._report_questions(writes=1)
+            self._emit(
+                RoomEvent(
+                    EventKind.QUESTION_ADDED,
+                    self._room_id,
+                    session_id=session_id,
+                    question_id=question_id,
+                    text=text,
+                ),
+            )
+        return question_id
 
+    @tracer.traced("room.upvote_question", _span_attributes)
     def upvote_question(self, session_id: str, question_id: str) -> None:
         with self._questions:
             if question_id not in self._questions:
@@ -83,10 +305,175 @@ class Room:
             if session_id in question.voter_ids:
                 return
 
+            self._rate_limits.upvotes.check(session_id)
             question.voter_ids.add(session_id)
+            self._report_questions(writes=1)
+            self._emit(
+                RoomEvent(
+                    EventKind.QUESTION_UPVOTED,
+                    self._room_id,
+                    session_id=session_id,
+                    question_id=question_id,
+                ),
+            )
 
+    @tracer.traced("room.close_question", _span_attributes)
     def close_question(self, question_id: str) -> None:
-        del self._questions[question_id]
+        with self._questions:
+            if self._questions.pop(question_id) is not None:
+                self._question_index.remove(question_id)
+                self._report_questions(writes=1)
+                self._emit(
+                    RoomEvent(
+                        EventKind.QUESTION_CLOSED,
+                        self._room_id,
+                        question_id=question_id,
+                    ),
+                )
+
+    def get_status_history(
+        self,
+        start_time: float | None = None,
+    ) -> list[StatusSnapshot]:
+        with self._lock:
+            return self._stats_tracker.get_status_history_range(start_time)
+
+    def get_status_history_length(self) -> int:
+        with self._lock:
+            return self._stats_tracker.snapshot_count
+
+    def get_status_history_start(self) -> float | None:
+        with self._lock:
+            return self._stats_tracker.first_timestamp
+
+    def get_memory_usage(self) -> MemoryUsage:
+        with self._lock:
+            snapshot_count = self._stats_tracker.in_memory_snapshot_count
+        return estimate_memory_usage(
+            list(self._sessions),
+            list(self._questions.values()),
+            snapshot_count,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._stats_tracker.close()
+        self._index.remove_room(self._index_entry, [self._host_id, *self._sessions])
+
+    def apply_event(self, event: RoomEvent) -> None:
+        """Replay a previously emitted event.
+
+        Events are idempotent, so replaying one that is already reflected in the
+        room's state is harmless. Replaying neither emits nor records history.
+        """
+        match event.kind:
+            case EventKind.SESSION_STATUS if event.status is not None:
+                with self._lock:
+                    self._store_session(
+                        event.session_id,
+                        UserSession(event.status, self._clock()),
+                    )
+                    self._version += 1
+                    self._report_participants()
+            case EventKind.SESSION_REMOVED:
+                with self._lock:
+                    self._drop_session(event.session_id)
+                    self._report_participants()
+            case EventKind.QUESTION_ADDED:
+                with self._questions:
+                    if event.question_id not in self._questions:
+                        self._questions[event.question_id] = Question(
+                            id=event.question_id,
+                            text=event.text,
+                            voter_ids={event.session_id},
+                        )
+                        self._question_index.add(event.question_id, event.text)
+                        self._report_questions()
+            case EventKind.QUESTION_UPVOTED:
+                with self._questions:
+                    if event.question_id in self._questions:
+                        question = self._questions[event.question_id]
+                        question.voter_ids.add(event.session_id)
+            case EventKind.QUESTION_CLOSED:
+                with self._questions:
+                    self._questions.pop(event.question_id)
+                    self._question_index.remove(event.question_id)
+                    self._report_questions()
+            case _:
+                message = f"Cannot apply {event.kind} to a room"
+                raise ValueError(message)
+
+    def to_snapshot(self) -> dict[str, Any]:
+        with self._lock, self._questions:
+            return {
+                "room_id": self._room_id,
+                "host_id": self._host_id,
+                "sessions": {
+                    session_id: user_session.status.name
+                    for session_id, user_session in self._sessions.items()
+                },
+                "questions": [
+                    {
+                        "id": question.id,
+                        "text": question.text,
+                        "voter_ids": sorted(question.voter_ids),
+                    }
+                    for question in self._questions.values()
+                ],
+                "history": [
+                    [
+                        snapshot.timestamp,
+                        *(snapshot.counts[status] for status in UserStatus),
+                    ]
+                    for snapshot in self._stats_tracker.status_history
+                ],
+            }
 
-    def get_status_history(self) -> list[StatusSnapshot]:
-        return self._stats_tracker.status_history
+    @classmethod
+    def from_snapshot(  # noqa: PLR0913
+        cls,
+        data: dict[str, Any],
+        history_directory: Path | None = None,
+        on_event: EventListener | None = None,
+        clock: Clock = system_clock,
+        *,
+        quotas: Quotas | None = None,
+        index: RoomIndex | None = None,
+        heartbeat_epoch_seconds: float = 0.0,
+    ) -> "Room":
+        room = cls(
+            data["room_id"],
+            data["host_id"],
+            history_directory,
+            on_event,
+            clock,
+            quotas=quotas,
+            index=index,
+            heartbeat_epoch_seconds=heartbeat_epoch_seconds,
+        )
+        current_time = clock()
+        for session_id, status_name in data["sessions"].items():
+            room._store_session(
+                session_id,
+                UserSession(UserStatus[status_name], current_time),
+            )
+        for question in data["questions"]:
+            room._questions[question["id"]] = Question(
+                id=question["id"],
+                text=question["text"],
+                voter_ids=set(question["voter_ids"]),
+            )
+            room._question_index.add(question["id"], question["text"])
+        room._report_participants()
+        room._report_questions()
+        room._stats_tracker.restore_status_history(
+            [
+                StatusSnapshot(
+                    timestamp=timestamp,
+                    counts=dict(zip(UserStatus, counts, strict=True)),
+                )
+                for timestamp, *counts in data["history"]
+            ],
+        )
+        return room
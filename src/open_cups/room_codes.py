@@ -0,0 +1,44 @@
+"""Short room codes that are easy to read out, type and encode in a QR code.
+
+A room code has ROOM_CODE_LENGTH characters of Crockford's base 32 alphabet,
+which has no I, L, O or U. When a code is typed in, lowercase letters are
+accepted and I, L and O are read as the digits they are mistaken for. Ids that
+are not room codes, such as the UUIDs of rooms created by earlier versions,
+are left as they are.
+
+The backends reject a code that is already taken with RoomCodeTakenError, the
+lobby then draws another one, up to MAX_ROOM_CODE_ATTEMPTS codes in all. The
+code of a removed room is free again.
+"""
+
+import secrets
+
+ROOM_CODE_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+# 32**6, about a billion codes, so a collision is rare even with many rooms
+ROOM_CODE_LENGTH = 6
+# behind the router, a worker owns one in as many codes as there are workers
+MAX_ROOM_CODE_ATTEMPTS = 1000
+_MISREAD_CHARACTERS = str.maketrans("ILO", "110")
+
+
+class RoomCodeTakenError(ValueError):
+    """Another room already has the code."""
+
+
+class NoFreeRoomCodeError(ValueError):
+    """No free room code of this worker was drawn within the attempts."""
+
+
+def generate_room_code() -> str:
+    return "".join(secrets.choice(ROOM_CODE_ALPHABET) for _ in range(ROOM_CODE_LENGTH))
+
+
+def normalize_room_code(text: str) -> str:
+    """Return the room code that text was typed for, or text if it is no code."""
+    text = text.strip()
+    code = text.upper().translate(_MISREAD_CHARACTERS)
+    if len(code) == ROOM_CODE_LENGTH and all(
+        character in ROOM_CODE_ALPHABET for character in code
+    ):
+        return code
+    return text
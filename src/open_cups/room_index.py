@@ -0,0 +1,237 @@
+"""Aggregates over all rooms of a process, kept up to date as the rooms change.
+
+Each room reports its participant counts and its open question count to the
+index whenever they change, along with the number of writes. The index adds
+the differences to the totals, so reading the totals takes constant time no
+matter how many rooms there are.
+
+Write rates change without any writes, so the rankings of the largest and
+busiest rooms and the rates are not kept up to date but recomputed by rank, at
+most every RANKING_INTERVAL_SECONDS, in O(rooms log RANKED_ROOMS). The cleanup
+calls it, as it visits every room anyway. An overview only copies the totals
+and the rankings, in O(RANKED_ROOMS), so the rankings may still list a room
+removed since, and are empty until the first cleanup.
+
+Rooms report through the RoomEntry handed out by add_room. A removed room may
+still be written to by sessions that found it just before, those reports are
+ignored, even if a new room took over its code.
+
+The index also knows the room of each session, the host and participants, so
+that the room of a session is found without asking every room.
+"""
+
+import dataclasses
+import heapq
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from open_cups.clock import Clock, system_clock
+from open_cups.lock_profiler import make_lock
+from open_cups.thread_safe_dict import ThreadSafeDict, is_oversized
+from open_cups.types import RoomsOverview, RoomSummary, UserStatus
+
+RANKING_INTERVAL_SECONDS = 5.0
+RANKED_ROOMS = 10
+
+
+class RoomEntry:
+    """The last reported counts of a room."""
+
+    __slots__ = (
+        "counts",
+        "participants",
+        "questions",
+        "ranked_writes",
+        "removed",
+        "room_id",
+        "writes",
+        "writes_per_second",
+    )
+
+    def __init__(self, room_id: str) -> None:
+        self.room_id = room_id
+        self.counts = dict.fromkeys(UserStatus, 0)
+        self.participants = 0
+        self.questions = 0
+        self.writes = 0
+        # the writes at the last ranking, for the rate since then
+        self.ranked_writes = 0
+        self.writes_per_second = 0.0
+        self.removed = False
+
+    def summary(self) -> RoomSummary:
+        return RoomSummary(
+            self.room_id,
+            self.participants,
+            self.questions,
+            self.writes_per_second,
+        )
+
+
+class RoomIndex:
+    def __init__(self, clock: Clock = system_clock) -> None:
+        self._clock = clock
+        self._entries: set[RoomEntry] = set()
+        self._peak_size = 0
+        self._counts = dict.fromkeys(UserStatus, 0)
+        self._questions = 0
+        self._writes = 0
+        self._ranked_writes = 0
+        self._writes_per_second = 0.0
+        self._ranked_at = clock()
+        self._ranked = False
+        self._largest: list[RoomSummary] = []
+        self._busiest: list[RoomSummary] = []
+        # written with _lock held, read without it
+        self._session_entries: ThreadSafeDict[RoomEntry] = ThreadSafeDict(
+            name="room_index.sessions",
+        )
+        self._lock = make_lock("RoomIndex")
+
+    def add_room(self, room_id: str, host_id: str | None = None) -> RoomEntry:
+        entry = RoomEntry(room_id)
+        with self._lock:
+            self._entries.add(entry)
+            self._peak_size = max(self._peak_size, len(self._entries))
+            if host_id is not None:
+                self._session_entries[host_id] = entry
+        return entry
+
+    def remove_room(self, entry: RoomEntry, session_ids: Iterable[str] = ()) -> None:
+        """Remove a room and its sessions, the host and the participants."""
+        with self._lock:
+            if entry.removed:
+                return
+            entry.removed = True
+            for session_id in session_ids:
+                self._discard_session(entry, session_id)
+            self._entries.discard(entry)
+            if is_oversized(len(self._entries), self._peak_size):
+                self._entries = set(self._entries)
+                self._peak_size = len(self._entries)
+            for status, count in entry.counts.items():
+                self._counts[status] -= count
+            self._questions -= entry.questions
+
+    def add_session(self, entry: RoomEntry, session_id: str) -> None:
+        with self._lock:
+            if not entry.removed:
+                self._session_entries[session_id] = entry
+
+    def remove_session(self, entry: RoomEntry, session_id: str) -> None:
+        with self._lock:
+            self._discard_session(entry, session_id)
+
+    def _discard_session(self, entry: RoomEntry, session_id: str) -> None:
+        # the session may have moved on to another room since
+        if self._session_entries.get(session_id) is entry:
+            del self._session_entries[session_id]
+
+    def get_session_room_id(self, session_id: str) -> str | None:
+        """Return the id of the room of a session, in constant time."""
+        entry = self._session_entries.get(session_id)
+        return None if entry is None else entry.room_id
+
+    def update_participants(
+        self,
+        entry: RoomEntry,
+        counts: Mapping[UserStatus, int],
+        writes: int = 0,
+    ) -> None:
+        """Set the participant counts of a room, after writes status changes."""
+        with self._lock:
+            if entry.removed:
+                return
+            for status, count in counts.items():
+                self._counts[status] += count - entry.counts[status]
+                entry.counts[status] = count
+            entry.participants = sum(counts.values())
+            entry.writes += writes
+            self._writes += writes
+
+    def update_questions(self, entry: RoomEntry, count: int, writes: int = 0) -> None:
+        """Set the open question count of a room, after writes questions or votes."""
+        with self._lock:
+            if entry.removed:
+                return
+            self._questions += count - entry.questions
+            entry.questions = count
+            entry.writes += writes
+            self._writes += writes
+
+    def get_totals(self) -> tuple[int, int, int]:
+        """Return the number of rooms, participants and open questions."""
+        with self._lock:
+            return len(self._entries), sum(self._counts.values()), self._questions
+
+    def rank(self) -> None:
+        """Recompute the rankings and rates, unless done recently."""
+        with self._lock:
+            now = self._clock()
+            if not self._ranked or now - self._ranked_at >= RANKING_INTERVAL_SECONDS:
+                self._rank(now)
+
+    def get_overview(self) -> RoomsOverview:
+        with self._lock:
+            return RoomsOverview(
+                rooms=len(self._entries),
+                participants=dict(self._counts),
+                questions=self._questions,
+                writes_per_second=self._writes_per_second,
+                largest_rooms=list(self._largest),
+                busiest_rooms=list(self._busiest),
+            )
+
+    def _rank(self, now: float) -> None:
+        elapsed = now - self._ranked_at
+        if elapsed > 0:
+            for entry in self._entries:
+                entry.writes_per_second = (entry.writes - entry.ranked_writes) / elapsed
+                entry.ranked_writes = entry.writes
+            self._writes_per_second = (self._writes - self._ranked_writes) / elapsed
+            self._ranked_writes = self._writes
+            self._ranked_at = now
+        self._largest = [
+            entry.summary()
+            for entry in heapq.nlargest(
+                RANKED_ROOMS,
+                self._entries,
+                key=lambda entry: entry.participants,
+            )
+        ]
+        self._busiest = [
+            entry.summary()
+            for entry in heapq.nlargest(
+                RANKED_ROOMS,
+                self._entries,
+                key=lambda entry: entry.writes_per_second,
+            )
+        ]
+        self._ranked = True
+
+
+def encode_overview(overview: RoomsOverview) -> dict[str, Any]:
+    """Return the overview as JSON-compatible data, statuses by lowercase name."""
+    return {
+        "rooms": overview.rooms,
+        "participants": {
+            status.name.lower(): count
+            for status, count in overview.participants.items()
+        },
+        "questions": overview.questions,
+        "writes_per_second": overview.writes_per_second,
+        "largest_rooms": [dataclasses.asdict(room) for room in overview.largest_rooms],
+        "busiest_rooms": [dataclasses.asdict(room) for room in overview.busiest_rooms],
+    }
+
+
+def overview_prometheus_lines(overview: RoomsOverview) -> list[str]:
+    lines = ["# TYPE open_cups_participants gauge"]
+    lines.extend(
+        f'open_cups_participants{{status="{status.name.lower()}"}} {count}'
+        for status, count in overview.participants.items()
+    )
+    if overview.writes_per_second is not None:
+        lines.append("# TYPE open_cups_writes_per_second gauge")
+        lines.append(f"open_cups_writes_per_second {overview.writes_per_second}")
+    return lines
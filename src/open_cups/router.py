@@ -0,0 +1,328 @@
+"""Run several Streamlit workers behind a room-affine reverse proxy.
+
+Every worker keeps its rooms in its own memory, so all requests of a room must
+reach the same worker. The router hashes the room_id query parameter of the
+page request onto a worker and remembers the worker in a cookie for the
+requests without it, most importantly the websocket of the Streamlit session.
+Workers only create rooms whose id hashes onto themselves, see
+open_cups.routing.WorkerAffinity. Rooms are hashed onto all workers, up or
+not, the same way the workers see it. The rooms of a worker that is down are
+gone with its memory anyway, so their pages are answered with 502 Bad Gateway
+until the worker is back, instead of being sent to a worker that would not
+serve them.
+
+Only the first request on a connection is routed, the rest of the connection
+is passed through. So that a later request on a kept-alive connection cannot
+reach the worker of an earlier one, requests other than websocket upgrades
+are sent with Connection: close and answered with it, and the browser opens a
+new connection for the next request.
+
+Run with: uv run open-cups-router --workers 4 --port 8501
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import subprocess
+import sys
+from collections.abc import Sequence
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+
+from open_cups.room_codes import normalize_room_code
+from open_cups.routing import HashRing
+
+WORKER_COOKIE = "open_cups_worker"
+MAX_HEAD_BYTES = 64 * 1024
+PIPE_CHUNK_BYTES = 64 * 1024
+CHECK_INTERVAL_SECONDS = 0.5
+BAD_GATEWAY = (
+    b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+)
+
+
+@dataclass(frozen=True)
+class WorkerSpec:
+    worker_id: str
+    host: str
+    port: int
+    command: tuple[str, ...]
+    env: dict[str, str]
+
+
+def _parse_head(head: bytes) -> tuple[str, dict[str, str]]:
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    parts = request_line.split(" ")
+    target = parts[1] if len(parts) > 1 else "/"
+    headers = {}
+    for line in header_lines:
+        name, separator, value = line.partition(":")
+        if separator:
+            headers[name.strip().lower()] = value.strip()
+    return target, headers
+
+
+def _rewrite_head(
+    head: bytes,
+    *,
+    close: bool,
+    cookie_worker: str | None = None,
+) -> bytes:
+    """Return the head with Connection: close and the worker cookie, if given."""
+    lines = head.removesuffix(b"\r\n\r\n").split(b"\r\n")
+    if close:
+        lines = [
+            line
+            for line in lines
+            if line.partition(b":")[0].strip().lower()
+            not in {b"connection", b"keep-alive"}
+        ]
+        lines.append(b"Connection: close")
+    if cookie_worker is not None:
+        lines.append(
+            f"Set-Cookie: {WORKER_COOKIE}={cookie_worker}; "
+            "Path=/; HttpOnly; SameSite=Lax".encode("latin-1"),
+        )
+    return b"\r\n".join(lines) + b"\r\n\r\n"
+
+
+def _cookie_worker(headers: dict[str, str]) -> str | None:
+    cookie: SimpleCookie = SimpleCookie(headers.get("cookie", ""))
+    morsel = cookie.get(WORKER_COOKIE)
+    return morsel.value if morsel is not None else None
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while data := await reader.read(PIPE_CHUNK_BYTES):
+            writer.write(data)
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+class Router:
+    """Reverse proxy that routes by room id onto the workers that are up."""
+
+    def __init__(self, workers: Sequence[WorkerSpec]) -> None:
+        self._workers = {worker.worker_id: worker for worker in workers}
+        # all workers, like the ring of open_cups.routing.WorkerAffinity
+        self._ring = HashRing(self._workers)
+        self._workers_up: set[str] = set()
+        self._round_robin = itertools.cycle(sorted(self._workers))
+
+    @property
+    def workers_up(self) -> set[str]:
+        return set(self._workers_up)
+
+    def mark_up(self, worker_id: str) -> None:
+        self._workers_up.add(worker_id)
+
+    def mark_down(self, worker_id: str) -> None:
+        self._workers_up.discard(worker_id)
+
+    def choose_worker(self, target: str, headers: dict[str, str]) -> str:
+        room_ids = parse_qs(urlsplit(target).query).get("room_id")
+        if room_ids:
+            worker_id = self._ring.lookup(normalize_room_code(room_ids[0]))
+            if worker_id not in self._workers_up:
+                message = f"Worker {worker_id} of the room is down"
+                raise LookupError(message)
+            return worker_id
+        cookie_worker = _cookie_worker(headers)
+        if cookie_worker in self.workers_up:
+            return cookie_worker
+        for _ in self._workers:
+            worker_id = next(self._round_robin)
+            if worker_id in self.workers_up:
+                return worker_id
+        message = "No workers available"
+        raise LookupError(message)
+
+    async def serve(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(
+            self._handle,
+            host,
+            port,
+            limit=MAX_HEAD_BYTES,
+        )
+
+    async def _handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+
+        target, headers = _parse_head(head)
+        try:
+            worker = self._workers[self.choose_worker(target, headers)]
+            upstream_reader, upstream_writer = await asyncio.open_connection(
+                worker.host,
+                worker.port,
+            )
+        except (LookupError, OSError):
+            writer.write(BAD_GATEWAY)
+            await writer.drain()
+            writer.close()
+            return
+
+        close = "upgrade" not in headers
+        upstream_writer.write(_rewrite_head(head, close=close))
+        set_cookie = _cookie_worker(headers) != worker.worker_id
+        await asyncio.gather(
+            _pipe(reader, upstream_writer),
+            self._forward_response(
+                upstream_reader,
+                writer,
+                worker.worker_id if set_cookie else None,
+                close=close,
+            ),
+            return_exceptions=True,
+        )
+
+    async def _forward_response(
+        self,
+        upstream_reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        cookie_worker: str | None,
+        *,
+        close: bool,
+    ) -> None:
+        if close or cookie_worker is not None:
+            head = await upstream_reader.readuntil(b"\r\n\r\n")
+            writer.write(_rewrite_head(head, close=close, cookie_worker=cookie_worker))
+        await _pipe(upstream_reader, writer)
+
+
+async def _is_listening(worker: WorkerSpec) -> bool:
+    try:
+        _, writer = await asyncio.open_connection(worker.host, worker.port)
+    except OSError:
+        return False
+    writer.close()
+    return True
+
+
+class Supervisor:
+    """Keeps the worker processes running and the router's workers up to date.
+
+    A worker that exits is marked as down and restarted, its rooms are not
+    served in the meantime. Once it accepts connections again, it is marked as
+    up.
+    """
+
+    def __init__(self, router: Router, workers: Sequence[WorkerSpec]) -> None:
+        self._router = router
+        self._workers = workers
+        self._processes: dict[str, subprocess.Popen[bytes]] = {}
+
+    def start(self) -> None:
+        for worker in self._workers:
+            self._spawn(worker)
+
+    def _spawn(self, worker: WorkerSpec) -> None:
+        self._processes[worker.worker_id] = subprocess.Popen(  # noqa: S603
+            worker.command,
+            env=worker.env,
+        )
+
+    def process(self, worker_id: str) -> subprocess.Popen[bytes]:
+        return self._processes[worker_id]
+
+    async def check(self) -> None:
+        for worker in self._workers:
+            if self._processes[worker.worker_id].poll() is not None:
+                self._router.mark_down(worker.worker_id)
+                self._spawn(worker)
+            elif worker.worker_id not in self._router.workers_up and (
+                await _is_listening(worker)
+            ):
+                self._router.mark_up(worker.worker_id)
+
+    async def run(self, stopped: asyncio.Event) -> None:
+        while not stopped.is_set():
+            await self.check()
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(stopped.wait(), CHECK_INTERVAL_SECONDS)
+
+    def stop(self) -> None:
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.wait()
+
+
+def build_worker_specs(
+    worker_count: int,
+    base_port: int,
+    app: str,
+    host: str = "127.0.0.1",
+) -> list[WorkerSpec]:
+    worker_ids = [f"worker-{index}" for index in range(worker_count)]
+    return [
+        WorkerSpec(
+            worker_id=worker_id,
+            host=host,
+            port=base_port + index,
+            command=(
+                sys.executable,
+                "-m",
+                "streamlit",
+                "run",
+                app,
+                "--server.address",
+                host,
+                "--server.port",
+                str(base_port + index),
+                "--server.headless",
+                "true",
+            ),
+            env={
+                **os.environ,
+                "OPEN_CUPS_WORKER_ID": worker_id,
+                "OPEN_CUPS_WORKERS": ",".join(worker_ids),
+            },
+        )
+        for index, worker_id in enumerate(worker_ids)
+    ]
+
+
+async def serve(
+    workers: Sequence[WorkerSpec],
+    host: str,
+    port: int,
+    stopped: asyncio.Event,
+) -> None:
+    router = Router(workers)
+    supervisor = Supervisor(router, workers)
+    supervisor.start()
+    server = await router.serve(host, port)
+    try:
+        await supervisor.run(stopped)
+    finally:
+        server.close()
+        supervisor.stop()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Run Streamlit workers behind a room-affine reverse proxy.",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8501)
+    parser.add_argument("--base-port", type=int, default=8601)
+    parser.add_argument("--app", default="main.py")
+    args = parser.parse_args(argv)
+
+    workers = build_worker_specs(args.workers, args.base_port, args.app)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve(workers, args.host, args.port, asyncio.Event()))
@@ -0,0 +1,76 @@
+import bisect
+import functools
+import hashlib
+from collections.abc import Iterable
+
+from open_cups.settings import Settings
+
+VIRTUAL_NODES_PER_WORKER = 64
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    """Consistent hashing of room ids onto workers.
+
+    Removing a worker only moves the rooms it owned, all other rooms keep
+    their worker.
+    """
+
+    def __init__(
+        self,
+        workers: Iterable[str] = (),
+        virtual_nodes: int = VIRTUAL_NODES_PER_WORKER,
+    ) -> None:
+        self._virtual_nodes = virtual_nodes
+        self._points: list[tuple[int, str]] = []
+        for worker in workers:
+            self.add(worker)
+
+    @property
+    def workers(self) -> set[str]:
+        return {worker for _, worker in self._points}
+
+    def add(self, worker: str) -> None:
+        if worker in self.workers:
+            return
+        for replica in range(self._virtual_nodes):
+            bisect.insort(self._points, (_hash(f"{worker}#{replica}"), worker))
+
+    def remove(self, worker: str) -> None:
+        self._points = [point for point in self._points if point[1] != worker]
+
+    def lookup(self, room_id: str) -> str:
+        if not self._points:
+            message = "No workers available"
+            raise LookupError(message)
+        index = bisect.bisect(self._points, (_hash(room_id), ""))
+        return self._points[index % len(self._points)][1]
+
+
+class RoomOnOtherWorkerError(ValueError):
+    """The room can only exist on another worker of the router."""
+
+
+class WorkerAffinity:
+    """The view of a single worker on the room distribution of a router."""
+
+    def __init__(self, worker_id: str, workers: Iterable[str]) -> None:
+        self._worker_id = worker_id
+        self._ring = HashRing(workers)
+        # otherwise the worker owns no room and could never create one
+        if worker_id not in self._ring.workers:
+            message = f"Worker {worker_id} is not one of the workers"
+            raise ValueError(message)
+
+    @classmethod
+    @functools.cache
+    def from_settings(cls, settings: Settings) -> "WorkerAffinity | None":
+        if settings.worker_id is None:
+            return None
+        return cls(settings.worker_id, settings.workers)
+
+    def owns(self, room_id: str) -> bool:
+        return self._ring.lookup(room_id) == self._worker_id
@@ -0,0 +1,93 @@
+"""Shutting down the Streamlit sessions of participants who left.
+
+Closing a tab only disconnects its Streamlit session. Streamlit keeps the
+session, with its session state, widget states and cached messages, for
+server.disconnectedSessionTTL seconds, 2 minutes by default, so that a
+reconnecting browser continues where it left off. After a large lecture, that
+is a lot of memory for sessions that will not come back.
+
+The state backends remove a participant after the user removal timeout
+without a heartbeat, and a browser reconnecting after that starts over in the
+lobby anyway. So at most every REAP_INTERVAL_SECONDS, the cleanup closes the
+disconnected Streamlit sessions whose user session is in no room, which also
+covers the lobby, where a session has nothing to lose. Sessions that are
+still connected are never closed, even when their participant was removed.
+
+Streamlit requires sessions to be closed on the event loop of its runtime,
+which checks again that the session did not reconnect in the meantime. The
+runtime has no public accessor for its event loop, so get_eventloop reads it
+from the private one, which is why pyproject.toml caps Streamlit at the
+releases this was tested with. The user sessions are looked up through the
+state backend, which finds the room of a session without asking every room.
+"""
+
+from asyncio import AbstractEventLoop
+
+from streamlit.runtime import Runtime
+
+from open_cups.backend import StateBackend
+from open_cups.clock import Clock, system_clock
+from open_cups.thread_safe_dict import ThreadSafeDict
+
+REAP_INTERVAL_SECONDS = 10.0
+
+
+class SessionReaper:
+    """The Streamlit sessions by the ids of their user sessions."""
+
+    def __init__(
+        self,
+        clock: Clock = system_clock,
+        runtime: Runtime | None = None,
+    ) -> None:
+        self._clock = clock
+        self._runtime = runtime
+        self._streamlit_session_ids: ThreadSafeDict[str] = ThreadSafeDict(
+            name="session_reaper.sessions",
+        )
+        self._reaped_at: float | None = None
+
+    def register(self, session_id: str, streamlit_session_id: str) -> None:
+        """Remember the Streamlit session that serves a user session."""
+        self._streamlit_session_ids[session_id] = streamlit_session_id
+
+    def reap(self, application_state: StateBackend) -> None:
+        """Close the abandoned Streamlit sessions, unless reaped recently."""
+        now = self._clock()
+        if (
+            self._reaped_at is not None
+            and now - self._reaped_at < REAP_INTERVAL_SECONDS
+        ):
+            return
+        self._reaped_at = now
+        runtime = self._runtime
+        if runtime is None:
+            if not Runtime.exists():
+                return
+            runtime = Runtime.instance()
+        abandoned = []
+        for session_id, streamlit_session_id in self._streamlit_session_ids.items():
+            if (
+                not runtime.is_active_session(streamlit_session_id)
+                and application_state.get_session_room(session_id) is None
+                # another rerun may be reaping at the same time
+                and self._streamlit_session_ids.pop(session_id) is not None
+            ):
+                abandoned.append(streamlit_session_id)
+        if abandoned:
+            get_eventloop(runtime).call_soon_threadsafe(
+                _close_sessions,
+                runtime,
+                abandoned,
+            )
+
+
+def get_eventloop(runtime: Runtime) -> AbstractEventLoop:
+    """Return the event loop of a started runtime, private in Streamlit."""
+    return runtime._get_async_objs().eventloop  # noqa: SLF001
+
+
+def _close_sessions(runtime: Runtime, streamlit_session_ids: list[str]) -> None:
+    for streamlit_session_id in streamlit_session_ids:
+        if not runtime.is_active_session(streamlit_session_id):
+            runtime.close_session(streamlit_session_id)
@@ -0,0 +1,101 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from open_cups.types import ExportFormat
+
+
+def _optional_path(name: str) -> Path | None:
+    value = os.environ.get(name)
+    return Path(value) if value else None
+
+
+def _optional_int(name: str) -> int | None:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in {"1", "true", "yes"}
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Deployment settings, read from OPEN_CUPS_* environment variables."""
+
+    history_directory: Path | None = None
+    state_directory: Path | None = None
+    sqlite_path: Path | None = None
+    participant_api_port: int | None = None
+    metrics_port: int | None = None
+    metrics_file: Path | None = None
+    lock_profile_path: Path | None = None
+    profile_directory: Path | None = None
+    profile_sample_every: int = 100
+    trace_path: Path | None = None
+    spans_path: Path | None = None
+    spans_sample_every: int = 100
+    overload_rerun_ms: int | None = None
+    max_rooms: int | None = None
+    max_participants_per_room: int | None = None
+    max_open_questions_per_room: int | None = None
+    max_question_length: int | None = None
+    questions_per_minute: int | None = None
+    room_questions_per_minute: int | None = None
+    upvotes_per_minute: int | None = None
+    room_upvotes_per_minute: int | None = None
+    live_charts: bool = False
+    export_directory: Path | None = None
+    export_format: ExportFormat = ExportFormat.CSV
+    admin_token: str | None = None
+    # if we go lower, chrome's background tab throttling causes faulty user removal
+    user_removal_timeout_seconds: int = 60
+    # set by the router for each of its workers, see open_cups.router
+    worker_id: str | None = None
+    workers: tuple[str, ...] = ()
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            history_directory=_optional_path("OPEN_CUPS_HISTORY_DIR"),
+            state_directory=_optional_path("OPEN_CUPS_STATE_DIR"),
+            sqlite_path=_optional_path("OPEN_CUPS_SQLITE_PATH"),
+            participant_api_port=_optional_int("OPEN_CUPS_PARTICIPANT_API_PORT"),
+            metrics_port=_optional_int("OPEN_CUPS_METRICS_PORT"),
+            metrics_file=_optional_path("OPEN_CUPS_METRICS_FILE"),
+            lock_profile_path=_optional_path("OPEN_CUPS_LOCK_PROFILE"),
+            profile_directory=_optional_path("OPEN_CUPS_PROFILE_DIR"),
+            profile_sample_every=_optional_int("OPEN_CUPS_PROFILE_EVERY")
+            or cls.profile_sample_every,
+            trace_path=_optional_path("OPEN_CUPS_TRACE_FILE"),
+            spans_path=_optional_path("OPEN_CUPS_SPANS_FILE"),
+            spans_sample_every=_optional_int("OPEN_CUPS_SPANS_EVERY")
+            or cls.spans_sample_every,
+            overload_rerun_ms=_optional_int("OPEN_CUPS_OVERLOAD_RERUN_MS"),
+            max_rooms=_optional_int("OPEN_CUPS_MAX_ROOMS"),
+            max_participants_per_room=_optional_int("OPEN_CUPS_MAX_PARTICIPANTS"),
+            max_open_questions_per_room=_optional_int("OPEN_CUPS_MAX_QUESTIONS"),
+            max_question_length=_optional_int("OPEN_CUPS_MAX_QUESTION_LENGTH"),
+            questions_per_minute=_optional_int("OPEN_CUPS_QUESTIONS_PER_MINUTE"),
+            room_questions_per_minute=_optional_int(
+                "OPEN_CUPS_ROOM_QUESTIONS_PER_MINUTE",
+            ),
+            upvotes_per_minute=_optional_int("OPEN_CUPS_UPVOTES_PER_MINUTE"),
+            room_upvotes_per_minute=_optional_int("OPEN_CUPS_ROOM_UPVOTES_PER_MINUTE"),
+            live_charts=_flag("OPEN_CUPS_LIVE_CHARTS"),
+            export_directory=_optional_path("OPEN_CUPS_EXPORT_DIR"),
+            export_format=ExportFormat(
+                os.environ.get("OPEN_CUPS_EXPORT_FORMAT") or cls.export_format.value,
+            ),
+            admin_token=os.environ.get("OPEN_CUPS_ADMIN_TOKEN") or None,
+            user_removal_timeout_seconds=_optional_int(
+                "OPEN_CUPS_USER_REMOVAL_TIMEOUT",
+            )
+            or cls.user_removal_timeout_seconds,
+            worker_id=os.environ.get("OPEN_CUPS_WORKER_ID") or None,
+            workers=tuple(
+                worker
+                for worker in os.environ.get("OPEN_CUPS_WORKERS", "").split(",")
+                if worker
+            ),
+        )
@@ -0,0 +1,338 @@
+"""Opt-in tracing spans of script reruns and room mutations, as OTLP JSON.
+
+With OPEN_CUPS_SPANS_FILE set, one in OPEN_CUPS_SPANS_EVERY script reruns is
+traced. The rerun and the calls within it that are decorated with
+tracer.traced, such as getting the current state, the cleanup, the mutations
+of rooms, the QR code and the plots, are recorded as the spans of one trace,
+tagged with the room id, the role of the session and the number of
+participants where known. Decorated calls outside of reruns, e.g. from the
+participant API, start traces of their own, also one in OPEN_CUPS_SPANS_EVERY.
+
+A background thread appends the finished spans in batches to the file, one
+ExportTraceServiceRequest in the JSON encoding of OTLP per line. That is the
+format of the file exporter of the OpenTelemetry Collector, whose otlpjsonfile
+receiver can forward the spans to e.g. Jaeger or Tempo.
+
+The tracer is started by the state provider, the first time the settings are
+read, so importing this module neither reads the environment nor starts the
+exporter thread. Until then and without the setting, decorated functions only
+check that the tracer is disabled and tracer.span returns a shared no-op span.
+Unsampled traces only pay for setting a thread-local at their start and end,
+which stops their calls from starting traces of their own.
+"""
+
+import atexit
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Self
+
+from open_cups.settings import Settings
+
+type AttributeValue = str | int | float | bool
+type Attributes = dict[str, AttributeValue]
+
+ROOM_ID = "open_cups.room_id"
+ROLE = "open_cups.role"
+PARTICIPANTS = "open_cups.participants"
+SERVICE_NAME = "open-cups"
+BATCH_SIZE = 512
+# spans are dropped rather than queued without bound when the file is slow
+MAX_QUEUE_SIZE = 4 * BATCH_SIZE
+EXPORT_INTERVAL_SECONDS = 5.0
+# the span kind and status code of OTLP
+_SPAN_KIND_INTERNAL = 1
+_STATUS_CODE_ERROR = 2
+
+_context = threading.local()
+
+
+class NonRecordingSpan:
+    """A span that is not exported, of disabled tracing or an unsampled trace."""
+
+    __slots__ = ()
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attributes(self, attributes: Attributes) -> None:
+        pass
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        pass
+
+
+class _UnsampledRootSpan(NonRecordingSpan):
+    """Marks the thread as in an unsampled trace until the root span ends."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> Self:
+        _context.span = _NON_RECORDING
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        _context.span = None
+
+
+_NON_RECORDING = NonRecordingSpan()
+_UNSAMPLED_ROOT = _UnsampledRootSpan()
+
+
+class Span:
+    """A span of a sampled trace, exported when it ends."""
+
+    __slots__ = (
+        "_exporter",
+        "_parent",
+        "attributes",
+        "end_ns",
+        "error",
+        "name",
+        "parent_id",
+        "span_id",
+        "start_ns",
+        "trace_id",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        exporter: "OtlpJsonFileExporter",
+        parent: "Span | None" = None,
+    ) -> None:
+        self.name = name
+        self.trace_id: str = os.urandom(16).hex() if parent is None else parent.trace_id
+        self.span_id: str = os.urandom(8).hex()
+        self.parent_id: str | None = None if parent is None else parent.span_id
+        self.attributes: Attributes = {}
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: str | None = None
+        self._parent = parent
+        self._exporter = exporter
+
+    def is_recording(self) -> bool:
+        return True
+
+    def set_attributes(self, attributes: Attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> Self:
+        _context.span = self
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *args: object) -> None:
+        self.end_ns = time.time_ns()
+        if exc_type is not None:
+            # only the type, the messages of some errors contain questions
+            self.error = exc_type.__name__
+        _context.span = self._parent
+        self._exporter.add(self)
+
+
+def _encode_value(value: AttributeValue) -> dict[str, AttributeValue]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in the JSON encoding of OTLP
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value}
+
+
+def _encode_attributes(attributes: Attributes) -> list[dict[str, object]]:
+    return [
+        {"key": key, "value": _encode_value(value)} for key, value in attributes.items()
+    ]
+
+
+def encode_span(span: Span) -> dict[str, object]:
+    encoded: dict[str, object] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": _SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _encode_attributes(span.attributes),
+    }
+    if span.parent_id is not None:
+        encoded["parentSpanId"] = span.parent_id
+    if span.error is not None:
+        encoded["status"] = {"code": _STATUS_CODE_ERROR, "message": span.error}
+    return encoded
+
+
+def encode_spans(spans: list[Span], resource: Attributes) -> dict[str, object]:
+    """Return an ExportTraceServiceRequest of the spans in OTLP JSON."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _encode_attributes(resource)},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __package__},
+                        "spans": [encode_span(span) for span in spans],
+                    },
+                ],
+            },
+        ],
+    }
+
+
+class OtlpJsonFileExporter:
+    """Appends the finished spans to a file in batches, from a background thread."""
+
+    def __init__(
+        self,
+        path: Path,
+        resource: Attributes,
+        *,
+        batch_size: int = BATCH_SIZE,
+        interval_seconds: float = EXPORT_INTERVAL_SECONDS,
+        max_queue_size: int = MAX_QUEUE_SIZE,
+    ) -> None:
+        self._path = path
+        self._resource = resource
+        self._batch_size = batch_size
+        self._interval_seconds = interval_seconds
+        self._max_queue_size = max_queue_size
+        self._spans: list[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._batch_ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="span-export",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            if len(self._spans) >= self._max_queue_size:
+                self.dropped += 1
+                return
+            self._spans.append(span)
+            if len(self._spans) >= self._batch_size:
+                self._batch_ready.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._batch_ready.wait(self._interval_seconds)
+            self._batch_ready.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the queued spans, one line per batch."""
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans:
+            return
+        lines = [
+            json.dumps(
+                encode_spans(spans[start : start + self._batch_size], self._resource),
+                separators=(",", ":"),
+            )
+            + "\n"
+            for start in range(0, len(spans), self._batch_size)
+        ]
+        with self._path.open("a") as file:
+            file.writelines(lines)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._batch_ready.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+
+
+class Tracer:
+    def __init__(
+        self,
+        exporter: OtlpJsonFileExporter | None = None,
+        sample_every: int = 1,
+    ) -> None:
+        self._exporter = exporter
+        self._sample_every = sample_every
+        self._roots = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return self._exporter is not None
+
+    def start(self, exporter: OtlpJsonFileExporter, sample_every: int = 1) -> None:
+        """Record spans from now on, also of functions decorated before."""
+        self._sample_every = sample_every
+        self._exporter = exporter
+
+    def span(self, name: str) -> Span | NonRecordingSpan:
+        """Return a span in the trace of this thread, or starting a sampled one."""
+        if self._exporter is None:
+            return _NON_RECORDING
+        parent = getattr(_context, "span", None)
+        if parent is None:
+            if next(self._roots) % self._sample_every:
+                return _UNSAMPLED_ROOT
+            return Span(name, self._exporter)
+        if isinstance(parent, Span):
+            return Span(name, self._exporter, parent)
+        return _NON_RECORDING
+
+    def traced[**P, R](
+        self,
+        name: str,
+        attributes: Callable[..., Attributes] | None = None,
+    ) -> Callable[[Callable[P, R]], Callable[P, R]]:
+        """Record the calls of the decorated function as spans.
+
+        attributes is called with the arguments of the recorded calls only.
+        While tracing is disabled, the function is called directly.
+        """
+
+        def decorate(function: Callable[P, R]) -> Callable[P, R]:
+            @functools.wraps(function)
+            def traced_function(*args: P.args, **kwargs: P.kwargs) -> R:
+                if self._exporter is None:
+                    return function(*args, **kwargs)
+                with self.span(name) as span:
+                    if attributes is not None and span.is_recording():
+                        span.set_attributes(attributes(*args, **kwargs))
+                    return function(*args, **kwargs)
+
+            return traced_function
+
+        return decorate
+
+
+def start_tracer(tracer: Tracer, settings: Settings) -> Tracer:
+    """Start the tracer with an exporter to the spans file, if one is set."""
+    if settings.spans_path is None or tracer.enabled:
+        return tracer
+    exporter = OtlpJsonFileExporter(
+        settings.spans_path,
+        {"service.name": SERVICE_NAME, "process.pid": os.getpid()},
+    )
+    exporter.start()
+    atexit.register(exporter.close)
+    tracer.start(exporter, settings.spans_sample_every)
+    return tracer
+
+
+# started by open_cups.state_provider, see start_tracer
+tracer = Tracer()
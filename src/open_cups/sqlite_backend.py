@@ -0,0 +1,645 @@
+import json
+import math
+import queue
+import sqlite3
+import threading
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from open_cups.backend import RoomArchiver
+from open_cups.clock import Clock, system_clock
+from open_cups.question_index import (
+    SimilarQuestionError,
+    find_most_similar,
+    get_band_keys,
+    get_shingles,
+)
+from open_cups.quotas import Quotas
+from open_cups.rate_limit import RoomRateLimits
+from open_cups.room_codes import RoomCodeTakenError
+from open_cups.room_index import RANKED_ROOMS
+from open_cups.spans import ROOM_ID, Attributes, tracer
+from open_cups.stats_tracker import Config as StatsTrackerConfig
+from open_cups.types import (
+    BackendStatistics,
+    Question,
+    RoomsOverview,
+    RoomSummary,
+    StatusSnapshot,
+    UserStatus,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    room_id TEXT PRIMARY KEY,
+    host_id TEXT NOT NULL,
+    host_last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rooms_host_id ON rooms (host_id);
+CREATE INDEX IF NOT EXISTS rooms_host_last_seen ON rooms (host_last_seen);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    room_id TEXT NOT NULL REFERENCES rooms ON DELETE CASCADE,
+    session_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (room_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_session_id ON sessions (session_id);
+CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+
+CREATE TABLE IF NOT EXISTS questions (
+    question_id TEXT PRIMARY KEY,
+    room_id TEXT NOT NULL REFERENCES rooms ON DELETE CASCADE,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_room_id ON questions (room_id);
+
+-- the LSH band keys of the open questions, see question_index.py
+CREATE TABLE IF NOT EXISTS question_bands (
+    question_id TEXT NOT NULL REFERENCES questions ON DELETE CASCADE,
+    room_id TEXT NOT NULL,
+    band_key INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS question_bands_room_id_band_key
+    ON question_bands (room_id, band_key);
+CREATE INDEX IF NOT EXISTS question_bands_question_id
+    ON question_bands (question_id);
+
+CREATE TABLE IF NOT EXISTS votes (
+    question_id TEXT NOT NULL REFERENCES questions ON DELETE CASCADE,
+    session_id TEXT NOT NULL,
+    PRIMARY KEY (question_id, session_id)
+);
+
+-- sparse = 0: dense snapshot, sparse = 1: kept after leaving the dense window
+CREATE TABLE IF NOT EXISTS history (
+    room_id TEXT NOT NULL REFERENCES rooms ON DELETE CASCADE,
+    timestamp REAL NOT NULL,
+    sparse INTEGER NOT NULL DEFAULT 0,
+    green INTEGER NOT NULL,
+    yellow INTEGER NOT NULL,
+    red INTEGER NOT NULL,
+    unknown INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_room_id_timestamp ON history (room_id, timestamp);
+"""
+
+CONNECT_TIMEOUT_SECONDS = 30.0
+
+
+class SqliteStateBackend:
+    """State of all rooms in a SQLite database in WAL mode.
+
+    Several server processes on the same machine can open the same file and
+    serve the same rooms. Connections are pooled and shared between threads.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        stats_tracker_config: StatsTrackerConfig | None = None,
+        clock: Clock = system_clock,
+        quotas: Quotas | None = None,
+        heartbeat_epoch_seconds: float = 0.0,
+    ) -> None:
+        self._path = path
+        self._clock = clock
+        self._stats_tracker_config = stats_tracker_config or StatsTrackerConfig()
+        self._quotas = quotas or Quotas()
+        self._rate_limits: dict[str, RoomRateLimits] = {}
+        self._rate_limits_lock = threading.Lock()
+        self._pool: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._archivers: list[RoomArchiver] = []
+        # without an epoch, every heartbeat is written, see SqliteRoom
+        self._heartbeat_epoch_seconds = heartbeat_epoch_seconds
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @property
+    def clock(self) -> Clock:
+        return self._clock
+
+    @property
+    def stats_tracker_config(self) -> StatsTrackerConfig:
+        return self._stats_tracker_config
+
+    @property
+    def quotas(self) -> Quotas:
+        return self._quotas
+
+    @property
+    def heartbeat_epoch_seconds(self) -> float:
+        return self._heartbeat_epoch_seconds
+
+    def add_room_archiver(self, archiver: RoomArchiver) -> None:
+        """Register an archiver for the rooms removed for an inactive host."""
+        self._archivers.append(archiver)
+
+    def get_rate_limits(self, room_id: str) -> RoomRateLimits:
+        """Return the rate limits of a room in this process."""
+        with self._rate_limits_lock:
+            rate_limits = self._rate_limits.get(room_id)
+            if rate_limits is None:
+                rate_limits = self._rate_limits[room_id] = RoomRateLimits(
+                    self._quotas,
+                    self._clock,
+                )
+            return rate_limits
+
+    def _prune_rate_limits(self) -> None:
+        # also drops the limits of rooms and sessions removed by other processes
+        with self._rate_limits_lock:
+            self._rate_limits = {
+                room_id: rate_limits
+                for room_id, rate_limits in self._rate_limits.items()
+                if not rate_limits.prune()
+            }
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self._path,
+            timeout=CONNECT_TIMEOUT_SECONDS,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.rollback()
+                raise
+            connection.commit()
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        with self._connection() as connection:
+            yield connection
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def get_session_room(self, session_id: str) -> "SqliteRoom | None":
+        with self.read() as connection:
+            row = connection.execute(
+                "SELECT room_id, host_id FROM rooms WHERE host_id = ? "
+                "UNION ALL "
+                "SELECT rooms.room_id, rooms.host_id FROM sessions "
+                "JOIN rooms USING (room_id) WHERE sessions.session_id = ? "
+                "LIMIT 1",
+                (session_id, session_id),
+            ).fetchone()
+        if row is None:
+            return None
+        return SqliteRoom(self, row[0], row[1])
+
+    def create_room(self, room_id: str, session_id: str) -> None:
+        with self.transaction() as connection:
+            if self._quotas.max_rooms is not None:
+                (room_count,) = connection.execute(
+                    "SELECT COUNT(*) FROM rooms",
+                ).fetchone()
+                self._quotas.check_rooms(room_count)
+            cursor = connection.execute(
+                "INSERT INTO rooms (room_id, host_id, host_last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (room_id) DO NOTHING",
+                (room_id, session_id, self._clock()),
+            )
+            if cursor.rowcount == 0:
+                message = f"Room {room_id} already exists"
+                raise RoomCodeTakenError(message)
+
+    def join_room(self, room_id: str, session_id: str) -> None:
+        with self.read() as connection:
+            row = connection.execute(
+                "SELECT host_id FROM rooms WHERE room_id = ?",
+                (room_id,),
+            ).fetchone()
+        if row is None:
+            message = f"Room {room_id} does not exist"
+            raise ValueError(message)
+        SqliteRoom(self, room_id, row[0]).join(session_id)
+
+    def remove_inactive_sessions(self, timeout_seconds: int) -> None:
+        with self.transaction() as connection:
+            connection.execute(
+                "DELETE FROM sessions WHERE last_seen < ?",
+                (self._clock() - timeout_seconds,),
+            )
+        self._prune_rate_limits()
+
+    def remove_rooms_with_inactive_hosts(self, timeout_seconds: int) -> None:
+        cutoff = self._clock() - timeout_seconds
+        if self._archivers:
+            self._archive_rooms_with_inactive_hosts(cutoff)
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM rooms WHERE host_last_seen < ?", (cutoff,))
+
+    def _archive_rooms_with_inactive_hosts(self, cutoff: float) -> None:
+        # outside of a transaction, so archiving does not block the writers of
+        # other rooms; processes removing the same room may both archive it
+        with self.read() as connection:
+            rows = connection.execute(
+                "SELECT room_id, host_id FROM rooms WHERE host_last_seen < ?",
+                (cutoff,),
+            ).fetchall()
+        for room_id, host_id in rows:
+            room = SqliteRoom(self, room_id, host_id)
+            for archiver in self._archivers:
+                archiver(room)
+
+    def get_statistics(self) -> BackendStatistics:
+        with self.read() as connection:
+            row = connection.execute(
+                "SELECT (SELECT COUNT(*) FROM rooms), (SELECT COUNT(*) FROM sessions), "
+                "(SELECT COUNT(*) FROM questions), (SELECT COUNT(*) FROM history)",
+            ).fetchone()
+        return BackendStatistics(*row)
+
+    def get_overview(self) -> RoomsOverview:
+        """Aggregate all rooms with SQL, unlike the index of ApplicationState.
+
+        The processes sharing the database do not see each other's writes, so
+        the write rates are unknown and the busiest rooms are not ranked.
+        """
+        with self.read() as connection:
+            (room_count, question_count) = connection.execute(
+                "SELECT (SELECT COUNT(*) FROM rooms), (SELECT COUNT(*) FROM questions)",
+            ).fetchone()
+            status_rows = connection.execute(
+                "SELECT status, COUNT(*) FROM sessions GROUP BY status",
+            ).fetchall()
+            largest_rows = connection.execute(
+                "SELECT rooms.room_id, COUNT(sessions.session_id) AS participants, "
+                "(SELECT COUNT(*) FROM questions "
+                "WHERE questions.room_id = rooms.room_id) "
+                "FROM rooms LEFT JOIN sessions USING (room_id) "
+                "GROUP BY rooms.room_id ORDER BY participants DESC LIMIT ?",
+                (RANKED_ROOMS,),
+            ).fetchall()
+        participants = dict.fromkeys(UserStatus, 0)
+        for status, count in status_rows:
+            participants[UserStatus[status]] = count
+        return RoomsOverview(
+            rooms=room_count,
+            participants=participants,
+            questions=question_count,
+            writes_per_second=None,
+            largest_rooms=[
+                RoomSummary(room_id, room_participants, room_questions, None)
+                for room_id, room_participants, room_questions in largest_rows
+            ],
+            busiest_rooms=[],
+        )
+
+
+class SqliteRoom:
+    """Handle to a room stored in a SqliteStateBackend."""
+
+    def __init__(self, backend: SqliteStateBackend, room_id: str, host_id: str) -> None:
+        self._backend = backend
+        self._room_id = room_id
+        self._host_id = host_id
+
+    def _span_attributes(self, *_: object, **__: object) -> Attributes:
+        return {ROOM_ID: self._room_id}
+
+    @property
+    def room_id(self) -> str:
+        return self._room_id
+
+    @property
+    def host_id(self) -> str:
+        return self._host_id
+
+    def is_host(self, session_id: str) -> bool:
+        return self._host_id == session_id
+
+    def has_session(self, session_id: str) -> bool:
+        # the sessions of a removed room are deleted with it, and its host is
+        # not the host of a room recreated with its id
+        with self._backend.read() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM sessions WHERE room_id = ? AND session_id = ? "
+                "UNION ALL "
+                "SELECT 1 FROM rooms WHERE room_id = ? AND host_id = ?",
+                (self._room_id, session_id, self._room_id, session_id),
+            ).fetchone()
+        return row is not None
+
+    @tracer.traced("room.update_host_last_seen", _span_attributes)
+    def update_host_last_seen(self) -> None:
+        with self._backend.transaction() as connection:
+            connection.execute(
+                "UPDATE rooms SET host_last_seen = ? WHERE room_id = ?",
+                (self._backend.clock(), self._room_id),
+            )
+
+    @tracer.traced("room.join", _span_attributes)
+    def join(self, session_id: str) -> None:
+        """Add a participant with an unknown status, within the quota."""
+        with self._backend.transaction() as connection:
+            if self._backend.quotas.max_participants_per_room is not None:
+                (participant_count,) = connection.execute(
+                    "SELECT COUNT(*) FROM sessions "
+                    "WHERE room_id = ? AND session_id != ?",
+                    (self._room_id, session_id),
+                ).fetchone()
+                self._backend.quotas.check_participants(participant_count)
+            self._store_session_status(connection, session_id, UserStatus.UNKNOWN)
+
+    @tracer.traced("room.set_session_status", _span_attributes)
+    def set_session_status(self, session_id: str, status: UserStatus) -> None:
+        with self._backend.transaction() as connection:
+            self._store_session_status(connection, session_id, status)
+
+    def _store_session_status(
+        self,
+        connection: sqlite3.Connection,
+        session_id: str,
+        status: UserStatus,
+    ) -> None:
+        current_time = self._backend.clock()
+        # seen until the end of an epoch, like a heartbeat
+        connection.execute(
+            "INSERT INTO sessions (room_id, session_id, status, last_seen) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (room_id, session_id) DO UPDATE "
+            "SET status = excluded.status, last_seen = excluded.last_seen",
+            (
+                self._room_id,
+                session_id,
+                status.name,
+                current_time + self._backend.heartbeat_epoch_seconds,
+            ),
+        )
+        self._record_status_snapshot(connection, current_time)
+
+    def _record_status_snapshot(
+        self,
+        connection: sqlite3.Connection,
+        current_time: float,
+    ) -> None:
+        """Mirror StatsTracker.record_status_snapshot on the history table."""
+        config = self._backend.stats_tracker_config
+        (last_snapshot_time,) = connection.execute(
+            "SELECT MAX(timestamp) FROM history WHERE room_id = ? AND sparse = 0",
+            (self._room_id,),
+        ).fetchone()
+        if (
+            last_snapshot_time is not None
+            and current_time - last_snapshot_time
+            < config.dense_snapshot_interval_seconds
+        ):
+            return
+
+        connection.execute(
+            "INSERT INTO history (room_id, timestamp, green, yellow, red, unknown) "
+            "SELECT ?, ?, "
+            "COUNT(*) FILTER (WHERE status = 'GREEN'), "
+            "COUNT(*) FILTER (WHERE status = 'YELLOW'), "
+            "COUNT(*) FILTER (WHERE status = 'RED'), "
+            "COUNT(*) FILTER (WHERE status = 'UNKNOWN') "
+            "FROM sessions WHERE room_id = ?",
+            (self._room_id, current_time, self._room_id),
+        )
+
+        (last_sparse_time,) = connection.execute(
+            "SELECT MAX(timestamp) FROM history WHERE room_id = ? AND sparse = 1",
+            (self._room_id,),
+        ).fetchone()
+        old_snapshots = connection.execute(
+            "SELECT rowid, timestamp FROM history "
+            "WHERE room_id = ? AND sparse = 0 AND timestamp < ? ORDER BY timestamp",
+            (self._room_id, current_time - config.dense_sampling_window_seconds),
+        ).fetchall()
+        for rowid, timestamp in old_snapshots:
+            if (
+                last_sparse_time is None
+                or timestamp - last_sparse_time
+                >= config.sparse_snapshot_interval_seconds
+            ):
+                connection.execute(
+                    "UPDATE history SET sparse = 1 WHERE rowid = ?",
+                    (rowid,),
+                )
+                last_sparse_time = timestamp
+            else:
+                connection.execute("DELETE FROM history WHERE rowid = ?", (rowid,))
+
+        connection.execute(
+            "DELETE FROM history WHERE rowid IN ("
+            "SELECT rowid FROM history WHERE room_id = ? AND sparse = 1 "
+            "ORDER BY timestamp DESC LIMIT -1 OFFSET ?)",
+            (self._room_id, config.max_sparse_snapshot_count),
+        )
+
+    def get_session_status(self, session_id: str) -> UserStatus:
+        with self._backend.read() as connection:
+            row = connection.execute(
+                "SELECT status FROM sessions WHERE room_id = ? AND session_id = ?",
+                (self._room_id, session_id),
+            ).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        return UserStatus[row[0]]
+
+    @tracer.traced("room.update_session", _span_attributes)
+    def update_session(self, session_id: str) -> None:
+        now = self._backend.clock()
+        # coalesced into epochs like Room.update_session, so most heartbeats
+        # only read and do not wait for the write lock
+        with self._backend.read() as connection:
+            row = connection.execute(
+                "SELECT last_seen FROM sessions WHERE room_id = ? AND session_id = ?",
+                (self._room_id, session_id),
+            ).fetchone()
+        if row is None or row[0] >= now:
+            return
+        with self._backend.transaction() as connection:
+            connection.execute(
+                "UPDATE sessions SET last_seen = ? "
+                "WHERE room_id = ? AND session_id = ? AND last_seen < ?",
+                (
+                    now + self._backend.heartbeat_epoch_seconds,
+                    self._room_id,
+                    session_id,
+                    now,
+                ),
+            )
+
+    def __iter__(self) -> Iterator[tuple[str, UserStatus]]:
+        with self._backend.read() as connection:
+            rows = connection.execute(
+                "SELECT session_id, status FROM sessions WHERE room_id = ?",
+                (self._room_id,),
+            ).fetchall()
+        return ((session_id, UserStatus[status]) for session_id, status in rows)
+
+    def get_open_questions(self) -> list[Question]:
+        with self._backend.read() as connection:
+            rows = connection.execute(
+                "SELECT questions.question_id, questions.text, votes.session_id "
+                "FROM questions JOIN votes USING (question_id) "
+                "WHERE questions.room_id = ? ORDER BY questions.rowid",
+                (self._room_id,),
+            ).fetchall()
+        questions: dict[str, Question] = {}
+        for question_id, text, session_id in rows:
+            question = questions.setdefault(
+                question_id,
+                Question(id=question_id, text=text, voter_ids=set()),
+            )
+            question.voter_ids.add(session_id)
+        return sorted(questions.values(), key=lambda q: q.vote_count, reverse=True)
+
+    @tracer.traced("room.add_question", _span_attributes)
+    def add_question(
+        self,
+        session_id: str,
+        text: str,
+        *,
+        allow_similar: bool = True,
+    ) -> str:
+        question_id = str(uuid.uuid4())
+        quotas = self._backend.quotas
+        shingles = get_shingles(text)
+        band_keys = get_band_keys(shingles)
+        with self._backend.transaction() as connection:
+            open_question_count = 0
+            if quotas.max_open_questions_per_room is not None:
+                (open_question_count,) = connection.execute(
+                    "SELECT COUNT(*) FROM questions WHERE room_id = ?",
+                    (self._room_id,),
+                ).fetchone()
+            quotas.check_question(open_question_count, text)
+            if not allow_similar:
+                similar = self._find_similar_question(connection, shingles, band_keys)
+                if similar is not None:
+                    raise SimilarQuestionError(similar)
+            self._backend.get_rate_limits(self._room_id).questions.check(session_id)
+            connection.execute(
+                "INSERT INTO questions (question_id, room_id, text) VALUES (?, ?, ?)",
+                (question_id, self._room_id, text),
+            )
+            connection.executemany(
+                "INSERT INTO question_bands (question_id, room_id, band_key) "
+                "VALUES (?, ?, ?)",
+                [(question_id, self._room_id, key) for key in band_keys],
+            )
+            connection.execute(
+                "INSERT INTO votes (question_id, session_id) VALUES (?, ?)",
+                (question_id, session_id),
+            )
+        return question_id
+
+    def _find_similar_question(
+        self,
+        connection: sqlite3.Connection,
+        shingles: frozenset[str],
+        band_keys: list[int],
+    ) -> Question | None:
+        rows = connection.execute(
+            "SELECT DISTINCT questions.question_id, questions.text "
+            "FROM question_bands JOIN questions USING (question_id) "
+            "WHERE question_bands.room_id = ? "
+            "AND band_key IN (SELECT value FROM json_each(?))",
+            (self._room_id, json.dumps(band_keys)),
+        ).fetchall()
+        texts = dict(rows)
+        similar_id = find_most_similar(
+            shingles,
+            ((question_id, get_shingles(text)) for question_id, text in rows),
+        )
+        if similar_id is None:
+            return None
+        voter_rows = connection.execute(
+            "SELECT session_id FROM votes WHERE question_id = ?",
+            (similar_id,),
+        ).fetchall()
+        return Question(
+            id=similar_id,
+            text=texts[similar_id],
+            voter_ids={session_id for (session_id,) in voter_rows},
+        )
+
+    @tracer.traced("room.upvote_question", _span_attributes)
+    def upvote_question(self, session_id: str, question_id: str) -> None:
+        with self._backend.transaction() as connection:
+            # only new votes count towards the rate limits
+            row = connection.execute(
+                "SELECT 1 FROM questions WHERE question_id = ? AND room_id = ? "
+                "AND NOT EXISTS (SELECT 1 FROM votes "
+                "WHERE question_id = ? AND session_id = ?)",
+                (question_id, self._room_id, question_id, session_id),
+            ).fetchone()
+            if row is None:
+                return
+            self._backend.get_rate_limits(self._room_id).upvotes.check(session_id)
+            connection.execute(
+                "INSERT INTO votes (question_id, session_id) VALUES (?, ?)",
+                (question_id, session_id),
+            )
+
+    @tracer.traced("room.close_question", _span_attributes)
+    def close_question(self, question_id: str) -> None:
+        with self._backend.transaction() as connection:
+            connection.execute(
+                "DELETE FROM questions WHERE question_id = ? AND room_id = ?",
+                (question_id, self._room_id),
+            )
+
+    def get_status_history(
+        self,
+        start_time: float | None = None,
+    ) -> list[StatusSnapshot]:
+        with self._backend.read() as connection:
+            rows = connection.execute(
+                "SELECT timestamp, green, yellow, red, unknown FROM history "
+                "WHERE room_id = ? AND timestamp >= ? ORDER BY timestamp",
+                (self._room_id, -math.inf if start_time is None else start_time),
+            ).fetchall()
+        return [
+            StatusSnapshot(
+                timestamp=timestamp,
+                counts={
+                    UserStatus.GREEN: green,
+                    UserStatus.YELLOW: yellow,
+                    UserStatus.RED: red,
+                    UserStatus.UNKNOWN: unknown,
+                },
+            )
+            for timestamp, green, yellow, red, unknown in rows
+        ]
+
+    def get_status_history_start(self) -> float | None:
+        with self._backend.read() as connection:
+            (timestamp,) = connection.execute(
+                "SELECT MIN(timestamp) FROM history WHERE room_id = ?",
+                (self._room_id,),
+            ).fetchone()
+        return None if timestamp is None else float(timestamp)
@@ -1,34 +1,80 @@
-import uuid
+import atexit
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 from open_cups.application_state import ApplicationState
-from open_cups.room import Question, Room, StatusSnapshot
+from open_cups.backend import RoomBackend, StateBackend
+from open_cups.export import RoomExporter
+from open_cups.lock_profiler import LockProfiler, lock_profiler, start_lock_profiler
+from open_cups.metrics import Metrics, MetricsFileExporter, serve_metrics
+from open_cups.overload import OverloadDetector
+from open_cups.participant_api import ParticipantApiServer
+from open_cups.persistence import open_persistent_application_state
+from open_cups.quotas import Quotas
+from open_cups.rerun_profiler import RerunProfiler
+from open_cups.room import HEARTBEAT_EPOCHS_PER_TIMEOUT
+from open_cups.room_codes import (
+    MAX_ROOM_CODE_ATTEMPTS,
+    NoFreeRoomCodeError,
+    RoomCodeTakenError,
+    generate_room_code,
+    normalize_room_code,
+)
+from open_cups.room_index import overview_prometheus_lines
+from open_cups.routing import RoomOnOtherWorkerError, WorkerAffinity
+from open_cups.session_reaper import SessionReaper
 from open_cups.session_state import SessionState
-from open_cups.types import UserStatus
+from open_cups.settings import Settings
+from open_cups.spans import Tracer, start_tracer, tracer
+from open_cups.sqlite_backend import SqliteStateBackend
+from open_cups.trace import RecordingStateBackend, TraceRecorder
+from open_cups.types import Question, StatusSnapshot, UserStatus
 
 
 class LobbyState:
     def __init__(
         self,
-        application_state: ApplicationState,
+        application_state: StateBackend,
         session_state: SessionState,
+        worker_affinity: WorkerAffinity | None = None,
     ) -> None:
         self._application_state = application_state
         self._session_state = session_state
+        self._worker_affinity = worker_affinity
 
     def create_room(self) -> None:
-        room_id = str(uuid.uuid4())
-        self._application_state.create_room(room_id, self._session_state.session_id)
+        for _ in range(MAX_ROOM_CODE_ATTEMPTS):
+            room_id = generate_room_code()
+            # behind the router, only create rooms that are routed to this worker
+            if self._worker_affinity is not None and not self._worker_affinity.owns(
+                room_id,
+            ):
+                continue
+            try:
+                self._application_state.create_room(
+                    room_id,
+                    self._session_state.session_id,
+                )
+            except RoomCodeTakenError:
+                continue
+            return
+        message = "No free room code was found, please try again."
+        raise NoFreeRoomCodeError(message)
 
     def join_room(self, room_id: str) -> None:
+        room_id = normalize_room_code(room_id)
+        if self._worker_affinity is not None and not self._worker_affinity.owns(
+            room_id,
+        ):
+            raise RoomOnOtherWorkerError(room_id)
         self._application_state.join_room(room_id, self._session_state.session_id)
 
 
 class RoomState:
     def __init__(
         self,
-        room: Room,
+        room: RoomBackend,
         session_id: str,
     ) -> None:
         self._room = room
@@ -38,6 +84,10 @@ class RoomState:
     def room_id(self) -> str:
         return self._room.room_id
 
+    @property
+    def host_id(self) -> str:
+        return self._room.host_id
+
     def get_room_participants(self) -> list[tuple[str, UserStatus]]:
         return list(self._room)
 
@@ -46,19 +96,25 @@ class RoomState:
 
 
 class HostState(RoomState):
-    def __init__(self, room: Room, session_id: str) -> None:
+    def __init__(self, room: RoomBackend, session_id: str) -> None:
         super().__init__(room, session_id)
         self._room.update_host_last_seen()
 
     def close_question(self, question_id: str) -> None:
         self._room.close_question(question_id)
 
-    def get_status_history(self) -> list[StatusSnapshot]:
-        return self._room.get_status_history()
+    def get_status_history(
+        self,
+        start_time: float | None = None,
+    ) -> list[StatusSnapshot]:
+        return self._room.get_status_history(start_time)
+
+    def get_status_history_start(self) -> float | None:
+        return self._room.get_status_history_start()
 
 
 class ClientState(RoomState):
-    def __init__(self, room: Room, session_id: str) -> None:
+    def __init__(self, room: RoomBackend, session_id: str) -> None:
         super().__init__(room, session_id)
         self._room.update_session(session_id)
 
@@ -68,8 +124,8 @@ class ClientState(RoomState):
     def set_user_status(self, status: UserStatus) -> None:
         self._room.set_session_status(self._session_id, status)
 
-    def submit_question(self, text: str) -> None:
-        self._room.add_question(self._session_id, text)
+    def submit_question(self, text: str, *, allow_similar: bool = True) -> None:
+        self._room.add_question(self._session_id, text, allow_similar=allow_similar)
 
     def upvote_question(self, question_id: str) -> None:
         self._room.upvote_question(self._session_id, question_id)
@@ -81,39 +137,186 @@ class ClientState(RoomState):
 class CleanupState:
     def __init__(
         self,
-        application_state: ApplicationState,
+        application_state: StateBackend,
         timeout_seconds: int,
+        session_reaper: SessionReaper | None = None,
     ) -> None:
         self._application_state = application_state
         self._timeout_seconds = timeout_seconds
+        self._session_reaper = session_reaper
 
+    @tracer.traced("cleanup_all")
     def cleanup_all(self) -> None:
-        for room in self._application_state.rooms.values():
-            room.remove_inactive_sessions(self._timeout_seconds)
-
+        self._application_state.remove_inactive_sessions(self._timeout_seconds)
         self._application_state.remove_rooms_with_inactive_hosts(
             self._timeout_seconds,
         )
+        if self._session_reaper is not None:
+            self._session_reaper.reap(self._application_state)
+
+
+def create_application_state(settings: Settings) -> StateBackend:
+    quotas = Quotas(
+        max_rooms=settings.max_rooms,
+        max_participants_per_room=settings.max_participants_per_room,
+        max_open_questions_per_room=settings.max_open_questions_per_room,
+        max_question_length=settings.max_question_length,
+        questions_per_minute=settings.questions_per_minute,
+        room_questions_per_minute=settings.room_questions_per_minute,
+        upvotes_per_minute=settings.upvotes_per_minute,
+        room_upvotes_per_minute=settings.room_upvotes_per_minute,
+    )
+    # heartbeats are coalesced into epochs of a fraction of the removal timeout
+    heartbeat_epoch_seconds = (
+        settings.user_removal_timeout_seconds / HEARTBEAT_EPOCHS_PER_TIMEOUT
+    )
+    backend: ApplicationState | SqliteStateBackend
+    if settings.sqlite_path is not None:
+        backend = SqliteStateBackend(
+            settings.sqlite_path,
+            quotas=quotas,
+            heartbeat_epoch_seconds=heartbeat_epoch_seconds,
+        )
+    elif settings.state_directory is None:
+        backend = ApplicationState(
+            history_directory=settings.history_directory,
+            quotas=quotas,
+            heartbeat_epoch_seconds=heartbeat_epoch_seconds,
+        )
+    else:
+        backend = open_persistent_application_state(
+            settings.state_directory,
+            settings.history_directory,
+            quotas,
+            heartbeat_epoch_seconds,
+        )
+    if settings.export_directory is not None:
+        backend.add_room_archiver(
+            RoomExporter(settings.export_directory, settings.export_format),
+        )
+    if settings.trace_path is None:
+        return backend
+    recorder = TraceRecorder(settings.trace_path)
+    atexit.register(recorder.close)
+    return RecordingStateBackend(backend, recorder)
+
+
+def create_overload_detector(settings: Settings) -> OverloadDetector:
+    if settings.overload_rerun_ms is None:
+        return OverloadDetector(None)
+    return OverloadDetector(settings.overload_rerun_ms / 1000)
+
+
+def create_metrics(
+    settings: Settings,
+    application_state: StateBackend,
+    overload_detector: OverloadDetector | None = None,
+) -> Metrics:
+    if settings.metrics_port is None and settings.metrics_file is None:
+        return Metrics(enabled=False)
+    metrics = Metrics(statistics=application_state.get_statistics)
+    if lock_profiler.enabled:
+        metrics.add_collector(lock_profiler.prometheus_lines)
+    if overload_detector is not None and overload_detector.enabled:
+        metrics.add_collector(overload_detector.prometheus_lines)
+    metrics.add_collector(
+        lambda: overview_prometheus_lines(application_state.get_overview()),
+    )
+    if settings.metrics_port is not None:
+        serve_metrics(
+            metrics,
+            "127.0.0.1",
+            settings.metrics_port,
+            application_state.get_overview,
+        )
+    if settings.metrics_file is not None:
+        MetricsFileExporter(metrics, settings.metrics_file).start()
+    return metrics
 
 
 class Context:
     def __init__(self) -> None:
-        self.application_state: ApplicationState = self._get_application_state()
+        self.tracer = self._get_tracer()
+        self.application_state: StateBackend = self._get_application_state()
+        self.metrics = self._get_metrics()
+        self.rerun_profiler = self._get_rerun_profiler()
+        self.overload_detector = self._get_overload_detector()
+        self.settings = self._get_settings()
         self.session_state = SessionState()
+        self.session_reaper = self._get_session_reaper()
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            self.session_reaper.register(self.session_state.session_id, ctx.session_id)
+
+    @staticmethod
+    @st.cache_resource
+    def _get_settings() -> Settings:
+        return Settings.from_env()
 
     @staticmethod
     @st.cache_resource
-    def _get_application_state() -> ApplicationState:
-        return ApplicationState()
+    def _get_tracer() -> Tracer:
+        return start_tracer(tracer, Settings.from_env())
+
+    @staticmethod
+    @st.cache_resource
+    def _get_lock_profiler() -> LockProfiler:
+        return start_lock_profiler(lock_profiler, Settings.from_env())
+
+    @staticmethod
+    @st.cache_resource
+    def _get_metrics() -> Metrics:
+        return create_metrics(
+            Settings.from_env(),
+            Context._get_application_state(),
+            Context._get_overload_detector(),
+        )
+
+    @staticmethod
+    @st.cache_resource
+    def _get_rerun_profiler() -> RerunProfiler:
+        settings = Settings.from_env()
+        return RerunProfiler(settings.profile_directory, settings.profile_sample_every)
+
+    @staticmethod
+    @st.cache_resource
+    def _get_session_reaper() -> SessionReaper:
+        return SessionReaper()
+
+    @staticmethod
+    @st.cache_resource
+    def _get_overload_detector() -> OverloadDetector:
+        return create_overload_detector(Settings.from_env())
+
+    @staticmethod
+    @st.cache_resource
+    def _get_application_state() -> StateBackend:
+        # before the backend makes the locks of its rooms and sessions
+        Context._get_lock_profiler()
+        settings = Settings.from_env()
+        application_state = create_application_state(settings)
+        if settings.participant_api_port is not None:
+            # served next to Streamlit for as long as the process runs
+            ParticipantApiServer(
+                application_state,
+                "",
+                settings.participant_api_port,
+            ).start()
+        return application_state
 
 
 class StateProvider:
     def __init__(self) -> None:
         self.context = Context()
 
-    def get_cleanup(self, timeout_seconds: int) -> CleanupState:
-        return CleanupState(self.context.application_state, timeout_seconds)
+    def get_cleanup(self) -> CleanupState:
+        return CleanupState(
+            self.context.application_state,
+            self.context.settings.user_removal_timeout_seconds,
+            self.context.session_reaper,
+        )
 
+    @tracer.traced("get_current")
     def get_current(self) -> LobbyState | HostState | ClientState:
         room = self.context.application_state.get_session_room(
             self.context.session_state.session_id,
@@ -122,6 +325,7 @@ class StateProvider:
             return LobbyState(
                 self.context.application_state,
                 self.context.session_state,
+                WorkerAffinity.from_settings(self.context.settings),
             )
         if room.is_host(self.context.session_state.session_id):
             return HostState(room, self.context.session_state.session_id)
@@ -1,9 +1,11 @@
 import bisect
 import time
 from collections import deque
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping
 from dataclasses import dataclass
 
+from open_cups.clock import Clock, system_clock
+from open_cups.history_store import MemoryMappedHistory
 from open_cups.types import StatusSnapshot, UserSession, UserStatus
 
 
@@ -35,20 +37,42 @@ class Config:
 
 
 class StatsTracker:
-    def __init__(self, config: Config) -> None:
+    def __init__(
+        self,
+        config: Config,
+        history_store: MemoryMappedHistory | None = None,
+        clock: Clock = system_clock,
+    ) -> None:
         self._dense_status_history: list[StatusSnapshot] = []
+        # With a history store, the sparse deque only caches the most recent
+        # snapshots, while the store keeps all of them.
         self._sparse_status_history: deque[StatusSnapshot] = deque(
             maxlen=config.max_sparse_snapshot_count,
         )
+        self._history_store = history_store
         self._config = config
+        self._clock = clock
 
     def record_status_snapshot(self, user_sessions: Iterable[UserSession]) -> None:
-        current_time = time.time()
+        current_time = self._clock()
+
+        if not self._should_record_snapshot(current_time):
+            return
+
+        self._record(create_snapshot(user_sessions, current_time), current_time)
+
+    def record_status_counts(self, counts: Mapping[UserStatus, int]) -> None:
+        """Like record_status_snapshot, for callers that keep counts up to date."""
+        current_time = self._clock()
 
         if not self._should_record_snapshot(current_time):
             return
 
-        self._dense_status_history.append(create_snapshot(user_sessions))
+        snapshot = StatusSnapshot(timestamp=current_time, counts=dict(counts))
+        self._record(snapshot, current_time)
+
+    def _record(self, snapshot: StatusSnapshot, current_time: float) -> None:
+        self._dense_status_history.append(snapshot)
 
         snapshots_to_move = self._extract_old_snapshots_from_dense_history(current_time)
         self._append_to_sparse_history(snapshots_to_move)
@@ -80,24 +104,87 @@ class StatsTracker:
 
     def _append_to_sparse_history(self, snapshots: list[StatusSnapshot]) -> None:
         for snapshot in snapshots:
-            if not self._sparse_status_history:
-                self._sparse_status_history.append(snapshot)
-            else:
+            if self._sparse_status_history:
                 last_sparse_time = self._sparse_status_history[-1].timestamp
                 if (
                     snapshot.timestamp - last_sparse_time
-                    >= self._config.sparse_snapshot_interval_seconds
+                    < self._config.sparse_snapshot_interval_seconds
                 ):
-                    self._sparse_status_history.append(snapshot)
+                    continue
+            self._sparse_status_history.append(snapshot)
+            if self._history_store is not None:
+                self._history_store.append(snapshot)
+
+    @property
+    def in_memory_snapshot_count(self) -> int:
+        """The number of snapshots held in memory, not in the history store."""
+        return len(self._dense_status_history) + len(self._sparse_status_history)
+
+    @property
+    def snapshot_count(self) -> int:
+        """The number of snapshots in the history, without reading them."""
+        if self._history_store is not None:
+            return len(self._history_store) + len(self._dense_status_history)
+        return len(self._sparse_status_history) + len(self._dense_status_history)
+
+    @property
+    def first_timestamp(self) -> float | None:
+        """The timestamp of the oldest snapshot kept, None without snapshots."""
+        if self._history_store is not None and len(self._history_store):
+            return self._history_store.read_timestamp(0)
+        if self._sparse_status_history:
+            return self._sparse_status_history[0].timestamp
+        if self._dense_status_history:
+            return self._dense_status_history[0].timestamp
+        return None
 
     @property
     def status_history(self) -> list[StatusSnapshot]:
-        return list(self._sparse_status_history) + self._dense_status_history
+        return self.get_status_history_range()
+
+    def get_status_history_range(
+        self,
+        start_time: float | None = None,
+    ) -> list[StatusSnapshot]:
+        if self._history_store is not None:
+            sparse_history = self._history_store.read_range(start_time)
+        else:
+            sparse_history = [
+                snapshot
+                for snapshot in self._sparse_status_history
+                if start_time is None or snapshot.timestamp >= start_time
+            ]
+        dense_history = [
+            snapshot
+            for snapshot in self._dense_status_history
+            if start_time is None or snapshot.timestamp >= start_time
+        ]
+        return sparse_history + dense_history
+
+    def restore_status_history(self, snapshots: list[StatusSnapshot]) -> None:
+        """Restore history persisted by a previous process into the sparse tier."""
+        for snapshot in snapshots:
+            self._sparse_status_history.append(snapshot)
+            if self._history_store is not None:
+                self._history_store.append(snapshot)
+
+    def close(self) -> None:
+        """Close the history store, later snapshots are only kept in memory.
+
+        Sessions that found a room just before it was removed may still write
+        to it.
+        """
+        if self._history_store is not None:
+            self._history_store.close()
+            self._history_store = None
 
 
-def create_snapshot(user_sessions: Iterable[UserSession]) -> StatusSnapshot:
+def create_snapshot(
+    user_sessions: Iterable[UserSession],
+    timestamp: float | None = None,
+) -> StatusSnapshot:
     snapshot = StatusSnapshot(
-        timestamp=time.time(),
+        timestamp=time.time() if timestamp is None else timestamp,
         counts={
             UserStatus.GREEN: 0,
             UserStatus.YELLOW: 0,
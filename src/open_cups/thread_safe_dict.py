@@ -1,16 +1,38 @@
 from __future__ import annotations
 
-import threading
 from typing import TYPE_CHECKING, Any, Self
 
+from open_cups.lock_profiler import make_lock
+
 if TYPE_CHECKING:
     from collections.abc import ItemsView, Iterator, ValuesView
 
 
+# dicts keep the size of their hash table when keys are removed, so a dict is
+# copied into a table of its size once it shrank to a SHRINK_FACTOR-th of its
+# largest size, e.g. the sessions of a large room that emptied
+SHRINK_FACTOR = 4
+# below this many keys, the table has its minimum size anyway
+MIN_SHRINK_SIZE = 8
+
+
+def is_oversized(size: int, peak_size: int) -> bool:
+    """Return if a container that held peak_size keys should be copied at size."""
+    return peak_size > MIN_SHRINK_SIZE and size * SHRINK_FACTOR <= peak_size
+
+
 class ThreadSafeDict[T]:
-    def __init__(self, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
-        self._lock = threading.RLock()
+    def __init__(
+        self,
+        *args: Any,  # noqa: ANN401
+        name: str = "ThreadSafeDict",
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Create the dict, name tells its lock apart in the lock profile."""
+        self._name = name
+        self._lock = make_lock(name)
         self._data: dict[str, T] = dict(*args, **kwargs)
+        self._peak_size = len(self._data)
 
     def __getitem__(self, key: str) -> T:
         with self._lock:
@@ -19,10 +41,28 @@ class ThreadSafeDict[T]:
     def __setitem__(self, key: str, value: T) -> None:
         with self._lock:
             self._data[key] = value
+            self._peak_size = max(self._peak_size, len(self._data))
 
     def __delitem__(self, key: str) -> None:
         with self._lock:
             del self._data[key]
+            self._shrink()
+
+    def get(self, key: str, default: T | None = None) -> T | None:
+        with self._lock:
+            return self._data.get(key, default)
+
+    def pop(self, key: str, default: T | None = None) -> T | None:
+        with self._lock:
+            value = self._data.pop(key, default)
+            self._shrink()
+            return value
+
+    def _shrink(self) -> None:
+        # amortized O(1), copying n keys follows at least 3n removals
+        if is_oversized(len(self._data), self._peak_size):
+            self._data = dict(self._data)
+            self._peak_size = len(self._data)
 
     def __iter__(self) -> Iterator[str]:
         with self._lock:
@@ -46,7 +86,7 @@ class ThreadSafeDict[T]:
     def copy(self) -> ThreadSafeDict[T]:
         """Return a shallow copy as a ThreadSafeDict instance."""
         with self._lock:
-            return ThreadSafeDict(self._data.copy())
+            return ThreadSafeDict(self._data.copy(), name=self._name)
 
     def items(self) -> ItemsView[str, T]:
         with self._lock:
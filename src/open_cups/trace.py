@@ -0,0 +1,379 @@
+"""Recording of anonymised room traffic and its replay against a state backend.
+
+With OPEN_CUPS_TRACE_FILE set, the state backend is wrapped so that every
+operation of hosts and participants is appended to a gzipped trace: room
+creations, joins, status changes, heartbeats, host refreshes, questions,
+upvotes and closed questions. Room, session and question ids are replaced by
+sequence numbers and question texts by their length.
+
+replay_trace drives a backend with a recorded trace, at the recorded pace or
+faster, from several threads. The rooms are spread over the threads, so the
+operations of each room keep their order. Operations that fail, like a room
+code that is still taken or a quota that is exceeded, are counted and the
+replay goes on.
+"""
+
+import gzip
+import json
+import resource
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from pathlib import Path
+
+from open_cups.backend import RoomBackend, StateBackend
+from open_cups.clock import Clock
+from open_cups.types import (
+    BackendStatistics,
+    Question,
+    ReplayReport,
+    RoomsOverview,
+    StatusSnapshot,
+    TraceOperation,
+    TraceRecord,
+    UserStatus,
+)
+
+FLUSH_EVERY_RECORDS = 1000
+REPLAY_THREAD_COUNT = 8
+
+
+class _Anonymizer:
+    """Replaces ids by sequence numbers, in the order they are first seen."""
+
+    def __init__(self) -> None:
+        self._numbers: dict[str, int] = {}
+
+    def __call__(self, identifier: str) -> int:
+        number = self._numbers.get(identifier)
+        if number is None:
+            number = self._numbers[identifier] = len(self._numbers)
+        return number
+
+
+class TraceRecorder:
+    def __init__(self, path: Path, clock: Clock = time.monotonic) -> None:
+        self._file = gzip.open(path, "wt", encoding="utf-8")  # noqa: SIM115
+        self._clock = clock
+        self._start = clock()
+        self._rooms = _Anonymizer()
+        self._sessions = _Anonymizer()
+        self._questions = _Anonymizer()
+        self._pending: list[str] = []
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        operation: TraceOperation,
+        room_id: str,
+        session_id: str = "",
+        question_id: str = "",
+        value: str | int = "",
+    ) -> None:
+        with self._lock:
+            record = [
+                round((self._clock() - self._start) * 1000),
+                operation.value,
+                self._rooms(room_id),
+                self._sessions(session_id) if session_id else -1,
+                self._questions(question_id) if question_id else -1,
+                value,
+            ]
+            self._pending.append(json.dumps(record, separators=(",", ":")))
+            if len(self._pending) >= FLUSH_EVERY_RECORDS:
+                self._flush()
+
+    def _flush(self) -> None:
+        self._file.write("".join(f"{line}\n" for line in self._pending))
+        self._pending.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+
+def read_trace(path: Path) -> Iterator[TraceRecord]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            milliseconds, operation, room, session, question, value = json.loads(line)
+            yield TraceRecord(
+                milliseconds / 1000,
+                TraceOperation(operation),
+                room,
+                session,
+                question,
+                value,
+            )
+
+
+class RecordingRoom:
+    """A room backend that records the operations of its sessions."""
+
+    def __init__(self, room: RoomBackend, recorder: TraceRecorder) -> None:
+        self._room = room
+        self._recorder = recorder
+
+    @property
+    def room_id(self) -> str:
+        return self._room.room_id
+
+    @property
+    def host_id(self) -> str:
+        return self._room.host_id
+
+    def is_host(self, session_id: str) -> bool:
+        return self._room.is_host(session_id)
+
+    def has_session(self, session_id: str) -> bool:
+        return self._room.has_session(session_id)
+
+    def update_host_last_seen(self) -> None:
+        self._room.update_host_last_seen()
+        self._recorder.record(TraceOperation.HOST_HEARTBEAT, self.room_id)
+
+    def set_session_status(self, session_id: str, status: UserStatus) -> None:
+        self._room.set_session_status(session_id, status)
+        self._recorder.record(
+            TraceOperation.STATUS,
+            self.room_id,
+            session_id,
+            value=status.name,
+        )
+
+    def get_session_status(self, session_id: str) -> UserStatus:
+        return self._room.get_session_status(session_id)
+
+    def update_session(self, session_id: str) -> None:
+        self._room.update_session(session_id)
+        self._recorder.record(TraceOperation.HEARTBEAT, self.room_id, session_id)
+
+    def __iter__(self) -> Iterator[tuple[str, UserStatus]]:
+        return iter(self._room)
+
+    def get_open_questions(self) -> list[Question]:
+        return self._room.get_open_questions()
+
+    def add_question(
+        self,
+        session_id: str,
+        text: str,
+        *,
+        allow_similar: bool = True,
+    ) -> str:
+        question_id = self._room.add_question(
+            session_id,
+            text,
+            allow_similar=allow_similar,
+        )
+        self._recorder.record(
+            TraceOperation.ASK,
+            self.room_id,
+            session_id,
+            question_id,
+            len(text),
+        )
+        return question_id
+
+    def upvote_question(self, session_id: str, question_id: str) -> None:
+        self._room.upvote_question(session_id, question_id)
+        self._recorder.record(
+            TraceOperation.UPVOTE,
+            self.room_id,
+            session_id,
+            question_id,
+        )
+
+    def close_question(self, question_id: str) -> None:
+        self._room.close_question(question_id)
+        self._recorder.record(
+            TraceOperation.CLOSE,
+            self.room_id,
+            question_id=question_id,
+        )
+
+    def get_status_history(
+        self,
+        start_time: float | None = None,
+    ) -> list[StatusSnapshot]:
+        return self._room.get_status_history(start_time)
+
+    def get_status_history_start(self) -> float | None:
+        return self._room.get_status_history_start()
+
+
+class RecordingStateBackend:
+    """A state backend that records the operations of all rooms to a trace."""
+
+    def __init__(self, backend: StateBackend, recorder: TraceRecorder) -> None:
+        self._backend = backend
+        self._recorder = recorder
+
+    def get_session_room(self, session_id: str) -> RecordingRoom | None:
+        room = self._backend.get_session_room(session_id)
+        return None if room is None else RecordingRoom(room, self._recorder)
+
+    def create_room(self, room_id: str, session_id: str) -> None:
+        self._backend.create_room(room_id, session_id)
+        self._recorder.record(TraceOperation.CREATE, room_id, session_id)
+
+    def join_room(self, room_id: str, session_id: str) -> None:
+        self._backend.join_room(room_id, session_id)
+        self._recorder.record(TraceOperation.JOIN, room_id, session_id)
+
+    def remove_inactive_sessions(self, timeout_seconds: int) -> None:
+        self._backend.remove_inactive_sessions(timeout_seconds)
+
+    def remove_rooms_with_inactive_hosts(self, timeout_seconds: int) -> None:
+        self._backend.remove_rooms_with_inactive_hosts(timeout_seconds)
+
+    def get_statistics(self) -> BackendStatistics:
+        return self._backend.get_statistics()
+
+    def get_overview(self) -> RoomsOverview:
+        return self._backend.get_overview()
+
+
+class _ReplayWorker:
+    """Replays the operations of some of the rooms of a trace, in order."""
+
+    def __init__(self, backend: StateBackend) -> None:
+        self.records: list[TraceRecord] = []
+        self.latencies_ns: defaultdict[str, list[int]] = defaultdict(list)
+        self.errors: defaultdict[str, int] = defaultdict(int)
+        self.max_lag_seconds = 0.0
+        self._backend = backend
+        self._rooms: dict[int, RoomBackend] = {}
+        self._questions: dict[int, str] = {}
+
+    def _create_room(self, room: int, host_id: str) -> None:
+        self._backend.create_room(f"trace-room-{room}", host_id)
+        room_backend = self._backend.get_session_room(host_id)
+        if room_backend is not None:
+            self._rooms[room] = room_backend
+
+    def _room(self, room: int) -> RoomBackend:
+        """Return the room, created for traces that start after its creation."""
+        if room not in self._rooms:
+            self._create_room(room, f"trace-host-{room}")
+        return self._rooms[room]
+
+    def run(self, start: float, speed: float | None) -> None:
+        for record in self.records:
+            if speed is not None:
+                lag = time.perf_counter() - start - record.seconds / speed
+                if lag < 0:
+                    time.sleep(-lag)
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+            operation_start = time.perf_counter_ns()
+            try:
+                self._apply(record)
+            except Exception:  # noqa: BLE001
+                self.errors[record.operation.value] += 1
+            self.latencies_ns[record.operation.value].append(
+                time.perf_counter_ns() - operation_start,
+            )
+
+    def _apply(self, record: TraceRecord) -> None:
+        room_id = f"trace-room-{record.room}"
+        session_id = f"trace-session-{record.session}"
+        match record.operation:
+            case TraceOperation.CREATE:
+                self._create_room(record.room, session_id)
+            case TraceOperation.JOIN:
+                self._room(record.room)
+                self._backend.join_room(room_id, session_id)
+            case TraceOperation.STATUS:
+                self._room(record.room).set_session_status(
+                    session_id,
+                    UserStatus[str(record.value)],
+                )
+            case TraceOperation.HEARTBEAT:
+                self._room(record.room).update_session(session_id)
+            case TraceOperation.HOST_HEARTBEAT:
+                self._room(record.room).update_host_last_seen()
+            case TraceOperation.ASK:
+                self._questions[record.question] = self._room(
+                    record.room,
+                ).add_question(session_id, "x" * int(record.value))
+            case TraceOperation.UPVOTE:
+                self._room(record.room).upvote_question(
+                    session_id,
+                    self._questions.get(record.question, ""),
+                )
+            case TraceOperation.CLOSE:
+                self._room(record.room).close_question(
+                    self._questions.get(record.question, ""),
+                )
+
+
+def replay_trace(
+    path: Path,
+    backend: StateBackend,
+    speed: float | None = 1.0,
+    thread_count: int = REPLAY_THREAD_COUNT,
+) -> ReplayReport:
+    """Replay a trace at speed times its recorded pace, or as fast as possible."""
+    workers = [_ReplayWorker(backend) for _ in range(thread_count)]
+    for record in read_trace(path):
+        workers[record.room % thread_count].records.append(record)
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker.run, args=(start, speed)) for worker in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    latencies_ns: defaultdict[str, list[int]] = defaultdict(list)
+    errors: defaultdict[str, int] = defaultdict(int)
+    for worker in workers:
+        for operation, latencies in worker.latencies_ns.items():
+            latencies_ns[operation].extend(latencies)
+        for operation, count in worker.errors.items():
+            errors[operation] += count
+    return ReplayReport(
+        operations=sum(len(worker.records) for worker in workers),
+        seconds=seconds,
+        max_lag_seconds=max(worker.max_lag_seconds for worker in workers),
+        latencies_ns={
+            operation: sorted(latencies)
+            for operation, latencies in sorted(latencies_ns.items())
+        },
+        errors=dict(sorted(errors.items())),
+        # kilobytes on Linux
+        peak_rss_bytes=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        statistics=backend.get_statistics(),
+    )
+
+
+def format_replay_report(report: ReplayReport) -> str:
+    summary = (
+        f"{report.operations} operations in {report.seconds:.2f} s "
+        f"({report.operations / report.seconds:.0f}/s), "
+        f"{sum(report.errors.values())} failed, "
+        f"max lag {report.max_lag_seconds * 1000:.1f} ms, "
+        f"peak RSS {report.peak_rss_bytes / 2**20:.0f} MiB, "
+        f"{report.statistics.rooms} rooms, {report.statistics.sessions} sessions, "
+        f"{report.statistics.history_points} history points"
+    )
+    lines = [
+        summary,
+        (
+            f"{'operation':<10} {'count':>9} {'errors':>9} "
+            f"{'p50 us':>9} {'p99 us':>9} {'max us':>9}"
+        ),
+    ]
+    for operation, latencies in report.latencies_ns.items():
+        count = len(latencies)
+        lines.append(
+            f"{operation:<10} {count:>9} {report.errors.get(operation, 0):>9} "
+            f"{latencies[count // 2] / 1000:>9.1f} "
+            f"{latencies[int(count * 0.99)] / 1000:>9.1f} "
+            f"{latencies[-1] / 1000:>9.1f}",
+        )
+    return "\n".join(lines) + "\n"
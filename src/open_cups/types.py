@@ -1,5 +1,6 @@
+from collections.abc import Callable
 from dataclasses import dataclass
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class UserStatus(Enum):
@@ -21,6 +22,7 @@ class UserStatus(Enum):
 @dataclass
 class UserSession:
     status: UserStatus
+    # up to a heartbeat epoch ahead, see Room.update_session
     last_seen: float
 
 
@@ -35,7 +37,156 @@ class Question:
         return len(self.voter_ids)
 
 
+@dataclass
+class PendingStatusWrite:
+    session_id: str
+    status: UserStatus
+    timestamp: float
+    applied: bool = False
+
+
 @dataclass
 class StatusSnapshot:
     timestamp: float
     counts: dict[UserStatus, int]
+
+
+@dataclass(frozen=True)
+class BackendStatistics:
+    rooms: int
+    sessions: int
+    questions: int
+    history_points: int
+
+
+@dataclass(frozen=True)
+class MemoryUsage:
+    """Approximate memory of a room, see open_cups.quotas."""
+
+    sessions_bytes: int
+    questions_bytes: int
+    history_bytes: int
+
+    @property
+    def total_bytes(self) -> int:
+        return self.sessions_bytes + self.questions_bytes + self.history_bytes
+
+
+@dataclass(frozen=True)
+class RoomSummary:
+    room_id: str
+    participants: int
+    questions: int
+    # None if the backend does not count the writes, see RoomsOverview
+    writes_per_second: float | None
+
+
+@dataclass(frozen=True)
+class RoomsOverview:
+    """Aggregates over all rooms, for operators.
+
+    The write rates count status changes, questions and upvotes. The rankings
+    and rates may be a few seconds old, see open_cups.room_index.
+    """
+
+    rooms: int
+    participants: dict[UserStatus, int]
+    questions: int
+    writes_per_second: float | None
+    largest_rooms: list[RoomSummary]
+    busiest_rooms: list[RoomSummary]
+
+
+@dataclass
+class LockStats:
+    acquisitions: int = 0
+    contended: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    hold_seconds: float = 0.0
+    max_hold_seconds: float = 0.0
+
+
+class EventKind(Enum):
+    ROOM_CREATED = "room_created"
+    ROOM_REMOVED = "room_removed"
+    SESSION_STATUS = "session_status"
+    SESSION_REMOVED = "session_removed"
+    QUESTION_ADDED = "question_added"
+    QUESTION_UPVOTED = "question_upvoted"
+    QUESTION_CLOSED = "question_closed"
+
+
+@dataclass(frozen=True)
+class RoomEvent:
+    """A state mutation of a room, emitted after it has been applied."""
+
+    kind: EventKind
+    room_id: str
+    session_id: str = ""
+    status: UserStatus | None = None
+    question_id: str = ""
+    text: str = ""
+
+
+type EventListener = Callable[[RoomEvent], None]
+
+
+class LoadLevel(IntEnum):
+    """How much work is shed, each level also sheds the work of the ones below."""
+
+    NORMAL = 0
+    SLOW_REFRESH = 1
+    PAUSE_HISTORY = 2
+    CACHE_QUESTIONS = 3
+    REJECT_ROOMS = 4
+
+
+class ExportFormat(Enum):
+    """Format of the room exports, the value is the file suffix."""
+
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+class TraceOperation(Enum):
+    CREATE = "create"
+    JOIN = "join"
+    STATUS = "status"
+    HEARTBEAT = "heartbeat"
+    HOST_HEARTBEAT = "host"
+    ASK = "ask"
+    UPVOTE = "upvote"
+    CLOSE = "close"
+
+
+@dataclass(frozen=True)
+class TraceRecord:
+    """An operation of a recorded trace, with anonymised ids.
+
+    Ids are -1 if the operation has none. The value is the status of a status
+    change and the length of the text of a question.
+    """
+
+    seconds: float
+    operation: TraceOperation
+    room: int
+    session: int = -1
+    question: int = -1
+    value: str | int = ""
+
+
+@dataclass(frozen=True)
+class ReplayReport:
+    operations: int
+    seconds: float
+    max_lag_seconds: float
+    # sorted latencies of each operation, failed ones included
+    latencies_ns: dict[str, list[int]]
+    # failed operations of each operation that failed
+    errors: dict[str, int]
+    peak_rss_bytes: int
+    statistics: BackendStatistics
@@ -0,0 +1,23 @@
+Feature: Rooms overview for operators
+
+  Scenario: Operators with the admin token see all rooms
+    Given the admin token is "s3cret"
+    And I host a room
+    When a second user joins the room
+    And the second user selects the status "🔴 Red"
+    And the second user submits a question "Why?"
+    And the operator opens the app with the admin token "s3cret"
+    Then the operator should see 1 rooms, 1 participants and 1 open questions
+    And the operator should see 1 "🔴 Red" participants
+    And the operator should see my room as the largest
+
+  Scenario: Other visitors see the lobby
+    Given the admin token is "s3cret"
+    When the operator opens the app with the admin token "guess"
+    Then the operator should see the room selection screen
+
+  Scenario: The busiest rooms are not ranked with SQLite
+    Given the rooms are stored in SQLite
+    And the admin token is "s3cret"
+    When the operator opens the app with the admin token "s3cret"
+    Then the operator should see that the writes are not counted
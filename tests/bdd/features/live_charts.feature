@@ -0,0 +1,24 @@
+Feature: Charts drawn in the browser
+
+  Scenario: Participants see the live distribution as counts
+    Given the charts are drawn in the browser
+    And I host a room
+    When a second user joins the room
+    Then "me,second_user" should see the live counts 1, 0, 0, 0
+    When the second user selects the status "🟢 Green"
+    Then "me,second_user" should see the live counts 0, 0, 0, 1
+
+  Scenario: The history chart only receives new snapshots
+    Given the charts are drawn in the browser
+    And I host a room
+    When I select the view "Distribution history"
+    Then the history chart should not be drawn yet
+    When a second user joins the room
+    Then the history chart should receive all 1 snapshots
+    When a second passes
+    Then the history chart should receive 1 new snapshot
+    When the browser asks for all snapshots
+    Then the history chart should receive all 2 snapshots
+    When I select the view "Live distribution"
+    And I select the view "Distribution history"
+    Then the history chart should receive all 2 snapshots
@@ -0,0 +1,24 @@
+Feature: Load shedding under overload
+
+  Scenario: New rooms are rejected when the server is overloaded
+    Given the server sheds load at level "REJECT_ROOMS"
+    When I click the "Create Room" button
+    Then I should see that the server is too busy for new rooms
+    And I should still be on the room selection screen
+
+  Scenario: Host keeps the live distribution while the history is paused
+    Given the server sheds load at level "PAUSE_HISTORY"
+    And I host a room
+    When a second user joins the room
+    And I select the view "Distribution history"
+    Then I should see that the distribution history is paused
+    When I select the view "Live distribution"
+    Then I should see the live distribution
+
+  Scenario: Participants see cached question lists
+    Given the server sheds load at level "CACHE_QUESTIONS"
+    And I host a room
+    When a second user joins the room
+    And the second user submits a question "How does this work?"
+    Then "me" should see question "How does this work?" with 1 vote
+    And "second_user" should see no questions
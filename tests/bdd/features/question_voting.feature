@@ -11,3 +11,35 @@ Feature: Question Voting
     Then "me, second_user, third_user" should see question "How does this work?" with 2 votes
     When I close the question
     Then "me, second_user, third_user" should see no questions
+
+  Scenario: Client votes for a similar question instead
+    Given I host a room
+    When a second user joins the room
+    And a third user joins the room
+    And the second user submits a question "How does this work?"
+    And the third user submits a question "How does that work?"
+    Then the third user should be offered the question "How does this work?"
+    When the third user votes for the similar question
+    Then "me, second_user, third_user" should see question "How does this work?" with 2 votes
+    And the third user should have an empty question input
+
+  Scenario: Client votes for a similar question that was closed meanwhile
+    Given I host a room
+    When a second user joins the room
+    And a third user joins the room
+    And the second user submits a question "How does this work?"
+    And the third user submits a question "How does that work?"
+    And I close the question
+    And the third user votes for the similar question
+    Then "me, second_user, third_user" should see question "How does that work?" with 1 vote
+    And the third user should have an empty question input
+
+  Scenario: Client asks a similar question anyway
+    Given I host a room
+    When a second user joins the room
+    And a third user joins the room
+    And the second user submits a question "How does this work?"
+    And the third user submits a question "How does that work?"
+    And the third user asks anyway
+    Then "me, second_user, third_user" should see question "How does that work?" with 1 vote
+    And the third user should have an empty question input
@@ -0,0 +1,58 @@
+Feature: Quotas
+
+  Scenario: Rooms beyond the quota are rejected
+    Given the server hosts at most 2 rooms
+    And I host a room
+    When "second_user" creates a room
+    And "third_user" creates a room
+    Then "second_user" should see the active room screen
+    And "third_user" should see the error "The server is full, it hosts at most 2 rooms"
+
+  Scenario: Participants beyond the quota are rejected
+    Given each room allows at most 2 participants
+    And I host a room
+    When "second_user" joins the room with the room ID
+    And "third_user" joins the room with the room ID
+    And "fourth_user" joins the room with the room ID
+    Then "fourth_user" should see the error "The room is full, it allows at most 2 participants"
+    When "fifth_user" opens my room URL
+    Then "fifth_user" should see the error "The room is full, it allows at most 2 participants"
+
+  Scenario: Questions beyond the length quota are rejected
+    Given questions can be at most 10 characters long
+    And I host a room
+    When a second user joins the room
+    And "second_user" asks "Why is the sky blue?"
+    Then "second_user" should see the error "Questions can be at most 10 characters long"
+    And "second_user" should still have the question "Why is the sky blue?" in the input
+    And "me, second_user" should see no questions
+
+  Scenario: Questions and upvotes beyond the rate limits are rejected
+    Given each participant is limited to 1 questions per minute
+    And each participant is limited to 1 upvotes per minute
+    And I host a room
+    When "second_user" joins the room with the room ID
+    And "third_user" joins the room with the room ID
+    And "fourth_user" joins the room with the room ID
+    And "second_user" asks "Why?"
+    And "second_user" asks "How?"
+    Then "second_user" should see the error "You have reached the limit of 1 questions per minute"
+    When "third_user" asks "What?"
+    And "fourth_user" asks "Where?"
+    And "second_user" upvotes another question
+    Then "second_user" should see no errors
+    When "second_user" upvotes another question
+    Then "second_user" should see the error "You have reached the limit of 1 upvotes per minute"
+
+  Scenario: Votes for a similar question beyond the rate limit are rejected
+    Given each participant is limited to 1 upvotes per minute
+    And I host a room
+    When "second_user" joins the room with the room ID
+    And "third_user" joins the room with the room ID
+    And "second_user" asks "When is the exam?"
+    And "second_user" asks "How does this work?"
+    And "third_user" upvotes another question
+    And "third_user" asks "How does that work?"
+    And "third_user" votes for the similar question
+    Then "third_user" should see the error "You have reached the limit of 1 upvotes per minute"
+    And "third_user" should still have the question "How does that work?" in the input
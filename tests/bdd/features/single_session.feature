@@ -19,3 +19,9 @@ Feature: Single session
     And I click the "Join Room" button
     Then I should see error message "Room ID not found"
     And I should still be on the room selection screen
+
+  Scenario: Only rooms are refreshed automatically
+    Given I am on the room selection screen
+    Then the page should not refresh automatically
+    When I click the "Create Room" button
+    Then the page should refresh automatically
@@ -0,0 +1,14 @@
+Feature: Worker affinity behind the router
+
+  Scenario: Created rooms are routed to this worker
+    Given I am worker "worker-0" of the workers "worker-0, worker-1"
+    When I click the "Create Room" button
+    Then I should see the active room screen
+    And the room ID should be routed to "worker-0"
+
+  Scenario: Join a room of another worker
+    Given I am worker "worker-0" of the workers "worker-0, worker-1"
+    When I enter a room ID routed to "worker-1"
+    And I press the "Join Room" button
+    Then I should see a link to open the room
+    And I should still be on the room selection screen
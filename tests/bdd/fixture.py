@@ -8,7 +8,7 @@ from open_cups.plots import get_statistics_data_frame
 from open_cups.state_provider import Context, RoomState
 
 if TYPE_CHECKING:
-    from open_cups.application_state import ApplicationState
+    from open_cups.backend import StateBackend
 
 
 def run_wrapper() -> None:
@@ -27,7 +27,7 @@ def context() -> dict[str, AppTest]:
 class CapturedData:
     def __init__(self) -> None:
         self.room_data: dict[str, pd.DataFrame] = {}
-        self.application_state: None | ApplicationState = None
+        self.application_state: None | StateBackend = None
 
 
 captured = CapturedData()
@@ -3,7 +3,11 @@ from streamlit.testing.v1 import AppTest
 
 from open_cups.types import UserStatus
 from tests.bdd.fixture import run_wrapper
-from tests.bdd.test_helper import get_room_id, refresh_all_apps
+from tests.bdd.test_helper import (
+    check_page_contents,
+    get_room_id,
+    refresh_all_apps,
+)
 
 STATUS_VALUES = {status.value: status for status in UserStatus}
 
@@ -30,6 +34,18 @@ def second_user_joins_room(context: dict[str, AppTest]) -> None:
     refresh_all_apps(context)
 
 
+@when(parsers.parse('the second user submits a question "{question}"'))
+def second_user_submits_question(context: dict[str, AppTest], question: str) -> None:
+    context["second_user"].text_area(key="question_input").set_value(question).run()
+    context["second_user"].button(key="submit_question").click().run()
+    refresh_all_apps(context)
+
+
+@when(parsers.parse('I select the view "{view_name}"'))
+def i_select_view(context: dict[str, AppTest], view_name: str) -> None:
+    context["me"].radio(key="host_view_choice").set_value(view_name).run()
+
+
 def _select_status(app: AppTest, context: dict[str, AppTest], status: str) -> None:
     status_enum = STATUS_VALUES.get(status)
     assert status_enum is not None
@@ -58,3 +74,56 @@ def see_active_room_screen(context: dict[str, AppTest]) -> None:
 def on_room_selection_screen(context: dict[str, AppTest]) -> None:
     assert len(context["me"].title) == 1
     assert context["me"].title[0].value == "Welcome to OpenCups"
+
+
+@then(
+    parsers.parse(
+        '"{users}" should see question "{question}" with {vote_count:d} vote',
+    ),
+)
+@then(
+    parsers.parse(
+        '"{users}" should see question "{question}" with {vote_count:d} votes',
+    ),
+)
+def users_should_see_question(
+    context: dict[str, AppTest],
+    users: str,
+    question: str,
+    vote_count: int,
+) -> None:
+    user_keys = [u.strip() for u in users.split(",")]
+
+    for user in user_keys:
+        app = context[user]
+
+        check_page_contents(app, expected=(question,))
+
+        button_labels = [btn.label for btn in app.button]
+        vote_buttons = [
+            label for label in button_labels if label.startswith(str(vote_count))
+        ]
+
+        assert len(vote_buttons) > 0, (
+            f"No button with vote count {vote_count} found for {user}"
+        )
+
+
+@then(parsers.parse('"{users}" should see no questions'))
+def users_should_see_no_questions(context: dict[str, AppTest], users: str) -> None:
+    user_keys = [u.strip() for u in users.split(",")]
+
+    for user in user_keys:
+        app = context[user]
+
+        upvote_buttons = [
+            btn for btn in app.button if btn.key and btn.key.startswith("upvote_")
+        ]
+        close_buttons = [
+            btn for btn in app.button if btn.key and btn.key.startswith("close_")
+        ]
+
+        assert len(upvote_buttons) == 0, f"{user} still sees upvote buttons"
+        assert len(close_buttons) == 0, f"{user} still sees close buttons"
+
+        check_page_contents(app, expected=("No questions yet.",))
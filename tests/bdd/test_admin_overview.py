@@ -0,0 +1,135 @@
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+import pytest
+import streamlit as st
+from pytest_bdd import given, parsers, scenario, then, when
+from streamlit.testing.v1 import AppTest
+
+from open_cups.room_index import RANKING_INTERVAL_SECONDS
+from open_cups.state_provider import Context
+from tests.bdd.fixture import run_wrapper
+from tests.bdd.test_helper import get_room_id
+
+if TYPE_CHECKING:
+    from open_cups.sqlite_backend import SqliteStateBackend
+
+
+@pytest.fixture(autouse=True)
+def clear_cached_resources() -> Iterator[None]:
+    # the settings are read once per process
+    yield
+    st.cache_resource.clear()
+
+
+@scenario(
+    "features/admin_overview.feature",
+    "Operators with the admin token see all rooms",
+)
+def test_operators_see_all_rooms() -> None:
+    pass
+
+
+@scenario("features/admin_overview.feature", "Other visitors see the lobby")
+def test_other_visitors_see_lobby() -> None:
+    pass
+
+
+@scenario(
+    "features/admin_overview.feature",
+    "The busiest rooms are not ranked with SQLite",
+)
+def test_sqlite_overview() -> None:
+    pass
+
+
+def _metric_values(app: AppTest) -> dict[str, str]:
+    return {metric.label: metric.value for metric in app.metric}
+
+
+@given(parsers.parse('the admin token is "{token}"'))
+def admin_token_is(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    token: str,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_ADMIN_TOKEN", token)
+    st.cache_resource.clear()
+    context["me"].run()
+
+
+@given("the rooms are stored in SQLite")
+def rooms_stored_in_sqlite(
+    context: dict[str, AppTest],  # noqa: ARG001
+    monkeypatch: pytest.MonkeyPatch,
+    request: pytest.FixtureRequest,
+    tmp_path: Path,
+) -> None:
+    # the app has run with the in-memory backend, so the backend created in
+    # SQLite is the one cached when the finalizer closes it
+    monkeypatch.setenv("OPEN_CUPS_SQLITE_PATH", str(tmp_path / "state.db"))
+    # runs before the cached backend is cleared, which leaves it open
+    request.addfinalizer(
+        lambda: cast("SqliteStateBackend", Context._get_application_state()).close(),  # noqa: SLF001
+    )
+
+
+@when(parsers.parse('the operator opens the app with the admin token "{token}"'))
+def operator_opens_app(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    token: str,
+) -> None:
+    # the cleanup of the operator's rerun ranks the rooms again
+    ranked_at = time.time() + RANKING_INTERVAL_SECONDS
+    monkeypatch.setattr("open_cups.clock.time.time", lambda: ranked_at)
+    context["operator"] = AppTest.from_function(run_wrapper)
+    context["operator"].query_params["admin"] = token
+    context["operator"].run()
+
+
+@then(
+    parsers.parse(
+        "the operator should see {rooms} rooms, {participants} participants "
+        "and {questions} open questions",
+    ),
+)
+def operator_sees_totals(
+    context: dict[str, AppTest],
+    rooms: str,
+    participants: str,
+    questions: str,
+) -> None:
+    values = _metric_values(context["operator"])
+    assert values["Rooms"] == rooms
+    assert values["Participants"] == participants
+    assert values["Open questions"] == questions
+
+
+@then(parsers.parse('the operator should see {count} "{status}" participants'))
+def operator_sees_status_count(
+    context: dict[str, AppTest],
+    count: str,
+    status: str,
+) -> None:
+    assert _metric_values(context["operator"])[status] == count
+
+
+@then("the operator should see my room as the largest")
+def operator_sees_largest_room(context: dict[str, AppTest]) -> None:
+    largest_rooms = context["operator"].dataframe[0].value
+    assert largest_rooms["room_id"].tolist() == [get_room_id(context["me"])]
+
+
+@then("the operator should see the room selection screen")
+def operator_sees_room_selection(context: dict[str, AppTest]) -> None:
+    assert not context["operator"].metric
+    assert context["operator"].button(key="start_room")
+
+
+@then("the operator should see that the writes are not counted")
+def operator_sees_writes_not_counted(context: dict[str, AppTest]) -> None:
+    assert _metric_values(context["operator"])["Writes per second"] == "n/a"
+    assert "does not count the writes" in context["operator"].info[0].value
@@ -0,0 +1,128 @@
+import json
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+import streamlit as st
+from pytest_bdd import given, parsers, scenario, then, when
+from streamlit.testing.v1 import AppTest
+
+from open_cups.live_charts import HISTORY_CHART_KEY
+from open_cups.plots import NO_HISTORY_MESSAGE
+
+
+class FakeTime:
+    def __init__(self) -> None:
+        self.current_time = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.current_time
+
+
+@pytest.fixture(autouse=True)
+def clear_cached_resources() -> Iterator[None]:
+    # the settings are read once per process
+    yield
+    st.cache_resource.clear()
+
+
+@pytest.fixture
+def fake_time(monkeypatch: pytest.MonkeyPatch) -> FakeTime:
+    time_mock = FakeTime()
+    monkeypatch.setattr("open_cups.clock.time.time", time_mock)
+    return time_mock
+
+
+@scenario(
+    "features/live_charts.feature",
+    "Participants see the live distribution as counts",
+)
+def test_live_distribution() -> None:
+    pass
+
+
+@scenario(
+    "features/live_charts.feature",
+    "The history chart only receives new snapshots",
+)
+def test_history_deltas() -> None:
+    pass
+
+
+def get_live_chart_args(app: AppTest) -> dict[str, Any]:
+    charts = [
+        component.proto
+        for component in app.get("component_instance")
+        if component.proto.component_name.endswith("live_chart")
+    ]
+    assert len(charts) == 1
+    args: dict[str, Any] = json.loads(charts[0].json_args)
+    return args
+
+
+@given("the charts are drawn in the browser")
+def charts_drawn_in_browser(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    fake_time: FakeTime,  # noqa: ARG001
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_LIVE_CHARTS", "1")
+    st.cache_resource.clear()
+    context["me"].run()
+
+
+@when("a second passes")
+def a_second_passes(context: dict[str, AppTest], fake_time: FakeTime) -> None:
+    fake_time.current_time += 1
+    # the heartbeat of the participant records the snapshot
+    context["second_user"].run()
+    context["me"].run()
+
+
+@when("the browser asks for all snapshots")
+def browser_asks_for_all_snapshots(context: dict[str, AppTest]) -> None:
+    context["me"].session_state[HISTORY_CHART_KEY] = 1
+    # the token is answered by this rerun and all snapshots sent by the next
+    context["me"].run()
+    context["me"].run()
+
+
+@then(parsers.parse('"{users}" should see the live counts {counts}'))
+def users_should_see_live_counts(
+    context: dict[str, AppTest],
+    users: str,
+    counts: str,
+) -> None:
+    for user in users.split(","):
+        args = get_live_chart_args(context[user])
+        assert args["kind"] == "distribution"
+        assert args["counts"] == [int(count) for count in counts.split(", ")]
+
+
+@then("the history chart should not be drawn yet")
+def history_chart_not_drawn(context: dict[str, AppTest]) -> None:
+    assert not [
+        component
+        for component in context["me"].get("component_instance")
+        if component.proto.component_name.endswith("live_chart")
+    ]
+    assert NO_HISTORY_MESSAGE in [info.value for info in context["me"].info]
+
+
+@then(parsers.parse("the history chart should receive all {count:d} snapshots"))
+def history_chart_receives_all(context: dict[str, AppTest], count: int) -> None:
+    args = get_live_chart_args(context["me"])
+    assert args["kind"] == "history"
+    assert args["since"] is None
+    assert len(args["points"]) == count
+    assert args["first"] == args["points"][0][0]
+
+
+@then(parsers.parse("the history chart should receive {count:d} new snapshot"))
+def history_chart_receives_new(context: dict[str, AppTest], count: int) -> None:
+    args = get_live_chart_args(context["me"])
+    assert args["since"] is not None
+    assert len(args["points"]) == count
+    assert args["points"][0][0] > args["since"]
+    assert args["first"] is not None
+    assert args["first"] <= args["since"]
@@ -0,0 +1,78 @@
+from collections.abc import Iterator
+
+import pytest
+import streamlit as st
+from pytest_bdd import given, parsers, scenario, then
+from streamlit.testing.v1 import AppTest
+
+from open_cups.overload import OverloadDetector
+from open_cups.types import LoadLevel
+
+
+@pytest.fixture(autouse=True)
+def clear_cached_resources() -> Iterator[None]:
+    # the overload detector is created once per process from the environment
+    yield
+    st.cache_resource.clear()
+
+
+@scenario(
+    "features/load_shedding.feature",
+    "New rooms are rejected when the server is overloaded",
+)
+def test_new_rooms_are_rejected() -> None:
+    pass
+
+
+@scenario(
+    "features/load_shedding.feature",
+    "Host keeps the live distribution while the history is paused",
+)
+def test_history_is_paused() -> None:
+    pass
+
+
+@scenario(
+    "features/load_shedding.feature",
+    "Participants see cached question lists",
+)
+def test_participants_see_cached_questions() -> None:
+    pass
+
+
+@given(parsers.parse('the server sheds load at level "{level}"'))
+def server_sheds_load(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    level: str,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_OVERLOAD_RERUN_MS", "100")
+    monkeypatch.setattr(OverloadDetector, "level", property(lambda _: LoadLevel[level]))
+    st.cache_resource.clear()
+    context["me"].run()
+
+
+@then("I should see that the server is too busy for new rooms")
+def i_should_see_server_too_busy(context: dict[str, AppTest]) -> None:
+    errors = [error.value for error in context["me"].error]
+    assert errors == [
+        (
+            "The server is too busy to start new rooms right now. "
+            "Please try again in a few minutes."
+        ),
+    ]
+
+
+@then("I should see that the distribution history is paused")
+def i_should_see_history_paused(context: dict[str, AppTest]) -> None:
+    assert not context["me"].get("plotly_chart")
+    info_messages = [info.value for info in context["me"].info]
+    assert (
+        "The distribution history is paused while the server is busy. "
+        "The live distribution is still up to date." in info_messages
+    )
+
+
+@then("I should see the live distribution")
+def i_should_see_live_distribution(context: dict[str, AppTest]) -> None:
+    assert context["me"].get("plotly_chart")
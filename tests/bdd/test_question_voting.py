@@ -2,7 +2,7 @@ from pytest_bdd import parsers, scenario, then, when
 from streamlit.testing.v1 import AppTest
 
 from tests.bdd.fixture import run_wrapper
-from tests.bdd.test_helper import check_page_contents, get_room_id, refresh_all_apps
+from tests.bdd.test_helper import get_room_id, refresh_all_apps
 
 
 @scenario("features/question_voting.feature", "Client submits a question")
@@ -10,11 +10,25 @@ def test_client_submits_a_question() -> None:
     pass
 
 
-@when(parsers.parse('the second user submits a question "{question}"'))
-def second_user_submits_question(context: dict[str, AppTest], question: str) -> None:
-    context["second_user"].text_area(key="question_input").set_value(question).run()
-    context["second_user"].button(key="submit_question").click().run()
-    refresh_all_apps(context)
+@scenario(
+    "features/question_voting.feature",
+    "Client votes for a similar question instead",
+)
+def test_client_votes_for_similar_question() -> None:
+    pass
+
+
+@scenario(
+    "features/question_voting.feature",
+    "Client votes for a similar question that was closed meanwhile",
+)
+def test_client_votes_for_closed_similar_question() -> None:
+    pass
+
+
+@scenario("features/question_voting.feature", "Client asks a similar question anyway")
+def test_client_asks_similar_question_anyway() -> None:
+    pass
 
 
 @when("a third user joins the room")
@@ -28,39 +42,6 @@ def third_user_joins_room(context: dict[str, AppTest]) -> None:
     refresh_all_apps(context)
 
 
-@then(
-    parsers.parse(
-        '"{users}" should see question "{question}" with {vote_count:d} vote',
-    ),
-)
-@then(
-    parsers.parse(
-        '"{users}" should see question "{question}" with {vote_count:d} votes',
-    ),
-)
-def users_should_see_question(
-    context: dict[str, AppTest],
-    users: str,
-    question: str,
-    vote_count: int,
-) -> None:
-    user_keys = [u.strip() for u in users.split(",")]
-
-    for user in user_keys:
-        app = context[user]
-
-        check_page_contents(app, expected=(question,))
-
-        button_labels = [btn.label for btn in app.button]
-        vote_buttons = [
-            label for label in button_labels if label.startswith(str(vote_count))
-        ]
-
-        assert len(vote_buttons) > 0, (
-            f"No button with vote count {vote_count} found for {user}"
-        )
-
-
 @when(parsers.parse("the third user upvotes the question"))
 def third_user_upvotes_question(context: dict[str, AppTest]) -> None:
     app = context["third_user"]
@@ -89,21 +70,36 @@ def i_close_the_question(context: dict[str, AppTest]) -> None:
     refresh_all_apps(context)
 
 
-@then(parsers.parse('"{users}" should see no questions'))
-def users_should_see_no_questions(context: dict[str, AppTest], users: str) -> None:
-    user_keys = [u.strip() for u in users.split(",")]
+@when(parsers.parse('the third user submits a question "{question}"'))
+def third_user_submits_question(context: dict[str, AppTest], question: str) -> None:
+    context["third_user"].text_area(key="question_input").set_value(question).run()
+    context["third_user"].button(key="submit_question").click().run()
+    refresh_all_apps(context)
+
+
+@when("the third user votes for the similar question")
+def third_user_votes_for_similar_question(context: dict[str, AppTest]) -> None:
+    context["third_user"].button(key="vote_similar_question").click().run()
+    refresh_all_apps(context)
 
-    for user in user_keys:
-        app = context[user]
 
-        upvote_buttons = [
-            btn for btn in app.button if btn.key and btn.key.startswith("upvote_")
-        ]
-        close_buttons = [
-            btn for btn in app.button if btn.key and btn.key.startswith("close_")
-        ]
+@when("the third user asks anyway")
+def third_user_asks_anyway(context: dict[str, AppTest]) -> None:
+    context["third_user"].button(key="ask_anyway").click().run()
+    refresh_all_apps(context)
 
-        assert len(upvote_buttons) == 0, f"{user} still sees upvote buttons"
-        assert len(close_buttons) == 0, f"{user} still sees close buttons"
 
-        check_page_contents(app, expected=("No questions yet.",))
+@then(parsers.parse('the third user should be offered the question "{question}"'))
+def third_user_offered_question(context: dict[str, AppTest], question: str) -> None:
+    app = context["third_user"]
+    assert [warning.value for warning in app.warning] == [
+        f'A similar question is already open: "{question}"',
+    ]
+    assert app.text_area(key="question_input").value
+
+
+@then("the third user should have an empty question input")
+def third_user_has_empty_input(context: dict[str, AppTest]) -> None:
+    app = context["third_user"]
+    assert not app.text_area(key="question_input").value
+    assert not app.warning
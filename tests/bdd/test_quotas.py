@@ -0,0 +1,174 @@
+from collections.abc import Iterator
+
+import pytest
+import streamlit as st
+from pytest_bdd import given, parsers, scenario, then, when
+from streamlit.testing.v1 import AppTest
+
+from tests.bdd.fixture import run_wrapper
+from tests.bdd.test_helper import get_room_id
+
+
+@pytest.fixture(autouse=True)
+def clear_cached_resources() -> Iterator[None]:
+    # the quotas are read once per process, with the state backend
+    yield
+    st.cache_resource.clear()
+
+
+@scenario("features/quotas.feature", "Rooms beyond the quota are rejected")
+def test_rooms_beyond_quota() -> None:
+    pass
+
+
+@scenario("features/quotas.feature", "Participants beyond the quota are rejected")
+def test_participants_beyond_quota() -> None:
+    pass
+
+
+@scenario(
+    "features/quotas.feature",
+    "Questions beyond the length quota are rejected",
+)
+def test_questions_beyond_length_quota() -> None:
+    pass
+
+
+@scenario(
+    "features/quotas.feature",
+    "Questions and upvotes beyond the rate limits are rejected",
+)
+def test_rate_limits() -> None:
+    pass
+
+
+@scenario(
+    "features/quotas.feature",
+    "Votes for a similar question beyond the rate limit are rejected",
+)
+def test_similar_question_vote_rate_limit() -> None:
+    pass
+
+
+def _set_quota(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    name: str,
+    limit: int,
+) -> None:
+    monkeypatch.setenv(name, str(limit))
+    st.cache_resource.clear()
+    context["me"].run()
+
+
+@given(parsers.parse("the server hosts at most {limit:d} rooms"))
+def server_hosts_at_most(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    limit: int,
+) -> None:
+    _set_quota(context, monkeypatch, "OPEN_CUPS_MAX_ROOMS", limit)
+
+
+@given(parsers.parse("each room allows at most {limit:d} participants"))
+def each_room_allows_at_most(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    limit: int,
+) -> None:
+    _set_quota(context, monkeypatch, "OPEN_CUPS_MAX_PARTICIPANTS", limit)
+
+
+@given(parsers.parse("questions can be at most {limit:d} characters long"))
+def questions_at_most(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    limit: int,
+) -> None:
+    _set_quota(context, monkeypatch, "OPEN_CUPS_MAX_QUESTION_LENGTH", limit)
+
+
+@given(parsers.parse("each participant is limited to {limit:d} {actions} per minute"))
+def each_participant_is_limited_to(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    limit: int,
+    actions: str,
+) -> None:
+    name = f"OPEN_CUPS_{actions.upper()}_PER_MINUTE"
+    _set_quota(context, monkeypatch, name, limit)
+
+
+def _new_user(context: dict[str, AppTest], user: str) -> AppTest:
+    context[user] = AppTest.from_function(run_wrapper)
+    return context[user]
+
+
+@when(parsers.parse('"{user}" creates a room'))
+def user_creates_room(context: dict[str, AppTest], user: str) -> None:
+    app = _new_user(context, user)
+    app.run()
+    app.button(key="start_room").click().run()
+
+
+@when(parsers.parse('"{user}" joins the room with the room ID'))
+def user_joins_room(context: dict[str, AppTest], user: str) -> None:
+    app = _new_user(context, user)
+    app.run()
+    app.text_input(key="join_room_id").set_value(get_room_id(context["me"])).run()
+    app.button(key="join_room").click().run()
+
+
+@when(parsers.parse('"{user}" opens my room URL'))
+def user_opens_room_url(context: dict[str, AppTest], user: str) -> None:
+    app = _new_user(context, user)
+    app.query_params["room_id"] = get_room_id(context["me"])
+    app.run()
+
+
+@when(parsers.parse('"{user}" asks "{question}"'))
+def user_asks(context: dict[str, AppTest], user: str, question: str) -> None:
+    context[user].text_area(key="question_input").set_value(question).run()
+    context[user].button(key="submit_question").click().run()
+
+
+@when(parsers.parse('"{user}" upvotes another question'))
+def user_upvotes_another_question(context: dict[str, AppTest], user: str) -> None:
+    context[user].run()
+    upvote_button = next(
+        button
+        for button in context[user].button
+        if button.key and button.key.startswith("upvote_") and not button.disabled
+    )
+    upvote_button.click().run()
+
+
+@when(parsers.parse('"{user}" votes for the similar question'))
+def user_votes_for_similar_question(context: dict[str, AppTest], user: str) -> None:
+    context[user].button(key="vote_similar_question").click().run()
+
+
+@then(parsers.parse('"{user}" should see no errors'))
+def user_should_see_no_errors(context: dict[str, AppTest], user: str) -> None:
+    assert not context[user].error
+
+
+@then(parsers.parse('"{user}" should see the active room screen'))
+def user_should_see_active_room(context: dict[str, AppTest], user: str) -> None:
+    assert [title.value for title in context[user].title] == ["Active Room"]
+
+
+@then(parsers.parse('"{user}" should see the error "{message}"'))
+def user_should_see_error(context: dict[str, AppTest], user: str, message: str) -> None:
+    assert [error.value for error in context[user].error] == [message]
+
+
+@then(
+    parsers.parse('"{user}" should still have the question "{question}" in the input'),
+)
+def user_should_still_have_question(
+    context: dict[str, AppTest],
+    user: str,
+    question: str,
+) -> None:
+    assert context[user].text_area(key="question_input").value == question
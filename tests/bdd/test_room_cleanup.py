@@ -1,4 +1,7 @@
+from collections.abc import Iterator
+
 import pytest
+import streamlit as st
 from pytest_bdd import parsers, scenario, then, when
 from streamlit.testing.v1 import AppTest
 
@@ -9,7 +12,16 @@ from tests.bdd.test_helper import get_info_content, get_page_content
 def freeze_time_to_zero(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    monkeypatch.setattr("open_cups.room.time.time", lambda: 0)
+    monkeypatch.setattr("open_cups.clock.time.time", lambda: 0)
+
+
+@pytest.fixture(autouse=True)
+def short_user_removal_timeout(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    # independent of the production value, the settings are read once per process
+    monkeypatch.setenv("OPEN_CUPS_USER_REMOVAL_TIMEOUT", "3")
+    st.cache_resource.clear()
+    yield
+    st.cache_resource.clear()
 
 
 @scenario(
@@ -57,15 +69,14 @@ def given_timeout_has_passed(
     context: dict[str, AppTest],
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    time_to_pass = 5
+    # the timeout and up to a heartbeat epoch of a third of it
+    time_to_pass = 7
     step_time = 2
-    # patch this in any case to be independent of the production value
-    monkeypatch.setattr("open_cups.app.USER_REMOVAL_TIMEOUT_SECONDS", 3)
 
     for current_time in range(0, time_to_pass, step_time):
         for user in context.values():
             monkeypatch.setattr(
-                "open_cups.room.time.time",
+                "open_cups.clock.time.time",
                 lambda current_time=current_time: current_time,
             )
             user.run()
@@ -27,6 +27,11 @@ def test_join_non_existent_room() -> None:
     pass
 
 
+@scenario("features/single_session.feature", "Only rooms are refreshed automatically")
+def test_only_rooms_refresh() -> None:
+    pass
+
+
 # ============================================================================
 # When Steps
 # ============================================================================
@@ -85,3 +90,14 @@ def my_status_should_be(context: dict[str, AppTest], status: str) -> None:
     assert captured.room_data[room_id] is not None, "No dataframe was captured"
     count = df[status].iloc[0]
     assert count >= 1, f"Expected at least 1 user with status '{status}', found {count}"
+
+
+@then("the page should not refresh automatically")
+def page_should_not_refresh(context: dict[str, AppTest]) -> None:
+    # st_autorefresh is the only custom component of the app
+    assert not context["me"].get("component_instance")
+
+
+@then("the page should refresh automatically")
+def page_should_refresh(context: dict[str, AppTest]) -> None:
+    assert len(context["me"].get("component_instance")) == 1
@@ -0,0 +1,77 @@
+import itertools
+from collections.abc import Iterator
+
+import pytest
+import streamlit as st
+from pytest_bdd import given, parsers, scenario, then, when
+from streamlit.testing.v1 import AppTest
+
+from open_cups.room_codes import normalize_room_code
+from open_cups.routing import HashRing
+from tests.bdd.test_helper import get_room_id
+
+WORKERS = ("worker-0", "worker-1")
+
+
+@pytest.fixture(autouse=True)
+def clear_cached_resources() -> Iterator[None]:
+    # the settings are read once per process
+    yield
+    st.cache_resource.clear()
+
+
+@scenario(
+    "features/worker_affinity.feature",
+    "Created rooms are routed to this worker",
+)
+def test_created_rooms_are_routed_to_this_worker() -> None:
+    pass
+
+
+@scenario("features/worker_affinity.feature", "Join a room of another worker")
+def test_join_room_of_other_worker() -> None:
+    pass
+
+
+@given(parsers.parse('I am worker "{worker_id}" of the workers "{workers}"'))
+def i_am_worker(
+    context: dict[str, AppTest],
+    monkeypatch: pytest.MonkeyPatch,
+    worker_id: str,
+    workers: str,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_WORKER_ID", worker_id)
+    monkeypatch.setenv("OPEN_CUPS_WORKERS", workers.replace(" ", ""))
+    st.cache_resource.clear()
+    context["me"].run()
+
+
+@when(parsers.parse('I enter a room ID routed to "{worker_id}"'))
+def i_enter_room_id_of_worker(context: dict[str, AppTest], worker_id: str) -> None:
+    ring = HashRing(WORKERS)
+    room_id = next(
+        room_id
+        for room_id in (f"R{number:05d}" for number in itertools.count())
+        if ring.lookup(room_id) == worker_id
+    )
+    # typed like a participant might, the link has the room code
+    context["me"].text_input(key="join_room_id").set_value(f" {room_id.lower()}").run()
+
+
+@when('I press the "Join Room" button')
+def i_press_join_room(context: dict[str, AppTest]) -> None:
+    context["me"].button(key="join_room").click().run()
+
+
+@then(parsers.parse('the room ID should be routed to "{worker_id}"'))
+def room_id_should_be_routed_to(context: dict[str, AppTest], worker_id: str) -> None:
+    assert HashRing(WORKERS).lookup(get_room_id(context["me"])) == worker_id
+
+
+@then("I should see a link to open the room")
+def i_should_see_link_to_open_room(context: dict[str, AppTest]) -> None:
+    link_buttons = context["me"].get("link_button")
+    assert len(link_buttons) == 1
+    room_id = context["me"].text_input(key="join_room_id").value
+    assert room_id is not None
+    assert link_buttons[0].proto.url == f"?room_id={normalize_room_code(room_id)}"
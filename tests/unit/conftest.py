@@ -0,0 +1,53 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.backend import StateBackend
+from open_cups.clock import Clock, system_clock
+from open_cups.quotas import Quotas
+from open_cups.sqlite_backend import SqliteStateBackend
+
+
+@pytest.fixture
+def clock() -> Clock:
+    """The clock of the backend, overridden by modules that simulate time."""
+    return system_clock
+
+
+@pytest.fixture
+def quotas() -> Quotas | None:
+    """The quotas of the backend, overridden by modules that test them."""
+    return None
+
+
+@pytest.fixture
+def heartbeat_epoch_seconds() -> float:
+    """The heartbeat epoch of the backend, parametrized by tests of heartbeats."""
+    return 0.0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(
+    request: pytest.FixtureRequest,
+    tmp_path: Path,
+    clock: Clock,
+    quotas: Quotas | None,
+    heartbeat_epoch_seconds: float,
+) -> Iterator[StateBackend]:
+    if request.param == "memory":
+        yield ApplicationState(
+            clock=clock,
+            quotas=quotas,
+            heartbeat_epoch_seconds=heartbeat_epoch_seconds,
+        )
+        return
+    sqlite_backend = SqliteStateBackend(
+        tmp_path / "state.db",
+        clock=clock,
+        quotas=quotas,
+        heartbeat_epoch_seconds=heartbeat_epoch_seconds,
+    )
+    yield sqlite_backend
+    sqlite_backend.close()
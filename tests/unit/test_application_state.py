@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import pytest
+
+from open_cups.application_state import ApplicationState
+
+
+def test_history_file_is_removed_with_inactive_room(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    history_directory = tmp_path / "history"
+    monkeypatch.setattr("open_cups.clock.time.time", lambda: 0.0)
+    application_state = ApplicationState(history_directory=history_directory)
+    application_state.create_room("room-id", "host-id")
+    assert (history_directory / "room-id.history").exists()
+
+    monkeypatch.setattr("open_cups.clock.time.time", lambda: 100.0)
+    application_state.remove_rooms_with_inactive_hosts(timeout_seconds=10)
+
+    assert "room-id" not in application_state.rooms
+    assert not (history_directory / "room-id.history").exists()
@@ -0,0 +1,56 @@
+import pytest
+
+from open_cups.backend import StateBackend
+from open_cups.clock import SimulatedClock, system_clock
+from open_cups.types import UserStatus
+
+LECTURE_SECONDS = 3 * 60 * 60
+TIMEOUT_SECONDS = 30
+
+
+def test_simulated_clock_only_moves_forward() -> None:
+    clock = SimulatedClock(100.0)
+    clock.advance(0.5)
+
+    assert clock() == 100.5
+    with pytest.raises(ValueError, match="cannot go back in time"):
+        clock.advance(-1)
+
+
+def test_system_clock_follows_patched_time(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("open_cups.clock.time.time", lambda: 42.0)
+
+    assert system_clock() == 42.0
+
+
+@pytest.fixture
+def clock() -> SimulatedClock:
+    return SimulatedClock()
+
+
+def test_three_hour_lecture_in_simulated_time(
+    clock: SimulatedClock,
+    backend: StateBackend,
+) -> None:
+    backend.create_room("room-id", "host-id")
+    room = backend.get_session_room("host-id")
+    assert room is not None
+    room.set_session_status("staying", UserStatus.GREEN)
+    room.set_session_status("leaving", UserStatus.GREEN)
+
+    for second in range(0, LECTURE_SECONDS, 2):
+        clock.advance(2)
+        room.update_host_last_seen()
+        room.update_session("staying")
+        if second < LECTURE_SECONDS // 2:
+            room.update_session("leaving")
+        statuses = [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED]
+        room.set_session_status("staying", statuses[second // 600 % 3])
+        backend.remove_inactive_sessions(TIMEOUT_SECONDS)
+        backend.remove_rooms_with_inactive_hosts(TIMEOUT_SECONDS)
+
+    assert dict(room) == {"staying": UserStatus.RED}
+    history = room.get_status_history()
+    # one sparse snapshot a minute, dense snapshots of the last minute
+    assert len(history) == LECTURE_SECONDS // 60 + 30
+    assert history[-1].timestamp == LECTURE_SECONDS
@@ -0,0 +1,195 @@
+"""Stress tests of rooms and the application state from many threads.
+
+The GIL's switch interval is lowered while they run, so threads interleave
+far more often than in production. On free-threaded builds they run truly in
+parallel.
+"""
+
+import contextlib
+import random
+import sys
+import threading
+from collections import Counter
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.clock import SimulatedClock
+from open_cups.room import Room
+from open_cups.room_codes import RoomCodeTakenError
+from open_cups.types import Question, UserStatus
+
+THREAD_COUNT = 24
+ITERATIONS = 3000
+SESSION_POOL = [f"user-{index}" for index in range(40)]
+STATUSES = list(UserStatus)
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches() -> Iterator[None]:
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(switch_interval)
+
+
+def run_threads(workers: list[Callable[[random.Random], None]]) -> None:
+    """Run each worker in its own thread, starting together, and reraise errors."""
+    barrier = threading.Barrier(len(workers))
+    errors: list[BaseException] = []
+
+    def run(worker: Callable[[random.Random], None], seed: int) -> None:
+        barrier.wait()
+        try:
+            worker(random.Random(seed))  # noqa: S311
+        except BaseException as error:  # noqa: BLE001
+            errors.append(error)
+
+    threads = [
+        threading.Thread(target=run, args=(worker, seed))
+        for seed, worker in enumerate(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def test_status_counts_match_sessions(tmp_path: Path) -> None:
+    clock = SimulatedClock()
+    room = Room("room-id", "host-id", tmp_path, clock=clock)
+
+    def writer(random_generator: random.Random) -> None:
+        for _ in range(ITERATIONS):
+            room.set_session_status(
+                random_generator.choice(SESSION_POOL),
+                random_generator.choice(STATUSES),
+            )
+
+    def heartbeat(random_generator: random.Random) -> None:
+        for _ in range(ITERATIONS):
+            room.update_session(random_generator.choice(SESSION_POOL))
+
+    def sweeper(_random_generator: random.Random) -> None:
+        for _ in range(ITERATIONS):
+            clock.advance(0.01)
+            room.remove_inactive_sessions(1)
+
+    def reader(_random_generator: random.Random) -> None:
+        for _ in range(ITERATIONS):
+            counts = room.get_status_counts()
+            assert all(count >= 0 for count in counts.values())
+            assert sum(counts.values()) <= len(SESSION_POOL)
+            room.get_status_history()
+
+    run_threads([writer, heartbeat, sweeper, reader] * (THREAD_COUNT // 4))
+
+    statuses = dict(room)
+    assert room.get_status_counts() == {
+        status: Counter(statuses.values())[status] for status in UserStatus
+    }
+    assert room.to_snapshot()["sessions"] == {
+        session_id: status.name for session_id, status in statuses.items()
+    }
+    room.close()
+
+
+def assert_no_orphaned_sessions(
+    application_state: ApplicationState,
+    history_directory: Path,
+) -> None:
+    rooms = list(application_state.rooms.values())
+    session_rooms = Counter(session_id for room in rooms for session_id, _ in room)
+    assert all(count == 1 for count in session_rooms.values())
+    for session_id in session_rooms:
+        assert application_state.get_session_room(session_id) in rooms
+    # the history files of removed rooms are deleted
+    assert sorted(path.name for path in history_directory.iterdir()) == sorted(
+        f"{room.room_id}.history" for room in rooms
+    )
+    for room in rooms:
+        room.close()
+
+
+def test_no_sessions_in_removed_rooms(tmp_path: Path) -> None:
+    clock = SimulatedClock()
+    application_state = ApplicationState(tmp_path, clock)
+    room_ids = [f"room-{index}" for index in range(6)]
+
+    def host(random_generator: random.Random) -> None:
+        for _ in range(ITERATIONS):
+            room_id = random_generator.choice(room_ids)
+            host_id = f"host-{room_id}"
+            room = application_state.get_session_room(host_id)
+            if room is None:
+                # another host thread may have created the room meanwhile
+                with contextlib.suppress(RoomCodeTakenError):
+                    application_state.create_room(room_id, host_id)
+            else:
+                room.update_host_last_seen()
+
+    def participant(random_generator: random.Random) -> None:
+        # the reruns of a session never overlap, so each thread has its own
+        session_ids = [
+            f"{session_id}-{random_generator.random()}"
+            for session_id in SESSION_POOL[:4]
+        ]
+        for _ in range(ITERATIONS):
+            session_id = random_generator.choice(session_ids)
+            room = application_state.get_session_room(session_id)
+            if room is None:
+                with contextlib.suppress(ValueError):  # the room was removed
+                    application_state.join_room(
+                        random_generator.choice(room_ids),
+                        session_id,
+                    )
+                continue
+            room.update_session(session_id)
+            room.set_session_status(session_id, random_generator.choice(STATUSES))
+            room.add_question(session_id, "Why?")
+            room.get_status_history()
+
+    def sweeper(_random_generator: random.Random) -> None:
+        for _ in range(ITERATIONS):
+            clock.advance(0.05)
+            application_state.remove_inactive_sessions(2)
+            application_state.remove_rooms_with_inactive_hosts(2)
+
+    run_threads([host, participant, participant, sweeper] * (THREAD_COUNT // 4))
+
+    assert_no_orphaned_sessions(application_state, tmp_path)
+
+
+def test_vote_counts_are_monotonic() -> None:
+    room = Room("room-id", "host-id")
+    question_ids = [
+        room.add_question("host-id", f"Question {index}") for index in range(5)
+    ]
+
+    def voter(random_generator: random.Random) -> None:
+        for _ in range(ITERATIONS):
+            room.upvote_question(
+                random_generator.choice(SESSION_POOL),
+                random_generator.choice(question_ids),
+            )
+
+    def reader(_random_generator: random.Random) -> None:
+        seen: dict[str, int] = {}
+        for _ in range(ITERATIONS):
+            questions: list[Question] = room.get_open_questions()
+            for question in questions:
+                assert question.vote_count >= seen.get(question.id, 1)
+                seen[question.id] = question.vote_count
+
+    run_threads([voter, voter, reader] * (THREAD_COUNT // 3))
+
+    votes = sum(question.vote_count for question in room.get_open_questions())
+    assert votes <= len(question_ids) * (len(SESSION_POOL) + 1)
+    assert all(
+        1 <= question.vote_count <= len(SESSION_POOL) + 1
+        for question in room.get_open_questions()
+    )
@@ -0,0 +1,151 @@
+import csv
+import json
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from open_cups.export import (
+    HISTORY_SCHEMA,
+    QUESTIONS_SCHEMA,
+    iter_csv,
+    iter_history_rows,
+    iter_ndjson,
+    iter_question_rows,
+    write_export,
+)
+from open_cups.settings import Settings
+from open_cups.sqlite_backend import SqliteStateBackend
+from open_cups.state_provider import create_application_state
+from open_cups.types import ExportFormat, Question, StatusSnapshot, UserStatus
+
+HISTORY = [
+    StatusSnapshot(
+        timestamp=float(second),
+        counts={
+            UserStatus.GREEN: second,
+            UserStatus.YELLOW: 1,
+            UserStatus.RED: 0,
+            UserStatus.UNKNOWN: 2,
+        },
+    )
+    for second in range(5)
+]
+QUESTIONS = [
+    Question(id="q1", text='Why "O(n)", not O(1)?\nSecond line', voter_ids={"a"}),
+    Question(id="q2", text="Slides?", voter_ids={"a", "b"}),
+]
+
+
+class FakeTime:
+    def __init__(self, initial_time: float = 0.0) -> None:
+        self.current_time = initial_time
+
+    def __call__(self) -> float:
+        return self.current_time
+
+
+def test_csv_is_encoded_one_line_per_row() -> None:
+    chunks = list(iter_csv(QUESTIONS_SCHEMA, iter_question_rows(QUESTIONS)))
+
+    assert chunks[0] == "id,text,votes\n"
+    assert len(chunks) == 3
+    rows = list(csv.reader("".join(chunks).splitlines(keepends=True)))
+    assert rows[1] == ["q1", QUESTIONS[0].text, "1"]
+    assert rows[2] == ["q2", "Slides?", "2"]
+
+
+def test_ndjson_is_encoded_one_line_per_row() -> None:
+    chunks = list(iter_ndjson(HISTORY_SCHEMA, iter_history_rows(HISTORY[:2])))
+
+    assert [json.loads(chunk) for chunk in chunks] == [
+        {"timestamp": 0.0, "green": 0, "yellow": 1, "red": 0, "unknown": 2},
+        {"timestamp": 1.0, "green": 1, "yellow": 1, "red": 0, "unknown": 2},
+    ]
+    assert all(chunk.count("\n") == 1 for chunk in chunks)
+
+
+@pytest.mark.parametrize("export_format", [ExportFormat.PARQUET, ExportFormat.ARROW])
+def test_columnar_export_in_batches(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    export_format: ExportFormat,
+) -> None:
+    monkeypatch.setattr("open_cups.export.COLUMNAR_BATCH_ROWS", 2)
+    path = tmp_path / f"history.{export_format.value}"
+
+    write_export(path, HISTORY_SCHEMA, iter_history_rows(HISTORY), export_format)
+
+    if export_format is ExportFormat.PARQUET:
+        assert pq.ParquetFile(path).metadata.num_row_groups == 3
+        table = pq.read_table(path)
+    else:
+        with pa.ipc.open_file(path) as reader:
+            assert reader.num_record_batches == 3
+            table = reader.read_all()
+    assert table.schema == HISTORY_SCHEMA
+    assert table.column("green").to_pylist() == [0, 1, 2, 3, 4]
+    assert [path.name for path in tmp_path.iterdir()] == [path.name]
+
+
+def test_empty_export_has_the_columns(tmp_path: Path) -> None:
+    path = tmp_path / "questions.parquet"
+
+    write_export(path, QUESTIONS_SCHEMA, [], ExportFormat.PARQUET)
+
+    assert pq.read_table(path).schema == QUESTIONS_SCHEMA
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_rooms_are_exported_when_removed(
+    monkeypatch: pytest.MonkeyPatch,
+    request: pytest.FixtureRequest,
+    tmp_path: Path,
+    backend: str,
+) -> None:
+    fake_time = FakeTime(1000.0)
+    monkeypatch.setattr("open_cups.clock.time.time", fake_time)
+    export_directory = tmp_path / "exports"
+    application_state = create_application_state(
+        Settings(
+            sqlite_path=tmp_path / "state.db" if backend == "sqlite" else None,
+            export_directory=export_directory,
+            export_format=ExportFormat.NDJSON,
+        ),
+    )
+    if isinstance(application_state, SqliteStateBackend):
+        request.addfinalizer(application_state.close)
+    application_state.create_room("ABC123", "host")
+    application_state.join_room("ABC123", "user")
+    room = application_state.get_session_room("user")
+    assert room is not None
+    fake_time.current_time += 1
+    room.set_session_status("user", UserStatus.RED)
+    room.add_question("user", "Slides?")
+
+    fake_time.current_time += 10
+    application_state.remove_rooms_with_inactive_hosts(5)
+
+    assert application_state.get_session_room("host") is None
+    history = (
+        (export_directory / "ABC123-19700101T001651Z-history.ndjson")
+        .read_text()
+        .splitlines()
+    )
+    assert json.loads(history[-1])["red"] == 1
+    questions = (
+        export_directory / "ABC123-19700101T001651Z-questions.ndjson"
+    ).read_text()
+    assert json.loads(questions)["text"] == "Slides?"
+
+    # a later room with the same code does not replace the export
+    application_state.create_room("ABC123", "second-host")
+    fake_time.current_time += 10
+    application_state.remove_rooms_with_inactive_hosts(5)
+    assert sorted(path.name for path in export_directory.iterdir()) == [
+        "ABC123-19700101T001651Z-history.ndjson",
+        "ABC123-19700101T001651Z-questions.ndjson",
+        "ABC123-19700101T001701Z-history.ndjson",
+        "ABC123-19700101T001701Z-questions.ndjson",
+    ]
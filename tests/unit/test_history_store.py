@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import pytest
+
+from open_cups.history_store import MemoryMappedHistory
+from open_cups.types import StatusSnapshot, UserStatus
+
+
+def make_snapshot(timestamp: float, green: int = 0, red: int = 0) -> StatusSnapshot:
+    return StatusSnapshot(
+        timestamp=timestamp,
+        counts={
+            UserStatus.GREEN: green,
+            UserStatus.YELLOW: 0,
+            UserStatus.RED: red,
+            UserStatus.UNKNOWN: 0,
+        },
+    )
+
+
+def test_append_and_read_back(tmp_path: Path) -> None:
+    history = MemoryMappedHistory(tmp_path / "room.history")
+
+    history.append(make_snapshot(1.0, green=3))
+    history.append(make_snapshot(2.0, red=2))
+
+    assert len(history) == 2
+    assert history.read_range() == [
+        make_snapshot(1.0, green=3),
+        make_snapshot(2.0, red=2),
+    ]
+    history.close()
+
+
+def test_grows_beyond_initial_capacity(tmp_path: Path) -> None:
+    history = MemoryMappedHistory(tmp_path / "room.history", initial_capacity=2)
+
+    for i in range(5):
+        history.append(make_snapshot(float(i), green=i))
+
+    snapshots = history.read_range()
+    assert [s.timestamp for s in snapshots] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert [s.counts[UserStatus.GREEN] for s in snapshots] == [0, 1, 2, 3, 4]
+    history.close()
+
+
+def test_read_range_bisects_on_timestamps(tmp_path: Path) -> None:
+    history = MemoryMappedHistory(tmp_path / "room.history")
+    for i in range(10):
+        history.append(make_snapshot(float(i * 10)))
+
+    assert [s.timestamp for s in history.read_range(25.0, 60.0)] == [
+        30.0,
+        40.0,
+        50.0,
+    ]
+    assert [s.timestamp for s in history.read_range(start_time=80.0)] == [80.0, 90.0]
+    assert [s.timestamp for s in history.read_range(end_time=10.0)] == [0.0]
+    history.close()
+
+
+def test_close_deletes_file(tmp_path: Path) -> None:
+    path = tmp_path / "room.history"
+    history = MemoryMappedHistory(path)
+    history.append(make_snapshot(1.0))
+    assert history.path == path
+    assert path.exists()
+
+    history.close()
+
+    assert not path.exists()
+
+
+def test_initial_capacity_must_be_positive(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="initial_capacity must be > 0"):
+        MemoryMappedHistory(tmp_path / "room.history", initial_capacity=0)
@@ -0,0 +1,68 @@
+from open_cups.clock import SimulatedClock
+from open_cups.live_charts import encode_snapshots, get_history_args, get_history_delta
+from open_cups.stats_tracker import Config, StatsTracker
+from open_cups.types import StatusSnapshot, UserStatus
+
+HISTORY = [
+    StatusSnapshot(
+        timestamp,
+        {
+            UserStatus.GREEN: index,
+            UserStatus.YELLOW: 1,
+            UserStatus.RED: 0,
+            UserStatus.UNKNOWN: 2,
+        },
+    )
+    for index, timestamp in enumerate([10.0, 11.0, 12.0004])
+]
+
+
+def test_snapshots_are_encoded_in_the_order_of_the_statuses() -> None:
+    statuses = [UserStatus.UNKNOWN, UserStatus.RED, UserStatus.YELLOW, UserStatus.GREEN]
+
+    assert encode_snapshots(HISTORY, statuses) == [
+        [10.0, 2, 0, 1, 0],
+        [11.0, 2, 0, 1, 1],
+        [12.0, 2, 0, 1, 2],
+    ]
+
+
+def test_history_delta_only_has_newer_snapshots() -> None:
+    assert get_history_delta(HISTORY, None) == HISTORY
+    assert get_history_delta(HISTORY, 9.0) == HISTORY
+    assert get_history_delta(HISTORY, 11.0) == HISTORY[2:]
+    assert get_history_delta(HISTORY, 12.0004) == []
+
+
+def test_deltas_send_the_oldest_snapshot_kept() -> None:
+    clock = SimulatedClock(0.0)
+    tracker = StatsTracker(
+        Config(
+            dense_sampling_window_seconds=1,
+            sparse_snapshot_interval_seconds=1,
+            max_sparse_snapshot_count=2,
+        ),
+        clock=clock,
+    )
+    colors = [(status, "") for status in UserStatus]
+    renders = []
+    for since in (None, 4.0, 6.0):
+        while clock() < (since or 2.0) + 2:
+            clock.advance(1)
+            tracker.record_status_counts(HISTORY[0].counts)
+        renders.append(
+            get_history_args(
+                tracker.get_status_history_range(since),
+                since,
+                tracker.first_timestamp,
+                colors,
+            ),
+        )
+
+    # the tracker dropped the oldest snapshots between the two deltas
+    assert [render["first"] for render in renders] == [1.0, 3.0, 5.0]
+    assert [[point[0] for point in render["points"]] for render in renders] == [
+        [1.0, 2.0, 3.0, 4.0],
+        [5.0, 6.0],
+        [7.0, 8.0],
+    ]
@@ -0,0 +1,153 @@
+import atexit
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from open_cups import lock_profiler as lock_profiler_module
+from open_cups.application_state import ApplicationState
+from open_cups.lock_profiler import LockProfiler, ProfiledRLock, start_lock_profiler
+from open_cups.room import Room
+from open_cups.settings import Settings
+from open_cups.state_provider import create_metrics
+from open_cups.thread_safe_dict import ThreadSafeDict
+from open_cups.types import UserStatus
+
+
+def test_disabled_profiler_returns_plain_locks() -> None:
+    lock = LockProfiler().make_lock("Room")
+
+    assert not isinstance(lock, ProfiledRLock)
+    with lock:
+        pass
+
+
+def test_records_wait_and_hold_of_contended_lock() -> None:
+    profiler = LockProfiler(enabled=True)
+    lock = profiler.make_lock("Room")
+    holding = threading.Event()
+
+    def hold() -> None:
+        with lock:
+            holding.set()
+            time.sleep(0.05)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait()
+    with lock:
+        pass
+    thread.join()
+
+    stats = profiler.stats_by_lock()["Room"]
+    assert stats.acquisitions == 2
+    assert stats.contended == 1
+    assert stats.max_wait_seconds > 0.01
+    assert stats.max_hold_seconds >= 0.05
+    functions = {site[2] for _, site in profiler.stats_by_site()}
+    assert functions == {"hold", "test_records_wait_and_hold_of_contended_lock"}
+
+
+def test_reentrant_acquisitions_are_recorded_once() -> None:
+    profiler = LockProfiler(enabled=True)
+    lock = profiler.make_lock("Room")
+
+    with lock:
+        assert lock.acquire()
+        lock.release()
+
+    assert profiler.stats_by_lock()["Room"].acquisitions == 1
+
+
+def test_records_timeouts() -> None:
+    profiler = LockProfiler(enabled=True)
+    lock = profiler.make_lock("Room")
+    holding = threading.Event()
+    done = threading.Event()
+
+    def hold() -> None:
+        with lock:
+            holding.set()
+            done.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait()
+    assert not lock.acquire(blocking=False)
+    assert not lock.acquire(timeout=0.01)
+    done.set()
+    thread.join()
+
+    stats = profiler.stats_by_lock()["Room"]
+    assert stats.timeouts == 2
+    assert stats.acquisitions == 1
+    assert stats.wait_seconds >= 0.01
+
+
+def test_call_sites_skip_wrappers(monkeypatch: pytest.MonkeyPatch) -> None:
+    profiler = LockProfiler(enabled=True)
+    monkeypatch.setattr(lock_profiler_module, "lock_profiler", profiler)
+    room = Room("room-id", "host-id")
+    data = ThreadSafeDict[int](name="data")
+
+    room.set_session_status("user-id", UserStatus.GREEN)
+    data["key"] = 1
+    data.copy()["key"] = 2
+
+    sites = {(name, site[2]) for name, site in profiler.stats_by_site()}
+    assert ("Room", "set_session_status") in sites
+    assert ("room.sessions", "_store_session") in sites
+    assert ("data", "test_call_sites_skip_wrappers") in sites
+
+
+def test_report_and_dump(tmp_path: Path) -> None:
+    profiler = LockProfiler(enabled=True)
+    with profiler.make_lock("Room"):
+        pass
+
+    profiler.dump(tmp_path / "locks.txt")
+
+    header, row = (tmp_path / "locks.txt").read_text().splitlines()
+    assert header.split()[:3] == ["lock", "call", "site"]
+    assert row.startswith("Room")
+    assert "test_lock_profiler.py:" in row
+    profiler.reset()
+    assert profiler.stats_by_lock() == {}
+
+
+def test_prometheus_lines_in_metrics(monkeypatch: pytest.MonkeyPatch) -> None:
+    profiler = LockProfiler(enabled=True)
+    with profiler.make_lock("Room"), profiler.make_lock("ThreadSafeDict"):
+        pass
+    monkeypatch.setattr(lock_profiler_module, "lock_profiler", profiler)
+    monkeypatch.setattr("open_cups.state_provider.lock_profiler", profiler)
+    monkeypatch.setattr(
+        "open_cups.state_provider.MetricsFileExporter.start",
+        lambda _exporter: None,
+    )
+
+    metrics = create_metrics(
+        Settings(metrics_file=Path("unused.prom")),
+        ApplicationState(),
+    )
+
+    lines = metrics.render().splitlines()
+    assert 'open_cups_lock_acquisitions_total{lock="Room"} 1' in lines
+    assert any(
+        line.startswith('open_cups_lock_hold_seconds_total{lock="Thread')
+        for line in lines
+    )
+    assert "# TYPE open_cups_lock_wait_seconds_total counter" in lines
+
+
+def test_profile_is_dumped_at_exit(tmp_path: Path) -> None:
+    disabled = start_lock_profiler(LockProfiler(), Settings())
+    profiler = start_lock_profiler(
+        LockProfiler(),
+        Settings(lock_profile_path=tmp_path / "x.txt"),
+    )
+    atexit.unregister(profiler.dump)
+
+    assert not disabled.enabled
+    assert profiler.enabled
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from open_cups.message_bytes import RerunBytes
+from open_cups.metrics import Metrics
+from open_cups.state_provider import Context
+
+
+def run_app() -> None:
+    from open_cups.app import run  # noqa: PLC0415
+
+    run()
+
+
+def test_disabled_metrics_measure_nothing() -> None:
+    metrics = Metrics(enabled=False)
+
+    with RerunBytes(metrics) as rerun_bytes:
+        rerun_bytes.role = "host"
+
+    assert not rerun_bytes.sizes
+    assert "open_cups_rerun_bytes" not in metrics.render()
+
+
+def test_bytes_outside_of_a_rerun_are_not_measured() -> None:
+    metrics = Metrics()
+
+    with RerunBytes(metrics):
+        pass
+
+    assert "open_cups_rerun_bytes" not in metrics.render()
+
+
+def test_bytes_are_not_measured_without_the_enqueue_hook(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    metrics = Metrics()
+    # a Streamlit version whose ScriptRunContext has no _enqueue
+    monkeypatch.setattr("open_cups.message_bytes.get_script_run_ctx", object)
+
+    with RerunBytes(metrics):
+        pass
+
+    assert "open_cups_rerun_bytes" not in metrics.render()
+
+
+def test_app_measures_bytes_per_role_and_phase(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_METRICS_FILE", str(tmp_path / "open_cups.prom"))
+    monkeypatch.setattr(
+        "open_cups.state_provider.MetricsFileExporter.start",
+        lambda _exporter: None,
+    )
+    st.cache_resource.clear()
+
+    host = AppTest.from_function(run_app)
+    host.run()
+    host.button(key="start_room").click().run()
+    participant = AppTest.from_function(run_app)
+    participant.query_params["room_id"] = host.query_params["room_id"][0]
+    participant.run()
+
+    lines = Context._get_metrics().render().splitlines()  # noqa: SLF001
+    counts = {
+        line.split("{")[1].split("}")[0]: int(line.rsplit(" ", 1)[1])
+        for line in lines
+        if line.startswith("open_cups_rerun_bytes_count")
+    }
+    # the QR code is generated in the qr_code phase but shown in the header
+    assert counts == {
+        'role="lobby",phase="rerun"': 3,
+        **{
+            f'role="host",phase="{phase}"': 1
+            for phase in ("rerun", "header", "plots", "questions")
+        },
+        **{
+            f'role="client",phase="{phase}"': 1
+            for phase in ("rerun", "header", "plots", "question_form", "questions")
+        },
+    }
+    st.cache_resource.clear()
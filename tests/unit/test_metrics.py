@@ -0,0 +1,173 @@
+import json
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.metrics import (
+    CONTENT_TYPE,
+    NO_PHASE,
+    OVERVIEW_PATH,
+    Histogram,
+    Metrics,
+    MetricsFileExporter,
+    current_phase,
+    serve_metrics,
+)
+from open_cups.settings import Settings
+from open_cups.state_provider import create_metrics
+from open_cups.types import BackendStatistics
+
+STATISTICS = BackendStatistics(rooms=2, sessions=30, questions=4, history_points=100)
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    buckets, total, count = histogram.snapshot()
+
+    assert buckets == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert total == pytest.approx(2.65)
+    assert count == 4
+
+
+def test_render_phases_and_gauges() -> None:
+    metrics = Metrics(statistics=lambda: STATISTICS)
+    with metrics.phase("rerun"), metrics.phase("cleanup"):
+        pass
+    with metrics.phase("rerun"):
+        pass
+
+    lines = metrics.render().splitlines()
+
+    assert "# TYPE open_cups_phase_duration_seconds histogram" in lines
+    assert 'open_cups_phase_duration_seconds_count{phase="rerun"} 2' in lines
+    assert 'open_cups_phase_duration_seconds_count{phase="cleanup"} 1' in lines
+    assert 'open_cups_phase_duration_seconds_bucket{phase="rerun",le="+Inf"} 2' in lines
+    assert "# TYPE open_cups_sessions gauge" in lines
+    assert "open_cups_rooms 2" in lines
+    assert "open_cups_sessions 30" in lines
+    assert "open_cups_questions 4" in lines
+    assert "open_cups_history_points 100" in lines
+
+
+def test_current_phase_is_the_innermost_one() -> None:
+    metrics = Metrics()
+
+    with metrics.phase("rerun"):
+        with metrics.phase("header"), metrics.phase("qr_code"):
+            inner = current_phase()
+        outer = current_phase()
+
+    assert (inner, outer, current_phase()) == ("qr_code", "rerun", NO_PHASE)
+
+
+def test_render_rerun_bytes() -> None:
+    metrics = Metrics()
+    metrics.observe_rerun_bytes("host", "plots", 5000)
+    metrics.observe_rerun_bytes("host", "plots", 300)
+    metrics.observe_rerun_bytes("client", "questions", 100)
+
+    lines = metrics.render().splitlines()
+
+    assert "# TYPE open_cups_rerun_bytes histogram" in lines
+    assert 'open_cups_rerun_bytes_count{role="host",phase="plots"} 2' in lines
+    assert 'open_cups_rerun_bytes_sum{role="host",phase="plots"} 5300.0' in lines
+    bucket = 'open_cups_rerun_bytes_bucket{role="host",phase="plots",le="1024.0"}'
+    assert f"{bucket} 1" in lines
+    assert 'open_cups_rerun_bytes_count{role="client",phase="questions"} 1' in lines
+
+
+def test_disabled_metrics_record_nothing() -> None:
+    metrics = Metrics(enabled=False)
+
+    assert metrics.phase("rerun") is metrics.phase("cleanup")
+    with metrics.phase("rerun"):
+        pass
+    assert "phase=" not in metrics.render()
+
+
+def test_serve_metrics() -> None:
+    metrics = Metrics(statistics=lambda: STATISTICS)
+    server = serve_metrics(metrics, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+
+    with urllib.request.urlopen(url) as response:
+        assert response.headers["Content-Type"] == CONTENT_TYPE
+        assert "open_cups_rooms 2" in response.read().decode()
+    server.shutdown()
+    server.server_close()
+
+
+def test_serve_overview() -> None:
+    application_state = ApplicationState()
+    application_state.create_room("room-id", "host-id")
+    application_state.join_room("room-id", "user-id")
+    application_state.remove_inactive_sessions(60)
+    server = serve_metrics(
+        Metrics(),
+        "127.0.0.1",
+        0,
+        application_state.get_overview,
+    )
+    url = f"http://127.0.0.1:{server.server_address[1]}{OVERVIEW_PATH}"
+
+    with urllib.request.urlopen(url) as response:
+        assert response.headers["Content-Type"] == "application/json"
+        overview = json.load(response)
+    server.shutdown()
+    server.server_close()
+
+    assert overview["rooms"] == 1
+    assert overview["participants"]["unknown"] == 1
+    assert overview["largest_rooms"][0]["room_id"] == "room-id"
+
+
+def test_file_exporter(tmp_path: Path) -> None:
+    path = tmp_path / "open_cups.prom"
+    metrics = Metrics(statistics=lambda: STATISTICS)
+    exporter = MetricsFileExporter(metrics, path, interval_seconds=0.01)
+    exporter.start()
+
+    deadline = time.monotonic() + 5
+    while not path.exists():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    with metrics.phase("rerun"):
+        pass
+    exporter.stop()
+
+    assert 'open_cups_phase_duration_seconds_count{phase="rerun"} 1' in (
+        path.read_text().splitlines()
+    )
+
+
+def test_create_metrics_from_settings(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    exports: list[object] = []
+    monkeypatch.setattr(
+        "open_cups.state_provider.serve_metrics",
+        lambda _metrics, host, port, _overview: exports.append((host, port)),
+    )
+    monkeypatch.setattr(
+        "open_cups.state_provider.MetricsFileExporter.start",
+        lambda _exporter: exports.append("file"),
+    )
+    application_state = ApplicationState()
+
+    disabled = create_metrics(Settings(), application_state)
+    enabled = create_metrics(
+        Settings(metrics_port=9100, metrics_file=tmp_path / "open_cups.prom"),
+        application_state,
+    )
+
+    assert disabled.phase("rerun") is disabled.phase("rerun")
+    assert exports == [("127.0.0.1", 9100), "file"]
+    assert "open_cups_rooms 0" in enabled.render()
+    assert 'open_cups_participants{status="green"} 0' in enabled.render()
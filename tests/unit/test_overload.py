@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.overload import RERUNS_IN_PROGRESS_PER_LEVEL, OverloadDetector
+from open_cups.settings import Settings
+from open_cups.state_provider import create_metrics, create_overload_detector
+from open_cups.types import LoadLevel
+
+
+def test_disabled_detector_never_sheds_load() -> None:
+    detector = OverloadDetector(None)
+    detector.record(60.0)
+
+    with detector.rerun() as level:
+        assert level == LoadLevel.NORMAL
+    assert not detector.enabled
+    assert detector.level == LoadLevel.NORMAL
+
+
+@pytest.mark.parametrize(
+    ("rerun_seconds", "expected"),
+    [
+        (0.05, LoadLevel.NORMAL),
+        (0.15, LoadLevel.SLOW_REFRESH),
+        (0.3, LoadLevel.PAUSE_HISTORY),
+        (0.5, LoadLevel.CACHE_QUESTIONS),
+        (0.9, LoadLevel.REJECT_ROOMS),
+        (60.0, LoadLevel.REJECT_ROOMS),
+    ],
+)
+def test_level_doubles_with_the_rerun_latency(
+    rerun_seconds: float,
+    expected: LoadLevel,
+) -> None:
+    detector = OverloadDetector(0.1)
+    for _ in range(100):
+        detector.record(rerun_seconds)
+
+    assert detector.level == expected
+
+
+def test_single_slow_rerun_is_smoothed() -> None:
+    detector = OverloadDetector(0.1)
+    for _ in range(100):
+        detector.record(0.01)
+    detector.record(0.3)
+
+    assert detector.level == LoadLevel.NORMAL
+
+
+def test_level_rises_with_reruns_in_progress() -> None:
+    detector = OverloadDetector(1.0)
+    reruns = [detector.rerun() for _ in range(2 * RERUNS_IN_PROGRESS_PER_LEVEL + 1)]
+    levels = [rerun.__enter__() for rerun in reruns]
+
+    assert levels[RERUNS_IN_PROGRESS_PER_LEVEL - 1] == LoadLevel.NORMAL
+    assert levels[RERUNS_IN_PROGRESS_PER_LEVEL] == LoadLevel.SLOW_REFRESH
+    assert levels[-1] == LoadLevel.PAUSE_HISTORY
+
+    for rerun in reruns:
+        rerun.__exit__(None, None, None)
+    assert detector.level == LoadLevel.NORMAL
+
+
+def test_rerun_records_its_duration(monkeypatch: pytest.MonkeyPatch) -> None:
+    times = iter([0.0, 2.0])
+    monkeypatch.setattr("open_cups.overload.time.perf_counter", lambda: next(times))
+    detector = OverloadDetector(0.1)
+
+    with detector.rerun():
+        pass
+
+    # the moving average rises to a fifth of the two seconds
+    assert detector.level == LoadLevel.PAUSE_HISTORY
+
+
+def test_rerun_without_record_keeps_the_average(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    times = iter([0.0, 2.0])
+    monkeypatch.setattr("open_cups.overload.time.perf_counter", lambda: next(times))
+    detector = OverloadDetector(0.1)
+
+    with detector.rerun(record=False):
+        pass
+
+    assert detector.level == LoadLevel.NORMAL
+
+
+def test_create_overload_detector_from_settings() -> None:
+    assert not create_overload_detector(Settings()).enabled
+    assert create_overload_detector(Settings(overload_rerun_ms=250)).enabled
+
+
+def test_load_level_is_added_to_metrics(tmp_path: Path) -> None:
+    detector = OverloadDetector(0.1)
+    detector.record(1.0)
+    metrics = create_metrics(
+        Settings(metrics_file=tmp_path / "metrics.prom"),
+        ApplicationState(),
+        detector,
+    )
+
+    assert "open_cups_load_level 1\n" in metrics.render()
@@ -0,0 +1,220 @@
+import asyncio
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+import streamlit as st
+from tornado.httpclient import AsyncHTTPClient
+from tornado.websocket import WebSocketClientConnection, websocket_connect
+
+from open_cups.backend import StateBackend
+from open_cups.participant_api import SESSION_NOT_FOUND, ParticipantApiServer
+from open_cups.quotas import Quotas
+from open_cups.sqlite_backend import SqliteStateBackend
+from open_cups.state_provider import Context
+from open_cups.types import UserStatus
+
+PARTICIPANT_COUNT = 200
+
+
+@pytest.fixture
+def server(backend: StateBackend) -> Iterator[ParticipantApiServer]:
+    backend.create_room("room-id", "host-id")
+    participant_api = ParticipantApiServer(backend, "127.0.0.1", 0)
+    participant_api.start()
+    yield participant_api
+    participant_api.stop()
+
+
+async def join(port: int, room_id: str) -> tuple[int, str | None]:
+    response = await AsyncHTTPClient().fetch(
+        f"http://127.0.0.1:{port}/api/rooms/{room_id}/participants",
+        method="POST",
+        body=b"",
+        raise_error=False,
+    )
+    if response.code != 201:
+        return response.code, None
+    return response.code, json.loads(response.body)["session_id"]
+
+
+async def connect(port: int, session_id: str) -> WebSocketClientConnection:
+    return await websocket_connect(
+        f"ws://127.0.0.1:{port}/api/rooms/room-id/participants/{session_id}/socket",
+    )
+
+
+async def request(
+    connection: WebSocketClientConnection,
+    message: dict[str, Any] | str,
+) -> dict[str, Any]:
+    await connection.write_message(
+        message if isinstance(message, str) else json.dumps(message),
+    )
+    reply = await connection.read_message()
+    assert isinstance(reply, str)
+    result: dict[str, Any] = json.loads(reply)
+    return result
+
+
+async def run_audience(port: int) -> list[str]:
+    async def participant(index: int) -> str:
+        _, session_id = await join(port, "room-id")
+        assert session_id is not None
+        connection = await connect(port, session_id)
+        status = [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED][index % 3]
+        await connection.write_message(json.dumps({"op": "heartbeat"}))
+        await connection.write_message(
+            json.dumps({"op": "status", "status": status.name}),
+        )
+        # replies are in order, so all earlier messages have been handled
+        await request(connection, {"op": "questions"})
+        connection.close()
+        return session_id
+
+    return await asyncio.gather(
+        *(participant(index) for index in range(PARTICIPANT_COUNT)),
+    )
+
+
+def test_audience_joins_and_sets_status(
+    backend: StateBackend,
+    server: ParticipantApiServer,
+) -> None:
+    session_ids = asyncio.run(run_audience(server.port))
+
+    room = backend.get_session_room("host-id")
+    assert room is not None
+    statuses = dict(room)
+    assert set(statuses) == set(session_ids)
+    assert sorted(statuses.values(), key=lambda status: status.name) == sorted(
+        [UserStatus.GREEN, UserStatus.YELLOW, UserStatus.RED] * 66
+        + [UserStatus.GREEN, UserStatus.YELLOW],
+        key=lambda status: status.name,
+    )
+
+
+async def run_questions(port: int) -> None:
+    _, asking = await join(port, "room-id")
+    _, voting = await join(port, "room-id")
+    assert asking is not None
+    assert voting is not None
+    asking_connection = await connect(port, asking)
+    voting_connection = await connect(port, voting)
+
+    await asking_connection.write_message(json.dumps({"op": "ask", "text": " Why? "}))
+    (question,) = (await request(asking_connection, {"op": "questions"}))["questions"]
+    assert question["text"] == "Why?"
+    assert question["votes"] == 1
+
+    await voting_connection.write_message(
+        json.dumps({"op": "upvote", "question_id": question["id"]}),
+    )
+    assert await request(voting_connection, {"op": "questions"}) == {
+        "questions": [{**question, "votes": 2}],
+    }
+
+
+def test_questions(server: ParticipantApiServer) -> None:
+    asyncio.run(run_questions(server.port))
+
+
+async def run_invalid_messages(port: int) -> None:
+    _, session_id = await join(port, "room-id")
+    assert session_id is not None
+    connection = await connect(port, session_id)
+
+    messages: list[dict[str, Any] | str] = [
+        "not json",
+        "[]",
+        {"op": "dance"},
+        {"op": "status", "status": "PURPLE"},
+        {"op": "ask", "text": "  "},
+    ]
+    for message in messages:
+        assert await request(connection, message) == {"error": "Invalid message"}
+
+
+def test_invalid_messages(server: ParticipantApiServer) -> None:
+    asyncio.run(run_invalid_messages(server.port))
+
+
+async def run_unknown_sessions(port: int, backend: StateBackend) -> None:
+    assert await join(port, "unknown-room") == (404, None)
+
+    for unknown_session_id in ["unknown-session", "host-id"]:
+        connection = await connect(port, unknown_session_id)
+        assert await connection.read_message() is None
+        assert connection.close_code == SESSION_NOT_FOUND
+
+    # sessions that time out are closed on their next message
+    _, session_id = await join(port, "room-id")
+    assert session_id is not None
+    connection = await connect(port, session_id)
+    backend.remove_inactive_sessions(-1)
+    await connection.write_message(json.dumps({"op": "heartbeat"}))
+    assert await connection.read_message() is None
+    assert connection.close_code == SESSION_NOT_FOUND
+
+    # and so are the sessions of removed rooms
+    _, session_id = await join(port, "room-id")
+    assert session_id is not None
+    connection = await connect(port, session_id)
+    assert await request(connection, {"op": "questions"}) == {"questions": []}
+    backend.remove_rooms_with_inactive_hosts(-1)
+    await connection.write_message(json.dumps({"op": "heartbeat"}))
+    assert await connection.read_message() is None
+    assert connection.close_code == SESSION_NOT_FOUND
+
+
+def test_unknown_sessions(
+    backend: StateBackend,
+    server: ParticipantApiServer,
+) -> None:
+    asyncio.run(run_unknown_sessions(server.port, backend))
+
+
+def test_context_starts_participant_api(monkeypatch: pytest.MonkeyPatch) -> None:
+    started = []
+
+    class FakeServer:
+        def __init__(self, backend: StateBackend, host: str, port: int) -> None:
+            self.arguments = (backend, host, port)
+
+        def start(self) -> None:
+            started.append(self.arguments)
+
+    monkeypatch.setenv("OPEN_CUPS_PARTICIPANT_API_PORT", "8502")
+    monkeypatch.setattr("open_cups.state_provider.ParticipantApiServer", FakeServer)
+    st.cache_resource.clear()
+
+    application_state = Context().application_state
+
+    assert started == [(application_state, "", 8502)]
+    st.cache_resource.clear()
+
+
+async def run_quotas(port: int) -> None:
+    _, session_id = await join(port, "room-id")
+    assert session_id is not None
+    assert await join(port, "room-id") == (429, None)
+
+    connection = await connect(port, session_id)
+    assert await request(connection, {"op": "ask", "text": "Why is that so?"}) == {
+        "error": "Questions can be at most 10 characters long",
+    }
+
+
+def test_quotas(tmp_path: Path) -> None:
+    quotas = Quotas(max_participants_per_room=1, max_question_length=10)
+    backend = SqliteStateBackend(tmp_path / "state.db", quotas=quotas)
+    backend.create_room("room-id", "host-id")
+    participant_api = ParticipantApiServer(backend, "127.0.0.1", 0)
+    participant_api.start()
+
+    asyncio.run(run_quotas(participant_api.port))
+
+    participant_api.stop()
+    backend.close()
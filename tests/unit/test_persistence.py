@@ -0,0 +1,254 @@
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.persistence import (
+    EventLog,
+    decode_event,
+    encode_event,
+    open_persistent_application_state,
+    restore_application_state,
+)
+from open_cups.room import Room
+from open_cups.settings import Settings
+from open_cups.state_provider import create_application_state
+from open_cups.types import EventKind, RoomEvent, UserStatus
+
+
+def without_history(snapshot: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "rooms": sorted(
+            (
+                {key: value for key, value in room.items() if key != "history"}
+                for room in snapshot["rooms"]
+            ),
+            key=lambda room: room["room_id"],
+        ),
+    }
+
+
+def populate(application_state: ApplicationState) -> None:
+    application_state.create_room("room-1", "host-1")
+    application_state.create_room("room-2", "host-2")
+    application_state.join_room("room-1", "user-1")
+    application_state.join_room("room-1", "user-2")
+    application_state.join_room("room-2", "user-3")
+    room = application_state.rooms["room-1"]
+    room.set_session_status("user-1", UserStatus.GREEN)
+    room.set_session_status("user-2", UserStatus.RED)
+    room.add_question("user-1", "First question")
+    room.add_question("user-2", "Second question")
+    first, second = sorted(room.get_open_questions(), key=lambda q: q.text)
+    room.upvote_question("user-2", first.id)
+    room.close_question(second.id)
+
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        RoomEvent(EventKind.ROOM_CREATED, "room", session_id="host"),
+        RoomEvent(EventKind.ROOM_REMOVED, "room"),
+        RoomEvent(
+            EventKind.SESSION_STATUS,
+            "room",
+            session_id="user",
+            status=UserStatus.YELLOW,
+        ),
+        RoomEvent(EventKind.SESSION_REMOVED, "room", session_id="user"),
+        RoomEvent(
+            EventKind.QUESTION_ADDED,
+            "room",
+            session_id="user",
+            question_id="question",
+            text="Wie geht's? 🟢",
+        ),
+        RoomEvent(
+            EventKind.QUESTION_UPVOTED,
+            "room",
+            session_id="user",
+            question_id="question",
+        ),
+        RoomEvent(EventKind.QUESTION_CLOSED, "room", question_id="question"),
+    ],
+)
+def test_event_encoding_round_trip(event: RoomEvent) -> None:
+    assert decode_event(encode_event(event)) == event
+
+
+def test_restore_replays_logged_events(tmp_path: Path) -> None:
+    application_state = ApplicationState()
+    event_log = EventLog(tmp_path, application_state.to_snapshot)
+    application_state.add_listener(event_log.append)
+
+    populate(application_state)
+    event_log.close()
+
+    restored = restore_application_state(tmp_path)
+
+    assert without_history(restored.to_snapshot()) == without_history(
+        application_state.to_snapshot(),
+    )
+
+
+def test_inactive_sessions_and_rooms_are_removed_after_restore(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr("open_cups.clock.time.time", lambda: 0.0)
+    application_state = ApplicationState()
+    event_log = EventLog(tmp_path, application_state.to_snapshot)
+    application_state.add_listener(event_log.append)
+    populate(application_state)
+
+    monkeypatch.setattr("open_cups.clock.time.time", lambda: 100.0)
+    application_state.rooms["room-1"].update_host_last_seen()
+    application_state.rooms["room-1"].update_session("user-1")
+    application_state.rooms["room-1"].remove_inactive_sessions(timeout_seconds=10)
+    application_state.remove_rooms_with_inactive_hosts(timeout_seconds=10)
+    event_log.close()
+
+    restored = restore_application_state(tmp_path)
+
+    assert list(restored.rooms) == ["room-1"]
+    assert list(restored.rooms["room-1"]) == [("user-1", UserStatus.GREEN)]
+
+
+def test_compaction_writes_snapshot_and_drops_old_segments(tmp_path: Path) -> None:
+    application_state = ApplicationState()
+    event_log = EventLog(
+        tmp_path,
+        application_state.to_snapshot,
+        compact_every_events=5,
+    )
+    application_state.add_listener(event_log.append)
+
+    populate(application_state)
+    event_log.flush()
+    application_state.rooms["room-2"].set_session_status("user-3", UserStatus.GREEN)
+    event_log.close()
+
+    assert (tmp_path / "snapshot.json").exists()
+    assert [path.name for path in sorted(tmp_path.glob("events-*.log"))] == [
+        "events-00000001.log",
+    ]
+
+    restored = restore_application_state(tmp_path)
+
+    assert without_history(restored.to_snapshot()) == without_history(
+        application_state.to_snapshot(),
+    )
+    assert restored.rooms["room-1"].get_status_history() == (
+        application_state.rooms["room-1"].get_status_history()
+    )
+
+
+def test_torn_last_write_is_ignored(tmp_path: Path) -> None:
+    application_state = ApplicationState()
+    event_log = EventLog(tmp_path, application_state.to_snapshot)
+    application_state.add_listener(event_log.append)
+    application_state.create_room("room-1", "host-1")
+    event_log.close()
+
+    with (tmp_path / "events-00000000.log").open("a", encoding="utf-8") as file:
+        file.write('{"k":"room_crea')
+
+    restored = restore_application_state(tmp_path)
+
+    assert list(restored.rooms) == ["room-1"]
+
+
+def test_background_thread_commits_batches(tmp_path: Path) -> None:
+    application_state = ApplicationState()
+    event_log = EventLog(
+        tmp_path,
+        application_state.to_snapshot,
+        flush_interval_seconds=0.001,
+    )
+    application_state.add_listener(event_log.append)
+    event_log.start()
+
+    application_state.create_room("room-1", "host-1")
+    segment = tmp_path / "events-00000000.log"
+    deadline = time.monotonic() + 5
+    while not segment.read_text(encoding="utf-8") and time.monotonic() < deadline:
+        time.sleep(0.001)
+    event_log.close()
+
+    assert "room_created" in segment.read_text(encoding="utf-8")
+
+
+def test_warm_restart_keeps_rooms(tmp_path: Path) -> None:
+    application_state = open_persistent_application_state(tmp_path)
+    populate(application_state)
+    expected = without_history(application_state.to_snapshot())
+
+    # wait for the group commit of the background thread
+    deadline = time.monotonic() + 5
+    while (
+        without_history(restore_application_state(tmp_path).to_snapshot()) != expected
+        and time.monotonic() < deadline
+    ):
+        time.sleep(0.01)
+
+    restarted = create_application_state(Settings(state_directory=tmp_path))
+
+    assert isinstance(restarted, ApplicationState)
+    assert without_history(restarted.to_snapshot()) == expected
+
+
+def test_restore_from_snapshot_only(tmp_path: Path) -> None:
+    application_state = ApplicationState()
+    populate(application_state)
+    event_log = EventLog(tmp_path, application_state.to_snapshot)
+    event_log.compact()
+    event_log.close()
+    # a segment that was already compacted, left behind by a crash
+    (tmp_path / "events-00000000.log").write_text(
+        encode_event(RoomEvent(EventKind.ROOM_CREATED, "stale", session_id="host")),
+        encoding="utf-8",
+    )
+
+    restored = restore_application_state(tmp_path, history_directory=tmp_path / "h")
+
+    assert without_history(restored.to_snapshot()) == without_history(
+        application_state.to_snapshot(),
+    )
+    assert "stale" not in restored.rooms
+    assert (tmp_path / "h" / "room-1.history").exists()
+    for room in restored.rooms.values():
+        room.close()
+
+
+def test_room_rejects_application_level_events() -> None:
+    room = Room("room-id", "host-id")
+
+    with pytest.raises(ValueError, match="Cannot apply"):
+        room.apply_event(RoomEvent(EventKind.ROOM_REMOVED, "room-id"))
+
+
+def test_replaying_events_is_idempotent() -> None:
+    application_state = ApplicationState()
+    events = [
+        RoomEvent(EventKind.ROOM_CREATED, "room", session_id="host"),
+        RoomEvent(EventKind.SESSION_STATUS, "room", "user", UserStatus.RED),
+        RoomEvent(EventKind.QUESTION_ADDED, "room", "user", question_id="q", text="?"),
+        RoomEvent(EventKind.QUESTION_UPVOTED, "room", "other", question_id="q"),
+        RoomEvent(EventKind.QUESTION_CLOSED, "room", question_id="q"),
+        RoomEvent(EventKind.QUESTION_UPVOTED, "room", "other", question_id="q"),
+        RoomEvent(EventKind.SESSION_REMOVED, "room", session_id="user"),
+        RoomEvent(EventKind.SESSION_STATUS, "missing", "user", UserStatus.RED),
+    ]
+
+    for event in events + events:
+        application_state.apply_event(event)
+
+    room = application_state.rooms["room"]
+    assert list(room) == []
+    assert room.get_open_questions() == []
+
+    application_state.apply_event(RoomEvent(EventKind.ROOM_REMOVED, "room"))
+    application_state.apply_event(RoomEvent(EventKind.ROOM_REMOVED, "room"))
+    assert "room" not in application_state.rooms
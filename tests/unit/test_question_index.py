@@ -0,0 +1,99 @@
+import pytest
+
+from open_cups.question_index import (
+    BANDS,
+    QuestionIndex,
+    SimilarQuestionError,
+    find_most_similar,
+    get_band_keys,
+    get_shingles,
+)
+from open_cups.room import Room
+from open_cups.types import EventKind, RoomEvent
+
+
+def test_shingles_ignore_case_and_punctuation() -> None:
+    assert get_shingles("Why?") == frozenset(["why"])
+    assert get_shingles("  Is  it?") == get_shingles("is it")
+    assert get_shingles("is it") == frozenset(["is ", "s i", " it"])
+
+
+def test_similar_texts_share_band_keys() -> None:
+    keys = get_band_keys(get_shingles("What is the deadline for the homework?"))
+    similar_keys = get_band_keys(get_shingles("what is the deadline of the homework"))
+    other_keys = get_band_keys(get_shingles("When is the exam?"))
+
+    assert len(keys) == BANDS
+    # the same in every process, as the keys are stored in SQLite
+    assert keys == get_band_keys(get_shingles("What is the deadline for the homework"))
+    assert set(keys) & set(similar_keys)
+    assert not set(keys) & set(other_keys)
+
+
+def test_find_most_similar() -> None:
+    shingles = get_shingles("How does this work?")
+    candidates = [
+        ("other", get_shingles("When is the exam?")),
+        ("similar", get_shingles("How does that work?")),
+        ("same", get_shingles("how does this work")),
+    ]
+
+    assert find_most_similar(shingles, candidates) == "same"
+    assert find_most_similar(shingles, candidates[:2]) == "similar"
+    assert find_most_similar(shingles, candidates[:1]) is None
+
+
+def test_index_finds_open_questions_only() -> None:
+    index = QuestionIndex()
+    index.add("deadline", "What is the deadline for the homework?")
+    index.add("exam", "When is the exam?")
+
+    assert index.find_similar("what's the deadline for the homework") == "deadline"
+    assert index.find_similar("Can you repeat the last slide?") is None
+
+    index.remove("deadline")
+    index.remove("deadline")
+    assert index.find_similar("What is the deadline for the homework?") is None
+    assert index.find_similar("When's the exam?") == "exam"
+
+
+def test_room_offers_similar_questions() -> None:
+    room = Room("room-id", "host-id")
+    question_id = room.add_question("user-1", "How does this work?")
+
+    with pytest.raises(SimilarQuestionError) as error:
+        room.add_question("user-2", "How does that work?", allow_similar=False)
+
+    assert error.value.question.id == question_id
+    assert str(error.value) == (
+        "A similar question was already asked: How does this work?"
+    )
+    room.add_question("user-2", "How does that work?")
+    room.close_question(question_id)
+    room.close_question(room.get_open_questions()[0].id)
+    room.add_question("user-2", "How does that work?", allow_similar=False)
+
+
+def test_restored_and_replayed_questions_are_indexed() -> None:
+    room = Room("room-id", "host-id")
+    room.add_question("user-1", "How does this work?")
+    restored = Room.from_snapshot(room.to_snapshot())
+    restored.apply_event(
+        RoomEvent(
+            EventKind.QUESTION_ADDED,
+            "room-id",
+            "user-2",
+            question_id="exam",
+            text="When is the exam?",
+        ),
+    )
+
+    with pytest.raises(SimilarQuestionError):
+        restored.add_question("user-3", "How does that work?", allow_similar=False)
+    with pytest.raises(SimilarQuestionError):
+        restored.add_question("user-3", "When's the exam?", allow_similar=False)
+
+    restored.apply_event(
+        RoomEvent(EventKind.QUESTION_CLOSED, "room-id", question_id="exam"),
+    )
+    restored.add_question("user-3", "When's the exam?", allow_similar=False)
@@ -0,0 +1,157 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.backend import StateBackend
+from open_cups.clock import SimulatedClock
+from open_cups.persistence import restore_application_state
+from open_cups.quotas import (
+    SESSION_BYTES,
+    SNAPSHOT_BYTES,
+    QuotaExceededError,
+    Quotas,
+)
+from open_cups.room import Room
+from open_cups.settings import Settings
+from open_cups.state_provider import create_application_state
+from open_cups.types import EventKind, RoomEvent
+
+QUOTAS = Quotas(
+    max_rooms=2,
+    max_participants_per_room=2,
+    max_open_questions_per_room=2,
+    max_question_length=10,
+)
+
+
+@pytest.fixture
+def quotas() -> Quotas:
+    return QUOTAS
+
+
+def test_invalid_quotas() -> None:
+    with pytest.raises(ValueError, match="max_rooms must be > 0"):
+        Quotas(max_rooms=0)
+
+
+def test_room_quota(backend: StateBackend) -> None:
+    backend.create_room("room-1", "host-1")
+    backend.create_room("room-2", "host-2")
+
+    with pytest.raises(QuotaExceededError, match="at most 2 rooms"):
+        backend.create_room("room-3", "host-3")
+    assert backend.get_statistics().rooms == 2
+
+
+def test_participant_quota(backend: StateBackend) -> None:
+    backend.create_room("room-id", "host-id")
+    backend.join_room("room-id", "user-1")
+    backend.join_room("room-id", "user-2")
+    # joining again does not take another place
+    backend.join_room("room-id", "user-2")
+
+    with pytest.raises(QuotaExceededError, match="at most 2 participants"):
+        backend.join_room("room-id", "user-3")
+    assert backend.get_session_room("user-3") is None
+
+
+def test_question_quotas(backend: StateBackend) -> None:
+    backend.create_room("room-id", "host-id")
+    backend.join_room("room-id", "user-id")
+    room = backend.get_session_room("user-id")
+    assert room is not None
+
+    with pytest.raises(QuotaExceededError, match="at most 10 characters"):
+        room.add_question("user-id", "Why is that so?")
+    question_id = room.add_question("user-id", "Why?")
+    room.add_question("user-id", "How?")
+    with pytest.raises(QuotaExceededError, match="at most 2 open questions"):
+        room.add_question("user-id", "What?")
+
+    # closed questions make room for new ones
+    room.close_question(question_id)
+    room.add_question("user-id", "What?")
+    assert len(room.get_open_questions()) == 2
+
+
+def test_concurrent_joins_respect_the_participant_quota() -> None:
+    room = Room("room-id", "host-id", quotas=Quotas(max_participants_per_room=10))
+    barrier = threading.Barrier(50)
+    rejected = []
+
+    def join(session_id: str) -> None:
+        barrier.wait()
+        try:
+            room.join(session_id)
+        except QuotaExceededError:
+            rejected.append(session_id)
+
+    threads = [
+        threading.Thread(target=join, args=(f"user-{index}",)) for index in range(50)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(list(room)) == 10
+    assert len(rejected) == 40
+
+
+def test_restored_state_keeps_quotas(tmp_path: Path) -> None:
+    application_state = ApplicationState()
+    application_state.create_room("room-1", "host-1")
+    restored = ApplicationState.from_snapshot(
+        application_state.to_snapshot(),
+        quotas=QUOTAS,
+    )
+    restored.join_room("room-1", "user-1")
+    restored.join_room("room-1", "user-2")
+    with pytest.raises(QuotaExceededError):
+        restored.join_room("room-1", "user-3")
+
+    replayed = restore_application_state(tmp_path, quotas=QUOTAS)
+    replayed.apply_event(
+        RoomEvent(EventKind.ROOM_CREATED, "room-1", session_id="host-1"),
+    )
+    replayed.create_room("room-2", "host-2")
+    with pytest.raises(QuotaExceededError):
+        replayed.create_room("room-3", "host-3")
+    replayed.join_room("room-1", "user-1")
+    replayed.join_room("room-1", "user-2")
+    with pytest.raises(QuotaExceededError):
+        replayed.join_room("room-1", "user-3")
+
+
+def test_settings_configure_quotas(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPEN_CUPS_MAX_ROOMS", "1")
+    application_state = create_application_state(Settings.from_env())
+    application_state.create_room("room-1", "host-1")
+
+    with pytest.raises(QuotaExceededError):
+        application_state.create_room("room-2", "host-2")
+
+
+def test_memory_usage_grows_with_the_room() -> None:
+    clock = SimulatedClock()
+    application_state = ApplicationState(clock=clock)
+    application_state.create_room("room-id", "host-id")
+    empty = application_state.get_memory_usage()["room-id"]
+    assert empty.total_bytes == 0
+
+    for index in range(100):
+        application_state.join_room("room-id", f"user-{index}")
+        clock.advance(1)
+    room = application_state.rooms["room-id"]
+    room.add_question("user-0", "x" * 1000)
+    usage = application_state.get_memory_usage()["room-id"]
+
+    assert usage.sessions_bytes >= 100 * SESSION_BYTES
+    assert usage.questions_bytes > 1000
+    assert usage.history_bytes > 0
+    assert usage.history_bytes % SNAPSHOT_BYTES == 0
+    assert usage.total_bytes == (
+        usage.sessions_bytes + usage.questions_bytes + usage.history_bytes
+    )
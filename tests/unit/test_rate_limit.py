@@ -0,0 +1,134 @@
+from pathlib import Path
+
+import pytest
+
+from open_cups.backend import StateBackend
+from open_cups.clock import SimulatedClock
+from open_cups.quotas import Quotas
+from open_cups.rate_limit import ActionRateLimiter, RateLimitedError, TokenBucket
+from open_cups.room import Room
+from open_cups.sqlite_backend import SqliteStateBackend
+
+QUOTAS = Quotas(
+    questions_per_minute=2,
+    room_questions_per_minute=3,
+    upvotes_per_minute=1,
+    room_upvotes_per_minute=60,
+)
+
+
+@pytest.fixture
+def clock() -> SimulatedClock:
+    return SimulatedClock()
+
+
+@pytest.fixture
+def quotas() -> Quotas:
+    return QUOTAS
+
+
+def test_token_bucket_refills_continuously() -> None:
+    bucket = TokenBucket(6, now=0.0)
+    for _ in range(6):
+        assert bucket.refill(0.0)
+        bucket.take()
+    assert not bucket.refill(0.0)
+    # one token every ten seconds
+    assert not bucket.refill(9.0)
+    assert bucket.refill(10.0)
+    # never more than a minute's worth
+    assert bucket.is_full(1000.0)
+
+
+def test_question_rate_limits(backend: StateBackend, clock: SimulatedClock) -> None:
+    backend.create_room("room-id", "host-id")
+    for session_id in ["user-1", "user-2"]:
+        backend.join_room("room-id", session_id)
+    room = backend.get_session_room("user-1")
+    assert room is not None
+
+    room.add_question("user-1", "First?")
+    room.add_question("user-1", "Second?")
+    with pytest.raises(RateLimitedError, match="limit of 2 questions per minute"):
+        room.add_question("user-1", "Third?")
+    room.add_question("user-2", "Third?")
+    with pytest.raises(RateLimitedError, match="The room has reached the limit"):
+        room.add_question("user-2", "Fourth?")
+
+    # the room refills a token every 20 seconds, the sessions every 30
+    clock.advance(20)
+    with pytest.raises(RateLimitedError, match="limit of 2 questions per minute"):
+        room.add_question("user-1", "Fourth?")
+    # the rejection did not use up the room's token
+    room.add_question("user-2", "Fourth?")
+    assert len(room.get_open_questions()) == 4
+
+
+def test_upvote_rate_limits(backend: StateBackend, clock: SimulatedClock) -> None:
+    backend.create_room("room-id", "host-id")
+    backend.join_room("room-id", "user-id")
+    room = backend.get_session_room("user-id")
+    assert room is not None
+    first = room.add_question("host-id", "First?")
+    second = room.add_question("host-id", "Second?")
+
+    room.upvote_question("user-id", first)
+    # votes that change nothing are not limited
+    room.upvote_question("user-id", first)
+    room.upvote_question("user-id", "unknown-question")
+    with pytest.raises(RateLimitedError, match="limit of 1 upvotes per minute"):
+        room.upvote_question("user-id", second)
+
+    clock.advance(60)
+    room.upvote_question("user-id", second)
+    assert [question.vote_count for question in room.get_open_questions()] == [2, 2]
+
+
+def test_buckets_are_removed_with_inactive_sessions(clock: SimulatedClock) -> None:
+    room = Room("room-id", "host-id", clock=clock, quotas=QUOTAS)
+    room.join("user-id")
+    room.add_question("user-id", "Why?")
+    questions = room._rate_limits.questions  # noqa: SLF001
+    assert questions.session_count == 1
+
+    clock.advance(10)
+    room.remove_inactive_sessions(5)
+
+    assert questions.session_count == 0
+
+
+def test_full_buckets_are_pruned(clock: SimulatedClock) -> None:
+    limiter = ActionRateLimiter("questions", 2, 60, clock)
+    limiter.check("user-1")
+    clock.advance(20)
+    limiter.check("user-2")
+
+    # user-1 and the room have refilled, user-2 has not
+    clock.advance(20)
+    assert not limiter.prune()
+    assert limiter.session_count == 1
+
+    clock.advance(20)
+    assert limiter.prune()
+    assert limiter.session_count == 0
+
+
+def test_sqlite_prunes_rate_limits_of_removed_sessions(
+    tmp_path: Path,
+    clock: SimulatedClock,
+) -> None:
+    backend = SqliteStateBackend(tmp_path / "state.db", clock=clock, quotas=QUOTAS)
+    backend.create_room("room-id", "host-id")
+    backend.join_room("room-id", "user-id")
+    room = backend.get_session_room("user-id")
+    assert room is not None
+    room.add_question("user-id", "Why?")
+    rate_limits = backend.get_rate_limits("room-id")
+
+    backend.remove_inactive_sessions(60)
+    assert backend.get_rate_limits("room-id") is rate_limits
+
+    clock.advance(60)
+    backend.remove_inactive_sessions(60)
+    assert backend.get_rate_limits("room-id") is not rate_limits
+    backend.close()
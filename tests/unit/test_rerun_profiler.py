@@ -0,0 +1,103 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from open_cups.rerun_profiler import UNKNOWN_ROLE, RerunProfiler, _StackRecorder
+
+# tracing every call slows the reruns down several times
+PROFILED_RUN_TIMEOUT_SECONDS = 15
+
+
+def render_plots() -> None:
+    time.sleep(0.002)
+    sorted(range(1000))
+
+
+def test_unsampled_reruns_share_a_no_op_sample(tmp_path: Path) -> None:
+    disabled = RerunProfiler(None, 1)
+    profiler = RerunProfiler(tmp_path, 3)
+
+    samples = [profiler.sample() for _ in range(6)]
+
+    assert disabled.sample() is disabled.sample()
+    assert samples[1] is samples[2] is samples[4] is disabled.sample()
+    assert len({id(sample) for sample in samples}) == 3
+    assert [sample.sampled for sample in samples[:3]] == [True, False, False]
+    # the role of one rerun does not stick to the shared sample
+    samples[1].role = "host"
+    assert samples[2].role == UNKNOWN_ROLE
+
+
+def test_sampled_rerun_writes_collapsed_stacks(tmp_path: Path) -> None:
+    profiler = RerunProfiler(tmp_path / "profiles", 1)
+
+    for _ in range(2):
+        with profiler.sample() as sample:
+            sample.role = "host"
+            render_plots()
+
+    lines = (tmp_path / "profiles" / "host.folded").read_text().splitlines()
+    stacks = dict(line.rsplit(" ", 1) for line in lines)
+    sleep = "host;test_rerun_profiler.render_plots;time.sleep"
+    assert int(stacks[sleep]) >= 4000
+    assert "host;test_rerun_profiler.render_plots;builtins.sorted" in stacks
+    assert all(stack.startswith("host;") for stack in stacks)
+
+
+def test_recorder_ignores_returns_of_outer_frames() -> None:
+    recorder = _StackRecorder()
+    frame = sys._getframe()  # noqa: SLF001
+
+    # called directly, as the profiler callback is not seen by coverage
+    recorder(frame, "return", None)
+    recorder(frame, "call", None)
+    recorder(frame, "c_call", sorted)
+    recorder(frame, "c_return", sorted)
+    recorder(frame, "return", None)
+    recorder(frame, "return", None)
+
+    assert set(recorder.stacks) == {
+        ("test_rerun_profiler.test_recorder_ignores_returns_of_outer_frames",),
+        (
+            "test_rerun_profiler.test_recorder_ignores_returns_of_outer_frames",
+            "builtins.sorted",
+        ),
+    }
+
+
+def run_app() -> None:
+    from open_cups.app import run  # noqa: PLC0415
+
+    run()
+
+
+def test_app_samples_reruns_per_role(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("OPEN_CUPS_PROFILE_EVERY", "1")
+    st.cache_resource.clear()
+
+    host = AppTest.from_function(run_app, default_timeout=PROFILED_RUN_TIMEOUT_SECONDS)
+    host.run()
+    host.button(key="start_room").click().run()
+    participant = AppTest.from_function(
+        run_app,
+        default_timeout=PROFILED_RUN_TIMEOUT_SECONDS,
+    )
+    participant.query_params["room_id"] = host.query_params["room_id"][0]
+    participant.run()
+    participant.run()
+
+    assert {path.name for path in tmp_path.iterdir()} == {
+        "client.folded",
+        "host.folded",
+        "lobby.folded",
+    }
+    assert "app.show_active_room_host" in (tmp_path / "host.folded").read_text()
+    st.cache_resource.clear()
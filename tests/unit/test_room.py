@@ -1,6 +1,12 @@
+import threading
+import time
+from pathlib import Path
+
 import pytest
 
+from open_cups.clock import SimulatedClock
 from open_cups.room import Room
+from open_cups.types import EventKind, RoomEvent, UserStatus
 
 
 def test_upvote_nonexistent_question_does_not_crash() -> None:
@@ -96,7 +102,98 @@ def test_questions_sorted_by_vote_count() -> None:
 
 
 def test_integration_with_stats_tracker(monkeypatch: pytest.MonkeyPatch) -> None:
-    monkeypatch.setattr("open_cups.room.time.time", lambda: 10.0)
+    monkeypatch.setattr("open_cups.clock.time.time", lambda: 10.0)
     room = Room("room-id", "host-id")
 
     assert room.get_status_history() == []
+    assert room.get_status_history_start() is None
+    room.set_session_status("user-1", UserStatus.GREEN)
+    assert room.get_status_history_start() == 10.0
+
+
+def test_closed_room_keeps_history_in_memory(tmp_path: Path) -> None:
+    clock = SimulatedClock()
+    room = Room("room-id", "host-id", tmp_path, clock=clock)
+    room.set_session_status("user-1", UserStatus.GREEN)
+    clock.advance(120)
+    room.set_session_status("user-1", UserStatus.RED)
+    assert room.get_status_history_start() == 0
+    assert room.get_status_history_length() == 2
+    room.close()
+
+    # a session that found the room just before it was removed
+    clock.advance(120)
+    room.set_session_status("user-1", UserStatus.YELLOW)
+
+    assert list(tmp_path.iterdir()) == []
+    assert room.get_status_history_start() == 0
+    assert [snapshot.timestamp for snapshot in room.get_status_history()] == [
+        0,
+        120,
+        240,
+    ]
+    assert [snapshot.timestamp for snapshot in room.get_status_history(120)] == [
+        120,
+        240,
+    ]
+
+
+def test_status_counts_and_version_follow_sessions() -> None:
+    room = Room("room-id", "host-id")
+    assert room.version == 0
+
+    room.set_session_status("user-1", UserStatus.GREEN)
+    room.set_session_status("user-2", UserStatus.GREEN)
+    room.set_session_status("user-2", UserStatus.RED)
+    room.remove_inactive_sessions(-1)
+    room.apply_event(RoomEvent(EventKind.SESSION_REMOVED, "room-id", "user-1"))
+    room.apply_event(
+        RoomEvent(EventKind.SESSION_STATUS, "room-id", "user-3", UserStatus.YELLOW),
+    )
+
+    assert room.get_status_counts() == {
+        UserStatus.UNKNOWN: 0,
+        UserStatus.GREEN: 0,
+        UserStatus.YELLOW: 1,
+        UserStatus.RED: 0,
+    }
+    assert room.version == 6
+
+    restored = Room.from_snapshot(room.to_snapshot())
+    assert restored.get_status_counts() == room.get_status_counts()
+    room.close()
+    restored.close()
+
+
+def test_concurrent_status_writes_are_applied_in_batches() -> None:
+    writer_count = 8
+    events: list[RoomEvent] = []
+    writers: list[threading.Thread] = []
+
+    def on_event(event: RoomEvent) -> None:
+        events.append(event)
+        if len(events) == 1:
+            # writes queued while the first one is applied join its batch
+            for writer in writers:
+                writer.start()
+            time.sleep(0.2)
+
+    room = Room("room-id", "host-id", on_event=on_event)
+
+    def write(session_id: str) -> None:
+        room.set_session_status(session_id, UserStatus.RED)
+        # read your own write
+        assert room.get_session_status(session_id) == UserStatus.RED
+
+    writers.extend(
+        threading.Thread(target=write, args=(f"user-{index}",))
+        for index in range(writer_count)
+    )
+    room.set_session_status("first-user", UserStatus.GREEN)
+    for writer in writers:
+        writer.join()
+
+    assert room.version == 1
+    assert len(events) == writer_count + 1
+    assert room.get_status_counts()[UserStatus.RED] == writer_count
+    room.close()
@@ -0,0 +1,116 @@
+import pytest
+import streamlit as st
+
+from open_cups.app import get_cached_open_questions
+from open_cups.application_state import ApplicationState
+from open_cups.backend import StateBackend
+from open_cups.room_codes import (
+    MAX_ROOM_CODE_ATTEMPTS,
+    ROOM_CODE_ALPHABET,
+    ROOM_CODE_LENGTH,
+    NoFreeRoomCodeError,
+    generate_room_code,
+    normalize_room_code,
+)
+from open_cups.session_state import SessionState
+from open_cups.state_provider import ClientState, LobbyState
+
+# rooms created by earlier versions have UUIDs
+LEGACY_ROOM_ID = "9c1e5f4a-6d2b-4c3e-8f7a-2b1c0d9e8f7a"
+
+
+def test_generated_codes_use_the_alphabet() -> None:
+    codes = {generate_room_code() for _ in range(1000)}
+
+    assert len(codes) == 1000
+    for code in codes:
+        assert len(code) == ROOM_CODE_LENGTH
+        assert set(code) <= set(ROOM_CODE_ALPHABET)
+        assert normalize_room_code(code) == code
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("ab12cd", "AB12CD"),
+        (" XYZ789\n", "XYZ789"),
+        ("oil0ab", "0110AB"),
+        (LEGACY_ROOM_ID, LEGACY_ROOM_ID),
+        ("abcdeu", "abcdeu"),
+        ("abc", "abc"),
+    ],
+)
+def test_typed_codes_are_normalized(text: str, expected: str) -> None:
+    assert normalize_room_code(text) == expected
+
+
+def test_lobby_draws_another_code_when_taken(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    application_state = ApplicationState()
+    application_state.create_room("TAKEN0", "other-host")
+    monkeypatch.setattr(
+        "open_cups.state_provider.generate_room_code",
+        iter(["TAKEN0", "FREE00"]).__next__,
+    )
+    session_state = SessionState()
+    lobby = LobbyState(application_state, session_state)
+
+    lobby.create_room()
+
+    room = application_state.get_session_room(session_state.session_id)
+    assert room is not None
+    assert room.room_id == "FREE00"
+
+
+def test_lobby_gives_up_when_all_codes_are_taken(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    application_state = ApplicationState()
+    application_state.create_room("TAKEN0", "other-host")
+    codes = iter(["TAKEN0"] * MAX_ROOM_CODE_ATTEMPTS + ["FREE00"])
+    monkeypatch.setattr("open_cups.state_provider.generate_room_code", codes.__next__)
+    session_state = SessionState()
+
+    with pytest.raises(NoFreeRoomCodeError, match="No free room code"):
+        LobbyState(application_state, session_state).create_room()
+    assert application_state.get_session_room(session_state.session_id) is None
+
+
+def test_lobby_joins_typed_code() -> None:
+    application_state = ApplicationState()
+    application_state.create_room("R00M12", "host-id")
+    session_state = SessionState()
+
+    LobbyState(application_state, session_state).join_room(" rOOm12 ")
+
+    room = application_state.get_session_room(session_state.session_id)
+    assert room is not None
+    assert room.room_id == "R00M12"
+
+
+def test_cached_questions_are_not_shared_by_a_recycled_code(
+    backend: StateBackend,
+) -> None:
+    backend.create_room("AB12CD", "host-1")
+    backend.join_room("AB12CD", "user")
+    room = backend.get_session_room("user")
+    assert room is not None
+    room.add_question("user", "Old question?")
+    old_questions = get_cached_open_questions(
+        "AB12CD",
+        "host-1",
+        ClientState(room, "user"),
+    )
+    backend.remove_rooms_with_inactive_hosts(-1)
+    backend.create_room("AB12CD", "host-2")
+    backend.join_room("AB12CD", "user")
+    room = backend.get_session_room("user")
+    assert room is not None
+
+    state = ClientState(room, "user")
+    new_questions = get_cached_open_questions(state.room_id, state.host_id, state)
+    st.cache_resource.clear()
+
+    assert [question.text for question in old_questions] == ["Old question?"]
+    assert new_questions == []
@@ -0,0 +1,241 @@
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.clock import SimulatedClock
+from open_cups.room_index import (
+    RANKING_INTERVAL_SECONDS,
+    RoomIndex,
+    encode_overview,
+    overview_prometheus_lines,
+)
+from open_cups.types import EventKind, RoomEvent, RoomSummary, UserStatus
+
+
+@pytest.fixture
+def clock() -> SimulatedClock:
+    return SimulatedClock(1000.0)
+
+
+def test_totals_follow_the_rooms(clock: SimulatedClock) -> None:
+    application_state = ApplicationState(clock=clock)
+    application_state.create_room("room-1", "host-1")
+    application_state.create_room("room-2", "host-2")
+    for user in ("a", "b", "c"):
+        application_state.join_room("room-1", user)
+    application_state.join_room("room-2", "d")
+    room = application_state.rooms["room-1"]
+    room.set_session_status("a", UserStatus.GREEN)
+    room.set_session_status("b", UserStatus.RED)
+    question_id = room.add_question("a", "Why?")
+    room.upvote_question("b", question_id)
+    room.add_question("b", "How?")
+    room.close_question(question_id)
+    application_state.remove_inactive_sessions(timeout_seconds=10)
+
+    overview = application_state.get_overview()
+
+    assert overview.rooms == 2
+    assert overview.participants == {
+        UserStatus.UNKNOWN: 2,
+        UserStatus.GREEN: 1,
+        UserStatus.YELLOW: 0,
+        UserStatus.RED: 1,
+    }
+    assert overview.questions == 1
+    assert [summary.room_id for summary in overview.largest_rooms] == [
+        "room-1",
+        "room-2",
+    ]
+
+    clock.advance(100)
+    application_state.rooms["room-2"].update_host_last_seen()
+    application_state.remove_inactive_sessions(timeout_seconds=10)
+    application_state.remove_rooms_with_inactive_hosts(timeout_seconds=10)
+
+    overview = application_state.get_overview()
+    assert overview.rooms == 1
+    assert sum(overview.participants.values()) == 0
+    assert overview.questions == 0
+
+
+def test_totals_after_many_rooms_are_removed(clock: SimulatedClock) -> None:
+    index = RoomIndex(clock)
+    entries = [index.add_room(f"room-{number}") for number in range(100)]
+    for entry in entries:
+        index.update_participants(entry, {UserStatus.GREEN: 2})
+
+    for entry in entries[:-1]:
+        index.remove_room(entry)
+
+    overview = index.get_overview()
+    assert overview.rooms == 1
+    assert overview.participants[UserStatus.GREEN] == 2
+
+
+def test_rankings_and_rates_are_updated_per_interval(clock: SimulatedClock) -> None:
+    index = RoomIndex(clock)
+    quiet = index.add_room("quiet")
+    busy = index.add_room("busy")
+    index.update_participants(quiet, {UserStatus.GREEN: 5}, writes=5)
+    index.update_participants(busy, {UserStatus.GREEN: 2}, writes=2)
+
+    assert index.get_overview().largest_rooms == []
+    index.rank()
+    assert index.get_overview().largest_rooms[0].room_id == "quiet"
+    clock.advance(RANKING_INTERVAL_SECONDS)
+    index.rank()
+    assert index.get_overview().busiest_rooms[0].room_id == "quiet"
+
+    index.update_questions(busy, 1, writes=20)
+    clock.advance(1)
+    index.rank()
+    overview = index.get_overview()
+    # the totals are up to date, the rankings wait for the interval
+    assert overview.questions == 1
+    assert overview.busiest_rooms[0].room_id == "quiet"
+
+    clock.advance(RANKING_INTERVAL_SECONDS - 1)
+    index.rank()
+    overview = index.get_overview()
+
+    assert overview.busiest_rooms == [
+        RoomSummary("busy", 2, 1, 20 / RANKING_INTERVAL_SECONDS),
+        RoomSummary("quiet", 5, 0, 0.0),
+    ]
+    assert overview.writes_per_second == 20 / RANKING_INTERVAL_SECONDS
+
+
+def test_removed_rooms_are_not_updated(clock: SimulatedClock) -> None:
+    index = RoomIndex(clock)
+    entry = index.add_room("room")
+    index.update_participants(entry, {UserStatus.RED: 3})
+    index.update_questions(entry, 2)
+
+    index.remove_room(entry)
+    index.remove_room(entry)
+    index.update_participants(entry, {UserStatus.RED: 4}, writes=1)
+    index.update_questions(entry, 3, writes=1)
+    replacement = index.add_room("room")
+    index.update_participants(replacement, {UserStatus.RED: 1})
+
+    overview = index.get_overview()
+    assert overview.rooms == 1
+    assert overview.participants[UserStatus.RED] == 1
+    assert overview.questions == 0
+
+
+def test_restored_and_replayed_rooms_are_indexed(clock: SimulatedClock) -> None:
+    application_state = ApplicationState(clock=clock)
+    application_state.create_room("room", "host")
+    application_state.join_room("room", "user")
+    application_state.rooms["room"].add_question("user", "Why?")
+
+    restored = ApplicationState.from_snapshot(
+        application_state.to_snapshot(),
+        clock=clock,
+    )
+    restored.apply_event(
+        RoomEvent(
+            EventKind.SESSION_STATUS,
+            "room",
+            session_id="other",
+            status=UserStatus.YELLOW,
+        ),
+    )
+    restored.apply_event(
+        RoomEvent(EventKind.QUESTION_ADDED, "room", "other", question_id="q", text="?"),
+    )
+    restored.apply_event(
+        RoomEvent(EventKind.SESSION_REMOVED, "room", session_id="user"),
+    )
+    restored.apply_event(RoomEvent(EventKind.QUESTION_CLOSED, "room", question_id="q"))
+
+    overview = restored.get_overview()
+    assert overview.rooms == 1
+    assert overview.participants[UserStatus.YELLOW] == 1
+    assert overview.participants[UserStatus.UNKNOWN] == 0
+    assert overview.questions == 1
+
+
+def test_sessions_are_found_through_the_index(clock: SimulatedClock) -> None:
+    index = RoomIndex(clock)
+    entry = index.add_room("room", "host")
+    index.add_session(entry, "user")
+    other = index.add_room("other")
+    # the user moved on, the late removal from the first room is ignored
+    index.add_session(other, "user")
+    index.remove_session(entry, "user")
+    index.add_session(entry, "leaver")
+    index.remove_session(entry, "leaver")
+
+    assert index.get_session_room_id("host") == "room"
+    assert index.get_session_room_id("user") == "other"
+    assert index.get_session_room_id("leaver") is None
+
+    index.remove_room(entry, ["host", "user"])
+    index.add_session(entry, "late")
+    replacement = index.add_room("room", "new-host")
+
+    assert index.get_session_room_id("host") is None
+    assert index.get_session_room_id("user") == "other"
+    assert index.get_session_room_id("late") is None
+    assert index.get_session_room_id("new-host") == "room"
+    index.remove_room(replacement)
+
+
+def test_session_rooms_follow_joins_and_removals(clock: SimulatedClock) -> None:
+    application_state = ApplicationState(clock=clock)
+    application_state.create_room("room", "host")
+    application_state.join_room("room", "user")
+    room = application_state.rooms["room"]
+
+    assert application_state.get_session_room("host") is room
+    assert application_state.get_session_room("user") is room
+    assert application_state.get_session_room("lobby") is None
+
+    clock.advance(100)
+    room.update_host_last_seen()
+    application_state.remove_inactive_sessions(timeout_seconds=10)
+    assert application_state.get_session_room("user") is None
+
+    application_state.join_room("room", "user")
+    clock.advance(100)
+    application_state.remove_rooms_with_inactive_hosts(timeout_seconds=10)
+    application_state.create_room("room", "new-host")
+    assert application_state.get_session_room("host") is None
+    assert application_state.get_session_room("user") is None
+    assert application_state.get_session_room("new-host") is not None
+
+
+def test_encode_overview(clock: SimulatedClock) -> None:
+    index = RoomIndex(clock)
+    entry = index.add_room("room")
+    index.update_participants(entry, {UserStatus.GREEN: 2}, writes=2)
+    index.rank()
+    overview = index.get_overview()
+
+    assert encode_overview(overview) == {
+        "rooms": 1,
+        "participants": {"unknown": 0, "green": 2, "yellow": 0, "red": 0},
+        "questions": 0,
+        "writes_per_second": 0.0,
+        "largest_rooms": [
+            {
+                "room_id": "room",
+                "participants": 2,
+                "questions": 0,
+                "writes_per_second": 0.0,
+            },
+        ],
+        "busiest_rooms": [
+            {
+                "room_id": "room",
+                "participants": 2,
+                "questions": 0,
+                "writes_per_second": 0.0,
+            },
+        ],
+    }
+    lines = overview_prometheus_lines(overview)
+    assert 'open_cups_participants{status="green"} 2' in lines
+    assert "open_cups_writes_per_second 0.0" in lines
@@ -0,0 +1,270 @@
+import asyncio
+import os
+import socket
+import sys
+import time
+from collections.abc import Callable
+
+import pytest
+
+from open_cups import router
+from open_cups.router import (
+    WORKER_COOKIE,
+    Router,
+    Supervisor,
+    WorkerSpec,
+    build_worker_specs,
+    serve,
+)
+from open_cups.routing import HashRing
+
+# Answers plain requests with its worker id, keeping the connection alive
+# unless asked to close it like Tornado, and echoes upgraded connections.
+FAKE_WORKER = r"""
+import asyncio
+import sys
+
+port, worker_id = int(sys.argv[1]), sys.argv[2].encode()
+
+
+async def handle(reader, writer):
+    while True:
+        try:
+            head = (await reader.readuntil(b"\r\n\r\n")).lower()
+        except asyncio.IncompleteReadError:
+            break
+        if b"upgrade: websocket" in head:
+            writer.write(b"HTTP/1.1 101 Switching Protocols\r\n\r\n%s\n" % worker_id)
+            while data := await reader.read(1024):
+                writer.write(data)
+            break
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nConnection: keep-alive\r\n"
+            b"Content-Length: %d\r\n\r\n%s" % (len(worker_id), worker_id)
+        )
+        await writer.drain()
+        if b"connection: close" in head:
+            break
+    writer.close()
+
+
+async def main():
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    await server.serve_forever()
+
+
+asyncio.run(main())
+"""
+
+WORKER_COUNT = 3
+ROOM_COUNT = 30
+AUDIENCE_SIZE = 300
+# the fake workers keep connections alive unless the router closes them
+READ_TIMEOUT_SECONDS = 10
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def fake_worker_specs(count: int) -> list[WorkerSpec]:
+    specs = []
+    for index in range(count):
+        worker_id, port = f"worker-{index}", free_port()
+        command = (sys.executable, "-c", FAKE_WORKER, str(port), worker_id)
+        specs.append(WorkerSpec(worker_id, "127.0.0.1", port, command, {**os.environ}))
+    return specs
+
+
+async def get(
+    port: int,
+    target: str,
+    cookie: str | None = None,
+) -> tuple[str, str | None]:
+    """Return the body and the worker cookie set by the response, if any."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    cookie_header = f"Cookie: {WORKER_COOKIE}={cookie}\r\n" if cookie else ""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: x\r\n{cookie_header}\r\n".encode())
+    response = await asyncio.wait_for(reader.read(), READ_TIMEOUT_SECONDS)
+    writer.close()
+
+    head, _, body = response.decode().partition("\r\n\r\n")
+    set_cookie = None
+    for line in head.split("\r\n"):
+        if line.startswith(f"Set-Cookie: {WORKER_COOKIE}="):
+            set_cookie = line.split("=", 1)[1].split(";")[0]
+    return body, set_cookie
+
+
+async def wait_until(condition: Callable[[], bool]) -> None:
+    deadline = time.monotonic() + 10
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+async def check_kept_alive_connection(
+    port: int,
+    ring: HashRing,
+    room_ids: list[str],
+) -> None:
+    """Check that requests never reach the worker of an earlier one on a connection."""
+    first_room = room_ids[0]
+    second_room = next(r for r in room_ids if ring.lookup(r) != ring.lookup(first_room))
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET /?room_id={first_room} HTTP/1.1\r\nConnection: keep-alive\r\n\r\n"
+        f"GET /?room_id={second_room} HTTP/1.1\r\n\r\n".encode(),
+    )
+    head, _, body = (
+        (await asyncio.wait_for(reader.read(), READ_TIMEOUT_SECONDS))
+        .decode()
+        .partition("\r\n\r\n")
+    )
+    writer.close()
+    assert body == ring.lookup(first_room)
+    assert "Connection: close" in head.split("\r\n")
+    assert "Connection: keep-alive" not in head
+    assert await get(port, f"/?room_id={second_room}") == (
+        ring.lookup(second_room),
+        ring.lookup(second_room),
+    )
+
+
+async def run_end_to_end() -> None:
+    specs = fake_worker_specs(WORKER_COUNT)
+    all_workers = {spec.worker_id for spec in specs}
+    proxy = Router(specs)
+    supervisor = Supervisor(proxy, specs)
+    supervisor.start()
+    server = await proxy.serve("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    stopped = asyncio.Event()
+    supervision = asyncio.create_task(supervisor.run(stopped))
+
+    try:
+        await wait_until(lambda: proxy.workers_up == all_workers)
+        ring = HashRing(all_workers)
+
+        # an audience joining rooms through their join links
+        room_ids = [f"room-{index}" for index in range(ROOM_COUNT)]
+        audience = [room_ids[index % ROOM_COUNT] for index in range(AUDIENCE_SIZE)]
+        responses = await asyncio.gather(
+            *(get(port, f"/?room_id={room_id}") for room_id in audience),
+        )
+        for room_id, (worker_id, set_cookie) in zip(audience, responses, strict=True):
+            assert worker_id == ring.lookup(room_id)
+            assert set_cookie == worker_id
+        assert {worker_id for worker_id, _ in responses} == all_workers
+
+        await check_kept_alive_connection(port, ring, room_ids)
+
+        # requests without room id stick to the worker from the cookie
+        lobby_worker, set_cookie = await get(port, "/")
+        assert set_cookie == lobby_worker
+        assert await get(port, "/_stcore/health", cookie=lobby_worker) == (
+            lobby_worker,
+            None,
+        )
+
+        # websockets are passed through after the upgrade
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            f"GET /_stcore/stream HTTP/1.1\r\nUpgrade: websocket\r\n"
+            f"Cookie: {WORKER_COOKIE}={lobby_worker}\r\n\r\n".encode(),
+        )
+        await reader.readuntil(b"\r\n\r\n")
+        assert (await reader.readline()).decode().strip() == lobby_worker
+        writer.write(b"ping\n")
+        assert await reader.readline() == b"ping\n"
+        writer.close()
+
+        # a crashed worker's rooms are not sent elsewhere until it is back
+        crashed_room = next(r for r in room_ids if ring.lookup(r) == "worker-0")
+        supervisor.process("worker-0").kill()
+        await wait_until(lambda: "worker-0" not in proxy.workers_up)
+        assert await get(port, f"/?room_id={crashed_room}") == ("", None)
+        await wait_until(lambda: proxy.workers_up == all_workers)
+        assert await get(port, f"/?room_id={crashed_room}") == ("worker-0", "worker-0")
+    finally:
+        stopped.set()
+        await supervision
+        server.close()
+        supervisor.stop()
+
+
+def test_router_end_to_end() -> None:
+    asyncio.run(run_end_to_end())
+
+
+async def run_without_workers() -> None:
+    server = await Router([]).serve("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET / HTTP/1.1\r\n\r\n")
+    assert (await reader.read()).startswith(b"HTTP/1.1 502 Bad Gateway")
+    writer.close()
+
+    # incomplete requests are dropped
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET")
+    writer.write_eof()
+    assert await reader.read() == b""
+    writer.close()
+
+    # a request line without target is routed like the root page
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET\r\nbroken header\r\n\r\n")
+    assert (await reader.read()).startswith(b"HTTP/1.1 502 Bad Gateway")
+    writer.close()
+    server.close()
+
+
+def test_router_without_workers() -> None:
+    asyncio.run(run_without_workers())
+
+
+async def run_serve() -> None:
+    stopped = asyncio.Event()
+    stopped.set()
+    await serve(fake_worker_specs(1), "127.0.0.1", free_port(), stopped)
+
+
+def test_serve_stops_workers() -> None:
+    asyncio.run(run_serve())
+
+
+def test_build_worker_specs() -> None:
+    specs = build_worker_specs(2, 9000, "main.py")
+
+    assert [(spec.worker_id, spec.port) for spec in specs] == [
+        ("worker-0", 9000),
+        ("worker-1", 9001),
+    ]
+    assert specs[1].command[1:5] == ("-m", "streamlit", "run", "main.py")
+    assert "9001" in specs[1].command
+    assert specs[1].env["OPEN_CUPS_WORKER_ID"] == "worker-1"
+    assert specs[1].env["OPEN_CUPS_WORKERS"] == "worker-0,worker-1"
+
+
+def test_main_parses_arguments(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+
+    async def fake_serve(
+        workers: list[WorkerSpec],
+        host: str,
+        port: int,
+        stopped: asyncio.Event,
+    ) -> None:
+        calls.append((len(workers), host, port, stopped.is_set()))
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(router, "serve", fake_serve)
+
+    router.main(["--workers", "3", "--port", "9100"])
+
+    assert calls == [(3, "127.0.0.1", 9100, False)]
@@ -0,0 +1,100 @@
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.routing import HashRing, RoomOnOtherWorkerError, WorkerAffinity
+from open_cups.session_state import SessionState
+from open_cups.settings import Settings
+from open_cups.state_provider import LobbyState
+
+WORKERS = ["worker-0", "worker-1", "worker-2", "worker-3"]
+ROOM_IDS = [f"room-{index}" for index in range(2000)]
+
+
+def test_rooms_are_spread_over_all_workers() -> None:
+    ring = HashRing(WORKERS)
+
+    rooms_per_worker = dict.fromkeys(WORKERS, 0)
+    for room_id in ROOM_IDS:
+        rooms_per_worker[ring.lookup(room_id)] += 1
+
+    assert ring.workers == set(WORKERS)
+    assert min(rooms_per_worker.values()) > len(ROOM_IDS) / len(WORKERS) / 2
+
+
+def test_removing_a_worker_only_moves_its_rooms() -> None:
+    ring = HashRing(WORKERS)
+    before = {room_id: ring.lookup(room_id) for room_id in ROOM_IDS}
+
+    ring.remove("worker-1")
+    after = {room_id: ring.lookup(room_id) for room_id in ROOM_IDS}
+
+    moved = {room_id for room_id in ROOM_IDS if before[room_id] != after[room_id]}
+    assert moved == {room_id for room_id in ROOM_IDS if before[room_id] == "worker-1"}
+
+    ring.add("worker-1")
+    ring.add("worker-1")
+    assert {room_id: ring.lookup(room_id) for room_id in ROOM_IDS} == before
+
+
+def test_lookup_without_workers() -> None:
+    with pytest.raises(LookupError, match="No workers available"):
+        HashRing().lookup("room-id")
+
+
+def test_worker_affinity_from_settings() -> None:
+    assert WorkerAffinity.from_settings(Settings()) is None
+
+    affinity = WorkerAffinity.from_settings(
+        Settings(worker_id="worker-0", workers=tuple(WORKERS)),
+    )
+    assert affinity is not None
+    ring = HashRing(WORKERS)
+    for room_id in ROOM_IDS[:100]:
+        assert affinity.owns(room_id) == (ring.lookup(room_id) == "worker-0")
+
+
+def test_worker_must_be_one_of_the_workers() -> None:
+    with pytest.raises(ValueError, match="worker-9 is not one of the workers"):
+        WorkerAffinity("worker-9", WORKERS)
+    with pytest.raises(ValueError, match="worker-0 is not one of the workers"):
+        WorkerAffinity("worker-0", [])
+
+
+def test_worker_settings_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPEN_CUPS_WORKER_ID", "worker-1")
+    monkeypatch.setenv("OPEN_CUPS_WORKERS", "worker-0,worker-1")
+
+    settings = Settings.from_env()
+
+    assert settings.worker_id == "worker-1"
+    assert settings.workers == ("worker-0", "worker-1")
+
+
+def test_lobby_only_creates_rooms_of_its_worker(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    ring = HashRing(WORKERS)
+    # the codes of other workers are drawn first
+    others = [r for r in ROOM_IDS if ring.lookup(r) != "worker-2"]
+    expected = next(r for r in ROOM_IDS if ring.lookup(r) == "worker-2")
+    room_ids = [*others[:10], expected]
+    session_state = SessionState()
+    monkeypatch.setattr(
+        "open_cups.state_provider.generate_room_code",
+        iter(room_ids).__next__,
+    )
+    application_state = ApplicationState()
+    lobby = LobbyState(
+        application_state,
+        session_state,
+        WorkerAffinity("worker-2", WORKERS),
+    )
+
+    lobby.create_room()
+
+    room = application_state.get_session_room(session_state.session_id)
+    assert room is not None
+    assert room.room_id == expected
+    assert expected != room_ids[0]
+    with pytest.raises(RoomOnOtherWorkerError):
+        lobby.join_room(next(r for r in ROOM_IDS if ring.lookup(r) != "worker-2"))
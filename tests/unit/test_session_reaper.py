@@ -0,0 +1,270 @@
+import asyncio
+import gc
+import logging
+import threading
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+from streamlit.runtime import Runtime, RuntimeConfig
+from streamlit.runtime.caching.storage.dummy_cache_storage import (
+    MemoryCacheStorageManager,
+)
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.memory_uploaded_file_manager import MemoryUploadedFileManager
+
+from open_cups.application_state import ApplicationState
+from open_cups.clock import SimulatedClock
+from open_cups.quotas import Quotas
+from open_cups.session_reaper import (
+    REAP_INTERVAL_SECONDS,
+    SessionReaper,
+    get_eventloop,
+)
+from open_cups.state_provider import CleanupState
+
+TIMEOUT_SECONDS = 60
+
+
+class NullClient:
+    """A browser tab that ignores the messages of its session."""
+
+    def write_forward_msg(self, msg: object) -> None:
+        pass
+
+    @property
+    def client_context(self) -> None:
+        return None
+
+
+class RunningRuntime:
+    """A Streamlit runtime with its event loop on a background thread."""
+
+    def __init__(self, script_path: Path) -> None:
+        script_path.write_text("")
+        self.runtime = Runtime(
+            RuntimeConfig(
+                script_path=str(script_path),
+                command_line=None,
+                media_file_storage=MemoryMediaFileStorage("/media"),
+                uploaded_file_manager=MemoryUploadedFileManager("/upload"),
+                cache_storage_manager=MemoryCacheStorageManager(),
+            ),
+        )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.runtime.start(), self._loop).result()
+
+    def call[T](self, function: Callable[..., T], *args: object) -> T:
+        """Call function on the event loop, after all callbacks scheduled before."""
+
+        async def call() -> T:
+            return function(*args)
+
+        return asyncio.run_coroutine_threadsafe(call(), self._loop).result()
+
+    def connect(self, existing_session_id: str | None = None) -> str:
+        return self.call(
+            self.runtime.connect_session,
+            NullClient(),
+            {},
+            existing_session_id,
+        )
+
+    def disconnect(self, streamlit_session_id: str) -> None:
+        self.call(self.runtime.disconnect_session, streamlit_session_id)
+
+    def is_kept(self, streamlit_session_id: str) -> bool:
+        """Return if the disconnected session resumes when its tab reconnects."""
+        reconnected_id = self.connect(streamlit_session_id)
+        self.disconnect(reconnected_id)
+        return reconnected_id == streamlit_session_id
+
+    def stop(self) -> None:
+        async def stop() -> None:
+            self.runtime.stop()
+            await self.runtime.stopped
+
+        asyncio.run_coroutine_threadsafe(stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        Runtime._instance = None  # noqa: SLF001
+
+
+def get_traced_size() -> int:
+    """Return the traced memory, without the tracers of coverage measurements."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(inclusive=False, filename_pattern="*/coverage/*")],
+    )
+    return sum(statistic.size for statistic in snapshot.statistics("filename"))
+
+
+@pytest.fixture
+def running_runtime(tmp_path: Path) -> Iterator[RunningRuntime]:
+    running_runtime = RunningRuntime(tmp_path / "app.py")
+    yield running_runtime
+    running_runtime.stop()
+
+
+@pytest.fixture
+def clock() -> SimulatedClock:
+    return SimulatedClock(1000.0)
+
+
+def test_abandoned_sessions_are_closed(
+    running_runtime: RunningRuntime,
+    clock: SimulatedClock,
+) -> None:
+    application_state = ApplicationState(clock=clock)
+    application_state.create_room("room", "host")
+    application_state.join_room("room", "left")
+    application_state.join_room("room", "connected")
+    reaper = SessionReaper(clock, running_runtime.runtime)
+    streamlit_session_ids = {}
+    for session_id in ("host", "left", "connected", "lobby"):
+        streamlit_session_ids[session_id] = running_runtime.connect()
+        reaper.register(session_id, streamlit_session_ids[session_id])
+    for session_id in ("host", "left", "lobby"):
+        running_runtime.disconnect(streamlit_session_ids[session_id])
+    cleanup = CleanupState(application_state, TIMEOUT_SECONDS, reaper)
+
+    cleanup.cleanup_all()
+
+    assert not running_runtime.is_kept(streamlit_session_ids["lobby"])
+    assert running_runtime.is_kept(streamlit_session_ids["left"])
+    assert running_runtime.is_kept(streamlit_session_ids["host"])
+
+    clock.advance(TIMEOUT_SECONDS + 1)
+    application_state.rooms["room"].update_host_last_seen()
+    cleanup.cleanup_all()
+
+    assert application_state.get_session_room("left") is None
+    assert not running_runtime.is_kept(streamlit_session_ids["left"])
+    assert running_runtime.is_kept(streamlit_session_ids["host"])
+    # the tab may still come back, it would rejoin from the lobby
+    assert running_runtime.runtime.is_active_session(
+        streamlit_session_ids["connected"],
+    )
+
+
+def test_sessions_are_reaped_at_most_every_interval(
+    running_runtime: RunningRuntime,
+    clock: SimulatedClock,
+) -> None:
+    application_state = ApplicationState(clock=clock)
+    reaper = SessionReaper(clock, running_runtime.runtime)
+    reaper.reap(application_state)
+    streamlit_session_id = running_runtime.connect()
+    reaper.register("lobby", streamlit_session_id)
+    running_runtime.disconnect(streamlit_session_id)
+
+    clock.advance(REAP_INTERVAL_SECONDS - 1)
+    reaper.reap(application_state)
+    assert running_runtime.is_kept(streamlit_session_id)
+
+    clock.advance(1)
+    reaper.reap(application_state)
+    assert not running_runtime.is_kept(streamlit_session_id)
+
+
+def test_reconnected_sessions_are_not_closed(
+    running_runtime: RunningRuntime,
+    clock: SimulatedClock,
+) -> None:
+    application_state = ApplicationState(clock=clock)
+    reaper = SessionReaper(clock, running_runtime.runtime)
+    streamlit_session_id = running_runtime.connect()
+    reaper.register("lobby", streamlit_session_id)
+    running_runtime.disconnect(streamlit_session_id)
+
+    def reap_and_reconnect() -> str:
+        reaper.reap(application_state)
+        # the tab reconnects before the event loop closes its session
+        return running_runtime.runtime.connect_session(
+            NullClient(),
+            {},
+            streamlit_session_id,
+        )
+
+    reconnected_id = running_runtime.call(reap_and_reconnect)
+    running_runtime.call(lambda: None)
+
+    assert reconnected_id == streamlit_session_id
+    assert running_runtime.runtime.is_active_session(streamlit_session_id)
+
+
+def test_eventloop_is_the_one_of_the_runtime(
+    running_runtime: RunningRuntime,
+) -> None:
+    # read from a private attribute, which the Streamlit pin keeps stable
+    assert get_eventloop(running_runtime.runtime) is running_runtime._loop  # noqa: SLF001
+
+
+def test_without_runtime_nothing_is_reaped(clock: SimulatedClock) -> None:
+    application_state = ApplicationState(clock=clock)
+    reaper = SessionReaper(clock)
+    reaper.register("lobby", "streamlit-session")
+
+    reaper.reap(application_state)
+
+
+def test_memory_returns_to_baseline_after_large_room_empties(
+    running_runtime: RunningRuntime,
+    clock: SimulatedClock,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    # the captured warnings about session states used outside of a script run
+    caplog.set_level(
+        logging.ERROR,
+        logger="streamlit.runtime.scriptrunner_utils.script_run_context",
+    )
+    quotas = Quotas(questions_per_minute=10, upvotes_per_minute=10)
+    application_state = ApplicationState(clock=clock, quotas=quotas)
+    application_state.create_room("room", "host")
+    room = application_state.rooms["room"]
+    reaper = SessionReaper(clock, running_runtime.runtime)
+    cleanup = CleanupState(application_state, TIMEOUT_SECONDS, reaper)
+    # Streamlit imports its file watchers with the first session
+    running_runtime.disconnect(running_runtime.connect())
+
+    def fill_and_empty_room() -> int:
+        for index in range(2000):
+            session_id = f"user-{index}"
+            application_state.join_room("room", session_id)
+            if index % 10 == 0:
+                question_id = room.add_question(session_id, f"Question {index}")
+                streamlit_session_id = running_runtime.connect()
+                session_info = running_runtime.runtime._session_mgr.get_session_info(  # noqa: SLF001
+                    streamlit_session_id,
+                )
+                assert session_info is not None
+                session_info.session.session_state["draft"] = "x" * 1000
+                reaper.register(session_id, streamlit_session_id)
+                running_runtime.disconnect(streamlit_session_id)
+            else:
+                room.upvote_question(session_id, question_id)
+        peak = get_traced_size()
+
+        clock.advance(TIMEOUT_SECONDS + REAP_INTERVAL_SECONDS)
+        room.update_host_last_seen()
+        cleanup.cleanup_all()
+        for question in room.get_open_questions():
+            room.close_question(question.id)
+        # after the sessions were closed on the event loop
+        running_runtime.call(gc.collect)
+        return peak
+
+    tracemalloc.start()
+    try:
+        fill_and_empty_room()
+        baseline = get_traced_size()
+        peak = fill_and_empty_room()
+        after = get_traced_size()
+    finally:
+        tracemalloc.stop()
+
+    assert peak - baseline > 1_000_000
+    assert after - baseline < (peak - baseline) / 100
@@ -0,0 +1,215 @@
+from pathlib import Path
+
+import pytest
+
+from open_cups.settings import Settings
+from open_cups.types import ExportFormat
+
+
+def test_defaults_without_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("OPEN_CUPS_HISTORY_DIR", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_STATE_DIR", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_SQLITE_PATH", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_PARTICIPANT_API_PORT", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_METRICS_PORT", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_METRICS_FILE", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_WORKER_ID", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_WORKERS", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_LOCK_PROFILE", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_PROFILE_DIR", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_PROFILE_EVERY", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_TRACE_FILE", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_SPANS_FILE", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_SPANS_EVERY", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_OVERLOAD_RERUN_MS", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_MAX_ROOMS", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_MAX_PARTICIPANTS", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_MAX_QUESTIONS", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_MAX_QUESTION_LENGTH", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_QUESTIONS_PER_MINUTE", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_ROOM_QUESTIONS_PER_MINUTE", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_UPVOTES_PER_MINUTE", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_ROOM_UPVOTES_PER_MINUTE", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_LIVE_CHARTS", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_EXPORT_DIR", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_EXPORT_FORMAT", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_ADMIN_TOKEN", raising=False)
+    monkeypatch.delenv("OPEN_CUPS_USER_REMOVAL_TIMEOUT", raising=False)
+
+    assert Settings.from_env() == Settings()
+
+
+def test_history_directory_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_HISTORY_DIR", str(tmp_path))
+
+    assert Settings.from_env().history_directory == tmp_path
+
+
+def test_state_directory_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_STATE_DIR", str(tmp_path))
+
+    assert Settings.from_env().state_directory == tmp_path
+
+
+def test_sqlite_path_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_SQLITE_PATH", str(tmp_path / "state.db"))
+
+    assert Settings.from_env().sqlite_path == tmp_path / "state.db"
+
+
+def test_participant_api_port_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_PARTICIPANT_API_PORT", "8502")
+
+    assert Settings.from_env().participant_api_port == 8502
+
+
+def test_metrics_export_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_METRICS_PORT", "9100")
+    monkeypatch.setenv("OPEN_CUPS_METRICS_FILE", str(tmp_path / "open_cups.prom"))
+
+    settings = Settings.from_env()
+
+    assert settings.metrics_port == 9100
+    assert settings.metrics_file == tmp_path / "open_cups.prom"
+
+
+def test_lock_profile_path_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_LOCK_PROFILE", str(tmp_path / "locks.txt"))
+
+    assert Settings.from_env().lock_profile_path == tmp_path / "locks.txt"
+
+
+def test_rerun_profiling_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("OPEN_CUPS_PROFILE_EVERY", "10")
+
+    settings = Settings.from_env()
+
+    assert settings.profile_directory == tmp_path
+    assert settings.profile_sample_every == 10
+
+
+def test_trace_path_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_TRACE_FILE", str(tmp_path / "trace.gz"))
+
+    assert Settings.from_env().trace_path == tmp_path / "trace.gz"
+
+
+def test_spans_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_SPANS_FILE", str(tmp_path / "spans.jsonl"))
+    monkeypatch.setenv("OPEN_CUPS_SPANS_EVERY", "10")
+
+    settings = Settings.from_env()
+
+    assert settings.spans_path == tmp_path / "spans.jsonl"
+    assert settings.spans_sample_every == 10
+
+
+def test_overload_rerun_target_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_OVERLOAD_RERUN_MS", "250")
+
+    assert Settings.from_env().overload_rerun_ms == 250
+
+
+def test_quotas_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPEN_CUPS_MAX_ROOMS", "100")
+    monkeypatch.setenv("OPEN_CUPS_MAX_PARTICIPANTS", "500")
+    monkeypatch.setenv("OPEN_CUPS_MAX_QUESTIONS", "50")
+    monkeypatch.setenv("OPEN_CUPS_MAX_QUESTION_LENGTH", "1000")
+
+    settings = Settings.from_env()
+
+    assert settings.max_rooms == 100
+    assert settings.max_participants_per_room == 500
+    assert settings.max_open_questions_per_room == 50
+    assert settings.max_question_length == 1000
+
+
+def test_rate_limits_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPEN_CUPS_QUESTIONS_PER_MINUTE", "3")
+    monkeypatch.setenv("OPEN_CUPS_ROOM_QUESTIONS_PER_MINUTE", "60")
+    monkeypatch.setenv("OPEN_CUPS_UPVOTES_PER_MINUTE", "30")
+    monkeypatch.setenv("OPEN_CUPS_ROOM_UPVOTES_PER_MINUTE", "600")
+
+    settings = Settings.from_env()
+
+    assert settings.questions_per_minute == 3
+    assert settings.room_questions_per_minute == 60
+    assert settings.upvotes_per_minute == 30
+    assert settings.room_upvotes_per_minute == 600
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("1", True), ("true", True), ("Yes", True), ("0", False), ("", False)],
+)
+def test_live_charts_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    value: str,
+    expected: bool,  # noqa: FBT001
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_LIVE_CHARTS", value)
+
+    assert Settings.from_env().live_charts == expected
+
+
+def test_export_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_EXPORT_DIR", str(tmp_path))
+    monkeypatch.setenv("OPEN_CUPS_EXPORT_FORMAT", "parquet")
+
+    settings = Settings.from_env()
+
+    assert settings.export_directory == tmp_path
+    assert settings.export_format == ExportFormat.PARQUET
+
+
+def test_unknown_export_format(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPEN_CUPS_EXPORT_FORMAT", "xlsx")
+
+    with pytest.raises(ValueError, match="xlsx"):
+        Settings.from_env()
+
+
+def test_admin_token_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPEN_CUPS_ADMIN_TOKEN", "s3cret")
+
+    assert Settings.from_env().admin_token == "s3cret"  # noqa: S105
+
+
+def test_user_removal_timeout_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OPEN_CUPS_USER_REMOVAL_TIMEOUT", "90")
+
+    assert Settings.from_env().user_removal_timeout_seconds == 90
@@ -0,0 +1,336 @@
+import atexit
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from open_cups.app import tag_rerun_span
+from open_cups.application_state import ApplicationState
+from open_cups.settings import Settings
+from open_cups.spans import (
+    PARTICIPANTS,
+    ROLE,
+    ROOM_ID,
+    OtlpJsonFileExporter,
+    Span,
+    Tracer,
+    start_tracer,
+)
+from open_cups.sqlite_backend import SqliteStateBackend
+from open_cups.state_provider import ClientState
+
+APP_SCRIPT = """
+from streamlit.testing.v1 import AppTest
+
+APP = "from open_cups.app import run; run()"
+host = AppTest.from_string(APP, default_timeout=10)
+host.run()
+host.button(key="start_room").click().run()
+participant = AppTest.from_string(APP, default_timeout=10)
+participant.query_params["room_id"] = host.query_params["room_id"][0]
+participant.run()
+participant.run()
+"""
+
+
+def read_spans(path: Path) -> list[dict[str, Any]]:
+    spans = []
+    for line in path.read_text().splitlines():
+        for resource_spans in json.loads(line)["resourceSpans"]:
+            for scope_spans in resource_spans["scopeSpans"]:
+                spans.extend(scope_spans["spans"])
+    return spans
+
+
+def read_spans_of_line(line: str) -> list[dict[str, Any]]:
+    spans: list[dict[str, Any]] = json.loads(line)["resourceSpans"][0]["scopeSpans"][0][
+        "spans"
+    ]
+    return spans
+
+
+def get_attributes(span: dict[str, Any]) -> dict[str, Any]:
+    return {
+        attribute["key"]: next(iter(attribute["value"].values()))
+        for attribute in span["attributes"]
+    }
+
+
+@pytest.fixture
+def exporter(tmp_path: Path) -> OtlpJsonFileExporter:
+    return OtlpJsonFileExporter(tmp_path / "spans.jsonl", {"service.name": "test"})
+
+
+def test_disabled_tracer_calls_functions_directly() -> None:
+    tracer = Tracer()
+
+    @tracer.traced("mutate")
+    def mutate() -> str:
+        return "mutated"
+
+    assert mutate() == "mutated"
+    with tracer.span("rerun") as span:
+        assert not span.is_recording()
+        assert tracer.span("get_current") is span
+
+
+def test_functions_decorated_before_the_start_are_traced(
+    exporter: OtlpJsonFileExporter,
+    tmp_path: Path,
+) -> None:
+    tracer = Tracer()
+
+    @tracer.traced("mutate")
+    def mutate() -> None:
+        pass
+
+    tracer.start(exporter)
+    mutate()
+    exporter.close()
+
+    assert [span["name"] for span in read_spans(tmp_path / "spans.jsonl")] == [
+        "mutate",
+    ]
+
+
+def test_sampled_traces_are_exported_as_otlp_json(
+    exporter: OtlpJsonFileExporter,
+    tmp_path: Path,
+) -> None:
+    tracer = Tracer(exporter, 2)
+
+    @tracer.traced("room.join", lambda room_id: {ROOM_ID: room_id, PARTICIPANTS: 3})
+    def join(room_id: str) -> str:
+        return room_id
+
+    for _ in range(4):
+        with tracer.span("rerun") as span:
+            span.set_attributes({ROLE: "client", "sampled": True, "load": 0.5})
+            assert join("room") == "room"
+    assert join("room") == "room"
+    exporter.close()
+
+    request = json.loads((tmp_path / "spans.jsonl").read_text())
+    resource_spans = request["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": "test"}},
+    ]
+    assert resource_spans["scopeSpans"][0]["scope"] == {"name": "open_cups"}
+    spans = read_spans(tmp_path / "spans.jsonl")
+    # the first and third rerun, and the call outside of reruns
+    assert [span["name"] for span in spans] == [
+        "room.join",
+        "rerun",
+        "room.join",
+        "rerun",
+        "room.join",
+    ]
+    join_span, rerun_span = spans[:2]
+    assert join_span["traceId"] == rerun_span["traceId"]
+    assert join_span["parentSpanId"] == rerun_span["spanId"]
+    assert "parentSpanId" not in rerun_span
+    assert "parentSpanId" not in spans[4]
+    assert len({span["traceId"] for span in spans}) == 3
+    assert get_attributes(join_span) == {ROOM_ID: "room", PARTICIPANTS: "3"}
+    assert get_attributes(rerun_span) == {
+        ROLE: "client",
+        "sampled": True,
+        "load": 0.5,
+    }
+    assert int(rerun_span["startTimeUnixNano"]) <= int(join_span["startTimeUnixNano"])
+    assert int(join_span["endTimeUnixNano"]) <= int(rerun_span["endTimeUnixNano"])
+
+
+def test_calls_in_unsampled_traces_are_not_traced(
+    exporter: OtlpJsonFileExporter,
+    tmp_path: Path,
+) -> None:
+    tracer = Tracer(exporter, 2)
+    with tracer.span("rerun"):
+        pass
+
+    with tracer.span("rerun") as span:
+        assert not span.is_recording()
+        with tracer.span("get_current") as inner_span:
+            assert not inner_span.is_recording()
+        # the calls do not advance the sampling of the reruns
+        assert not tracer.span("cleanup_all").is_recording()
+    with tracer.span("rerun") as span:
+        assert span.is_recording()
+    exporter.close()
+
+    assert [span["name"] for span in read_spans(tmp_path / "spans.jsonl")] == [
+        "rerun",
+        "rerun",
+    ]
+
+
+def test_errors_are_recorded_by_type(
+    exporter: OtlpJsonFileExporter,
+    tmp_path: Path,
+) -> None:
+    tracer = Tracer(exporter)
+
+    @tracer.traced("room.add_question")
+    def add_question(text: str) -> None:
+        raise ValueError(text)
+
+    with pytest.raises(ValueError, match="private question"):
+        add_question("private question")
+    exporter.close()
+
+    (span,) = read_spans(tmp_path / "spans.jsonl")
+    assert span["status"] == {"code": 2, "message": "ValueError"}
+
+
+def test_spans_are_dropped_when_the_queue_is_full(tmp_path: Path) -> None:
+    exporter = OtlpJsonFileExporter(
+        tmp_path / "spans.jsonl",
+        {},
+        batch_size=2,
+        max_queue_size=3,
+    )
+
+    for _ in range(4):
+        exporter.add(Span("rerun", exporter))
+    exporter.close()
+    exporter.close()
+
+    lines = (tmp_path / "spans.jsonl").read_text().splitlines()
+    assert [len(read_spans_of_line(line)) for line in lines] == [2, 1]
+    assert exporter.dropped == 1
+
+
+def test_full_batches_are_exported_before_the_interval(tmp_path: Path) -> None:
+    path = tmp_path / "spans.jsonl"
+    exporter = OtlpJsonFileExporter(path, {}, batch_size=2, interval_seconds=60)
+    exporter.start()
+
+    exporter.add(Span("rerun", exporter))
+    exporter.add(Span("rerun", exporter))
+    deadline = time.monotonic() + 5
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    exporter.close()
+
+    assert [
+        len(read_spans_of_line(line)) for line in path.read_text().splitlines()
+    ] == [2]
+
+
+def test_tracer_from_settings(tmp_path: Path) -> None:
+    disabled = start_tracer(Tracer(), Settings())
+    settings = Settings(spans_path=tmp_path / "spans.jsonl", spans_sample_every=3)
+    tracer = start_tracer(Tracer(), settings)
+    exporter = tracer._exporter  # noqa: SLF001
+    assert exporter is not None
+    atexit.unregister(exporter.close)
+    exporter.close()
+
+    assert not disabled.enabled
+    assert tracer.enabled
+    # started once, e.g. when the cached resources are cleared
+    assert start_tracer(tracer, settings)._exporter is exporter  # noqa: SLF001
+
+
+def test_rooms_and_reruns_are_tagged(
+    exporter: OtlpJsonFileExporter,
+    tmp_path: Path,
+) -> None:
+    application_state = ApplicationState()
+    application_state.create_room("room", "host")
+    application_state.join_room("room", "user")
+    sqlite_backend = SqliteStateBackend(tmp_path / "state.db")
+    sqlite_backend.create_room("room", "host")
+    sqlite_room = sqlite_backend.get_session_room("host")
+    assert sqlite_room is not None
+    room = application_state.rooms["room"]
+
+    with Span("rerun", exporter) as span:
+        tag_rerun_span(span, "client", ClientState(room, "user"))
+    sqlite_backend.close()
+
+    assert span.attributes == {ROLE: "client", ROOM_ID: "room", PARTICIPANTS: 1}
+    assert room._span_attributes() == {ROOM_ID: "room", PARTICIPANTS: 1}  # noqa: SLF001
+    assert sqlite_room._span_attributes() == {ROOM_ID: "room"}  # noqa: SLF001
+
+
+def test_importing_the_app_starts_nothing(tmp_path: Path) -> None:
+    script = (
+        "import threading, open_cups.app, open_cups.lock_profiler as profiler; "
+        "print(threading.active_count(), open_cups.app.tracer.enabled, "
+        "profiler.lock_profiler.enabled)"
+    )
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script],
+        env={
+            **os.environ,
+            "OPEN_CUPS_SPANS_FILE": str(tmp_path / "spans.jsonl"),
+            "OPEN_CUPS_LOCK_PROFILE": str(tmp_path / "locks.txt"),
+        },
+        capture_output=True,
+        check=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.stdout.split() == ["1", "False", "False"]
+    assert not (tmp_path / "locks.txt").exists()
+
+
+def test_app_traces_sampled_reruns(tmp_path: Path) -> None:
+    path = tmp_path / "spans.jsonl"
+    # the tracer is started in a process of its own, like the app would
+    subprocess.run(  # noqa: S603
+        [sys.executable, "-c", APP_SCRIPT],
+        env={
+            **os.environ,
+            "OPEN_CUPS_SPANS_FILE": str(path),
+            "OPEN_CUPS_SPANS_EVERY": "1",
+        },
+        check=True,
+        timeout=60,
+    )
+
+    spans = read_spans(path)
+    reruns = {
+        span["spanId"]: get_attributes(span)
+        for span in spans
+        if span["name"] == "rerun"
+    }
+    assert sorted(attributes[ROLE] for attributes in reruns.values()) == [
+        "client",
+        "client",
+        "host",
+        "lobby",
+        "lobby",
+        "lobby",
+    ]
+    room_id = next(
+        attributes[ROOM_ID]
+        for attributes in reruns.values()
+        if attributes[ROLE] == "host"
+    )
+    assert {
+        attributes[PARTICIPANTS]
+        for attributes in reruns.values()
+        if attributes[ROLE] == "client"
+    } == {"1"}
+    children = {span["name"] for span in spans if span.get("parentSpanId") in reruns}
+    assert {
+        "cleanup_all",
+        "get_current",
+        "qr_code",
+        "plots.show_room_statistics",
+        "room.join",
+    } <= children
+    assert {"room.update_host_last_seen", "room.update_session"} <= {
+        span["name"] for span in spans
+    }
+    (join,) = [span for span in spans if span["name"] == "room.join"]
+    assert get_attributes(join) == {ROOM_ID: room_id, PARTICIPANTS: "0"}
@@ -0,0 +1,327 @@
+from pathlib import Path
+
+import pytest
+
+from open_cups.application_state import ApplicationState
+from open_cups.backend import StateBackend
+from open_cups.question_index import SimilarQuestionError
+from open_cups.room import HEARTBEAT_EPOCHS_PER_TIMEOUT
+from open_cups.room_codes import RoomCodeTakenError
+from open_cups.settings import Settings
+from open_cups.sqlite_backend import SqliteStateBackend
+from open_cups.state_provider import create_application_state
+from open_cups.stats_tracker import Config as StatsTrackerConfig
+from open_cups.types import Question, UserStatus
+
+TIMEOUT_SECONDS = 30
+EPOCH_SECONDS = TIMEOUT_SECONDS / HEARTBEAT_EPOCHS_PER_TIMEOUT
+
+
+class FakeTime:
+    def __init__(self, initial_time: float = 0.0) -> None:
+        self.current_time = initial_time
+
+    def __call__(self) -> float:
+        return self.current_time
+
+
+@pytest.fixture
+def fake_time(monkeypatch: pytest.MonkeyPatch) -> FakeTime:
+    time_mock = FakeTime()
+    monkeypatch.setattr("open_cups.clock.time.time", time_mock)
+    return time_mock
+
+
+def test_sessions_and_statuses(backend: StateBackend) -> None:
+    backend.create_room("room-id", "host-id")
+    backend.join_room("room-id", "user-1")
+    backend.join_room("room-id", "user-2")
+
+    room = backend.get_session_room("user-1")
+    assert room is not None
+    assert room.room_id == "room-id"
+    assert not room.is_host("user-1")
+    room.set_session_status("user-1", UserStatus.GREEN)
+
+    host_room = backend.get_session_room("host-id")
+    assert host_room is not None
+    assert host_room.is_host("host-id")
+    assert sorted(host_room) == [
+        ("user-1", UserStatus.GREEN),
+        ("user-2", UserStatus.UNKNOWN),
+    ]
+    assert host_room.get_session_status("user-2") == UserStatus.UNKNOWN
+    assert backend.get_session_room("stranger") is None
+
+
+def test_join_missing_room(backend: StateBackend) -> None:
+    with pytest.raises(ValueError, match="Room missing does not exist"):
+        backend.join_room("missing", "user-1")
+
+
+def test_taken_room_code_is_free_after_room_removal(
+    backend: StateBackend,
+    fake_time: FakeTime,
+) -> None:
+    backend.create_room("ABC123", "host-1")
+    with pytest.raises(RoomCodeTakenError, match="Room ABC123 already exists"):
+        backend.create_room("ABC123", "host-2")
+    assert backend.get_session_room("host-2") is None
+
+    fake_time.current_time += 10
+    backend.remove_rooms_with_inactive_hosts(5)
+    backend.create_room("ABC123", "host-2")
+
+    room = backend.get_session_room("host-2")
+    assert room is not None
+    assert room.room_id == "ABC123"
+
+
+def test_unknown_session_status(backend: StateBackend) -> None:
+    backend.create_room("room-id", "host-id")
+    room = backend.get_session_room("host-id")
+    assert room is not None
+
+    with pytest.raises(KeyError):
+        room.get_session_status("stranger")
+
+
+def test_questions(backend: StateBackend) -> None:
+    backend.create_room("room-id", "host-id")
+    backend.join_room("room-id", "user-1")
+    room = backend.get_session_room("user-1")
+    assert room is not None
+
+    room.add_question("user-1", "First")
+    room.add_question("user-1", "Second")
+    first, second = room.get_open_questions()
+    room.upvote_question("user-2", second.id)
+    room.upvote_question("user-2", second.id)
+    room.upvote_question("user-2", "missing")
+
+    questions = room.get_open_questions()
+    assert [(q.text, q.voter_ids) for q in questions] == [
+        ("Second", {"user-1", "user-2"}),
+        ("First", {"user-1"}),
+    ]
+
+    room.close_question(first.id)
+    assert [q.text for q in room.get_open_questions()] == ["Second"]
+
+
+def test_similar_questions(backend: StateBackend) -> None:
+    backend.create_room("room-1", "host-1")
+    backend.create_room("room-2", "host-2")
+    backend.join_room("room-1", "user-1")
+    backend.join_room("room-2", "user-2")
+    room = backend.get_session_room("user-1")
+    other_room = backend.get_session_room("user-2")
+    assert room is not None
+    assert other_room is not None
+    question_id = room.add_question("user-1", "How does this work?")
+    room.upvote_question("user-3", question_id)
+    room.add_question("user-1", "When is the exam?")
+
+    with pytest.raises(SimilarQuestionError) as error:
+        room.add_question("user-4", "How does that work?", allow_similar=False)
+
+    assert error.value.question == Question(
+        question_id,
+        "How does this work?",
+        {"user-1", "user-3"},
+    )
+    # the questions of other rooms are not similar
+    other_room.add_question("user-2", "How does that work?", allow_similar=False)
+    room.close_question(question_id)
+    room.add_question("user-4", "How does that work?", allow_similar=False)
+    assert len(room.get_open_questions()) == 2
+
+
+def test_statistics(backend: StateBackend) -> None:
+    backend.create_room("room-1", "host-1")
+    backend.create_room("room-2", "host-2")
+    backend.join_room("room-1", "user-1")
+    backend.join_room("room-2", "user-2")
+    room = backend.get_session_room("user-1")
+    assert room is not None
+    question_id = room.add_question("user-1", "Question")
+
+    statistics = backend.get_statistics()
+    room.close_question(question_id)
+
+    assert (statistics.rooms, statistics.sessions, statistics.questions) == (2, 2, 1)
+    # each room recorded a snapshot when its first participant joined
+    assert statistics.history_points == 2
+    assert backend.get_statistics().questions == 0
+
+
+def test_overview(backend: StateBackend) -> None:
+    backend.create_room("room-1", "host-1")
+    backend.create_room("room-2", "host-2")
+    for user in ("user-1", "user-2"):
+        backend.join_room("room-1", user)
+    backend.join_room("room-2", "user-3")
+    room = backend.get_session_room("user-1")
+    assert room is not None
+    room.set_session_status("user-1", UserStatus.GREEN)
+    room.add_question("user-1", "Question")
+    # the cleanup ranks the rooms
+    backend.remove_inactive_sessions(60)
+
+    overview = backend.get_overview()
+
+    assert overview.rooms == 2
+    assert overview.participants == {
+        UserStatus.UNKNOWN: 2,
+        UserStatus.GREEN: 1,
+        UserStatus.YELLOW: 0,
+        UserStatus.RED: 0,
+    }
+    assert overview.questions == 1
+    assert [
+        (summary.room_id, summary.participants, summary.questions)
+        for summary in overview.largest_rooms
+    ] == [("room-1", 2, 1), ("room-2", 1, 0)]
+    # only the in-memory backend sees all writes
+    assert (overview.writes_per_second is None) == (
+        isinstance(backend, SqliteStateBackend)
+    )
+
+
+def test_cleanup(backend: StateBackend, monkeypatch: pytest.MonkeyPatch) -> None:
+    times = FakeTime()
+    monkeypatch.setattr("time.time", times)
+    backend.create_room("room-1", "host-1")
+    backend.create_room("room-2", "host-2")
+    backend.join_room("room-1", "user-1")
+    backend.join_room("room-1", "user-2")
+
+    times.current_time = 100.0
+    room = backend.get_session_room("host-1")
+    assert room is not None
+    room.update_host_last_seen()
+    room.update_session("user-1")
+
+    backend.remove_inactive_sessions(timeout_seconds=10)
+    backend.remove_rooms_with_inactive_hosts(timeout_seconds=10)
+
+    assert list(room) == [("user-1", UserStatus.UNKNOWN)]
+    assert backend.get_session_room("host-2") is None
+
+
+def test_sqlite_history_mirrors_stats_tracker(
+    tmp_path: Path,
+    fake_time: FakeTime,
+) -> None:
+    backend = SqliteStateBackend(
+        tmp_path / "state.db",
+        StatsTrackerConfig(
+            dense_snapshot_interval_seconds=1,
+            dense_sampling_window_seconds=10,
+            sparse_snapshot_interval_seconds=5,
+            max_sparse_snapshot_count=3,
+        ),
+    )
+    backend.create_room("room-id", "host-id")
+    room = backend.get_session_room("host-id")
+    assert room is not None
+
+    for i in range(30):
+        fake_time.current_time = float(i)
+        room.set_session_status("user-1", UserStatus.GREEN)
+        room.set_session_status("user-2", UserStatus.RED)
+
+    history = room.get_status_history()
+    recent_history = room.get_status_history(27.0)
+    first = room.get_status_history_start()
+    backend.close()
+    assert [s.timestamp for s in history] == [5.0, 10.0, 15.0, *range(19, 30)]
+    assert [s.timestamp for s in recent_history] == [27.0, 28.0, 29.0]
+    assert first == 5.0
+    assert history[-1].counts == {
+        UserStatus.GREEN: 1,
+        UserStatus.YELLOW: 0,
+        UserStatus.RED: 1,
+        UserStatus.UNKNOWN: 0,
+    }
+
+
+def get_last_seen(backend: StateBackend, session_id: str) -> float:
+    if isinstance(backend, SqliteStateBackend):
+        with backend.read() as connection:
+            (last_seen,) = connection.execute(
+                "SELECT last_seen FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        return float(last_seen)
+    assert isinstance(backend, ApplicationState)
+    return backend.rooms["room-id"]._sessions[session_id].last_seen  # noqa: SLF001
+
+
+@pytest.mark.parametrize("heartbeat_epoch_seconds", [EPOCH_SECONDS])
+def test_heartbeats_are_coalesced_without_early_removal(
+    backend: StateBackend,
+    fake_time: FakeTime,
+) -> None:
+    backend.create_room("room-id", "host-id")
+    backend.join_room("room-id", "user")
+    room = backend.get_session_room("user")
+    assert room is not None
+
+    writes = set()
+    for _ in range(300):
+        fake_time.current_time += 2
+        room.update_host_last_seen()
+        room.update_session("user")
+        backend.remove_inactive_sessions(TIMEOUT_SECONDS)
+        writes.add(get_last_seen(backend, "user"))
+    # a status change marks the session as seen until the end of an epoch too
+    fake_time.current_time += EPOCH_SECONDS
+    room.set_session_status("user", UserStatus.GREEN)
+    last_seen = get_last_seen(backend, "user")
+    fake_time.current_time += 2
+    room.update_session("user")
+
+    assert len(writes) <= 300 / 5
+    assert get_last_seen(backend, "user") == last_seen
+    # not before the timeout after the last heartbeat, at most an epoch later
+    fake_time.current_time += TIMEOUT_SECONDS
+    room.update_host_last_seen()
+    backend.remove_inactive_sessions(TIMEOUT_SECONDS)
+    assert dict(room) == {"user": UserStatus.GREEN}
+    fake_time.current_time += EPOCH_SECONDS
+    backend.remove_inactive_sessions(TIMEOUT_SECONDS)
+    assert dict(room) == {}
+
+
+def test_processes_share_rooms_through_the_database(tmp_path: Path) -> None:
+    first = create_application_state(Settings(sqlite_path=tmp_path / "state.db"))
+    second = SqliteStateBackend(tmp_path / "state.db")
+    assert isinstance(first, SqliteStateBackend)
+    assert first.heartbeat_epoch_seconds == 60 / HEARTBEAT_EPOCHS_PER_TIMEOUT
+
+    first.create_room("room-id", "host-id")
+    second.join_room("room-id", "user-1")
+
+    room = first.get_session_room("user-1")
+    assert room is not None
+    assert list(room) == [("user-1", UserStatus.UNKNOWN)]
+    first.close()
+    second.close()
+
+
+def test_failed_transaction_is_rolled_back(tmp_path: Path) -> None:
+    backend = SqliteStateBackend(tmp_path / "state.db")
+    backend.create_room("room-id", "host-id")
+
+    def delete_rooms_and_fail() -> None:
+        with backend.transaction() as connection:
+            connection.execute("DELETE FROM rooms")
+            message = "boom"
+            raise ValueError(message)
+
+    with pytest.raises(ValueError, match="boom"):
+        delete_rooms_and_fail()
+
+    assert backend.get_session_room("host-id") is not None
+    backend.close()
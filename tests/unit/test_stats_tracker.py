@@ -1,5 +1,8 @@
+from pathlib import Path
+
 import pytest
 
+from open_cups.history_store import MemoryMappedHistory
 from open_cups.stats_tracker import Config, StatsTracker
 from open_cups.types import UserSession, UserStatus
 
@@ -164,3 +167,74 @@ def test_disregard_samples_provided_quicker_than_dense_interval(
     assert len(history) == 2
     assert history[0].timestamp == 0.0
     assert history[1].timestamp == 5.0
+
+
+def test_history_store_keeps_snapshots_dropped_from_sparse_cache(
+    fake_time: FakeTime,
+    tmp_path: Path,
+) -> None:
+    history_store = MemoryMappedHistory(tmp_path / "room.history")
+    unit = StatsTracker(
+        Config(
+            dense_snapshot_interval_seconds=1,
+            dense_sampling_window_seconds=10,
+            sparse_snapshot_interval_seconds=5,
+            max_sparse_snapshot_count=2,
+        ),
+        history_store,
+    )
+
+    for i in range(40):
+        fake_time.current_time = float(i)
+        unit.record_status_snapshot([UserSession(UserStatus.GREEN, 0.0)])
+
+    history = unit.status_history
+    sparse_timestamps = [s.timestamp for s in history if s.timestamp < 29.0]
+    assert sparse_timestamps == [0.0, 5.0, 10.0, 15.0, 20.0, 25.0]
+    assert history[-1].timestamp == 39.0
+
+    recent = unit.get_status_history_range(start_time=20.0)
+    assert recent[0].timestamp == 20.0
+    assert recent[-1].timestamp == 39.0
+
+    unit.close()
+    assert not (tmp_path / "room.history").exists()
+
+
+def test_status_history_range_without_history_store(fake_time: FakeTime) -> None:
+    unit = StatsTracker(
+        Config(
+            dense_snapshot_interval_seconds=1,
+            dense_sampling_window_seconds=10,
+            sparse_snapshot_interval_seconds=5,
+            max_sparse_snapshot_count=1000,
+        ),
+    )
+
+    for i in range(30):
+        fake_time.current_time = float(i)
+        unit.record_status_snapshot([UserSession(UserStatus.GREEN, 0.0)])
+
+    recent = unit.get_status_history_range(start_time=10.0)
+    assert [s.timestamp for s in recent][:3] == [10.0, 15.0, 19.0]
+    unit.close()
+
+
+def test_record_status_counts_matches_snapshots(fake_time: FakeTime) -> None:
+    from_sessions = StatsTracker(Config())
+    from_counts = StatsTracker(Config())
+    sessions = [UserSession(UserStatus.GREEN, 0), UserSession(UserStatus.RED, 0)]
+    counts = {
+        UserStatus.GREEN: 1,
+        UserStatus.YELLOW: 0,
+        UserStatus.RED: 1,
+        UserStatus.UNKNOWN: 0,
+    }
+
+    for current_time in range(0, 200, 7):
+        fake_time.current_time = current_time
+        from_sessions.record_status_snapshot(sessions)
+        from_counts.record_status_counts(counts)
+
+    assert from_counts.status_history == from_sessions.status_history
+    assert len(from_counts.status_history) > 1
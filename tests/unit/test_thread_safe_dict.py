@@ -1,3 +1,4 @@
+import sys
 from typing import Any
 
 import pytest
@@ -43,9 +44,34 @@ def test_basic_operations() -> None:
     with pytest.raises(KeyError):
         _ = thread_safe_dict["key1"]
 
+    # Test get
+    assert thread_safe_dict.get("key2") == {"nested": "dict"}
+    assert thread_safe_dict.get("missing") is None
+    assert thread_safe_dict.get("missing", "default") == "default"
+
+    # Test pop
+    thread_safe_dict["key3"] = "value3"
+    assert thread_safe_dict.pop("key3") == "value3"
+    assert thread_safe_dict.pop("key3") is None
+    assert thread_safe_dict.pop("key3", "default") == "default"
+
     # Test context manager for atomic operations
     thread_safe_dict["counter"] = 0
     with thread_safe_dict:
         current = thread_safe_dict["counter"]
         thread_safe_dict["counter"] = current + 1
     assert thread_safe_dict["counter"] == 1
+
+
+def test_emptied_dict_shrinks() -> None:
+    thread_safe_dict: ThreadSafeDict[int] = ThreadSafeDict()
+    for index in range(1000):
+        thread_safe_dict[str(index)] = index
+    peak_size = sys.getsizeof(thread_safe_dict._data)  # noqa: SLF001
+
+    for index in range(999):
+        thread_safe_dict.pop(str(index))
+    del thread_safe_dict["999"]
+
+    assert sys.getsizeof(thread_safe_dict._data) < peak_size / 10  # noqa: SLF001
+    assert not list(thread_safe_dict)
@@ -0,0 +1,181 @@
+import atexit
+import gzip
+import json
+from pathlib import Path
+
+from open_cups.application_state import ApplicationState
+from open_cups.backend import StateBackend
+from open_cups.settings import Settings
+from open_cups.state_provider import create_application_state
+from open_cups.trace import (
+    RecordingStateBackend,
+    TraceRecorder,
+    format_replay_report,
+    read_trace,
+    replay_trace,
+)
+from open_cups.types import TraceOperation, UserStatus
+
+
+def record_lecture(path: Path) -> None:
+    recorder = TraceRecorder(path)
+    backend = RecordingStateBackend(ApplicationState(), recorder)
+    backend.create_room("secret-room", "secret-host")
+    backend.join_room("secret-room", "alice")
+    backend.join_room("secret-room", "bob")
+    host_room = backend.get_session_room("secret-host")
+    room = backend.get_session_room("alice")
+    assert host_room is not None
+    assert room is not None
+    assert backend.get_session_room("nobody") is None
+    assert room.has_session("alice")
+
+    host_room.update_host_last_seen()
+    room.update_session("alice")
+    room.set_session_status("alice", UserStatus.GREEN)
+    room.set_session_status("bob", UserStatus.RED)
+    asked = room.add_question("alice", "Secret question?")
+    closed = room.add_question("bob", "Closed")
+    room.upvote_question("bob", asked)
+    host_room.close_question(closed)
+    backend.remove_inactive_sessions(60)
+    backend.remove_rooms_with_inactive_hosts(60)
+
+    assert room.room_id == "secret-room"
+    assert host_room.is_host("secret-host")
+    assert host_room.host_id == "secret-host"
+    assert room.get_session_status("bob") == UserStatus.RED
+    assert dict(room) == {"alice": UserStatus.GREEN, "bob": UserStatus.RED}
+    assert [question.vote_count for question in room.get_open_questions()] == [2]
+    assert len(room.get_status_history()) == 1
+    assert room.get_status_history_start() is not None
+    assert backend.get_statistics().sessions == 2
+    assert backend.get_overview().participants[UserStatus.RED] == 1
+    recorder.close()
+
+
+def test_recorded_trace_is_anonymised(tmp_path: Path) -> None:
+    record_lecture(tmp_path / "lecture.trace.gz")
+
+    records = list(read_trace(tmp_path / "lecture.trace.gz"))
+
+    content = gzip.decompress((tmp_path / "lecture.trace.gz").read_bytes()).decode()
+    assert "secret" not in content.lower()
+    assert "alice" not in content
+    assert [record.operation for record in records] == [
+        TraceOperation.CREATE,
+        TraceOperation.JOIN,
+        TraceOperation.JOIN,
+        TraceOperation.HOST_HEARTBEAT,
+        TraceOperation.HEARTBEAT,
+        TraceOperation.STATUS,
+        TraceOperation.STATUS,
+        TraceOperation.ASK,
+        TraceOperation.ASK,
+        TraceOperation.UPVOTE,
+        TraceOperation.CLOSE,
+    ]
+    assert {record.room for record in records} == {0}
+    assert records[1].session == 1
+    assert records[7].value == len("Secret question?")
+    assert records[10].question == 1
+    assert all(record.seconds >= 0 for record in records)
+
+
+def test_replay_reproduces_the_state(backend: StateBackend, tmp_path: Path) -> None:
+    record_lecture(tmp_path / "lecture.trace.gz")
+
+    report = replay_trace(tmp_path / "lecture.trace.gz", backend, None, 2)
+
+    room = backend.get_session_room("trace-session-0")
+    assert room is not None
+    assert room.is_host("trace-session-0")
+    assert dict(room) == {
+        "trace-session-1": UserStatus.GREEN,
+        "trace-session-2": UserStatus.RED,
+    }
+    (question,) = room.get_open_questions()
+    assert question.text == "x" * len("Secret question?")
+    assert question.vote_count == 2
+    assert report.operations == 11
+    assert report.errors == {}
+    assert len(report.latencies_ns["status"]) == 2
+    assert report.statistics.rooms == 1
+    assert report.peak_rss_bytes > 0
+
+
+def test_replay_at_recorded_pace_of_trace_without_room_creation(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "partial.trace.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        file.writelines(
+            json.dumps(record) + "\n"
+            for record in [
+                [0, "status", 3, 7, -1, "YELLOW"],
+                [20, "heartbeat", 3, 7, -1, ""],
+                [40, "upvote", 3, 7, 5, ""],
+            ]
+        )
+    backend = ApplicationState()
+
+    report = replay_trace(path, backend, speed=2.0)
+
+    assert report.seconds >= 0.02
+    room = backend.get_session_room("trace-host-3")
+    assert room is not None
+    assert dict(room) == {"trace-session-7": UserStatus.YELLOW}
+    lines = format_replay_report(report).splitlines()
+    assert lines[0].startswith("3 operations in")
+    assert [line.split()[0] for line in lines[2:]] == ["heartbeat", "status", "upvote"]
+
+
+def test_replay_counts_failed_operations(tmp_path: Path) -> None:
+    path = tmp_path / "recycled.trace.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        file.writelines(
+            json.dumps(record) + "\n"
+            for record in [
+                [0, "create", 0, 0, -1, ""],
+                # the room code is still taken by the first host
+                [10, "create", 0, 1, -1, ""],
+                [20, "join", 0, 2, -1, ""],
+            ]
+        )
+    backend = ApplicationState()
+
+    report = replay_trace(path, backend, speed=None)
+
+    assert report.operations == 3
+    assert report.errors == {"create": 1}
+    assert len(report.latencies_ns["create"]) == 2
+    room = backend.get_session_room("trace-session-2")
+    assert room is not None
+    assert room.is_host("trace-session-0")
+    lines = format_replay_report(report).splitlines()
+    assert "1 failed" in lines[0]
+    assert lines[2].split()[:3] == ["create", "2", "1"]
+
+
+def test_long_traces_are_written_in_batches(tmp_path: Path) -> None:
+    recorder = TraceRecorder(tmp_path / "long.trace.gz")
+    backend = RecordingStateBackend(ApplicationState(), recorder)
+    backend.create_room("room-id", "host-id")
+    room = backend.get_session_room("host-id")
+    assert room is not None
+
+    for _ in range(2500):
+        room.update_host_last_seen()
+    recorder.close()
+
+    assert len(list(read_trace(tmp_path / "long.trace.gz"))) == 2501
+
+
+def test_create_application_state_records_trace(tmp_path: Path) -> None:
+    backend = create_application_state(Settings(trace_path=tmp_path / "t.gz"))
+
+    assert isinstance(backend, RecordingStateBackend)
+    backend.create_room("room-id", "host-id")
+    atexit.unregister(backend._recorder.close)  # noqa: SLF001
+    backend._recorder.close()  # noqa: SLF001
+    assert len(list(read_trace(tmp_path / "t.gz"))) == 1